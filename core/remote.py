@@ -27,6 +27,7 @@ from qtpy.QtCore import QObject
 from urllib.parse import urlparse
 import ssl
 from .util.models import DictTableModel, ListTableModel
+from .util.network import ArrayExportServiceMixin
 import rpyc
 from rpyc.utils.server import ThreadedServer
 rpyc.core.protocol.DEFAULT_CONFIG['allow_pickle'] = True
@@ -77,8 +78,9 @@ class RemoteObjectManager(QObject):
     def makeRemoteService(self):
         """ A function that returns a class containing a module list hat can be manipulated from the host.
         """
-        class RemoteModuleService(rpyc.Service):
+        class RemoteModuleService(ArrayExportServiceMixin, rpyc.Service):
             """ An RPyC service that has a module list.
+                Clients can obtain numpy arrays from this service without pickling (see netobtain).
             """
             modules = self.sharedModules
             _manager = self.manager
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains an on-disk store for numpy arrays, deduplicated by content hashed chunks.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import hashlib
+import tempfile
+import numpy as np
+
+
+class ChunkedArrayStore:
+    """
+    Stores numpy arrays in a directory as chunks of raw bytes named by their content hash.
+
+    The raw buffer of each array is split into chunks of a fixed size. A chunk is only written if
+    no chunk with the same content exists, so identical arrays and unchanged parts of arrays with
+    the same shape (e.g. image lines that have not been scanned again) are stored once.
+    Arrays are identified by a small reference dict (dtype, shape and the list of chunk hashes),
+    which can be kept in memory or saved with the status variables instead of the array itself.
+    """
+    _suffix = '.chunk'
+
+    def __init__(self, directory, chunk_size=2 ** 18):
+        """
+        @param str directory: directory to store the chunks in (created if necessary)
+        @param int chunk_size: chunk size in bytes
+        """
+        self.directory = directory
+        self.chunk_size = int(chunk_size)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def _chunk_path(self, chunk_hash):
+        return os.path.join(self.directory, chunk_hash + self._suffix)
+
+    def put(self, array):
+        """
+        Store an array.
+
+        @param numpy.ndarray array: the array to store (numeric dtype)
+
+        @return dict: reference to the stored array to pass to get
+        """
+        array = np.ascontiguousarray(array)
+        if array.dtype.hasobject or array.dtype.fields is not None:
+            raise TypeError('Only arrays of numeric dtype can be stored in a ChunkedArrayStore.')
+        buffer = memoryview(array.reshape(-1).view(np.uint8))
+        chunks = list()
+        for start in range(0, len(buffer), self.chunk_size):
+            chunk = buffer[start:start + self.chunk_size]
+            chunk_hash = hashlib.sha1(chunk).hexdigest()
+            path = self._chunk_path(chunk_hash)
+            if not os.path.exists(path):
+                # Write to a temporary file first, so an interrupted write leaves no broken chunk
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+                with os.fdopen(fd, 'wb') as file:
+                    file.write(chunk)
+                os.replace(tmp_path, path)
+            chunks.append(chunk_hash)
+        return {'dtype': array.dtype.str,
+                'shape': list(array.shape),
+                'chunk_size': self.chunk_size,
+                'chunks': chunks}
+
+    def get(self, reference):
+        """
+        Load a stored array.
+
+        @param dict reference: reference returned by put
+
+        @return numpy.ndarray: the stored array (new array, not shared between calls)
+        """
+        array = np.empty(tuple(reference['shape']), dtype=np.dtype(reference['dtype']))
+        buffer = array.reshape(-1).view(np.uint8)
+        chunk_size = reference.get('chunk_size', self.chunk_size)
+        start = 0
+        for chunk_hash in reference['chunks']:
+            with open(self._chunk_path(chunk_hash), 'rb') as file:
+                start += file.readinto(memoryview(buffer[start:start + chunk_size]))
+        if start != buffer.size:
+            raise ValueError('Stored chunks do not match the size of the referenced array.')
+        return array
+
+    def contains(self, reference):
+        """
+        Check if all chunks of a referenced array are available.
+
+        @param dict reference: reference returned by put
+
+        @return bool: True if the array can be loaded
+        """
+        return all(os.path.exists(self._chunk_path(chunk_hash))
+                   for chunk_hash in reference['chunks'])
+
+    def prune(self, references):
+        """
+        Remove all chunks which are not used by the given references.
+
+        @param list references: references of all arrays to keep (None entries are ignored)
+
+        @return int: number of removed chunks
+        """
+        keep = set()
+        for reference in references:
+            if reference is not None:
+                keep.update(reference['chunks'])
+        removed = 0
+        for filename in os.listdir(self.directory):
+            if filename.endswith(self._suffix) and filename[:-len(self._suffix)] not in keep:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the min/max decimation of large traces for plotting.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+
+
+class MinMaxDecimator:
+    """
+    Reduces a trace (x sorted ascending) to the samples needed to plot it in a given x range with a
+    given number of pixels: the first, last, minimum and maximum sample of each pixel column, in
+    the order of the trace (M4 aggregation). Drawing these samples connected by lines gives the
+    same picture as drawing all samples.
+
+    The minima and maxima (values and sample indices) of blocks of 8, 64, 512, ... samples are
+    calculated on first use and kept until new data is set, so zooming and panning only reduces
+    the blocks of the visible range (8 to 64 blocks per pixel) into pixel columns.
+    """
+
+    # number of blocks of a level reduced into one block of the next level
+    block_factor = 8
+
+    def __init__(self, min_samples_per_pixel=4):
+        """
+        @param int min_samples_per_pixel: the visible samples are returned without decimation
+                                          unless there are more samples per pixel than this
+        """
+        self.min_samples_per_pixel = max(1, int(min_samples_per_pixel))
+        self.x = None
+        self.y = None
+        self._sorted = False
+        self._y_range = (None, None)
+        self._levels = list()
+
+    @property
+    def size(self):
+        return 0 if self.y is None else self.y.size
+
+    def set_data(self, x, y):
+        """
+        Set a new trace. The decimation levels of the previous trace are discarded.
+
+        @param numpy.ndarray x: x values (ascending for decimation, otherwise all samples are
+                                always returned)
+        @param numpy.ndarray y: y values of the same size
+        """
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        self._levels = list()
+        self._sorted = bool(self.x.ndim == 1 and self.x.shape == self.y.shape and (
+                self.x.size < 2 or not np.any(self.x[1:] < self.x[:-1])))
+        if self.y.size > 0 and self.y.dtype.kind in 'iuf':
+            self._y_range = (np.nanmin(self.y), np.nanmax(self.y))
+        else:
+            self._y_range = (None, None)
+        return
+
+    def clear(self):
+        self.x = None
+        self.y = None
+        self._sorted = False
+        self._y_range = (None, None)
+        self._levels = list()
+        return
+
+    def data_bounds(self, axis, x_range=None):
+        """
+        Range of the whole trace (not only of the returned samples) along an axis.
+
+        @param int axis: 0 for x, 1 for y
+        @param tuple x_range: optional (min, max) x range to get the y range of
+
+        @return tuple: (min, max) or (None, None) for no data
+        """
+        if self.size == 0 or not self._sorted:
+            return None, None
+        if axis == 0:
+            return self.x[0], self.x[-1]
+        if x_range is None:
+            return self._y_range
+        start = int(np.searchsorted(self.x, x_range[0], side='left'))
+        stop = int(np.searchsorted(self.x, x_range[1], side='right'))
+        if stop <= start:
+            return None, None
+        return np.nanmin(self.y[start:stop]), np.nanmax(self.y[start:stop])
+
+    def decimate(self, x_min=None, x_max=None, pixels=1000):
+        """
+        Samples to plot the trace in an x range with a number of pixels.
+
+        @param float x_min: left edge of the visible x range (default: start of the trace)
+        @param float x_max: right edge of the visible x range (default: end of the trace)
+        @param int pixels: width of the visible x range in pixels
+
+        @return tuple: x and y arrays of the samples to plot. These include one sample on each side
+                       outside the visible range, so lines leaving the plot are drawn.
+        """
+        if self.size == 0 or not self._sorted:
+            return self.x, self.y
+
+        start = 0 if x_min is None else int(np.searchsorted(self.x, x_min, side='left'))
+        stop = self.size if x_max is None else int(np.searchsorted(self.x, x_max, side='right'))
+        start = max(0, start - 1)
+        stop = min(self.size, stop + 1)
+        pixels = max(1, int(pixels))
+        samples_per_pixel = (stop - start) / pixels
+        if samples_per_pixel <= self.min_samples_per_pixel:
+            return self.x[start:stop], self.y[start:stop]
+
+        # The coarsest level with at least block_factor blocks per pixel, so blocks reaching into
+        # the next pixel column are narrow compared to a pixel.
+        level = 0
+        while self.block_factor ** (level + 2) <= samples_per_pixel:
+            level += 1
+        block = self.block_factor ** level
+        if level == 0:
+            block_min = block_max = self.y[start:stop]
+            block_argmin = block_argmax = np.arange(start, stop)
+            block_starts = block_argmin
+        else:
+            first_block, last_block = start // block, -(-stop // block)
+            block_min, block_max, block_argmin, block_argmax = (
+                values[first_block:last_block] for values in self._get_level(level))
+            block_starts = np.arange(first_block, last_block) * block
+
+        # pixel column of each block (by the x value of its first sample)
+        x_min = self.x[start] if x_min is None else x_min
+        x_max = self.x[stop - 1] if x_max is None else x_max
+        if x_max > x_min:
+            columns = np.floor((self.x[block_starts] - x_min) * (pixels / (x_max - x_min)))
+        else:
+            columns = np.zeros(block_starts.size)
+        column_starts = np.insert(np.flatnonzero(np.diff(columns)) + 1, 0, 0)
+        column_sizes = np.diff(np.append(column_starts, block_starts.size))
+
+        # First, last, minimum and maximum sample of each column in the order of the trace. These
+        # give the same line as all samples: the line inside a column covers the range between
+        # minimum and maximum, the lines between columns connect the last and the first sample.
+        indices = np.empty((column_starts.size, 4), dtype=np.int64)
+        indices[:, 0] = block_starts[column_starts]
+        indices[:-1, 1] = block_starts[column_starts[1:]] - 1
+        indices[-1, 1] = min(self.size, block_starts[-1] + block) - 1
+        indices[:, 2] = self._first_extremum(np.minimum, block_min, block_argmin, column_starts,
+                                             column_sizes)
+        indices[:, 3] = self._first_extremum(np.maximum, block_max, block_argmax, column_starts,
+                                             column_sizes)
+        indices.sort(axis=1)
+        indices = indices.ravel()
+        indices = indices[np.insert(indices[1:] != indices[:-1], 0, True)]
+        return self.x[indices], self.y[indices]
+
+    @staticmethod
+    def _first_extremum(ufunc, values, indices, column_starts, column_sizes):
+        """
+        Sample index of the first occurrence of the extremum of each column of blocks.
+
+        @param numpy.ufunc ufunc: numpy.minimum or numpy.maximum
+        @param numpy.ndarray values: minima or maxima of the blocks
+        @param numpy.ndarray indices: sample indices of the block minima or maxima
+        @param numpy.ndarray column_starts: index of the first block of each column
+        @param numpy.ndarray column_sizes: number of blocks of each column
+
+        @return numpy.ndarray: sample index of the extremum of each column
+        """
+        column_values = ufunc.reduceat(values, column_starts)
+        matches = values == np.repeat(column_values, column_sizes)
+        if values.dtype.kind == 'f':
+            # minimum/maximum propagate NaN, so a column containing NaN has a NaN extremum
+            matches |= np.isnan(values)
+        no_index = np.iinfo(indices.dtype).max
+        return np.minimum.reduceat(np.where(matches, indices, no_index), column_starts)
+
+    def _get_level(self, level):
+        """
+        Minima, maxima and the sample indices of their first occurrence of the blocks of
+        block_factor**level samples. Calculated from the next finer level on first use.
+
+        @param int level: level (>= 1)
+
+        @return tuple: block_min, block_max, block_argmin, block_argmax arrays
+        """
+        while len(self._levels) < level:
+            if self._levels:
+                block_min, block_max, block_argmin, block_argmax = self._levels[-1]
+            else:
+                block_min = block_max = self.y
+                block_argmin = block_argmax = None
+            self._levels.append(self._reduce_blocks(block_min, block_max, block_argmin,
+                                                    block_argmax))
+        return self._levels[level - 1]
+
+    def _reduce_blocks(self, block_min, block_max, block_argmin, block_argmax):
+        """
+        Reduce each block_factor consecutive blocks (or samples if the indices are None) into one.
+        """
+        factor = self.block_factor
+        number_of_blocks = -(-block_min.size // factor)
+        padding = number_of_blocks * factor - block_min.size
+        index_dtype = np.uint32 if self.y.size < np.iinfo(np.uint32).max else np.int64
+        if block_argmin is None:
+            block_argmin = block_argmax = np.arange(block_min.size, dtype=index_dtype)
+        if padding:
+            # repeat the last block, so it is not the first occurrence of the min/max
+            block_min = np.append(block_min, np.repeat(block_min[-1:], padding))
+            block_max = np.append(block_max, np.repeat(block_max[-1:], padding))
+            block_argmin = np.append(block_argmin, np.repeat(block_argmin[-1:], padding))
+            block_argmax = np.append(block_argmax, np.repeat(block_argmax[-1:], padding))
+        block_min = block_min.reshape(number_of_blocks, factor)
+        block_max = block_max.reshape(number_of_blocks, factor)
+        rows = np.arange(number_of_blocks)
+        position_min = np.argmin(block_min, axis=1)
+        position_max = np.argmax(block_max, axis=1)
+        return (block_min[rows, position_min],
+                block_max[rows, position_max],
+                block_argmin.reshape(number_of_blocks, factor)[rows, position_min],
+                block_argmax.reshape(number_of_blocks, factor)[rows, position_max])
@@ -19,14 +19,274 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import os
+import ssl
+import uuid
+import socket
+import tempfile
+import threading
+import weakref
+import numpy as np
 import rpyc.core.netref
 import rpyc.utils.classic
 
+# Size of the chunks (in bytes) to transfer array buffers through a rpyc connection
+ARRAY_STREAM_CHUNK_SIZE = 2 ** 25
+# Timeout (in seconds) for the separate socket used to stream array buffers
+ARRAY_SOCKET_TIMEOUT = 30
+
+# Host id of the peer for each rpyc connection (None if the peer does not support array export)
+_peer_host_ids = weakref.WeakKeyDictionary()
+
 
 def netobtain(obj):
     """
+    Get a local copy of an object if it is a rpyc remote object (netref).
+
+    Remote numpy arrays are transferred without pickling if the remote service supports it
+    (see ArrayExportServiceMixin): Through shared memory if both sides run on the same host and
+    by streaming the raw array buffer otherwise (see obtain_array).
+
+    @param obj: the object to obtain
+
+    @return: obj itself if it is a local object or a local copy of the remote object
     """
     if isinstance(obj, rpyc.core.netref.BaseNetref):
+        if _is_remote_ndarray(obj):
+            array = obtain_array(obj)
+            if array is not None:
+                return array
         return rpyc.utils.classic.obtain(obj)
     else:
         return obj
+
+
+def get_host_id():
+    """
+    Identifier of the local machine used to determine if two rpyc peers share memory.
+
+    @return str: host identifier
+    """
+    return '{0}:{1:x}'.format(socket.gethostname(), uuid.getnode())
+
+
+def get_shared_memory_dir():
+    """
+    Directory to create files for shared memory in. Uses the RAM based file system /dev/shm if
+    available and the default temporary directory otherwise.
+
+    @return str: directory path
+    """
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def _get_connection(netref):
+    conn = object.__getattribute__(netref, '____conn__')
+    if isinstance(conn, weakref.ref):
+        conn = conn()
+    return conn
+
+
+def _is_remote_ndarray(netref):
+    try:
+        name_pack = object.__getattribute__(netref, '____id_pack__')[0]
+    except (AttributeError, IndexError, TypeError):
+        return False
+    return name_pack == 'numpy.ndarray'
+
+
+def _get_peer_socket(conn):
+    """ Plain (not encrypted) socket of a rpyc connection or None if not available. """
+    try:
+        sock = conn._channel.stream.sock
+    except AttributeError:
+        return None
+    if isinstance(sock, ssl.SSLSocket) or sock.family not in (socket.AF_INET, socket.AF_INET6):
+        return None
+    return sock
+
+
+def obtain_array(netref, transport=None):
+    """
+    Obtain a remote numpy array without pickling.
+
+    @param netref: rpyc netref to a numpy.ndarray
+    @param str transport: 'shm' (shared memory, same host only), 'socket' (raw buffer stream
+                          through a separate unencrypted socket) or 'rpyc' (raw buffer chunks
+                          through the rpyc connection). If None (default), shared memory is used
+                          for peers on the same host, 'socket' for other peers and 'rpyc' if the
+                          rpyc connection is encrypted.
+
+    @return numpy.ndarray: local array or None if the remote service does not support array export
+    """
+    conn = _get_connection(netref)
+    if conn is None:
+        return None
+    try:
+        peer_host_id = _peer_host_ids[conn]
+    except KeyError:
+        try:
+            peer_host_id = conn.root.get_host_id()
+        except AttributeError:
+            peer_host_id = None
+        _peer_host_ids[conn] = peer_host_id
+    if peer_host_id is None:
+        return None
+
+    peer_socket = _get_peer_socket(conn)
+    if transport is None:
+        if peer_host_id == get_host_id():
+            transport = 'shm'
+        elif peer_socket is not None:
+            transport = 'socket'
+        else:
+            transport = 'rpyc'
+    elif transport == 'socket' and peer_socket is None:
+        transport = 'rpyc'
+    export = conn.root.export_array(netref, transport)
+    if export is None:
+        return None
+    transport, descr, shape, handle = rpyc.utils.classic.obtain(export)
+    dtype = np.dtype(descr)
+    shape = tuple(shape)
+
+    if transport == 'shm':
+        if dtype.itemsize * int(np.prod(shape)) == 0:
+            os.remove(handle)
+            return np.empty(shape, dtype=dtype)
+        mapped = np.memmap(handle, dtype=dtype, mode='r+', shape=shape)
+        if os.name == 'posix':
+            # The mapping stays valid after the file is removed. The memory is released as soon
+            # as the returned array is garbage collected.
+            array = np.asarray(mapped)
+        else:
+            array = np.array(mapped)
+            del mapped
+        try:
+            os.remove(handle)
+        except OSError:
+            pass
+        return array
+
+    array = np.empty(shape, dtype=dtype)
+    buffer = array.reshape(-1).view(np.uint8)
+    if transport == 'socket':
+        # Receive the raw array buffer directly into the preallocated array
+        port, token = handle
+        with socket.create_connection((peer_socket.getpeername()[0], port),
+                                      timeout=ARRAY_SOCKET_TIMEOUT) as sock:
+            sock.sendall(token.encode('ascii'))
+            view = memoryview(buffer)
+            received = 0
+            while received < array.nbytes:
+                count = sock.recv_into(view[received:])
+                if count == 0:
+                    raise ConnectionError('Array stream closed by peer after {0:d} of {1:d} bytes.'
+                                          ''.format(received, array.nbytes))
+                received += count
+        return array
+
+    # Read the raw array buffer in chunks through the rpyc connection
+    try:
+        for start in range(0, array.nbytes, ARRAY_STREAM_CHUNK_SIZE):
+            stop = min(start + ARRAY_STREAM_CHUNK_SIZE, array.nbytes)
+            buffer[start:stop] = np.frombuffer(
+                conn.root.read_exported_array(handle, start, stop), dtype=np.uint8)
+    finally:
+        conn.root.release_exported_array(handle)
+    return array
+
+
+def _send_array(listener, token, array):
+    """ Thread target sending the raw buffer of an array to the first peer presenting the token.
+    """
+    with listener:
+        while True:
+            try:
+                sock, address = listener.accept()
+            except socket.timeout:
+                return
+            with sock:
+                sock.settimeout(ARRAY_SOCKET_TIMEOUT)
+                received = b''
+                while len(received) < len(token):
+                    chunk = sock.recv(len(token) - len(received))
+                    if not chunk:
+                        break
+                    received += chunk
+                if received == token.encode('ascii'):
+                    sock.sendall(memoryview(array.reshape(-1).view(np.uint8)))
+                    return
+
+
+class ArrayExportServiceMixin:
+    """
+    Mixin for rpyc services enabling peers to obtain numpy arrays without pickling through
+    netobtain/obtain_array.
+    """
+
+    def _get_exported_arrays(self):
+        try:
+            return self.__exported_arrays
+        except AttributeError:
+            self.__exported_arrays = dict()
+            return self.__exported_arrays
+
+    def exposed_get_host_id(self):
+        return get_host_id()
+
+    def exposed_export_array(self, array, transport):
+        """
+        Prepare a numpy array to be obtained by the peer.
+
+        @param numpy.ndarray array: the array to export (local object of this side)
+        @param str transport: 'shm', 'socket' or 'rpyc' (see obtain_array)
+
+        @return tuple: (transport, dtype descriptor, shape, handle) or None if the array can not
+                       be exported (e.g. object arrays). handle is the shared memory file path
+                       for 'shm', (port, token) for 'socket' and a key for read_exported_array
+                       for 'rpyc'.
+        """
+        if not isinstance(array, np.ndarray) or array.dtype.hasobject:
+            return None
+        array = np.ascontiguousarray(array)
+        descr = np.lib.format.dtype_to_descr(array.dtype)
+        if transport == 'shm':
+            fd, path = tempfile.mkstemp(prefix='qudi_array_', dir=get_shared_memory_dir())
+            with os.fdopen(fd, 'wb') as file:
+                array.tofile(file)
+            return 'shm', descr, array.shape, path
+
+        if transport == 'socket':
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.bind(('', 0))
+            listener.listen(1)
+            listener.settimeout(ARRAY_SOCKET_TIMEOUT)
+            token = uuid.uuid4().hex
+            threading.Thread(target=_send_array,
+                             args=(listener, token, array),
+                             name='array export',
+                             daemon=True).start()
+            return 'socket', descr, array.shape, (listener.getsockname()[1], token)
+
+        key = uuid.uuid4().hex
+        self._get_exported_arrays()[key] = array
+        return 'rpyc', descr, array.shape, key
+
+    def exposed_read_exported_array(self, key, start, stop):
+        """
+        Read a part of the raw buffer of an exported array.
+
+        @param str key: the handle returned by export_array
+        @param int start: first byte to read
+        @param int stop: byte to read up to (excluding)
+
+        @return bytes: the raw buffer content
+        """
+        array = self._get_exported_arrays()[key]
+        return array.reshape(-1).view(np.uint8)[start:stop].tobytes()
+
+    def exposed_release_exported_array(self, key):
+        self._get_exported_arrays().pop(key, None)
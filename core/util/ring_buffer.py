@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains ring buffer classes to store continuously acquired data with constant
+insertion cost.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import tempfile
+import numpy as np
+
+
+class SweepRingBuffer:
+    """
+    Ring buffer storing lines (e.g. ODMR sweeps) of a fixed shape with the newest line first.
+
+    Each line is stored twice in a buffer of twice the capacity, so the newest <capacity> lines
+    are always available as a contiguous array view (newest first) without copying.
+    Running sums of all lines and of the newest <window> lines are updated with each new line,
+    so the mean values are available in O(1) independent of the number of lines.
+
+    If a spill directory is given, lines dropping out of the buffer are appended to a temporary
+    binary file in that directory, so all lines remain accessible with constant memory usage.
+    Without a spill directory the capacity is doubled whenever the buffer is full.
+    """
+
+    def __init__(self, line_shape, capacity, window=0, spill_dir=None):
+        """
+        @param tuple line_shape: shape of a single line
+        @param int capacity: number of lines to hold in memory
+        @param int window: number of newest lines for the sliding window mean (0 means all)
+        @param str spill_dir: optional directory to store lines dropping out of the buffer
+        """
+        self.line_shape = tuple(line_shape)
+        self._capacity = max(1, int(capacity))
+        self._buffer = np.zeros((2 * self._capacity,) + self.line_shape, dtype=np.float64)
+        self._head = 0
+        self._count = 0
+        self._window = 0
+        self._total_sum = np.zeros(self.line_shape, dtype=np.float64)
+        self._window_sum = np.zeros(self.line_shape, dtype=np.float64)
+        self._window_updates = 0
+
+        self._spill_file = None
+        self._spill_path = None
+        self._spilled_lines = 0
+        if spill_dir is not None:
+            if not os.path.exists(spill_dir):
+                os.makedirs(spill_dir)
+            fd, self._spill_path = tempfile.mkstemp(suffix='.bin', prefix='sweeps_', dir=spill_dir)
+            self._spill_file = os.fdopen(fd, 'w+b')
+        self.set_window(window)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def window(self):
+        return self._window
+
+    @property
+    def lines_in_memory(self):
+        return min(self._count, self._capacity)
+
+    def add_line(self, line):
+        """
+        Add a new line to the buffer and update the running sums.
+
+        @param numpy.ndarray line: the new line data with shape line_shape
+        """
+        line = np.asarray(line, dtype=np.float64).reshape(self.line_shape)
+        if self._count >= self._capacity:
+            if self._spill_file is None:
+                self.ensure_capacity(2 * self._capacity)
+            else:
+                # The oldest line in memory is overwritten by the new line
+                oldest = self._buffer[self._head + self._capacity - 1]
+                self._spill_file.seek(0, os.SEEK_END)
+                self._spill_file.write(oldest.tobytes())
+                self._spilled_lines += 1
+
+        # Line dropping out of the sliding window. Must be removed before it is overwritten.
+        if 0 < self._window <= self._count:
+            self._window_sum -= self._buffer[self._head + self._window - 1]
+
+        self._head = (self._head - 1) % self._capacity
+        self._buffer[self._head] = line
+        self._buffer[self._head + self._capacity] = line
+        self._count += 1
+        self._total_sum += line
+
+        if self._window > 0:
+            self._window_sum += line
+            # Recalculate the window sum from time to time to avoid accumulating rounding errors
+            self._window_updates += 1
+            if self._window_updates >= self._window:
+                self._window_sum = self.get_view(self._window).sum(axis=0)
+                self._window_updates = 0
+        return
+
+    def get_view(self, number_of_lines=None):
+        """
+        Get a view of the newest lines in memory (newest first) without copying.
+        If fewer lines have been added, the remaining lines are zero.
+
+        @param int number_of_lines: number of lines to return (default and maximum: capacity)
+
+        @return numpy.ndarray: array view of shape (number_of_lines,) + line_shape
+        """
+        if number_of_lines is None or number_of_lines > self._capacity:
+            number_of_lines = self._capacity
+        return self._buffer[self._head:self._head + max(0, int(number_of_lines))]
+
+    def get_lines(self, number_of_lines=None):
+        """
+        Get the newest lines (newest first) including the lines spilled to disk.
+        Returns a view if all requested lines are in memory, otherwise a new array.
+
+        @param int number_of_lines: number of lines to return (default: all lines added)
+
+        @return numpy.ndarray: array of shape (lines,) + line_shape
+        """
+        available = self.lines_in_memory + self._spilled_lines
+        if number_of_lines is None or number_of_lines > available:
+            number_of_lines = available
+        number_of_lines = max(0, int(number_of_lines))
+        if number_of_lines <= self.lines_in_memory:
+            return self.get_view(number_of_lines)
+
+        from_disk = number_of_lines - self.lines_in_memory
+        self._spill_file.flush()
+        spilled = np.memmap(self._spill_path, dtype=np.float64, mode='r',
+                            shape=(self._spilled_lines,) + self.line_shape)
+        lines = np.concatenate((self.get_view(self.lines_in_memory),
+                                spilled[self._spilled_lines - from_disk:][::-1]))
+        del spilled
+        return lines
+
+    def get_mean(self):
+        """
+        Get the mean of all lines or of the newest <window> lines if a window is set.
+
+        @return numpy.ndarray: mean line of shape line_shape
+        """
+        if self._count == 0:
+            return np.zeros(self.line_shape, dtype=np.float64)
+        if self._window > 0:
+            return self._window_sum / min(self._window, self._count)
+        return self._total_sum / self._count
+
+    def set_window(self, window):
+        """
+        Set the number of newest lines to include in the sliding window mean.
+
+        @param int window: number of lines in the window (0 means all lines)
+        """
+        self._window = max(0, int(window))
+        self._window_updates = 0
+        if self._window > 0:
+            self.ensure_capacity(self._window)
+            self._window_sum = self.get_lines(self._window).sum(axis=0)
+        return
+
+    def ensure_capacity(self, capacity):
+        """
+        Increase the number of lines held in memory. Lines spilled to disk are moved back into
+        memory as far as they fit.
+
+        @param int capacity: minimum number of lines to hold in memory
+        """
+        if capacity <= self._capacity:
+            return
+        capacity = int(capacity)
+        lines = self.get_lines(capacity)
+        buffer = np.zeros((2 * capacity,) + self.line_shape, dtype=np.float64)
+        buffer[:lines.shape[0]] = lines
+        buffer[capacity:capacity + lines.shape[0]] = lines
+        self._buffer = buffer
+        self._capacity = capacity
+        self._head = 0
+        if self._spill_file is not None:
+            self._spilled_lines = self._count - lines.shape[0]
+            self._spill_file.truncate(self._spilled_lines * self._buffer[0].nbytes)
+        return
+
+    def clear(self):
+        """
+        Remove all lines and reset the running sums.
+        """
+        self._buffer[:] = 0
+        self._head = 0
+        self._count = 0
+        self._total_sum[:] = 0
+        self._window_sum[:] = 0
+        self._window_updates = 0
+        if self._spill_file is not None:
+            self._spill_file.seek(0)
+            self._spill_file.truncate()
+        self._spilled_lines = 0
+        return
+
+    def close(self):
+        """
+        Close and remove the spill file.
+        """
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+            try:
+                os.remove(self._spill_path)
+            except OSError:
+                pass
+        return
+
+
+class TraceRingBuffer:
+    """
+    Circular buffer storing the last <length> samples of several channels (e.g. a time trace).
+
+    New samples are written at the write head, overwriting the oldest samples. Just like for
+    SweepRingBuffer each sample is stored twice, so the complete trace (oldest sample first) is
+    always available as a contiguous array view without rolling or copying the data.
+    """
+
+    def __init__(self, number_of_channels, length, dtype=np.float64):
+        """
+        @param int number_of_channels: number of channels (rows) in the buffer
+        @param int length: number of samples per channel
+        @param dtype: data type of the buffer
+        """
+        self.length = max(1, int(length))
+        self._buffer = np.zeros((int(number_of_channels), 2 * self.length), dtype=dtype)
+        self._head = 0
+
+    @property
+    def shape(self):
+        return self._buffer.shape[0], self.length
+
+    def append(self, data):
+        """
+        Append new samples to the end of the trace. If more samples than the buffer length are
+        given, only the newest samples are kept.
+
+        @param numpy.ndarray data: new samples with shape (number_of_channels, samples)
+        """
+        new_samples = data.shape[1]
+        if new_samples >= self.length:
+            self._buffer[:, :self.length] = data[:, new_samples - self.length:]
+            self._buffer[:, self.length:] = self._buffer[:, :self.length]
+            self._head = 0
+            return
+        # Write new samples over the oldest ones (and their copies), wrapping around if needed.
+        first_part = min(new_samples, self.length - self._head)
+        for start, stop in ((0, first_part), (first_part, new_samples)):
+            if start == stop:
+                continue
+            index = (self._head + start) % self.length
+            chunk = data[:, start:stop]
+            self._buffer[:, index:index + chunk.shape[1]] = chunk
+            self._buffer[:, index + self.length:index + self.length + chunk.shape[1]] = chunk
+        self._head = (self._head + new_samples) % self.length
+        return
+
+    def overwrite_newest(self, data, number_of_samples=None):
+        """
+        Overwrite the newest samples of the trace without moving the write head.
+
+        @param numpy.ndarray data: new values, broadcastable to (number_of_channels,
+                                   number_of_samples)
+        @param int number_of_samples: number of newest samples to overwrite (default: number of
+                                      samples in data)
+        """
+        data = np.asarray(data)
+        if number_of_samples is None:
+            number_of_samples = data.shape[-1]
+        number_of_samples = min(int(number_of_samples), self.length)
+        data = np.broadcast_to(data, (self._buffer.shape[0], number_of_samples))
+        # The newest samples are located directly in front of the head in both copies
+        start = self._head - number_of_samples
+        if start < 0:
+            self._buffer[:, start + self.length:self.length] = data[:, :-start]
+            self._buffer[:, start + 2 * self.length:] = data[:, :-start]
+            data = data[:, -start:]
+            start = 0
+        self._buffer[:, start:self._head] = data
+        self._buffer[:, start + self.length:self._head + self.length] = data
+        return
+
+    def get_view(self, number_of_samples=None):
+        """
+        Get a contiguous view of the newest samples (oldest first) without copying.
+
+        @param int number_of_samples: number of newest samples to return (default: all)
+
+        @return numpy.ndarray: array view of shape (number_of_channels, number_of_samples)
+        """
+        if number_of_samples is None or number_of_samples > self.length:
+            number_of_samples = self.length
+        stop = self._head + self.length
+        return self._buffer[:, stop - max(0, int(number_of_samples)):stop]
+
+    def clear(self):
+        """
+        Set all samples to zero.
+        """
+        self._buffer[:] = 0
+        self._head = 0
+        return
+
+
+class SampleBuffer:
+    """
+    Growable buffer for rows of samples with a fixed number of columns (e.g. timestamp and counts
+    of each channel).
+
+    Memory is preallocated and doubled whenever the buffer is full, so appending rows has amortized
+    constant cost and all rows are available as a single contiguous array view.
+    """
+
+    def __init__(self, number_of_columns, capacity=1024, dtype=np.float64):
+        """
+        @param int number_of_columns: number of values per row
+        @param int capacity: number of rows to preallocate
+        @param dtype: data type of the buffer
+        """
+        self._buffer = np.empty((max(1, int(capacity)), int(number_of_columns)), dtype=dtype)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, item):
+        return self.get_view()[item]
+
+    @property
+    def number_of_columns(self):
+        return self._buffer.shape[1]
+
+    def append(self, row):
+        """
+        Append a single row.
+
+        @param numpy.ndarray row: values of the row with shape (number_of_columns, )
+        """
+        if self._count == self._buffer.shape[0]:
+            self._grow(self._count + 1)
+        self._buffer[self._count] = row
+        self._count += 1
+        return
+
+    def extend(self, rows):
+        """
+        Append several rows.
+
+        @param numpy.ndarray rows: array of shape (number_of_rows, number_of_columns)
+        """
+        rows = np.asarray(rows)
+        if self._count + rows.shape[0] > self._buffer.shape[0]:
+            self._grow(self._count + rows.shape[0])
+        self._buffer[self._count:self._count + rows.shape[0]] = rows
+        self._count += rows.shape[0]
+        return
+
+    def _grow(self, capacity):
+        buffer = np.empty((max(capacity, 2 * self._buffer.shape[0]), self._buffer.shape[1]),
+                          dtype=self._buffer.dtype)
+        buffer[:self._count] = self._buffer[:self._count]
+        self._buffer = buffer
+        return
+
+    def get_view(self):
+        """
+        Get all rows as array view without copying. Rows appended after a call to clear overwrite
+        the data of previously returned views.
+
+        @return numpy.ndarray: array of shape (number_of_rows, number_of_columns)
+        """
+        return self._buffer[:self._count]
+
+    def clear(self):
+        """
+        Remove all rows. The allocated memory is kept.
+        """
+        self._count = 0
+        return
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains classes to calculate statistics of continuously acquired data (e.g. counts)
+with constant or logarithmic cost per new sample.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import heapq
+from collections import deque
+import numpy as np
+
+from core.util.ring_buffer import TraceRingBuffer
+
+
+class SlidingMedian:
+    """
+    Median of the newest <window> values of a data stream.
+
+    The values of the window are split into two heaps, a max heap with the lower half and a min
+    heap with the upper half, so the median is always at the top of the heaps. Values dropping
+    out of the window are only marked for removal and removed once they reach the top of a heap.
+    Adding a value therefore costs O(log(window)) instead of sorting the whole window.
+    Marked values far from the median (e.g. for drifting data) may never reach the top, so both
+    heaps are rebuilt from the window once they hold more than twice the window size.
+    """
+
+    def __init__(self, window, initial_value=None):
+        """
+        @param int window: number of newest values to calculate the median of
+        @param float initial_value: optional value to fill the window with initially
+        """
+        self.window = max(1, int(window))
+        self._values = deque()
+        self._low = list()  # max heap of the lower half (negated values)
+        self._high = list()  # min heap of the upper half
+        self._low_size = 0
+        self._high_size = 0
+        self._removed = dict()  # values marked for removal with their multiplicity
+        if initial_value is not None:
+            for _ in range(self.window):
+                self.add(initial_value)
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def median(self):
+        """ Median of the values in the window (NaN if empty). """
+        if not self._values:
+            return np.nan
+        if self._low_size > self._high_size:
+            return -self._low[0]
+        return (self._high[0] - self._low[0]) / 2
+
+    def add(self, value):
+        """
+        Add a new value and remove the oldest one if the window is full.
+
+        @param float value: the new value
+
+        @return float: median of the window including the new value
+        """
+        value = float(value)
+        if not self._low or value <= -self._low[0]:
+            heapq.heappush(self._low, -value)
+            self._low_size += 1
+        else:
+            heapq.heappush(self._high, value)
+            self._high_size += 1
+        self._values.append(value)
+        if len(self._values) > self.window:
+            self._remove(self._values.popleft())
+        if len(self._low) + len(self._high) > 2 * self.window:
+            self._rebuild()
+        else:
+            self._balance()
+        return self.median
+
+    def _rebuild(self):
+        # Heaps with only the values of the window, the lower half holding one more if uneven
+        values = sorted(self._values)
+        self._low_size = (len(values) + 1) // 2
+        self._high_size = len(values) - self._low_size
+        self._low = [-value for value in values[:self._low_size]]
+        heapq.heapify(self._low)
+        # a sorted list is a valid min heap
+        self._high = values[self._low_size:]
+        self._removed = dict()
+        return
+
+    def _remove(self, value):
+        self._removed[value] = self._removed.get(value, 0) + 1
+        if value <= -self._low[0]:
+            self._low_size -= 1
+            if value == -self._low[0]:
+                self._prune_low()
+        else:
+            self._high_size -= 1
+            if value == self._high[0]:
+                self._prune_high()
+        return
+
+    def _prune_low(self):
+        while self._low and self._removed.get(-self._low[0], 0) > 0:
+            self._discard(-heapq.heappop(self._low))
+        return
+
+    def _prune_high(self):
+        while self._high and self._removed.get(self._high[0], 0) > 0:
+            self._discard(heapq.heappop(self._high))
+        return
+
+    def _discard(self, value):
+        if self._removed[value] == 1:
+            del self._removed[value]
+        else:
+            self._removed[value] -= 1
+        return
+
+    def _balance(self):
+        # The lower half holds as many values as the upper half or one more
+        if self._low_size > self._high_size + 1:
+            heapq.heappush(self._high, -heapq.heappop(self._low))
+            self._low_size -= 1
+            self._high_size += 1
+            self._prune_low()
+        elif self._low_size < self._high_size:
+            heapq.heappush(self._low, -heapq.heappop(self._high))
+            self._high_size -= 1
+            self._low_size += 1
+            self._prune_high()
+        return
+
+    def clear(self, initial_value=None):
+        """
+        Remove all values.
+
+        @param float initial_value: optional value to fill the window with
+        """
+        self.__init__(self.window, initial_value)
+        return
+
+
+class RunningStatistics:
+    """
+    Mean and variance of all values added so far for several channels, updated with each new
+    sample (Welford's algorithm). No samples are stored.
+    """
+
+    def __init__(self, number_of_channels):
+        """
+        @param int number_of_channels: number of channels (values per sample)
+        """
+        self.number_of_channels = int(number_of_channels)
+        self.count = 0
+        self._mean = np.zeros(self.number_of_channels, dtype=np.float64)
+        self._sum_squared_deviations = np.zeros(self.number_of_channels, dtype=np.float64)
+
+    @property
+    def mean(self):
+        """ Mean value of each channel. """
+        return self._mean.copy()
+
+    @property
+    def variance(self):
+        """ Sample variance of each channel (NaN for less than two samples). """
+        if self.count < 2:
+            return np.full(self.number_of_channels, np.nan)
+        return self._sum_squared_deviations / (self.count - 1)
+
+    @property
+    def std(self):
+        """ Sample standard deviation of each channel. """
+        return np.sqrt(self.variance)
+
+    def add(self, sample):
+        """
+        Add a new sample.
+
+        @param numpy.ndarray sample: one value for each channel
+        """
+        self.count += 1
+        delta = sample - self._mean
+        self._mean += delta / self.count
+        self._sum_squared_deviations += delta * (sample - self._mean)
+        return
+
+    def clear(self):
+        """
+        Reset the statistics.
+        """
+        self.count = 0
+        self._mean[:] = 0
+        self._sum_squared_deviations[:] = 0
+        return
+
+
+class CountTraceStatistics:
+    """
+    Count trace of several channels with a median smoothed trace and running statistics.
+
+    The newest <length> samples of each channel are kept in a TraceRingBuffer. Each new sample
+    updates a sliding median over the newest <smooth_window> samples per channel which is written
+    to the smoothed trace at the center of the window. The newest half window of the smoothed
+    trace, for which the window is not complete yet, is filled with the current median.
+    """
+
+    def __init__(self, number_of_channels, length, smooth_window):
+        """
+        @param int number_of_channels: number of channels
+        @param int length: number of samples in the trace
+        @param int smooth_window: number of samples to calculate the median of
+        """
+        self.number_of_channels = int(number_of_channels)
+        self.trace = TraceRingBuffer(self.number_of_channels, length)
+        self.smoothed_trace = TraceRingBuffer(self.number_of_channels, length)
+        # The trace starts filled with zeros, the median windows likewise
+        self._smooth_window = max(1, min(int(smooth_window), self.trace.length))
+        self._unfinished_samples = min(max(1, int(smooth_window)) // 2 + 1, self.trace.length)
+        self._medians = [SlidingMedian(self._smooth_window, 0) for _ in
+                         range(self.number_of_channels)]
+        self._current_median = np.zeros((self.number_of_channels, 1), dtype=np.float64)
+        self.statistics = RunningStatistics(self.number_of_channels)
+
+    @property
+    def smooth_window(self):
+        return self._smooth_window
+
+    def add(self, sample):
+        """
+        Add a new sample to the traces and statistics.
+
+        @param numpy.ndarray sample: one value for each channel
+        """
+        sample = np.asarray(sample, dtype=np.float64)
+        self.trace.append(sample[:, np.newaxis])
+        for channel, value in enumerate(sample):
+            self._current_median[channel, 0] = self._medians[channel].add(value)
+        self.smoothed_trace.append(self._current_median)
+        self.smoothed_trace.overwrite_newest(self._current_median, self._unfinished_samples)
+        self.statistics.add(sample)
+        return
+
+    def add_samples(self, samples):
+        """
+        Add several samples at once to the count trace only (no smoothing and statistics).
+
+        @param numpy.ndarray samples: array of shape (number_of_channels, number_of_samples)
+        """
+        self.trace.append(np.asarray(samples, dtype=np.float64))
+        return
+
+    def clear(self):
+        """
+        Reset the traces and statistics.
+        """
+        self.trace.clear()
+        self.smoothed_trace.clear()
+        for median in self._medians:
+            median.clear(0)
+        self._current_median[:] = 0
+        self.statistics.clear()
+        return
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a writer to stream data blocks of unknown total length into a .npy file.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import struct
+import numpy as np
+
+
+class NpyStreamWriter:
+    """
+    Appends 2D data blocks (rows x columns) to a .npy file as they arrive.
+
+    The file is created with a fixed size header reserving enough space for any shape. Each
+    appended block is written directly behind the previous ones, so memory usage does not depend
+    on the total amount of data. The header is updated with the actual number of rows on flush
+    and finalize, so the file can be read with numpy.load (e.g. with mmap_mode='r') afterwards.
+    """
+    _magic = b'\x93NUMPY\x01\x00'
+    _header_size = 128
+
+    def __init__(self, filepath, number_of_columns, dtype=np.float64):
+        """
+        @param str filepath: full path of the .npy file to create
+        @param int number_of_columns: number of columns (e.g. channels) of each row
+        @param dtype: data type of the stored data
+        """
+        self.filepath = filepath
+        self.number_of_columns = int(number_of_columns)
+        self.dtype = np.dtype(dtype)
+        self.number_of_rows = 0
+        directory = os.path.dirname(filepath)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._file = open(filepath, 'wb')
+        self._write_header()
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def _write_header(self):
+        header = "{{'descr': {0!r}, 'fortran_order': False, 'shape': ({1:d}, {2:d}), }}".format(
+            np.lib.format.dtype_to_descr(self.dtype), self.number_of_rows,
+            self.number_of_columns)
+        # Header is padded with spaces to the fixed size and terminated by a newline
+        header_length = self._header_size - len(self._magic) - 2
+        header = header.ljust(header_length - 1) + '\n'
+        self._file.seek(0)
+        self._file.write(self._magic + struct.pack('<H', header_length) + header.encode('latin1'))
+        self._file.seek(0, os.SEEK_END)
+        return
+
+    def append(self, data):
+        """
+        Append rows to the file.
+
+        @param numpy.ndarray data: 2D array with shape (rows, number_of_columns)
+        """
+        if data.ndim != 2 or data.shape[1] != self.number_of_columns:
+            raise ValueError('Data to append must be 2D array with {0:d} columns (shape {1} '
+                             'given).'.format(self.number_of_columns, data.shape))
+        np.ascontiguousarray(data, dtype=self.dtype).tofile(self._file)
+        self.number_of_rows += data.shape[0]
+        return
+
+    def flush(self):
+        """
+        Update the header with the current number of rows and flush the file.
+        """
+        self._write_header()
+        self._file.flush()
+        return
+
+    def finalize(self):
+        """
+        Write the final header and close the file.
+
+        @return str: path of the finished file
+        """
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+        return self.filepath
@@ -30,7 +30,7 @@ from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
 from qtwidgets.scan_plotwidget import ScanImageItem
 from gui.guibase import GUIBase
-from gui.guiutils import ColorBar
+from gui.guiutils import ColorBar, ImageRowBuffer, RefreshScheduler
 from gui.colordefs import ColorScaleInferno
 from gui.colordefs import QudiPalettePale as palette
 from gui.fitsettings import FitParametersWidget
@@ -124,6 +124,8 @@ class ConfocalGui(GUIBase):
     image_z_padding = ConfigOption('image_z_padding', 0.02)
 
     default_meter_prefix = ConfigOption('default_meter_prefix', None)  # assume the unit prefix of position spinbox
+    # maximum rate of image refreshes during a scan in Hz (0: no limit)
+    max_frame_rate = ConfigOption('max_frame_rate', 20)
 
     # status var
     adjust_cursor_roi = StatusVar(default=True)
@@ -181,6 +183,12 @@ class ConfocalGui(GUIBase):
         raw_data_xy = self._scanning_logic.xy_image[:, :, 3 + self.xy_channel]
         raw_data_depth = self._scanning_logic.depth_image[:, :, 3 + self.depth_channel]
 
+        # Copies of the displayed images, only the changed rows are redrawn at a refresh
+        self._xy_image_buffer = ImageRowBuffer()
+        self._xy_image_buffer.update(raw_data_xy)
+        self._depth_image_buffer = ImageRowBuffer()
+        self._depth_image_buffer.update(raw_data_depth)
+
         # Set initial position for the crosshair, default is the middle of the
         # screen:
         ini_pos_x_crosshair = len(raw_data_xy) / 2
@@ -188,8 +196,8 @@ class ConfocalGui(GUIBase):
         ini_pos_z_crosshair = len(raw_data_depth) / 2
 
         # Load the images for xy and depth in the display:
-        self.xy_image = ScanImageItem(image=raw_data_xy, axisOrder='row-major')
-        self.depth_image = ScanImageItem(image=raw_data_depth, axisOrder='row-major')
+        self.xy_image = ScanImageItem(image=self._xy_image_buffer.image, axisOrder='row-major')
+        self.depth_image = ScanImageItem(image=self._depth_image_buffer.image, axisOrder='row-major')
 
         # Hide tilt correction window
         self._mw.tilt_correction_dockWidget.hide()
@@ -486,11 +494,15 @@ class ConfocalGui(GUIBase):
         self._mw.depth_cb_high_percentile_DoubleSpinBox.valueChanged.connect(self.shortcut_to_depth_cb_centiles)
 
         # Connect the emitted signal of an image change from the logic with
-        # a refresh of the GUI picture:
-        self._scanning_logic.signal_xy_image_updated.connect(self.refresh_xy_image)
-        self._scanning_logic.signal_xy_image_updated.connect(self.refresh_scan_line)
-        self._scanning_logic.signal_depth_image_updated.connect(self.refresh_scan_line)
-        self._scanning_logic.signal_depth_image_updated.connect(self.refresh_depth_image)
+        # a refresh of the GUI picture. Image updates arriving faster than max_frame_rate are
+        # combined into one refresh.
+        self._xy_refresh = RefreshScheduler(self.refresh_xy_image, self.max_frame_rate)
+        self._depth_refresh = RefreshScheduler(self.refresh_depth_image, self.max_frame_rate)
+        self._scan_line_refresh = RefreshScheduler(self.refresh_scan_line, self.max_frame_rate)
+        self._scanning_logic.signal_xy_image_updated.connect(self._xy_refresh.request)
+        self._scanning_logic.signal_xy_image_updated.connect(self._scan_line_refresh.request)
+        self._scanning_logic.signal_depth_image_updated.connect(self._scan_line_refresh.request)
+        self._scanning_logic.signal_depth_image_updated.connect(self._depth_refresh.request)
         self._optimizer_logic.sigImageUpdated.connect(self.refresh_refocus_image)
         self._scanning_logic.sigImageXYInitialized.connect(self.adjust_xy_window)
         self._scanning_logic.sigImageDepthInitialized.connect(self.adjust_depth_window)
@@ -648,6 +660,13 @@ class ConfocalGui(GUIBase):
 
         @return int: error code (0:OK, -1:error)
         """
+        self._scanning_logic.signal_xy_image_updated.disconnect(self._xy_refresh.request)
+        self._scanning_logic.signal_xy_image_updated.disconnect(self._scan_line_refresh.request)
+        self._scanning_logic.signal_depth_image_updated.disconnect(self._scan_line_refresh.request)
+        self._scanning_logic.signal_depth_image_updated.disconnect(self._depth_refresh.request)
+        self._xy_refresh.stop()
+        self._depth_refresh.stop()
+        self._scan_line_refresh.stop()
         self._mw.close()
         return 0
 
@@ -705,21 +724,20 @@ class ConfocalGui(GUIBase):
         """ Determines the cb_min and cb_max values for the xy scan image
         """
         # If "Manual" is checked, or the image data is empty (all zeros), then take manual cb range.
-        if self._mw.xy_cb_manual_RadioButton.isChecked() or np.count_nonzero(self.xy_image.image) < 1:
+        if self._mw.xy_cb_manual_RadioButton.isChecked() or self._xy_image_buffer.nonzero_count < 1:
             cb_min = self._mw.xy_cb_min_DoubleSpinBox.value()
             cb_max = self._mw.xy_cb_max_DoubleSpinBox.value()
 
         # Otherwise, calculate cb range from percentiles.
         else:
-            # Exclude any zeros (which are typically due to unfinished scan)
-            xy_image_nonzero = self.xy_image.image[np.nonzero(self.xy_image.image)]
-
             # Read centile range
             low_centile = self._mw.xy_cb_low_percentile_DoubleSpinBox.value()
             high_centile = self._mw.xy_cb_high_percentile_DoubleSpinBox.value()
 
-            cb_min = np.percentile(xy_image_nonzero, low_centile)
-            cb_max = np.percentile(xy_image_nonzero, high_centile)
+            # Percentiles of the nonzero pixels (zeros are typically due to unfinished scan),
+            # kept sorted by the image buffer
+            cb_min = self._xy_image_buffer.percentile(low_centile)
+            cb_max = self._xy_image_buffer.percentile(high_centile)
 
         cb_range = [cb_min, cb_max]
 
@@ -729,21 +747,20 @@ class ConfocalGui(GUIBase):
         """ Determines the cb_min and cb_max values for the xy scan image
         """
         # If "Manual" is checked, or the image data is empty (all zeros), then take manual cb range.
-        if self._mw.depth_cb_manual_RadioButton.isChecked() or np.count_nonzero(self.depth_image.image) < 1:
+        if self._mw.depth_cb_manual_RadioButton.isChecked() or self._depth_image_buffer.nonzero_count < 1:
             cb_min = self._mw.depth_cb_min_DoubleSpinBox.value()
             cb_max = self._mw.depth_cb_max_DoubleSpinBox.value()
 
         # Otherwise, calculate cb range from percentiles.
         else:
-            # Exclude any zeros (which are typically due to unfinished scan)
-            depth_image_nonzero = self.depth_image.image[np.nonzero(self.depth_image.image)]
-
             # Read centile range
             low_centile = self._mw.depth_cb_low_percentile_DoubleSpinBox.value()
             high_centile = self._mw.depth_cb_high_percentile_DoubleSpinBox.value()
 
-            cb_min = np.percentile(depth_image_nonzero, low_centile)
-            cb_max = np.percentile(depth_image_nonzero, high_centile)
+            # Percentiles of the nonzero pixels (zeros are typically due to unfinished scan),
+            # kept sorted by the image buffer
+            cb_min = self._depth_image_buffer.percentile(low_centile)
+            cb_max = self._depth_image_buffer.percentile(high_centile)
 
         cb_range = [cb_min, cb_max]
         return cb_range
@@ -1380,16 +1397,23 @@ class ConfocalGui(GUIBase):
         """ Update the current XY image from the logic.
 
         Everytime the scanner is scanning a line in xy the
-        image is rebuild and updated in the GUI.
+        image is updated in the GUI (at most max_frame_rate times per second). Only the changed
+        rows are redrawn, unless the color scale changed by more than the level tolerance of the
+        image item.
         """
         self.xy_image.getViewBox().updateAutoRange()
 
         xy_image_data = self._scanning_logic.xy_image[:, :, 3 + self.xy_channel]
+        rows, shift = self._xy_image_buffer.update(xy_image_data)
 
         cb_range = self.get_xy_cb_range()
 
         # Now update image with new color scale, and update colorbar
-        self.xy_image.setImage(image=xy_image_data, levels=(cb_range[0], cb_range[1]))
+        # Render the whole image with the exact color scale when the scan is not running
+        level_tolerance = None if self._scanning_logic.module_state() == 'locked' else 0
+        self.xy_image.update_image_rows(self._xy_image_buffer.image, rows, shift,
+                                        levels=(cb_range[0], cb_range[1]),
+                                        level_tolerance=level_tolerance)
         self.refresh_xy_colorbar()
 
         # Unlock state widget if scan is finished
@@ -1400,16 +1424,23 @@ class ConfocalGui(GUIBase):
         """ Update the current Depth image from the logic.
 
         Everytime the scanner is scanning a line in depth the
-        image is rebuild and updated in the GUI.
+        image is updated in the GUI (at most max_frame_rate times per second). Only the changed
+        rows are redrawn, unless the color scale changed by more than the level tolerance of the
+        image item.
         """
 
         self.depth_image.getViewBox().enableAutoRange()
 
         depth_image_data = self._scanning_logic.depth_image[:, :, 3 + self.depth_channel]
+        rows, shift = self._depth_image_buffer.update(depth_image_data)
         cb_range = self.get_depth_cb_range()
 
         # Now update image with new color scale, and update colorbar
-        self.depth_image.setImage(image=depth_image_data, levels=(cb_range[0], cb_range[1]))
+        # Render the whole image with the exact color scale when the scan is not running
+        level_tolerance = None if self._scanning_logic.module_state() == 'locked' else 0
+        self.depth_image.update_image_rows(self._depth_image_buffer.image, rows, shift,
+                                           levels=(cb_range[0], cb_range[1]),
+                                           level_tolerance=level_tolerance)
         self.refresh_depth_colorbar()
 
         # Unlock state widget if scan is finished
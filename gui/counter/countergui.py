@@ -30,6 +30,7 @@ from gui.guibase import GUIBase
 from qtpy import QtCore
 from qtpy import QtWidgets
 from qtpy import uic
+from qtwidgets.decimated_plotitem import DecimatedPlotDataItem
 
 
 
@@ -89,14 +90,14 @@ class CounterGui(GUIBase):
             if i % 2 == 0:
                 # Create an empty plot curve to be filled later, set its pen
                 self.curves.append(
-                    pg.PlotDataItem(pen=pg.mkPen(palette.c1), symbol=None))
+                    DecimatedPlotDataItem(pen=pg.mkPen(palette.c1), symbol=None))
                 self._pw.addItem(self.curves[-1])
                 self.curves.append(
-                    pg.PlotDataItem(pen=pg.mkPen(palette.c2, width=3), symbol=None))
+                    DecimatedPlotDataItem(pen=pg.mkPen(palette.c2, width=3), symbol=None))
                 self._pw.addItem(self.curves[-1])
             else:
                 self.curves.append(
-                    pg.PlotDataItem(
+                    DecimatedPlotDataItem(
                         pen=pg.mkPen(palette.c3, style=QtCore.Qt.DotLine),
                         symbol='s',
                         symbolPen=palette.c3,
@@ -104,7 +105,7 @@ class CounterGui(GUIBase):
                         symbolSize=5))
                 self._pw.addItem(self.curves[-1])
                 self.curves.append(
-                    pg.PlotDataItem(pen=pg.mkPen(palette.c4, width=3), symbol=None))
+                    DecimatedPlotDataItem(pen=pg.mkPen(palette.c4, width=3), symbol=None))
                 self._pw.addItem(self.curves[-1])
 
         # setting the x axis length correctly
@@ -261,12 +262,15 @@ class CounterGui(GUIBase):
         """
 
         if self._counting_logic.module_state() == 'locked':
-            if 0 < self._counting_logic.countdata_smoothed[(self._display_trace-1), -1] < 10:
+            # copies of the traces, the logic keeps writing its buffers
+            countdata = self._counting_logic.countdata
+            countdata_smoothed = self._counting_logic.countdata_smoothed
+            if 0 < countdata_smoothed[(self._display_trace-1), -1] < 10:
                 self._mw.count_value_Label.setText(
-                    '{0:,.6f}'.format(self._counting_logic.countdata_smoothed[(self._display_trace-1), -1]))
+                    '{0:,.6f}'.format(countdata_smoothed[(self._display_trace-1), -1]))
             else:
                 self._mw.count_value_Label.setText(
-                    '{0:,.0f}'.format(self._counting_logic.countdata_smoothed[(self._display_trace-1), -1]))
+                    '{0:,.0f}'.format(countdata_smoothed[(self._display_trace-1), -1]))
 
             x_vals = (
                 np.arange(0, self._counting_logic.get_count_length())
@@ -275,14 +279,14 @@ class CounterGui(GUIBase):
             ymax = -1
             ymin = 2000000000
             for i, ch in enumerate(self._counting_logic.get_channels()):
-                self.curves[2 * i].setData(y=self._counting_logic.countdata[i], x=x_vals)
-                self.curves[2 * i + 1].setData(y=self._counting_logic.countdata_smoothed[i],
+                self.curves[2 * i].setData(y=countdata[i], x=x_vals)
+                self.curves[2 * i + 1].setData(y=countdata_smoothed[i],
                                                x=x_vals
                                                )
-                if ymax < self._counting_logic.countdata[i].max() and self._trace_selection[i]:
-                    ymax = self._counting_logic.countdata[i].max()
-                if ymin > self._counting_logic.countdata[i].min() and self._trace_selection[i]:
-                    ymin = self._counting_logic.countdata[i].min()
+                if ymax < countdata[i].max() and self._trace_selection[i]:
+                    ymax = countdata[i].max()
+                if ymin > countdata[i].min() and self._trace_selection[i]:
+                    ymin = countdata[i].min()
 
             if ymin == ymax:
                 ymax += 0.1
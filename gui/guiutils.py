@@ -20,7 +20,10 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import time
+import numpy as np
 import pyqtgraph as pg
+from qtpy import QtCore
 
 
 class ColorBar(pg.GraphicsObject):
@@ -107,3 +110,158 @@ class ColorBar(pg.GraphicsObject):
         """
         return pg.QtCore.QRectF(self.pic.boundingRect())
 
+
+
+class RefreshScheduler(QtCore.QObject):
+    """ Coalesces refresh requests (e.g. data update signals of a logic module) into calls of a
+    refresh method at a maximum rate.
+
+    Requests arriving faster than the maximum rate are combined into a single refresh with the
+    arguments of the latest request. A refresh is deferred but never dropped, so the last request
+    is always followed by a refresh. The refresh is always called from the event loop of the thread
+    of the scheduler (usually the GUI thread), so queued update signals piled up in the meantime
+    are combined as well.
+    """
+
+    def __init__(self, refresh_method, max_rate=20, parent=None):
+        """
+        @param callable refresh_method: method to call for a refresh
+        @param float max_rate: maximum number of refreshes per second (<= 0: no limit)
+        @param QObject parent: optional parent object
+        """
+        super().__init__(parent)
+        self._refresh_method = refresh_method
+        self._max_rate = 0
+        self._args = tuple()
+        self._last_refresh = 0.0
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._refresh)
+        self.max_rate = max_rate
+
+    @property
+    def max_rate(self):
+        return self._max_rate
+
+    @max_rate.setter
+    def max_rate(self, rate):
+        self._max_rate = max(0, float(rate)) if rate else 0
+
+    @property
+    def pending(self):
+        return self._timer.isActive()
+
+    def request(self, *args):
+        """ Request a refresh. Can be connected to a signal, the arguments of the latest request are
+        passed to the refresh method.
+        """
+        self._args = args
+        if self._timer.isActive():
+            return
+        interval = 1 / self._max_rate if self._max_rate > 0 else 0
+        delay = max(0.0, self._last_refresh + interval - time.perf_counter())
+        self._timer.start(int(np.ceil(delay * 1000)))
+
+    def flush(self):
+        """ Refresh immediately if a refresh is pending. """
+        if self._timer.isActive():
+            self._timer.stop()
+            self._refresh()
+
+    def stop(self):
+        """ Discard a pending refresh. """
+        self._timer.stop()
+        self._args = tuple()
+
+    def _refresh(self):
+        self._last_refresh = time.perf_counter()
+        args = self._args
+        self._args = tuple()
+        self._refresh_method(*args)
+
+
+class ImageRowBuffer:
+    """ Copy of a displayed 2D image which is updated in place, row by row.
+
+    Every update finds the rows which changed since the last update, so only these have to be
+    redrawn (see ScanImageItem.update_image_rows). The non-zero pixel values are kept sorted and
+    updated with the changed rows, so the percentiles used for the color scale are available without
+    sorting or partitioning the whole image at every update.
+    """
+
+    def __init__(self):
+        self.image = None
+        self._values = np.empty(0)
+
+    @property
+    def nonzero_count(self):
+        """ Number of non-zero pixels in the image. """
+        return self._values.size
+
+    def update(self, image, shift=0):
+        """ Update the buffer with a new image.
+
+        @param numpy.ndarray image: the new 2D image
+        @param int shift: expected number of rows the content of the previous image moved down
+                          (e.g. a matrix with the newest line first). Only used if the image
+                          content actually moved by this number of rows.
+
+        @return tuple: (rows, shift) with the indices of the changed rows after moving the previous
+                       content down by shift rows. rows is None if the buffer was replaced (new
+                       shape or dtype).
+        """
+        image = np.asarray(image)
+        if self.image is None or image.shape != self.image.shape or image.dtype != self.image.dtype:
+            self.image = image.copy()
+            self._values = np.sort(self.image[np.nonzero(self.image)])
+            return None, 0
+
+        shift = int(shift)
+        if 0 < shift < image.shape[0] and np.array_equal(image[shift:], self.image[:-shift]):
+            self._replace_values(self.image[-shift:], image[:shift])
+            self.image[shift:] = self.image[:-shift]
+            self.image[:shift] = image[:shift]
+            return np.arange(shift), shift
+
+        rows = np.flatnonzero(np.any(image != self.image, axis=1))
+        if rows.size > image.shape[0] // 2:
+            self.image[:] = image
+            self._values = np.sort(self.image[np.nonzero(self.image)])
+        elif rows.size > 0:
+            self._replace_values(self.image[rows], image[rows])
+            self.image[rows] = image[rows]
+        return rows, 0
+
+    def percentile(self, q):
+        """ Percentile of the non-zero pixel values, identical to numpy.percentile (linear).
+
+        @param float q: percentile (0..100)
+
+        @return float: the percentile, NaN if the image has no non-zero pixels
+        """
+        values = self._values
+        if values.size == 0 or np.isnan(values[-1]):
+            return np.nan
+        position = (values.size - 1) * (q / 100)
+        low = int(np.clip(np.floor(position), 0, values.size - 1))
+        high = min(low + 1, values.size - 1)
+        fraction = position - low
+        difference = values[high] - values[low]
+        # same interpolation as numpy.percentile (numerically stable from both sides)
+        if fraction >= 0.5:
+            return values[high] - difference * (1 - fraction)
+        return values[low] + difference * fraction
+
+    def _replace_values(self, old_pixels, new_pixels):
+        """ Remove the non-zero old pixel values from and insert the new ones into the sorted
+        values.
+        """
+        old = np.sort(old_pixels[np.nonzero(old_pixels)])
+        new = np.sort(new_pixels[np.nonzero(new_pixels)])
+        if old.size > 0:
+            # index of each value among equal values, so duplicates are removed only once each
+            duplicate = np.arange(old.size) - np.searchsorted(old, old, side='left')
+            self._values = np.delete(
+                self._values, np.searchsorted(self._values, old, side='left') + duplicate)
+        if new.size > 0:
+            self._values = np.insert(self._values, np.searchsorted(self._values, new), new)
@@ -23,16 +23,18 @@ import numpy as np
 import os
 import pyqtgraph as pg
 
+from core.configoption import ConfigOption
 from core.connector import Connector
 from core.util import units
 from gui.guibase import GUIBase
-from gui.guiutils import ColorBar
+from gui.guiutils import ColorBar, ImageRowBuffer, RefreshScheduler
 from gui.colordefs import ColorScaleInferno
 from gui.colordefs import QudiPalettePale as palette
 from gui.fitsettings import FitSettingsDialog, FitSettingsComboBox
 from qtpy import QtCore
 from qtpy import QtCore, QtWidgets, uic
 from qtwidgets.scientific_spinbox import ScienDSpinBox
+from qtwidgets.scan_plotwidget import ScanImageItem
 from qtpy import uic
 from functools import partial
 
@@ -75,6 +77,9 @@ class ODMRGui(GUIBase):
     odmrlogic1 = Connector(interface='ODMRLogic')
     savelogic = Connector(interface='SaveLogic')
 
+    # maximum rate of plot refreshes during a measurement in Hz (0: no limit)
+    max_frame_rate = ConfigOption('max_frame_rate', 20)
+
     sigStartOdmrScan = QtCore.Signal()
     sigStopOdmrScan = QtCore.Signal()
     sigContinueOdmrScan = QtCore.Signal()
@@ -267,10 +272,13 @@ class ODMRGui(GUIBase):
 
         self._mw.odmr_channel_ComboBox.activated.connect(self.update_channel)
 
-        # Get the image from the logic
-        self.odmr_matrix_image = pg.ImageItem(
-            self._odmr_logic.odmr_plot_xy[:, self.display_channel],
-            axisOrder='row-major')
+        # Get the image from the logic. A copy of the displayed matrix is kept, so only the new
+        # lines have to be drawn at a refresh.
+        self._matrix_buffer = ImageRowBuffer()
+        self._matrix_buffer.update(self._odmr_logic.odmr_plot_xy[:, self.display_channel])
+        self._matrix_sweeps = 0
+        self._elapsed_sweeps = 0
+        self.odmr_matrix_image = ScanImageItem(self._matrix_buffer.image, axisOrder='row-major')
         self.odmr_matrix_image.setRect(QtCore.QRectF(
             self._odmr_logic.mw_starts[0],
             0,
@@ -395,7 +403,10 @@ class ODMRGui(GUIBase):
                                                      QtCore.Qt.QueuedConnection)
         self._odmr_logic.sigOutputStateUpdated.connect(self.update_status,
                                                        QtCore.Qt.QueuedConnection)
-        self._odmr_logic.sigOdmrPlotsUpdated.connect(self.update_plots, QtCore.Qt.QueuedConnection)
+        # Plot updates arriving faster than max_frame_rate are combined into one refresh
+        self._plots_refresh = RefreshScheduler(self.update_plots, self.max_frame_rate)
+        self._odmr_logic.sigOdmrPlotsUpdated.connect(self._plots_refresh.request,
+                                                     QtCore.Qt.QueuedConnection)
         self._odmr_logic.sigOdmrFitUpdated.connect(self.update_fit, QtCore.Qt.QueuedConnection)
         self._odmr_logic.sigOdmrElapsedTimeUpdated.connect(self.update_elapsedtime,
                                                            QtCore.Qt.QueuedConnection)
@@ -424,6 +435,7 @@ class ODMRGui(GUIBase):
         self._odmr_logic.sigParameterUpdated.disconnect()
         self._odmr_logic.sigOutputStateUpdated.disconnect()
         self._odmr_logic.sigOdmrPlotsUpdated.disconnect()
+        self._plots_refresh.stop()
         self._odmr_logic.sigOdmrFitUpdated.disconnect()
         self._odmr_logic.sigOdmrElapsedTimeUpdated.disconnect()
         self.sigCwMwOn.disconnect()
@@ -816,13 +828,21 @@ class ODMRGui(GUIBase):
         return
 
     def update_plots(self, odmr_data_x, odmr_data_y, odmr_matrix):
-        """ Refresh the plot widgets with new data. """
+        """ Refresh the plot widgets with new data.
+
+        Only the new lines of the matrix plot are drawn, if the previous lines just moved down by
+        the number of sweeps since the last refresh and the color scale did not change.
+        """
         # Update mean signal plot
         self.odmr_image.setData(odmr_data_x, odmr_data_y[self.display_channel])
         # Update raw data matrix plot
+        matrix_range = self._mw.odmr_control_DockWidget.matrix_range_SpinBox.value()
+        odmr_matrix_range = self._odmr_logic.select_odmr_matrix_data(odmr_matrix, self.display_channel, matrix_range)
+        rows, shift = self._matrix_buffer.update(odmr_matrix_range,
+                                                 shift=self._elapsed_sweeps - self._matrix_sweeps)
+        self._matrix_sweeps = self._elapsed_sweeps
         cb_range = self.get_matrix_cb_range()
         self.update_colorbar(cb_range)
-        matrix_range = self._mw.odmr_control_DockWidget.matrix_range_SpinBox.value()
         start = self._odmr_logic.mw_starts[matrix_range]
         step = self._odmr_logic.mw_steps[matrix_range]
         stop = self._odmr_logic.mw_stops[matrix_range]
@@ -836,11 +856,8 @@ class ODMRGui(GUIBase):
                 odmr_matrix.shape[0])
         )
 
-        odmr_matrix_range = self._odmr_logic.select_odmr_matrix_data(odmr_matrix, self.display_channel, matrix_range)
-        self.odmr_matrix_image.setImage(
-            image=odmr_matrix_range,
-            axisOrder='row-major',
-            levels=(cb_range[0], cb_range[1]))
+        self.odmr_matrix_image.update_image_rows(self._matrix_buffer.image, rows, shift,
+                                                 levels=(cb_range[0], cb_range[1]))
 
     def update_channel(self, index):
         self.display_channel = int(
@@ -863,8 +880,8 @@ class ODMRGui(GUIBase):
         """
         cb_range = self.get_matrix_cb_range()
         self.update_colorbar(cb_range)
-        matrix_image = self.odmr_matrix_image.image
-        self.odmr_matrix_image.setImage(image=matrix_image, levels=(cb_range[0], cb_range[1]))
+        self.odmr_matrix_image.update_image_rows(self._matrix_buffer.image,
+                                                 levels=(cb_range[0], cb_range[1]))
         return
 
     def update_colorbar(self, cb_range):
@@ -880,23 +897,20 @@ class ODMRGui(GUIBase):
         """
         Determines the cb_min and cb_max values for the matrix plot
         """
-        matrix_image = self.odmr_matrix_image.image
-
         # If "Manual" is checked or the image is empty (all zeros), then take manual cb range.
         # Otherwise, calculate cb range from percentiles.
-        if self._mw.odmr_cb_manual_RadioButton.isChecked() or np.count_nonzero(matrix_image) < 1:
+        if self._mw.odmr_cb_manual_RadioButton.isChecked() or self._matrix_buffer.nonzero_count < 1:
             cb_min = self._mw.odmr_cb_min_DoubleSpinBox.value()
             cb_max = self._mw.odmr_cb_max_DoubleSpinBox.value()
         else:
-            # Exclude any zeros (which are typically due to unfinished scan)
-            matrix_image_nonzero = matrix_image[np.nonzero(matrix_image)]
-
             # Read centile range
             low_centile = self._mw.odmr_cb_low_percentile_DoubleSpinBox.value()
             high_centile = self._mw.odmr_cb_high_percentile_DoubleSpinBox.value()
 
-            cb_min = np.percentile(matrix_image_nonzero, low_centile)
-            cb_max = np.percentile(matrix_image_nonzero, high_centile)
+            # Percentiles of the nonzero values (zeros are typically due to unfinished scan),
+            # kept sorted by the matrix buffer
+            cb_min = self._matrix_buffer.percentile(low_centile)
+            cb_max = self._matrix_buffer.percentile(high_centile)
 
         cb_range = [cb_min, cb_max]
         return cb_range
@@ -909,6 +923,7 @@ class ODMRGui(GUIBase):
         """ Updates current elapsed measurement time and completed frequency sweeps """
         self._mw.elapsed_time_DisplayWidget.display(int(np.rint(elapsed_time)))
         self._mw.elapsed_sweeps_DisplayWidget.display(scanned_lines)
+        self._elapsed_sweeps = scanned_lines
         return
 
     def update_settings(self):
@@ -973,9 +988,10 @@ class ODMRGui(GUIBase):
         self._odmr_logic.matrix_range = self._mw.odmr_control_DockWidget.matrix_range_SpinBox.value()
         # need to update the plot that is showed
         key = 'Matrix range: {}'.format(self._odmr_logic.matrix_range)
-        self.odmr_matrix_image.setImage(self._odmr_logic.select_odmr_matrix_data(self._odmr_logic.odmr_plot_xy,
-                                                                                 self.display_channel,
-                                                                                 self._odmr_logic.matrix_range))
+        self.update_plots(
+            self._odmr_logic.odmr_plot_x,
+            self._odmr_logic.odmr_plot_y,
+            self._odmr_logic.odmr_plot_xy)
         return
 
     def update_parameter(self, param_dict):
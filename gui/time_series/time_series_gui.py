@@ -21,16 +21,19 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 import os
+import numpy as np
 import pyqtgraph as pg
 
 from core.connector import Connector
 from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
+from core.util.ring_buffer import TraceRingBuffer
 from gui.colordefs import QudiPalettePale as palette
 from gui.guibase import GUIBase
 from qtpy import QtCore
 from qtpy import QtWidgets
 from qtpy import uic
+from qtwidgets.decimated_plotitem import DecimatedPlotDataItem
 from interface.data_instream_interface import StreamChannelType
 
 
@@ -102,6 +105,13 @@ class TimeSeriesGui(GUIBase):
         self._csd_widgets = dict()
         self.curves = dict()
         self.averaged_curves = dict()
+        # Displayed (averaged) traces. The new samples of each data frame are appended to them.
+        self._trace = None
+        self._trace_time = None
+        self._trace_channels = None
+        self._averaged_trace = None
+        self._averaged_trace_time = None
+        self._averaged_trace_channels = None
 
         self._channels_per_axis = [set(), set()]
 
@@ -171,16 +181,9 @@ class TimeSeriesGui(GUIBase):
             else:
                 pen1 = pg.mkPen(palette.c5, cosmetic=True)
                 pen2 = pg.mkPen(palette.c6, cosmetic=True)
-            self.averaged_curves[ch] = pg.PlotCurveItem(pen=pen1,
-                                                        clipToView=True,
-                                                        downsampleMethod='subsample',
-                                                        autoDownsample=True,
-                                                        antialias=self._use_antialias)
-            self.curves[ch] = pg.PlotCurveItem(pen=pen2,
-                                               clipToView=True,
-                                               downsampleMethod='subsample',
-                                               autoDownsample=True,
-                                               antialias=self._use_antialias)
+            self.averaged_curves[ch] = DecimatedPlotDataItem(pen=pen1,
+                                                             antialias=self._use_antialias)
+            self.curves[ch] = DecimatedPlotDataItem(pen=pen2, antialias=self._use_antialias)
 
         #####################
         # Set up channel settings dialog
@@ -241,6 +244,8 @@ class TimeSeriesGui(GUIBase):
         # Handling signals from the logic
         self._time_series_logic.sigDataChanged.connect(
             self.update_data, QtCore.Qt.QueuedConnection)
+        self._time_series_logic.sigNewTraceSamples.connect(
+            self.append_data, QtCore.Qt.QueuedConnection)
         self._time_series_logic.sigSettingsChanged.connect(
             self.update_settings, QtCore.Qt.QueuedConnection)
         self._time_series_logic.sigStatusChanged.connect(
@@ -282,6 +287,7 @@ class TimeSeriesGui(GUIBase):
         self.sigStopRecording.disconnect()
         self.sigSettingsChanged.disconnect()
         self._time_series_logic.sigDataChanged.disconnect()
+        self._time_series_logic.sigNewTraceSamples.disconnect()
         self._time_series_logic.sigSettingsChanged.disconnect()
         self._time_series_logic.sigStatusChanged.disconnect()
 
@@ -459,12 +465,55 @@ class TimeSeriesGui(GUIBase):
             self.log.error('Must provide a full data set of x and y values. update_data failed.')
             return
 
+        # Copy the traces into the ring buffers the new samples are appended to
+        self._trace, self._trace_time, self._trace_channels = self.__create_trace(data_time, data)
+        self._averaged_trace, self._averaged_trace_time, self._averaged_trace_channels = \
+            self.__create_trace(smooth_time, smooth_data)
+        return self.__plot_traces()
+
+    @QtCore.Slot(object, object)
+    def append_data(self, data, smooth_data=None):
+        """ Append the new samples of a data frame to the displayed traces and plot them.
+
+        @param dict data: new samples of each channel
+        @param dict smooth_data: new samples of each averaged channel (None if not averaged)
+        """
+        if (self._trace_channels != (None if data is None else list(data))
+                or self._averaged_trace_channels != (
+                        None if smooth_data is None else list(smooth_data))):
+            # Channels changed without the whole traces being sent yet
+            return self.update_data()
         if data is not None:
-            for channel, y_arr in data.items():
-                self.curves[channel].setData(y=y_arr, x=data_time)
+            self._trace.append(np.array(list(data.values())))
         if smooth_data is not None:
+            self._averaged_trace.append(np.array(list(smooth_data.values())))
+        return self.__plot_traces()
+
+    @staticmethod
+    def __create_trace(trace_time, data):
+        if data is None:
+            return None, None, None
+        channels = list(data)
+        trace = TraceRingBuffer(len(channels), len(trace_time))
+        if channels:
+            trace.append(np.array([data[ch] for ch in channels]))
+        return trace, trace_time, channels
+
+    def __plot_traces(self):
+        """ Plot the displayed traces. The curves get views of the trace buffers, which are only
+        written in the GUI thread right before the curves are updated again.
+        """
+        data = smooth_data = None
+        if self._trace is not None:
+            trace = self._trace.get_view()
+            data = {ch: trace[i] for i, ch in enumerate(self._trace_channels)}
+            for channel, y_arr in data.items():
+                self.curves[channel].setData(y=y_arr, x=self._trace_time)
+        if self._averaged_trace is not None:
+            trace = self._averaged_trace.get_view()
+            smooth_data = {ch: trace[i] for i, ch in enumerate(self._averaged_trace_channels)}
             for channel, y_arr in smooth_data.items():
-                self.averaged_curves[channel].setData(y=y_arr, x=smooth_time)
+                self.averaged_curves[channel].setData(y=y_arr, x=self._averaged_trace_time)
 
         curr_value_channel = self._mw.curr_value_comboBox.currentText()
         if curr_value_channel != 'None':
@@ -65,6 +65,11 @@ class AWG70K(Base, PulserInterface):
     _ftp_dir = ConfigOption(name='ftp_root_dir', default='C:\\inetpub\\ftproot', missing='warn')
     _username = ConfigOption(name='ftp_login', default='anonymous', missing='warn')
     _password = ConfigOption(name='ftp_passwd', default='anonymous@', missing='warn')
+    # Write chunked waveforms into wfmx files preallocated to their final size instead of
+    # appending to them (and buffering the marker bytes in a temporary file)
+    _preallocate_waveform_files = ConfigOption(name='preallocate_waveform_files',
+                                               default=False,
+                                               missing='nothing')
 
     # translation dict from qudi trigger descriptor to device command
     __event_triggers = {'OFF': 'OFF', 'A': 'ATR', 'B': 'BTR', 'INT': 'INT'}
@@ -85,6 +90,10 @@ class AWG70K(Base, PulserInterface):
         self.__min_waveform_length = 0
         self.__max_waveform_length = 0
         self.__installed_options = list()
+
+        # Write position (in samples) and header length of each wfmx file currently written
+        # into a preallocated file
+        self._preallocated_wfmx_files = dict()
         return
 
     def on_activate(self):
@@ -1595,6 +1604,15 @@ class AWG70K(Base, PulserInterface):
         wfmx_path = os.path.join(self._tmp_work_dir, filename)
         tmp_path = os.path.join(self._tmp_work_dir, 'digital_tmp.bin')
 
+        if self._preallocate_waveform_files:
+            self._write_wfmx_preallocated(wfmx_path=wfmx_path,
+                                          analog_samples=analog_samples,
+                                          marker_bytes=marker_bytes,
+                                          is_first_chunk=is_first_chunk,
+                                          is_last_chunk=is_last_chunk,
+                                          total_number_of_samples=total_number_of_samples)
+            return
+
         # if it is the first chunk, create the .WFMX file with header.
         if is_first_chunk:
             # create header
@@ -1636,6 +1654,41 @@ class AWG70K(Base, PulserInterface):
                 wfmxfile.write(marker_bytes)
         return
 
+    def _write_wfmx_preallocated(self, wfmx_path, analog_samples, marker_bytes, is_first_chunk,
+                                 is_last_chunk, total_number_of_samples):
+        """
+        Version of _write_wfmx creating identical files without a temporary marker file.
+        The wfmx-file is preallocated to its final size with the first chunk. The analog samples
+        and marker bytes of each chunk are then written directly to their positions in the file.
+
+        @param str wfmx_path: full path of the wfmx-file to write
+        Other parameters are the same as for _write_wfmx.
+        """
+        if is_first_chunk:
+            header = self._create_xml_header(total_number_of_samples, marker_bytes is not None)
+            header = header.encode('utf8')
+            file_size = len(header) + total_number_of_samples * (4 if marker_bytes is None else 5)
+            with open(wfmx_path, 'wb') as wfmxfile:
+                wfmxfile.write(header)
+                wfmxfile.truncate(file_size)
+            self._preallocated_wfmx_files[wfmx_path] = [0, len(header)]
+
+        write_index, header_length = self._preallocated_wfmx_files[wfmx_path]
+        with open(wfmx_path, 'r+b') as wfmxfile:
+            # analog samples behind the header (4 bytes per sample)
+            wfmxfile.seek(header_length + 4 * write_index)
+            wfmxfile.write(analog_samples)
+            # marker bytes behind all analog samples
+            if marker_bytes is not None:
+                wfmxfile.seek(header_length + 4 * total_number_of_samples + write_index)
+                wfmxfile.write(marker_bytes)
+
+        if is_last_chunk:
+            del self._preallocated_wfmx_files[wfmx_path]
+        else:
+            self._preallocated_wfmx_files[wfmx_path][0] = write_index + len(analog_samples)
+        return
+
     def _create_xml_header(self, number_of_samples, markers_active):
         """
         This function creates an xml file containing the header for the wfmx-file format using
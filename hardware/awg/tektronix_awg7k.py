@@ -63,6 +63,11 @@ class AWG7k(Base, PulserInterface):
     _username = ConfigOption(name='ftp_login', default='anonymous', missing='warn')
     _password = ConfigOption(name='ftp_passwd', default='anonymous@', missing='warn')
     _visa_timeout = ConfigOption(name='timeout', default=30, missing='nothing')
+    # Write chunked waveforms into wfm files preallocated to their final size instead of
+    # appending to them
+    _preallocate_waveform_files = ConfigOption(name='preallocate_waveform_files',
+                                               default=False,
+                                               missing='nothing')
 
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
@@ -83,6 +88,9 @@ class AWG7k(Base, PulserInterface):
         self._loaded_sequences = []  # Helper variable since a loaded sequence can not be queried :(
         self._marker_byte_dict = {0: b'\x00', 1: b'\x01', 2: b'\x02', 3: b'\x03'}
         self._event_triggers = {'OFF': 'OFF', 'ON': 'ON'}
+        # Write position (in samples), header length and record buffer of each wfm file currently
+        # written into a preallocated file
+        self._preallocated_wfm_files = dict()
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
@@ -1416,6 +1424,15 @@ class AWG7k(Base, PulserInterface):
             filename += '.wfm'
         wfm_path = os.path.join(self._tmp_work_dir, filename)
 
+        if self._preallocate_waveform_files:
+            self._write_wfm_preallocated(wfm_path=wfm_path,
+                                         analog_samples=analog_samples,
+                                         marker_bytes=marker_bytes,
+                                         is_first_chunk=is_first_chunk,
+                                         is_last_chunk=is_last_chunk,
+                                         total_number_of_samples=total_number_of_samples)
+            return
+
         # if it is the first chunk, create the WFM file with header.
         if is_first_chunk:
             with open(wfm_path, 'wb') as wfm_file:
@@ -1457,6 +1474,49 @@ class AWG7k(Base, PulserInterface):
                 wfm_file.write(footer.encode())
         return
 
+    def _write_wfm_preallocated(self, wfm_path, analog_samples, marker_bytes, is_first_chunk,
+                                is_last_chunk, total_number_of_samples):
+        """
+        Version of _write_wfm creating identical files.
+        The wfm-file is preallocated to its final size (incl. header and footer) with the first
+        chunk. The (float32, uint8) records of each chunk are packed into a buffer of at most
+        100 MB reused for all chunks and written directly to their position in the file.
+
+        @param str wfm_path: full path of the wfm-file to write
+        Other parameters are the same as for _write_wfm.
+        """
+        record_type = np.dtype('float32, uint8')
+
+        if is_first_chunk:
+            num_bytes = str(int(total_number_of_samples * 5))
+            header = 'MAGIC 1000\r\n#{0}{1}'.format(len(num_bytes), num_bytes).encode()
+            # the footer encodes the sample rate, which was used for that file:
+            footer = 'CLOCK {0:16.10E}\r\n'.format(self.get_sample_rate()).encode()
+            with open(wfm_path, 'wb') as wfm_file:
+                wfm_file.write(header)
+                wfm_file.seek(len(header) + total_number_of_samples * record_type.itemsize)
+                wfm_file.write(footer)
+            buffer_samples = min(104857600 // record_type.itemsize, total_number_of_samples)
+            self._preallocated_wfm_files[wfm_path] = [0,
+                                                      len(header),
+                                                      np.empty(buffer_samples, dtype=record_type)]
+
+        write_index, header_length, records = self._preallocated_wfm_files[wfm_path]
+        with open(wfm_path, 'r+b') as wfm_file:
+            wfm_file.seek(header_length + record_type.itemsize * write_index)
+            for start in range(0, len(analog_samples), records.size):
+                stop = min(start + records.size, len(analog_samples))
+                block = records[:stop - start]
+                block['f0'] = analog_samples[start:stop]
+                block['f1'] = 0 if marker_bytes is None else marker_bytes[start:stop]
+                wfm_file.write(block)
+
+        if is_last_chunk:
+            del self._preallocated_wfm_files[wfm_path]
+        else:
+            self._preallocated_wfm_files[wfm_path][0] = write_index + len(analog_samples)
+        return
+
     def sequence_set_waveform(self, waveform_name, step, track):
         """
         Set the waveform 'waveform_name' to position 'step' in the sequence 'sequence_name'.
@@ -32,6 +32,7 @@ from interface.slow_counter_interface import SlowCounterInterface
 from interface.slow_counter_interface import SlowCounterConstraints
 from interface.slow_counter_interface import CountingMode
 from interface.fast_counter_interface import FastCounterInterface
+from hardware.picoquant.tttr_decoder import TTTRDecoder, TTTRHistogrammer
 
 # =============================================================================
 # Wrapper around the PHLib.DLL. The current file is based on the header files
@@ -99,11 +100,13 @@ class PicoHarp300(Base, SlowCounterInterface, FastCounterInterface):
         module.Class: 'picoquant.picoharp300.PicoHarp300'
         deviceID: 0 # a device index from 0 to 7.
         mode: 0 # 0: histogram mode, 2: T2 mode, 3: T3 mode
+        gated: False # fast counter: gated histogram, each sync opens the next gate
         
     """
 
     _deviceID = ConfigOption('deviceID', 0, missing='warn') # a device index from 0 to 7.
     _mode = ConfigOption('mode', 0, missing='warn')
+    _gated = ConfigOption('gated', False, missing='nothing')
 
     sigReadoutPicoharp = QtCore.Signal()
     sigAnalyzeData = QtCore.Signal(object, object)
@@ -126,8 +129,13 @@ class PicoHarp300(Base, SlowCounterInterface, FastCounterInterface):
         self._dll = ctypes.cdll.LoadLibrary('phlib64')
 
         # Just some default values:
-        self._bin_width_ns = 3000
-        self._record_length_ns = 100 *1e9
+        self._bin_width_s = 4e-12
+        self._record_length_s = 1e-6
+        self._number_of_gates = 0
+
+        # Decoder and histogram for the TTTR records, created in configure
+        self._tttr_decoder = None
+        self._histogrammer = None
 
         self._photon_source2 = None #for compatibility reasons with second APD
         self._count_channel = 1
@@ -1057,29 +1065,46 @@ class PicoHarp300(Base, SlowCounterInterface, FastCounterInterface):
 
     #FIXME: The interface connection to the fast counter must be established!
 
-    def configure(self, bin_width_ns, record_length_ns, number_of_gates = 0):
-        """
-        Configuration of the fast counter.
-        bin_width_ns: Length of a single time bin in the time trace histogram
-                      in nanoseconds.
-        record_length_ns: Total length of the timetrace/each single gate in
-                          nanoseconds.
-        number_of_gates: Number of gates in the pulse sequence. Ignore for
-                         ungated counter.
-        """
-        #        self.initialize(mode=3)
-        self._bin_width_ns = bin_width_ns
-        self._record_length_ns = record_length_ns
-        self._number_of_gates = number_of_gates
+    def configure(self, bin_width_s, record_length_s, number_of_gates=0):
+        """ Configuration of the fast counter.
 
-        #FIXME: actualle only an unsigned array will be needed. Change that later.
-        #        self.data_trace = np.zeros(number_of_gates, dtype=np.int64 )
-        self.data_trace = [0]*number_of_gates
-        self.count = 0
+        @param float bin_width_s: Length of a single time bin in the time trace histogram in
+                                  seconds.
+        @param float record_length_s: Total length of the timetrace/each single gate in seconds.
+        @param int number_of_gates: optional, number of gates in the pulse sequence. Ignore for
+                                    not gated counter.
 
-        self.result = []
-        self.initialize(2)
-        return
+        @return tuple(binwidth_s, record_length_s, number_of_gates):
+                    binwidth_s: float the actual set binwidth in seconds
+                    record_length_s: the actual record length in seconds
+                    number_of_gates: the number of gates, which are accepted, 0 if not gated
+
+        The time trace is histogrammed from the TTTR records (T3 mode, or T2 mode if configured).
+        The bin width is rounded to a multiple of the record time resolution.
+        """
+        if self._mode not in (self.MODE_T2, self.MODE_T3):
+            self._mode = self.MODE_T3
+        self.initialize(self._mode)
+        if self._mode == self.MODE_T3:
+            resolution_s = self.get_resolution() * 1e-12
+            record_format = 'picoharp_t3'
+        else:
+            # The resolution in T2 mode is fixed to the base resolution of 4 ps
+            resolution_s = 4e-12
+            record_format = 'picoharp_t2'
+
+        bin_factor = max(1, int(round(bin_width_s / resolution_s)))
+        self._bin_width_s = bin_factor * resolution_s
+        number_of_bins = max(1, int(np.ceil(record_length_s / self._bin_width_s)))
+        self._record_length_s = number_of_bins * self._bin_width_s
+        self._number_of_gates = int(number_of_gates) if self._gated else 0
+
+        self._tttr_decoder = TTTRDecoder(record_format)
+        self._histogrammer = TTTRHistogrammer(is_t3=self._mode == self.MODE_T3,
+                                              number_of_bins=number_of_bins,
+                                              bin_factor=bin_factor,
+                                              number_of_gates=self._number_of_gates)
+        return self._bin_width_s, self._record_length_s, self._number_of_gates
 
     def get_status(self):
         """
@@ -1114,21 +1139,21 @@ class PicoHarp300(Base, SlowCounterInterface, FastCounterInterface):
         Continues the current measurement if the fast counter is in pause state.
         """
         self.meas_run = True
-        self.start(self._record_length_ns/1e6)
+        self.start(self.ACQTMAX)
+        self.sigReadoutPicoharp.emit()
 
     def is_gated(self):
         """
         Boolean return value indicates if the fast counter is a gated counter
         (TRUE) or not (FALSE).
         """
-        return False
+        return bool(self._gated)
 
     def get_binwidth(self):
         """
         returns the width of a single timebin in the timetrace in seconds
         """
-        #FIXME: Must be implemented
-        return 2e-9
+        return self._bin_width_s
 
     def get_data_trace(self):
         """
@@ -1142,9 +1167,15 @@ class PicoHarp300(Base, SlowCounterInterface, FastCounterInterface):
             returnarray[gate_index, timebin_index]
         """
 
-        info_dict = {'elapsed_sweeps': None,
-                     'elapsed_time': None}  # TODO : implement that according to hardware capabilities
-        return self.data_trace, info_dict
+        if self._histogrammer is None:
+            self.log.error('PicoHarp: Fast counter is not configured. Call configure first.')
+            return np.zeros(0, dtype=np.int64), {'elapsed_sweeps': None, 'elapsed_time': None}
+        with self.threadlock:
+            data_trace = self._histogrammer.get_data_trace()
+            elapsed_sweeps = self._histogrammer.sweeps
+        info_dict = {'elapsed_sweeps': elapsed_sweeps if elapsed_sweeps > 0 else None,
+                     'elapsed_time': self.get_elepased_meas_time() / 1000}
+        return data_trace, info_dict
 
     # =========================================================================
     #  Test routine for continuous readout
@@ -1158,9 +1189,13 @@ class PicoHarp300(Base, SlowCounterInterface, FastCounterInterface):
         self.lock()
 
         self.meas_run = True
+        if self._histogrammer is not None:
+            with self.threadlock:
+                self._tttr_decoder.reset()
+                self._histogrammer.clear()
 
-        # start the device:
-        self.start(int(self._record_length_ns/1e6))
+        # start the device, the measurement runs until it is stopped:
+        self.start(self.ACQTMAX)
 
         self.sigReadoutPicoharp.emit()
 
@@ -1177,7 +1212,7 @@ class PicoHarp300(Base, SlowCounterInterface, FastCounterInterface):
         #        buffer, actual_counts = [1,2,3,4,5,6,7,8,9], 9
 
         # This analysis signel should be analyzed in a queued thread:
-        self.sigAnalyzeData.emit(buffer[0:actual_counts-1], actual_counts)
+        self.sigAnalyzeData.emit(buffer[:actual_counts], actual_counts)
 
         if not self.meas_run:
             with self.threadlock:
@@ -1185,7 +1220,6 @@ class PicoHarp300(Base, SlowCounterInterface, FastCounterInterface):
                 self.stop_device()
                 return
 
-        print('get new data.')
         # get the next data:
         self.sigReadoutPicoharp.emit()
 
@@ -1197,8 +1231,8 @@ class PicoHarp300(Base, SlowCounterInterface, FastCounterInterface):
         @param arr_data: numpy uint32 array with length 'actual_counts'.
         @param actual_counts: int, number of read out events from the buffer.
 
-        Write the obtained arr_data to the predefined array data_trace,
-        initialized in the configure method.
+        The records are decoded and added to the time trace histogram, which
+        is created in the configure method.
 
         The received array contains 32bit words. The bit assignment starts from
         the MSB (most significant bit), which is here displayed as the most
@@ -1271,36 +1305,15 @@ class PicoHarp300(Base, SlowCounterInterface, FastCounterInterface):
                       the channel-number are set to high (i.e. 1).
         """
 
-        # at first just a simple test
-        time.sleep(0.2)
-
-        self.data_trace[self.count] = actual_counts
-        self.count += 1
-
-        if self.count > self._number_of_gates-1:
-            self.count = 0
-
         if actual_counts == self.TTREADMAX:
-            self.log.warning('Overflow!')
-
-        print('Data analyzed.')
-
-#        self.result = []
-#        for entry in arr_data[0:actual_counts-1]:
-#
-#            # apply three bitmasks to extract the relavent numbers:
-#            overflow = entry & (2**(32-1) )
-#            marker_ch = entry & (2**(32-2)  + 2**(32-3) + 2**(32-4))
-#            time_tag = entry & (2**32 -1 - 2**(32-1) + 2**(32-2) + 2**(32-3) + 2**(32-4))
-
-
-
-
-
-
-
-
-
-
-
+            self.log.warning('PicoHarp: FIFO read returned the maximum number of records. Data '
+                             'might have been lost.')
+        if self._histogrammer is None:
+            return
 
+        # Decode all records at once. The overflow correction is carried across FIFO reads by
+        # the decoder.
+        with self.threadlock:
+            events = self._tttr_decoder.decode(arr_data[:actual_counts])
+            self._histogrammer.add(events)
+        return
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized decoder and histogrammer for the 32 bit TTTR records (T2 and T3 mode) of the
+PicoQuant PicoHarp 300 and HydraHarp 400.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+from collections import namedtuple
+import numpy as np
+
+# Record layouts (starting from the MSB):
+#   picoharp_t2:  channel 4 bit | timetag 28 bit
+#                 channel 15 marks special records: lowest 4 bits of timetag are marker bits,
+#                 overflow if they are all zero. Channel 0 is the sync input.
+#   picoharp_t3:  channel 4 bit | dtime 12 bit | nsync 16 bit
+#                 channel 15 marks special records: dtime contains marker bits, overflow if 0.
+#   hydraharp_t2: special 1 bit | channel 6 bit | timetag 25 bit
+#                 special channel 63: overflow (timetag holds the number of overflows),
+#                 special channel 0: sync, special channel 1..15: marker bits.
+#   hydraharp_t3: special 1 bit | channel 6 bit | dtime 15 bit | nsync 10 bit
+#                 special channel 63: overflow (nsync holds the number of overflows),
+#                 special channel 1..15: marker bits.
+# The value is the wraparound period of the timetag (T2) or sync counter (T3).
+RECORD_FORMATS = {'picoharp_t2': 210698240,
+                  'picoharp_t3': 65536,
+                  'hydraharp_t2': 33554432,
+                  'hydraharp_t3': 1024}
+
+TTTREvents = namedtuple('TTTREvents', ['channel', 'time', 'nsync', 'marker_bits', 'marker_time',
+                                       'marker_nsync', 'sync_time'])
+TTTREvents.__doc__ = """
+Decoded TTTR events as numpy arrays, overflow corrected and in the order of the records.
+
+channel: photon channel numbers
+time: T2: photon timetags, T3: photon start-stop times (dtime), both in units of the resolution
+nsync: T3: sync counter of the photons, T2: None
+marker_bits: marker bit masks of the marker records
+marker_time: T2: timetags of the markers, T3: None
+marker_nsync: T3: sync counter of the markers, T2: None
+sync_time: T2: timetags of the sync events, T3: None
+"""
+
+
+class TTTRDecoder:
+    """
+    Decodes blocks of TTTR records as read from the device FIFO with numpy vector operations.
+
+    The overflow (wraparound) correction is carried across subsequent calls of decode, so the
+    blocks must be passed in the order they were read. Call reset when starting a new
+    measurement.
+    """
+
+    def __init__(self, record_format):
+        """
+        @param str record_format: one of the keys of RECORD_FORMATS
+        """
+        if record_format not in RECORD_FORMATS:
+            raise ValueError('Unknown TTTR record format "{0}". Valid formats are: {1}'
+                             ''.format(record_format, sorted(RECORD_FORMATS)))
+        self.record_format = record_format
+        self.is_t3 = record_format.endswith('_t3')
+        self.wraparound = RECORD_FORMATS[record_format]
+        self._overflows = 0
+
+    def reset(self):
+        """
+        Reset the overflow correction.
+        """
+        self._overflows = 0
+        return
+
+    def decode(self, records):
+        """
+        Decode a block of records.
+
+        @param numpy.ndarray records: 1D uint32 array of TTTR records
+
+        @return TTTREvents: the decoded photon, marker and sync events
+        """
+        records = np.asarray(records, dtype=np.uint32)
+        if self.record_format.startswith('picoharp'):
+            channel = records >> 28
+            special = channel == 15
+            if self.is_t3:
+                field = (records >> 16) & 0xFFF
+                counter = records & 0xFFFF
+            else:
+                field = records & 0xFFFFFFF
+                counter = field
+            special_indices = np.flatnonzero(special)
+            special_field = field[special_indices]
+            if not self.is_t3:
+                special_field &= 0xF
+            overflow_indices = special_indices[special_field == 0]
+            overflow_weights = None
+            marker_indices = special_indices[special_field != 0]
+            marker_bits = special_field[special_field != 0]
+            sync_indices = None
+            if not self.is_t3:
+                sync_indices = np.flatnonzero(channel == 0)
+            photon_mask = ~special
+            if sync_indices is not None:
+                photon_mask[sync_indices] = False
+        else:
+            channel = (records >> 25) & 0x3F
+            special = records >= 0x80000000
+            if self.is_t3:
+                field = (records >> 10) & 0x7FFF
+                counter = records & 0x3FF
+            else:
+                field = records & 0x1FFFFFF
+                counter = field
+            special_indices = np.flatnonzero(special)
+            special_channel = channel[special_indices]
+            overflow_indices = special_indices[special_channel == 63]
+            # Number of overflows is stored in the counter field (0 for old format means 1)
+            overflow_weights = counter[overflow_indices].astype(np.int64)
+            overflow_weights[overflow_weights == 0] = 1
+            is_marker = (special_channel >= 1) & (special_channel <= 15)
+            marker_indices = special_indices[is_marker]
+            marker_bits = special_channel[is_marker]
+            sync_indices = None
+            if not self.is_t3:
+                sync_indices = special_indices[special_channel == 0]
+            photon_mask = ~special
+
+        photon_indices = np.flatnonzero(photon_mask)
+        photon_time, marker_time, sync_time = None, None, None
+        photon_nsync, marker_nsync = None, None
+        if self.is_t3:
+            photon_nsync = self._correct_overflows(counter, photon_indices, overflow_indices,
+                                                   overflow_weights)
+            marker_nsync = self._correct_overflows(counter, marker_indices, overflow_indices,
+                                                   overflow_weights)
+            photon_time = field[photon_indices]
+        else:
+            photon_time = self._correct_overflows(counter, photon_indices, overflow_indices,
+                                                  overflow_weights)
+            marker_time = self._correct_overflows(counter, marker_indices, overflow_indices,
+                                                  overflow_weights)
+            if self.record_format.startswith('picoharp'):
+                # The lowest 4 bits of a marker timetag are occupied by the marker bits
+                marker_time -= marker_bits
+            sync_time = self._correct_overflows(counter, sync_indices, overflow_indices,
+                                                overflow_weights)
+
+        if overflow_weights is None:
+            self._overflows += overflow_indices.size
+        else:
+            self._overflows += int(overflow_weights.sum())
+        return TTTREvents(channel=channel[photon_indices].astype(np.int8),
+                          time=photon_time,
+                          nsync=photon_nsync,
+                          marker_bits=marker_bits.astype(np.uint8),
+                          marker_time=marker_time,
+                          marker_nsync=marker_nsync,
+                          sync_time=sync_time)
+
+    def _correct_overflows(self, counter, indices, overflow_indices, overflow_weights):
+        """
+        Add the wraparound periods passed before each of the selected records to their counter
+        value.
+
+        @param numpy.ndarray counter: timetag (T2) or sync counter (T3) field of all records
+        @param numpy.ndarray indices: record indices to return the corrected values for
+        @param numpy.ndarray overflow_indices: indices of the overflow records (ascending)
+        @param numpy.ndarray overflow_weights: number of overflows of each overflow record
+                                               (None means 1 for each)
+
+        @return numpy.ndarray: corrected int64 counter values of the selected records
+        """
+        values = counter[indices].astype(np.int64)
+        if overflow_indices.size == 0:
+            if self._overflows:
+                values += self._overflows * self.wraparound
+            return values
+        passed = np.searchsorted(overflow_indices, indices)
+        if overflow_weights is not None:
+            passed = np.concatenate(([0], np.cumsum(overflow_weights)))[passed]
+        values += (passed + self._overflows) * self.wraparound
+        return values
+
+
+class TTTRHistogrammer:
+    """
+    Accumulates decoded TTTR events into the time trace histogram of a fast counter.
+
+    Ungated, each photon is binned by its time after the preceding sync (T3: dtime, T2: timetag
+    difference to the last sync event). Gated, each sync pulse opens the next gate and a marker
+    (e.g. the sequence start trigger) resets the gate index to the first gate. Without markers
+    the gate index counts the sync pulses modulo the number of gates.
+    """
+
+    def __init__(self, is_t3, number_of_bins, bin_factor=1, number_of_gates=0, channels=None):
+        """
+        @param bool is_t3: True for T3 events, False for T2 events
+        @param int number_of_bins: number of time bins (per gate)
+        @param int bin_factor: bin width in units of the record time resolution
+        @param int number_of_gates: number of gates, 0 for an ungated histogram
+        @param list channels: photon channels to count (None for all channels)
+        """
+        self.is_t3 = bool(is_t3)
+        self.number_of_bins = max(1, int(number_of_bins))
+        self.bin_factor = max(1, int(bin_factor))
+        self.number_of_gates = max(0, int(number_of_gates))
+        self.channels = None if channels is None else np.asarray(channels, dtype=np.int8)
+        self._histogram = np.zeros(max(1, self.number_of_gates) * self.number_of_bins,
+                                   dtype=np.int64)
+        self.clear()
+
+    def clear(self):
+        """
+        Reset the histogram and the sync/marker references.
+        """
+        self._histogram[:] = 0
+        self.sweeps = 0
+        # T3: sync counter of the last marker
+        self._last_marker_nsync = 0
+        # T2: timetag of the last sync, number of syncs and number of syncs before the last marker
+        self._last_sync_time = -1
+        self._sync_count = 0
+        self._last_marker_sync_count = 0
+        return
+
+    def add(self, events):
+        """
+        Add decoded events to the histogram.
+
+        @param TTTREvents events: decoded events of one block of records
+        """
+        if self.channels is None:
+            photon_time = events.time
+            photon_nsync = events.nsync
+        else:
+            selected = np.isin(events.channel, self.channels)
+            photon_time = events.time[selected]
+            photon_nsync = None if events.nsync is None else events.nsync[selected]
+        if self.is_t3:
+            self._add_t3(photon_time, photon_nsync, events.marker_nsync)
+        else:
+            self._add_t2(photon_time, events.marker_time, events.sync_time)
+        return
+
+    def _add_t3(self, dtime, nsync, marker_nsync):
+        bins = dtime // self.bin_factor
+        valid = bins < self.number_of_bins
+        if self.number_of_gates > 0:
+            if marker_nsync.size:
+                last_marker = np.searchsorted(marker_nsync, nsync, side='right') - 1
+                reference = np.where(last_marker >= 0, marker_nsync[np.maximum(last_marker, 0)],
+                                     self._last_marker_nsync)
+            else:
+                reference = self._last_marker_nsync
+            gates = (nsync - reference) % self.number_of_gates
+            bins = gates * self.number_of_bins + bins
+        self._histogram += np.bincount(bins[valid], minlength=self._histogram.size)
+        self.sweeps += marker_nsync.size
+        if marker_nsync.size:
+            self._last_marker_nsync = int(marker_nsync[-1])
+        return
+
+    def _add_t2(self, time, marker_time, sync_time):
+        preceding_syncs = np.searchsorted(sync_time, time, side='right')
+        if sync_time.size:
+            last_sync = np.where(preceding_syncs > 0,
+                                 sync_time[np.maximum(preceding_syncs - 1, 0)],
+                                 self._last_sync_time)
+        else:
+            last_sync = np.full(time.shape, self._last_sync_time, dtype=np.int64)
+        bins = (time - last_sync) // self.bin_factor
+        valid = (last_sync >= 0) & (bins < self.number_of_bins)
+        if self.number_of_gates > 0:
+            marker_syncs = self._sync_count + np.searchsorted(sync_time, marker_time,
+                                                              side='right')
+            if marker_syncs.size:
+                last_marker = np.searchsorted(marker_time, time, side='right') - 1
+                reference = np.where(last_marker >= 0, marker_syncs[np.maximum(last_marker, 0)],
+                                     self._last_marker_sync_count)
+            else:
+                reference = self._last_marker_sync_count
+            # The first sync after the marker opens gate 0
+            gates = (self._sync_count + preceding_syncs - reference - 1) % self.number_of_gates
+            bins = gates * self.number_of_bins + bins
+            if marker_syncs.size:
+                self._last_marker_sync_count = int(marker_syncs[-1])
+        self._histogram += np.bincount(bins[valid], minlength=self._histogram.size)
+        self.sweeps += marker_time.size
+        if sync_time.size:
+            self._last_sync_time = int(sync_time[-1])
+            self._sync_count += sync_time.size
+        return
+
+    def get_data_trace(self):
+        """
+        Get a copy of the accumulated histogram.
+
+        @return numpy.ndarray: int64 array with shape (number_of_bins,) if ungated or
+                               (number_of_gates, number_of_bins) if gated
+        """
+        if self.number_of_gates > 0:
+            return self._histogram.reshape(self.number_of_gates, self.number_of_bins).copy()
+        return self._histogram.copy()
@@ -1333,6 +1333,10 @@ class PulseBlasterESRPRO(Base, SwitchInterface, PulserInterface):
 
         constraints.activation_config = activation_config
 
+        # pulse sequences can be written directly from runs of constant
+        # channel states
+        constraints.run_length_waveforms = True
+
         return constraints
 
 
@@ -1850,63 +1854,108 @@ class PulseBlasterESRPRO(Base, SwitchInterface, PulserInterface):
 
         ch_list = list(digital_samples)
         ch_list.sort()
-        num_ch = len(ch_list)
 
         # take on of the channel and obtain the channel length
         num_entries = len(digital_samples[ch_list[0]])
 
-        last_sequence_dict = None
-        pb_sequence_list = list()
+        # find the samples at which any of the channels changes its state and
+        # convert the samples into runs of constant channel states.
+        changed = np.zeros(num_entries, dtype=bool)
+        changed[:1] = True
+        for ch_name in ch_list:
+            samples = np.asarray(digital_samples[ch_name], dtype=bool)
+            changed[1:] |= samples[1:] != samples[:-1]
+        run_starts = np.flatnonzero(changed)
+        run_lengths = np.diff(np.append(run_starts, num_entries))
+        digital_states = {ch_name: np.asarray(digital_samples[ch_name], dtype=bool)[run_starts]
+                          for ch_name in ch_list}
+
+        return self._convert_runs_to_pb_sequence(run_lengths, digital_states)
+
+    def _convert_runs_to_pb_sequence(self, run_lengths, digital_states):
+        """ Helper method to create a pulse blaster sequence from runs of
+            constant channel states.
+
+        @param numpy.ndarray run_lengths: number of samples of each run
+        @param dict digital_states: keys are the generic digital channel names
+                                    and values are bool arrays with the state
+                                    of the channel in each run.
 
-        for index in range(num_entries):
+        @return list: a sequence list with dictionaries formated for the generic
+                      method 'write_pulse_form (see
+                      _convert_sample_to_pb_sequence). Consecutive runs with the
+                      same active channels are merged.
+        """
 
-            # create at first a temporary array, with the minimal granularity
-            # length. The sampling freq is fixed anyway and cannot be changed.
-            temp_sequence_dict = {'active_channels': [],
-                                  'length': self.GRAN_MIN}
+        ch_list = list(digital_states)
+        ch_list.sort()
+        ch_numbers = [int(ch_name.replace('d_ch', ''))-1 for ch_name in ch_list]
 
-            for ch_name in ch_list:
+        pb_sequence_list = list()
+        for run_index, run_length in enumerate(np.asarray(run_lengths).tolist()):
+            active_channels = [ch_number for ch_number, ch_name in zip(ch_numbers, ch_list)
+                               if digital_states[ch_name][run_index]]
+            # if present and the same channels, accumulate length
+            if pb_sequence_list and pb_sequence_list[-1]['active_channels'] == active_channels:
+                pb_sequence_list[-1]['length'] += run_length*self.GRAN_MIN
+            else:
+                pb_sequence_list.append({'active_channels': active_channels,
+                                         'length': run_length*self.GRAN_MIN})
+
+        # increase length by 1%, to remove the ambiguity for the comparison
+        for pulse in pb_sequence_list[:-1]:
+            if pulse['length']*1.01 < self.LEN_MIN:
+                self.log.warning('Current waveform contains a pulse of '
+                                 'length {0:.2f}ns, which is smaller '
+                                 'than the minimal allowed length of '
+                                 '{1:.2f}ns! Pulse sequence might '
+                                 'most probably look unexpected. '
+                                 'Increase the length of the smallest '
+                                 'pulse!'
+                                 ''.format(pulse['length']*1e9,
+                                           self.LEN_MIN*1e9))
 
-                if digital_samples[ch_name][index]:
-                    temp_sequence_dict['active_channels'].append(int(ch_name.replace('d_ch', ''))-1)
+        return pb_sequence_list
 
-            # compare it with the last array if present
+    def write_run_length_waveform(self, name, run_lengths, digital_states):
+        """ Write a new purely digital waveform given as runs of constant
+            channel states instead of sample arrays (run-length encoding).
 
-            # if not present start to count
-            if last_sequence_dict is None:
-                last_sequence_dict = temp_sequence_dict
+        @param str name: the name of the waveform to be created
+        @param numpy.ndarray run_lengths: array of type int64 containing the
+                                          number of samples of each run
+        @param dict digital_states: keys are the generic digital channel names
+                                    (i.e. 'd_ch1') and values are arrays of
+                                    type bool (same length as run_lengths)
+                                    containing the marker state in each run.
 
-            else:
+        @return (int, list): number of samples written (-1 indicates failed
+                             process) and list of created waveform names.
+        """
+        run_lengths = np.asarray(netobtain(run_lengths), dtype='int64')
+        digital_states = netobtain(digital_states)
 
-                 # if present and the same channels, accumulate length
-                if temp_sequence_dict['active_channels'] == last_sequence_dict['active_channels']:
-                    last_sequence_dict['length'] += temp_sequence_dict['length']
-
-                # if present and not the same channels, append last array to
-                # sequence array
-                else:
-                    # increase length by 1%, to remove the ambiguity for the
-                    # comparison
-                    if last_sequence_dict['length']*1.01 < self.LEN_MIN:
-                        self.log.warning('Current waveform contains a pulse of '
-                                         'length {0:.2f}ns, which is smaller '
-                                         'than the minimal allowed length of '
-                                         '{1:.2f}ns! Pulse sequence might '
-                                         'most probably look unexpected. '
-                                         'Increase the length of the smallest '
-                                         'pulse!'
-                                         ''.format(last_sequence_dict['length']*1e9,
-                                                   self.LEN_MIN*1e9))
-
-                    pb_sequence_list.append(last_sequence_dict)
-
-                    # and temporary array becomes last array for the next round
-                    last_sequence_dict = temp_sequence_dict
-
-        # do not forget to add the last sequence
-        pb_sequence_list.append(last_sequence_dict)
+        if not digital_states or len(run_lengths) == 0:
+            self.log.warning('No runs handed over for waveform generation! '
+                             'Pass to the function "write_run_length_waveform" '
+                             'digital channel states!')
+            return -1, list()
 
-        return pb_sequence_list
+        chan = list(digital_states)
+        chan.sort()
+        self._current_activation_config = chan
+
+        self._current_pb_waveform_theoretical = self._convert_runs_to_pb_sequence(run_lengths,
+                                                                                  digital_states)
+        self._current_pb_waveform_name = name
+        self._current_pb_waveform = self._correct_sequence_for_delays(self._current_pb_waveform_theoretical)
+        self.write_pulse_form(self._current_pb_waveform)
+        self.log.debug('Waveform written in PulseBlaster with name "{0}" '
+                       'and a total length of {1} sequence '
+                       'entries.'.format(self._current_pb_waveform_name,
+                                          len(self._current_pb_waveform)))
+
+        return int(run_lengths.sum()), [self._current_pb_waveform_name]
 
     def write_sequence(self, name, sequence_parameters):
         """
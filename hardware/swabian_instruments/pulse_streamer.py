@@ -220,6 +220,9 @@ class PulseStreamer(Base, PulserInterface):
         activation_config['all'] = frozenset({'d_ch1', 'd_ch2', 'd_ch3', 'd_ch4', 'd_ch5', 'd_ch6', 'd_ch7', 'd_ch8'})
         constraints.activation_config = activation_config
 
+        # pulse patterns can be written directly from runs of constant channel states
+        constraints.run_length_waveforms = True
+
         return constraints
 
     
@@ -653,24 +656,64 @@ class PulseStreamer(Base, PulserInterface):
             self.__current_waveform = {key:[] for key in digital_samples.keys()}
 
         for channel_number, samples in digital_samples.items():
-            new_channel_indices = np.where(samples[:-1] != samples[1:])[0]
-            new_channel_indices = np.unique(new_channel_indices)
-
-            # add in indices for the start and end of the sequence to simplify iteration
-            new_channel_indices = np.insert(new_channel_indices, 0, [-1])
-            new_channel_indices = np.insert(new_channel_indices, new_channel_indices.size, [samples.shape[0] - 1])
-            pulses = []
-            for new_channel_index in range(1, new_channel_indices.size):
-                pulse = [new_channel_indices[new_channel_index] - new_channel_indices[new_channel_index - 1],
-                         samples[new_channel_indices[new_channel_index - 1] + 1].astype(np.byte)]
-                pulses.append(pulse)
+            if len(samples) == 0:
+                continue
+            # first sample of each pulse (channel state changes)
+            pulse_starts = np.flatnonzero(samples[1:] != samples[:-1]) + 1
+            pulse_starts = np.insert(pulse_starts, 0, 0)
+            durations = np.diff(np.append(pulse_starts, len(samples)))
+            pulses = self._pulse_pattern(durations, samples[pulse_starts])
 
             # extend (as opposed to rewrite) for chunky business
-            #print(pulses)
             self.__current_waveform[channel_number].extend(pulses)
 
         return len(samples), [self.__current_waveform_name]
 
+    def write_run_length_waveform(self, name, run_lengths, digital_states):
+        """
+        Write a new purely digital waveform given as runs of constant channel states instead of
+        sample arrays (run-length encoding).
+
+        @param str name: the name of the waveform to be created
+        @param numpy.ndarray run_lengths: 1D numpy array of type int64 containing the number of
+                                          samples of each run
+        @param dict digital_states: keys are the generic digital channel names (i.e. 'd_ch1') and
+                                    values are 1D numpy arrays of type bool (same length as
+                                    run_lengths) containing the marker state in each run.
+
+        @return (int, list): Number of samples written (-1 indicates failed process) and list of
+                             created waveform names
+        """
+        run_lengths = np.asarray(run_lengths, dtype='int64')
+        self.__current_waveform_name = name
+        self.__current_waveform = dict()
+        for channel_number, states in digital_states.items():
+            states = np.asarray(states, dtype=bool)
+            if len(states) == 0:
+                self.__current_waveform[channel_number] = []
+                continue
+            # merge consecutive runs in which this channel does not change
+            pulse_starts = np.flatnonzero(states[1:] != states[:-1]) + 1
+            pulse_starts = np.insert(pulse_starts, 0, 0)
+            durations = np.add.reduceat(run_lengths, pulse_starts)
+            self.__current_waveform[channel_number] = self._pulse_pattern(durations,
+                                                                          states[pulse_starts])
+        self.__samples_written = int(run_lengths.sum())
+        return self.__samples_written, [self.__current_waveform_name]
+
+    @staticmethod
+    def _pulse_pattern(durations, states):
+        """
+        Pulse pattern of one channel in PulseStreamer format.
+
+        @param numpy.ndarray durations: number of samples (ns) of each pulse
+        @param numpy.ndarray states: bool state of each pulse
+
+        @return list: list of [duration, level] pairs
+        """
+        return [[duration, level] for duration, level in
+                zip(durations.tolist(), states.astype(np.byte).tolist())]
+
 
     
     def write_sequence(self, name, sequence_parameters):
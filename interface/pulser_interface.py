@@ -458,6 +458,26 @@ class PulserInterface(metaclass=InterfaceMetaclass):
         """
         pass
 
+    def write_run_length_waveform(self, name, run_lengths, digital_states):
+        """
+        Write a new purely digital waveform given as runs of constant channel states instead of
+        sample arrays (run-length encoding). Only used by the logic if the constraint
+        run_length_waveforms is True; digital-only devices converting the samples back into
+        durations and states anyway should implement this method and set the constraint.
+
+        @param str name: the name of the waveform to be created
+        @param numpy.ndarray run_lengths: 1D numpy array of type int64 containing the number of
+                                          samples of each run
+        @param dict digital_states: keys are the generic digital channel names (i.e. 'd_ch1') and
+                                    values are 1D numpy arrays of type bool (same length as
+                                    run_lengths) containing the marker state in each run.
+                                    Consecutive runs differ in at least one channel.
+
+        @return (int, list): Number of samples written (-1 indicates failed process) and list of
+                             created waveform names
+        """
+        return -1, list()
+
     @abstract_interface_method
     def write_sequence(self, name, sequence_parameters):
         """
@@ -580,3 +600,6 @@ class PulserConstraints:
 
         self.activation_config = dict()
         self.sequence_option = SequenceOption.OPTIONAL
+        # Digital-only waveforms can be written as runs of constant channel states
+        # (see PulserInterface.write_run_length_waveform)
+        self.run_length_waveforms = False
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains helper functions to fit stacks of traces in worker processes for the Qudi
+FitLogic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import importlib
+import inspect
+import logging
+import os
+import sys
+import types
+import numpy as np
+
+from logic.fast_fitting import fast_fit
+
+# Fit methods of the worker process (set by the pool initializer)
+_worker_fit_methods = None
+
+
+class FitMethods:
+    """
+    Stand-in for FitLogic in the worker processes. It holds the methods imported from the fit
+    method files, so the make_*_fit, make_*_model and estimate_* functions can be called just
+    like in FitLogic.
+    """
+
+    def __init__(self, functions):
+        """
+        @param dict functions: names and functions of all imported fit methods
+        """
+        self.log = logging.getLogger(__name__)
+        for name, function in functions.items():
+            setattr(self, name, types.MethodType(function, self))
+
+
+def _init_worker(paths):
+    """
+    Pool initializer importing the fit methods files and creating the fit methods of the worker
+    process.
+
+    @param list paths: directories containing the fit methods files
+    """
+    global _worker_fit_methods
+    functions = dict()
+    for path in paths:
+        if path not in sys.path:
+            sys.path.append(path)
+        for f in os.listdir(path):
+            if os.path.isfile(os.path.join(path, f)) and f.endswith('.py'):
+                mod = importlib.import_module(f[:-3])
+                for method in dir(mod):
+                    ref = getattr(mod, method)
+                    if callable(ref) and (inspect.ismethod(ref) or inspect.isfunction(ref)):
+                        functions[method] = ref
+    _worker_fit_methods = FitMethods(functions)
+    return
+
+
+def split_traces(number_of_traces, number_of_tasks):
+    """
+    Split the trace indices into at most <number_of_tasks> consecutive ranges of similar size.
+    Consecutive traces are kept together, so warm starts work within each range.
+
+    @param int number_of_traces: number of traces to fit
+    @param int number_of_tasks: maximum number of ranges
+
+    @return list: list of (start, stop) index tuples
+    """
+    number_of_tasks = max(1, min(number_of_tasks, number_of_traces))
+    bounds = np.linspace(0, number_of_traces, number_of_tasks + 1).astype(int)
+    return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def fit_traces(fit_methods, fit_method_name, estimator_name, param_names, x_data, y_data,
+               add_params=None, warm_start=True, fast=False):
+    """
+    Fit a stack of traces one after the other with the same fit function.
+
+    With warm start, the estimator is only used for the first trace and after failed fits.
+    All other traces start from the fit result of the previous trace, which is usually much closer
+    to the optimum for slowly varying traces (e.g. rows of an ODMR matrix or pulsed sweeps).
+
+    @param object fit_methods: FitLogic or FitMethods instance providing the fit methods
+    @param str fit_method_name: name of the make_*_fit method
+    @param str estimator_name: name of the estimate_* method
+    @param list param_names: names of the parameters to return
+    @param numpy.ndarray x_data: 1D x values shared by all traces or 2D x values of each trace
+    @param numpy.ndarray y_data: 2D array of traces with shape (number_of_traces, trace_length)
+    @param Parameters add_params: optional parameters replacing the estimated values
+    @param bool warm_start: start each fit from the result of the previous trace
+    @param bool fast: use the fast least-squares fit (see logic.fast_fitting) where available
+
+    @return tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray): values and errors with shape
+                                                                (number_of_traces, parameters)
+                                                                and success flag of each fit
+    """
+    make_fit = getattr(fit_methods, fit_method_name)
+    fit_function = fit_method_name.split('_', 1)[1].rsplit('_', 1)[0]
+    estimator = getattr(fit_methods, estimator_name)
+    values = np.full((len(y_data), len(param_names)), np.nan)
+    errors = np.full((len(y_data), len(param_names)), np.nan)
+    success = np.zeros(len(y_data), dtype=bool)
+    previous_params = None
+
+    def previous_result_estimator(x_axis, data, params):
+        return 0, previous_params.copy()
+
+    for index, trace in enumerate(y_data):
+        x_axis = x_data if x_data.ndim == 1 else x_data[index]
+        trace_estimator = estimator if previous_params is None else previous_result_estimator
+        try:
+            result = fast_fit(fit_methods, fit_function, trace_estimator, x_axis, trace,
+                              add_params=add_params) if fast else None
+            if result is None:
+                result = make_fit(x_axis=x_axis,
+                                  data=trace,
+                                  estimator=trace_estimator,
+                                  add_params=add_params)
+        except Exception as e:
+            fit_methods.log.warning('Batch fit of trace {0:d} failed: {1}'.format(index, e))
+            previous_params = None
+            continue
+        for param_index, name in enumerate(param_names):
+            if name in result.params:
+                values[index, param_index] = result.params[name].value
+                if result.params[name].stderr is not None:
+                    errors[index, param_index] = result.params[name].stderr
+        success[index] = result.success and np.all(np.isfinite(values[index]))
+        previous_params = result.params if warm_start and success[index] else None
+    return values, errors, success
+
+
+def fit_traces_in_worker(*args):
+    """
+    Fit a stack of traces in a worker process with the fit methods created by the initializer.
+    See fit_traces for the arguments.
+    """
+    return fit_traces(_worker_fit_methods, *args)
@@ -24,12 +24,17 @@ from collections import OrderedDict
 from copy import copy
 import time
 import datetime
+import queue
+import threading
+import os
 import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 
 from logic.generic_logic import GenericLogic
+from core.util.array_store import ChunkedArrayStore
 from core.util.mutex import Mutex
+from core.configoption import ConfigOption
 from core.connector import Connector
 from core.statusvariable import StatusVar
 
@@ -44,12 +49,21 @@ class OldConfigFileError(Exception):
 class ConfocalHistoryEntry(QtCore.QObject):
     """ This class contains all relevant parameters of a Confocal scan.
         It provides methods to extract, restore and serialize this data.
+
+        The images are not kept in the entry but in the history store of the confocal logic
+        (see ChunkedArrayStore). The entry only holds the references and loads the images when it
+        is restored.
     """
 
     def __init__(self, confocal):
         """ Make a confocal data setting with default values. """
         super().__init__()
 
+        self._image_store = confocal.history_store
+        self.log = confocal.log
+        self.xy_image_ref = None
+        self.depth_image_ref = None
+
         self.depth_scan_dir_is_xz = True
         self.depth_img_is_xz = True
 
@@ -131,21 +145,38 @@ class ConfocalHistoryEntry(QtCore.QObject):
         confocal._scanning_device.tiltcorrection = self.tilt_correction
 
         confocal.initialize_image()
-        try:
-            if confocal.xy_image.shape == self.xy_image.shape:
-                confocal.xy_image = np.copy(self.xy_image)
-        except AttributeError:
-            self.xy_image = np.copy(confocal.xy_image)
+        xy_image = self._load_image(self.xy_image_ref)
+        if xy_image is None:
+            self.xy_image_ref = self._image_store.put(confocal.xy_image)
+        elif confocal.xy_image.shape == xy_image.shape:
+            confocal.xy_image = xy_image
 
         confocal._zscan = True
         confocal.initialize_image()
-        try:
-            if confocal.depth_image.shape == self.depth_image.shape:
-                confocal.depth_image = np.copy(self.depth_image)
-        except AttributeError:
-            self.depth_image = np.copy(confocal.depth_image)
+        depth_image = self._load_image(self.depth_image_ref)
+        if depth_image is None:
+            self.depth_image_ref = self._image_store.put(confocal.depth_image)
+        elif confocal.depth_image.shape == depth_image.shape:
+            confocal.depth_image = depth_image
         confocal._zscan = False
 
+    def _load_image(self, reference):
+        """ Load an image from the history store.
+
+        @param dict reference: image reference of the history store or None
+
+        @return numpy.ndarray: the image or None if not available
+        """
+        if reference is None:
+            return None
+        try:
+            return self._image_store.get(reference)
+        except (OSError, ValueError, KeyError, TypeError):
+            self.log.warning('Confocal history image could not be loaded from the history cache '
+                             'in {0}. Starting with an empty image.'
+                             ''.format(self._image_store.directory))
+            return None
+
     def snapshot(self, confocal):
         """ Extract all necessary data from a confocal logic and keep it for later use """
         self.current_x = confocal._current_x
@@ -172,8 +203,8 @@ class ConfocalHistoryEntry(QtCore.QObject):
         self.point1 = np.copy(confocal.point1)
         self.point2 = np.copy(confocal.point2)
         self.point3 = np.copy(confocal.point3)
-        self.xy_image = np.copy(confocal.xy_image)
-        self.depth_image = np.copy(confocal.depth_image)
+        self.xy_image_ref = self._image_store.put(confocal.xy_image)
+        self.depth_image_ref = self._image_store.put(confocal.depth_image)
 
     def serialize(self):
         """ Give out a dictionary that can be saved via the usual means """
@@ -197,8 +228,8 @@ class ConfocalHistoryEntry(QtCore.QObject):
         serialized['tilt_point3'] = list(self.point3)
         serialized['tilt_reference'] = [self.tilt_reference_x, self.tilt_reference_y]
         serialized['tilt_slope'] = [self.tilt_slope_x, self.tilt_slope_y]
-        serialized['xy_image'] = self.xy_image
-        serialized['depth_image'] = self.depth_image
+        serialized['xy_image_ref'] = self.xy_image_ref
+        serialized['depth_image_ref'] = self.depth_image_ref
         return serialized
 
     def deserialize(self, serialized):
@@ -236,17 +267,29 @@ class ConfocalHistoryEntry(QtCore.QObject):
             self.point2 = np.array(serialized['tilt_point2'])
         if 'tilt_point3' in serialized and len(serialized['tilt_point3']) == 3:
             self.point3 = np.array(serialized['tilt_point3'])
-        if 'xy_image' in serialized:
+        if 'xy_image_ref' in serialized:
+            self.xy_image_ref = serialized['xy_image_ref']
+        elif 'xy_image' in serialized:
+            # history saved with the images, move them to the history cache
             if isinstance(serialized['xy_image'], np.ndarray):
-                self.xy_image = serialized['xy_image']
+                self.xy_image_ref = self._image_store.put(serialized['xy_image'])
             else:
                 raise OldConfigFileError()
-        if 'depth_image' in serialized:
+        if 'depth_image_ref' in serialized:
+            self.depth_image_ref = serialized['depth_image_ref']
+        elif 'depth_image' in serialized:
             if isinstance(serialized['depth_image'], np.ndarray):
-                self.depth_image = serialized['depth_image'].copy()
+                self.depth_image_ref = self._image_store.put(serialized['depth_image'])
             else:
                 raise OldConfigFileError()
 
+    def image_references(self):
+        """ References of the images of this entry in the history cache.
+
+        @return list: xy and depth image references (None if not stored)
+        """
+        return [self.xy_image_ref, self.depth_image_ref]
+
 
 class ConfocalLogic(GenericLogic):
     """
@@ -257,10 +300,18 @@ class ConfocalLogic(GenericLogic):
     confocalscanner1 = Connector(interface='ConfocalScannerInterface')
     savelogic = Connector(interface='SaveLogic')
 
+    # Optional directory of the on-disk cache holding the images of the scan history. If not
+    # given, a directory in the application status directory is used.
+    history_cache_dir = ConfigOption('history_cache_dir', None, missing='nothing')
+
     # status vars
     _clock_frequency = StatusVar('clock_frequency', 500)
     return_slowness = StatusVar(default=50)
     max_history_length = StatusVar(default=10)
+    # record counts on forward and backward sweeps (snake scan) instead of returning to line start
+    bidirectional_scan = StatusVar(default=False)
+    # scan lines back to back in a separate thread while the next line is prepared
+    pipelined_scan = StatusVar(default=False)
 
     # signals
     signal_start_scanning = QtCore.Signal(str)
@@ -277,7 +328,9 @@ class ConfocalLogic(GenericLogic):
     signal_tilt_correction_update = QtCore.Signal()
     signal_draw_figure_completed = QtCore.Signal()
     signal_position_changed = QtCore.Signal()
+    signal_line_rate_updated = QtCore.Signal(float)
 
+    _signal_pipelined_line_scanned = QtCore.Signal(int, int, bool, object)
     _signal_save_xy = QtCore.Signal(object, object)
     _signal_save_depth = QtCore.Signal(object, object)
 
@@ -300,6 +353,19 @@ class ConfocalLogic(GenericLogic):
         self.depth_img_is_xz = True
         self.permanent_scan = False
 
+        # scanned lines per second of the current scan
+        self.line_rate = 0.0
+        self._line_rate_start_time = 0
+        self._line_rate_lines = 0
+
+        # thread and job queue of the pipelined scan
+        self._scan_thread = None
+        self._scan_job_queue = None
+        self._queued_line_index = 0
+        # incremented when the pipelined scan thread is stopped, so lines of a stopped scan still
+        # queued in the event loop are not stored in the following scan
+        self._scan_generation = 0
+
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
@@ -311,6 +377,13 @@ class ConfocalLogic(GenericLogic):
         self.y_range = self._scanning_device.get_position_range()[1]
         self.z_range = self._scanning_device.get_position_range()[2]
 
+        # history images are kept in an on-disk cache, the history entries only keep references
+        cache_dir = self.history_cache_dir
+        if cache_dir is None:
+            cache_dir = os.path.join(self._manager.getStatusDir(),
+                                     'confocal_history_{0}'.format(self._name))
+        self.history_store = ChunkedArrayStore(cache_dir)
+
         # restore here ...
         self.history = []
         for i in reversed(range(1, self.max_history_length)):
@@ -338,11 +411,14 @@ class ConfocalLogic(GenericLogic):
             self.history.append(new_state)
 
         self.history_index = len(self.history) - 1
+        self._prune_history_store()
 
         # Sets connections between signals and functions
         self.signal_scan_lines_next.connect(self._scan_line, QtCore.Qt.QueuedConnection)
         self.signal_start_scanning.connect(self.start_scanner, QtCore.Qt.QueuedConnection)
         self.signal_continue_scanning.connect(self.continue_scanner, QtCore.Qt.QueuedConnection)
+        self._signal_pipelined_line_scanned.connect(
+            self._pipelined_line_scanned, QtCore.Qt.QueuedConnection)
 
         self._signal_save_xy.connect(self._save_xy_data, QtCore.Qt.QueuedConnection)
         self._signal_save_depth.connect(self._save_depth_data, QtCore.Qt.QueuedConnection)
@@ -354,6 +430,7 @@ class ConfocalLogic(GenericLogic):
 
         @return int: error code (0:OK, -1:error)
         """
+        self._stop_scan_thread()
         closing_state = ConfocalHistoryEntry(self)
         closing_state.snapshot(self)
         self.history.append(closing_state)
@@ -361,8 +438,21 @@ class ConfocalLogic(GenericLogic):
         for state in reversed(self.history):
             self._statusVariables['history_{0}'.format(histindex)] = state.serialize()
             histindex += 1
+        self._prune_history_store()
         return 0
 
+    def _prune_history_store(self):
+        """ Remove all images from the history cache which are not used by the history any more.
+        """
+        references = list()
+        for state in self.history:
+            references.extend(state.image_references())
+        try:
+            self.history_store.prune(references)
+        except OSError:
+            self.log.warning('Cleaning up the confocal history cache in {0} failed.'
+                             ''.format(self.history_store.directory))
+
     def switch_hardware(self, to_on=False):
         """ Switches the Hardware off or on.
 
@@ -389,6 +479,34 @@ class ConfocalLogic(GenericLogic):
         else:
             return 0
 
+    def set_bidirectional_scan(self, enabled):
+        """Enables or disables the bidirectional (snake) scan. Every second line is scanned
+        backwards and reversed when stored in the image, so no return sweeps are needed.
+
+        @param bool enabled: bidirectional scan if True, unidirectional scan if False
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self.module_state() == 'locked':
+            self.log.error('Can not change the scan direction mode while scanning.')
+            return -1
+        self.bidirectional_scan = bool(enabled)
+        return 0
+
+    def set_pipelined_scan(self, enabled):
+        """Enables or disables the pipelined scan. The lines are scanned back to back in a
+        separate thread while the next line is prepared and the last one is stored.
+
+        @param bool enabled: pipelined scan if True, one line per event loop cycle if False
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self.module_state() == 'locked':
+            self.log.error('Can not change the pipelined scan mode while scanning.')
+            return -1
+        self.pipelined_scan = bool(enabled)
+        return 0
+
     def start_scanning(self, zscan = False, tag='logic'):
         """Starts scanning
 
@@ -595,6 +713,7 @@ class ConfocalLogic(GenericLogic):
             self.set_position('scanner')
             return -1
 
+        self._reset_line_rate()
         self.signal_scan_lines_next.emit()
         return 0
 
@@ -624,6 +743,7 @@ class ConfocalLogic(GenericLogic):
             self.set_position('scanner')
             return -1
 
+        self._reset_line_rate()
         self.signal_scan_lines_next.emit()
         return 0
 
@@ -719,6 +839,7 @@ class ConfocalLogic(GenericLogic):
         # stops scanning
         if self.stopRequested:
             with self.threadlock:
+                self._stop_scan_thread()
                 self.kill_scanner()
                 self.stopRequested = False
                 self.module_state.unlock()
@@ -735,122 +856,269 @@ class ConfocalLogic(GenericLogic):
                 self.history.append(new_history)
                 if len(self.history) > self.max_history_length:
                     self.history.pop(0)
+                    self._prune_history_store()
                 self.history_index = len(self.history) - 1
+                self.log.debug('Scanned {0:d} lines at {1:.2f} lines/s.'.format(
+                    self._line_rate_lines, self.line_rate))
                 return
 
-        image = self.depth_image if self._zscan else self.xy_image
-        n_ch = len(self.get_scanner_axes())
-        s_ch = len(self.get_scanner_count_channels())
-
         try:
-            if self._scan_counter == 0:
-                # make a line from the current cursor position to
-                # the starting position of the first scan line of the scan
-                rs = self.return_slowness
-                lsx = np.linspace(self._current_x, image[self._scan_counter, 0, 0], rs)
-                lsy = np.linspace(self._current_y, image[self._scan_counter, 0, 1], rs)
-                lsz = np.linspace(self._current_z, image[self._scan_counter, 0, 2], rs)
-                if n_ch <= 3:
-                    start_line = np.vstack([lsx, lsy, lsz][0:n_ch])
-                else:
-                    start_line = np.vstack(
-                        [lsx, lsy, lsz, np.ones(lsx.shape) * self._current_a])
-                # move to the start position of the scan, counts are thrown away
-                start_line_counts = self._scanning_device.scan_line(start_line)
-                if np.any(start_line_counts == -1):
-                    self.stopRequested = True
-                    self.signal_scan_lines_next.emit()
-                    return
-
-            # adjust z of line in image to current z before building the line
-            if not self._zscan:
-                z_shape = image[self._scan_counter, :, 2].shape
-                image[self._scan_counter, :, 2] = self._current_z * np.ones(z_shape)
-
-            # make a line in the scan, _scan_counter says which one it is
-            lsx = image[self._scan_counter, :, 0]
-            lsy = image[self._scan_counter, :, 1]
-            lsz = image[self._scan_counter, :, 2]
-            if n_ch <= 3:
-                line = np.vstack([lsx, lsy, lsz][0:n_ch])
-            else:
-                line = np.vstack(
-                    [lsx, lsy, lsz, np.ones(lsx.shape) * self._current_a])
+            if self.pipelined_scan:
+                if self._scan_thread is None:
+                    self._start_scan_thread()
+                return
 
-            # scan the line in the scan
-            line_counts = self._scanning_device.scan_line(line, pixel_clock=True)
-            if np.any(line_counts == -1):
+            job = self._get_scan_line_job(self._scan_counter)
+            line_counts = self._run_scan_line_job(job)
+            if line_counts is None:
                 self.stopRequested = True
                 self.signal_scan_lines_next.emit()
                 return
 
+            # update image with counts from the line we just scanned
+            self._store_line_counts(job['index'], line_counts, job['reverse'])
+
+            # next line in scan
+            self._next_scan_line()
+            self.signal_scan_lines_next.emit()
+        except:
+            self.log.exception('The scan went wrong, killing the scanner.')
+            self.stop_scanning()
+            self.signal_scan_lines_next.emit()
+
+    def _get_scanner_path(self, x, y, z):
+        """ Stack the positions of a scanner path for the axes of the scanning device.
+
+        @param numpy.ndarray x: x positions
+        @param numpy.ndarray y: y positions (same length as x)
+        @param numpy.ndarray z: z positions (same length as x)
+
+        @return numpy.ndarray: path with one row per scanner axis
+        """
+        n_ch = len(self.get_scanner_axes())
+        if n_ch <= 3:
+            return np.vstack([x, y, z][0:n_ch])
+        return np.vstack([x, y, z, np.full(np.shape(x), self._current_a)])
+
+    def _get_scan_line_job(self, line_index):
+        """ Prepare the scanner paths to scan one line of the image.
+
+        @param int line_index: index of the image line
+
+        @return dict: 'index': the line index,
+                      'reverse': True if the line is scanned backwards (bidirectional scan),
+                      'start_path': ramp to the start of the first line (counts are thrown away)
+                                    or None,
+                      'line_path': the pixel positions in scan order,
+                      'return_path': ramp back to the start of the next line (counts are thrown
+                                     away) or None for the bidirectional scan
+        """
+        image = self.depth_image if self._zscan else self.xy_image
+
+        # adjust z of line in image to current z before building the line
+        if not self._zscan:
+            image[line_index, :, 2] = self._current_z
+
+        reverse = self.bidirectional_scan and line_index % 2 == 1
+        pixels = image[line_index, ::-1] if reverse else image[line_index]
+        line_path = self._get_scanner_path(pixels[:, 0], pixels[:, 1], pixels[:, 2])
+
+        start_path = None
+        if line_index == 0:
+            # make a line from the current cursor position to
+            # the starting position of the first scan line of the scan
+            rs = self.return_slowness
+            start_path = self._get_scanner_path(np.linspace(self._current_x, image[0, 0, 0], rs),
+                                                np.linspace(self._current_y, image[0, 0, 1], rs),
+                                                np.linspace(self._current_z, image[0, 0, 2], rs))
+
+        return_path = None
+        if not self.bidirectional_scan:
             # make a line to go to the starting position of the next scan line
             if self.depth_img_is_xz or not self._zscan:
-                if n_ch <= 3:
-                    return_line = np.vstack([
-                        self._return_XL,
-                        image[self._scan_counter, 0, 1] * np.ones(self._return_XL.shape),
-                        image[self._scan_counter, 0, 2] * np.ones(self._return_XL.shape)
-                    ][0:n_ch])
-                else:
-                    return_line = np.vstack([
-                            self._return_XL,
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_XL.shape),
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_XL.shape),
-                            np.ones(self._return_XL.shape) * self._current_a
-                        ])
+                return_path = self._get_scanner_path(
+                    self._return_XL,
+                    np.full(self._return_XL.shape, image[line_index, 0, 1]),
+                    np.full(self._return_XL.shape, image[line_index, 0, 2]))
             else:
-                if n_ch <= 3:
-                    return_line = np.vstack([
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_YL.shape),
-                            self._return_YL,
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_YL.shape)
-                        ][0:n_ch])
-                else:
-                    return_line = np.vstack([
-                            image[self._scan_counter, 0, 1] * np.ones(self._return_YL.shape),
-                            self._return_YL,
-                            image[self._scan_counter, 0, 2] * np.ones(self._return_YL.shape),
-                            np.ones(self._return_YL.shape) * self._current_a
-                        ])
+                return_path = self._get_scanner_path(
+                    np.full(self._return_YL.shape, image[line_index, 0, 0]),
+                    self._return_YL,
+                    np.full(self._return_YL.shape, image[line_index, 0, 2]))
+
+        return {'index': line_index,
+                'reverse': reverse,
+                'start_path': start_path,
+                'line_path': line_path,
+                'return_path': return_path}
 
+    def _run_scan_line_job(self, job):
+        """ Scan the paths of a line job (see _get_scan_line_job) with the scanning device.
+
+        @param dict job: the line job
+
+        @return numpy.ndarray: the counts of the line in scan order or None if scanning failed
+        """
+        if job['start_path'] is not None:
+            # move to the start position of the scan, counts are thrown away
+            start_line_counts = self._scanning_device.scan_line(job['start_path'])
+            if np.any(start_line_counts == -1):
+                return None
+
+        # scan the line in the scan
+        line_counts = self._scanning_device.scan_line(job['line_path'], pixel_clock=True)
+        if np.any(line_counts == -1):
+            return None
+
+        if job['return_path'] is not None:
             # return the scanner to the start of next line, counts are thrown away
-            return_line_counts = self._scanning_device.scan_line(return_line)
+            return_line_counts = self._scanning_device.scan_line(job['return_path'])
             if np.any(return_line_counts == -1):
-                self.stopRequested = True
-                self.signal_scan_lines_next.emit()
-                return
+                return None
+        return line_counts
 
-            # update image with counts from the line we just scanned
-            if self._zscan:
-                if self.depth_img_is_xz:
-                    self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
+    def _store_line_counts(self, line_index, line_counts, reverse=False):
+        """ Write the counts of a scanned line into the image and update the line rate.
+
+        @param int line_index: index of the image line
+        @param numpy.ndarray line_counts: counts of the line in scan order
+        @param bool reverse: True if the line was scanned backwards
+        """
+        s_ch = len(self.get_scanner_count_channels())
+        if reverse:
+            line_counts = line_counts[::-1]
+        if self._zscan:
+            self.depth_image[line_index, :, 3:3 + s_ch] = line_counts
+            self.signal_depth_image_updated.emit()
+        else:
+            self.xy_image[line_index, :, 3:3 + s_ch] = line_counts
+            self.signal_xy_image_updated.emit()
+
+        self._line_rate_lines += 1
+        elapsed = time.time() - self._line_rate_start_time
+        if elapsed > 0:
+            self.line_rate = self._line_rate_lines / elapsed
+            self.signal_line_rate_updated.emit(self.line_rate)
+        return
+
+    def _reset_line_rate(self):
+        self.line_rate = 0.0
+        self._line_rate_lines = 0
+        self._line_rate_start_time = time.time()
+        return
+
+    def _next_scan_line(self):
+        """ Advance the scan counter to the next line. Stops the scan after the last line (or
+        starts over for a permanent scan).
+        """
+        self._scan_counter += 1
+
+        # stop scanning when last line scan was performed and makes scan not continuable
+        if self._scan_counter >= np.size(self._image_vert_axis):
+            if not self.permanent_scan:
+                self.stop_scanning()
+                if self._zscan:
+                    self._zscan_continuable = False
                 else:
-                    self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
-                self.signal_depth_image_updated.emit()
+                    self._xyscan_continuable = False
             else:
-                self.xy_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
-                self.signal_xy_image_updated.emit()
+                self._scan_counter = 0
+        return
 
-            # next line in scan
-            self._scan_counter += 1
-
-            # stop scanning when last line scan was performed and makes scan not continuable
-            if self._scan_counter >= np.size(self._image_vert_axis):
-                if not self.permanent_scan:
-                    self.stop_scanning()
-                    if self._zscan:
-                        self._zscan_continuable = False
-                    else:
-                        self._xyscan_continuable = False
-                else:
-                    self._scan_counter = 0
+    def _start_scan_thread(self):
+        """ Start the thread of the pipelined scan and queue the first two lines. While a line is
+        scanned, the following line is already waiting in the queue.
+        """
+        self._scan_job_queue = queue.Queue()
+        self._scan_thread = threading.Thread(target=self._scan_line_worker,
+                                             args=(self._scan_generation,),
+                                             name='confocal scan lines',
+                                             daemon=True)
+        self._scan_thread.start()
+        self._queued_line_index = self._scan_counter
+        self._scan_job_queue.put(self._get_scan_line_job(self._scan_counter))
+        self._queue_next_scan_line()
+        return
 
-            self.signal_scan_lines_next.emit()
+    def _queue_next_scan_line(self):
+        """ Prepare the line following the last queued line and add it to the job queue. """
+        next_index = self._queued_line_index + 1
+        if next_index >= np.size(self._image_vert_axis):
+            if not self.permanent_scan:
+                return
+            next_index = 0
+        self._queued_line_index = next_index
+        self._scan_job_queue.put(self._get_scan_line_job(next_index))
+        return
+
+    def _stop_scan_thread(self):
+        """ Remove all queued lines and wait for the thread of the pipelined scan to finish the
+        current line.
+        """
+        if self._scan_thread is None:
+            return
+        try:
+            while True:
+                self._scan_job_queue.get_nowait()
+        except queue.Empty:
+            pass
+        self._scan_job_queue.put(None)
+        self._scan_thread.join()
+        self._scan_thread = None
+        self._scan_job_queue = None
+        self._scan_generation += 1
+        return
+
+    def _scan_line_worker(self, generation):
+        """ Target of the pipelined scan thread. Scans the queued lines back to back until None is
+        received or scanning fails.
+
+        @param int generation: scan generation the scanned lines are tagged with
+        """
+        while True:
+            job = self._scan_job_queue.get()
+            if job is None:
+                break
+            try:
+                line_counts = self._run_scan_line_job(job)
+            except:
+                self.log.exception('The scan went wrong, killing the scanner.')
+                line_counts = None
+            self._signal_pipelined_line_scanned.emit(generation, job['index'], job['reverse'],
+                                                     line_counts)
+            if line_counts is None:
+                break
+        return
+
+    def _pipelined_line_scanned(self, generation, line_index, reverse, line_counts):
+        """ Store a line scanned by the pipelined scan thread and queue the next line.
+
+        @param int generation: scan generation of the thread which scanned the line
+        @param int line_index: index of the image line
+        @param bool reverse: True if the line was scanned backwards
+        @param numpy.ndarray line_counts: counts of the line in scan order, None if scanning failed
+        """
+        # Lines finished after their scan thread has been stopped are discarded, also if a new
+        # scan has been started in the meantime
+        if self._scan_thread is None or generation != self._scan_generation:
+            return
+        try:
+            if line_counts is None:
+                self.stopRequested = True
+                self.signal_scan_lines_next.emit()
+                return
+
+            self._store_line_counts(line_index, line_counts, reverse)
+            self._next_scan_line()
+            if self.stopRequested:
+                self.signal_scan_lines_next.emit()
+            else:
+                self._queue_next_scan_line()
         except:
             self.log.exception('The scan went wrong, killing the scanner.')
             self.stop_scanning()
             self.signal_scan_lines_next.emit()
+        return
 
     def save_xy_data(self, colorscale_range=None, percentile_range=None, block=True):
         """ Save the current confocal xy data to file.
@@ -30,6 +30,8 @@ from core.statusvariable import StatusVar
 from logic.generic_logic import GenericLogic
 from interface.slow_counter_interface import CountingMode
 from core.util.mutex import Mutex
+from core.util.ring_buffer import SampleBuffer
+from core.util.running_statistics import CountTraceStatistics
 
 
 class CounterLogic(GenericLogic):
@@ -112,11 +114,9 @@ class CounterLogic(GenericLogic):
         number_of_detectors = constraints.max_detectors
 
         # initialize data arrays
-        self.countdata = np.zeros([len(self.get_channels()), self._count_length])
-        self.countdata_smoothed = np.zeros([len(self.get_channels()), self._count_length])
-        self.rawdata = np.zeros([len(self.get_channels()), self._counting_samples])
+        self._init_data_buffers()
+        self.rawdata = np.zeros([self._number_of_channels, self._counting_samples])
         self._already_counted_samples = 0  # For gated counting
-        self._data_to_save = []
 
         # Flag to stop the loop
         self.stopRequested = False
@@ -140,6 +140,40 @@ class CounterLogic(GenericLogic):
         self.sigCountDataNext.disconnect()
         return
 
+    def _init_data_buffers(self):
+        """ Set up the count trace with its statistics and the buffer of samples to save.
+        """
+        self._number_of_channels = len(self.get_channels())
+        self._count_statistics = CountTraceStatistics(self._number_of_channels,
+                                                      self._count_length,
+                                                      self._smooth_window_length)
+        # rows of timestamp and counts of each channel
+        self._data_to_save = SampleBuffer(self._number_of_channels + 1)
+        return
+
+    @property
+    def countdata(self):
+        """ Copy of the count trace of each channel (oldest sample first) with shape
+        (channels, count_length). A copy, since the GUI thread reads it while it is written.
+        """
+        return self._count_statistics.trace.get_view().copy()
+
+    @property
+    def countdata_smoothed(self):
+        """ Copy of the median smoothed count trace of each channel with shape
+        (channels, count_length).
+        """
+        return self._count_statistics.smoothed_trace.get_view().copy()
+
+    def get_count_statistics(self):
+        """ Running statistics of the counts since the counter was started.
+
+        @return tuple(numpy.ndarray, numpy.ndarray, int): mean and standard deviation of each
+                                                          channel and number of samples
+        """
+        statistics = self._count_statistics.statistics
+        return statistics.mean, statistics.std, statistics.count
+
     def get_hardware_constraints(self):
         """
         Retrieve the hardware constrains from the counter device.
@@ -263,7 +297,7 @@ class CounterLogic(GenericLogic):
         @return bool: saving state
         """
         if not resume:
-            self._data_to_save = []
+            self._data_to_save.clear()
             self._saving_start_time = time.time()
 
         self._saving = True
@@ -308,11 +342,11 @@ class CounterLogic(GenericLogic):
             for i, detector in enumerate(self.get_channels()):
                 header = header + ',Signal{0} (counts/s)'.format(i)
 
-            data = {header: self._data_to_save}
+            data = {header: self._data_to_save.get_view()}
             filepath = self._save_logic.get_path_for_module(module_name='Counter')
 
             if save_figure:
-                fig = self.draw_figure(data=np.array(self._data_to_save))
+                fig = self.draw_figure(data=self._data_to_save.get_view())
             else:
                 fig = None
             self._save_logic.save_data(data, filepath=filepath, parameters=parameters,
@@ -320,7 +354,7 @@ class CounterLogic(GenericLogic):
             self.log.info('Counter Trace saved to:\n{0}'.format(filepath))
 
         self.sigSavingStatusChanged.emit(self._saving)
-        return self._data_to_save, parameters
+        return self._data_to_save.get_view(), parameters
 
     def draw_figure(self, data):
         """ Draw figure to save with data file.
@@ -424,11 +458,12 @@ class CounterLogic(GenericLogic):
                 self.sigCountStatusChanged.emit(False)
                 return -1
 
-            # initialising the data arrays
-            self.rawdata = np.zeros([len(self.get_channels()), self._counting_samples])
-            self.countdata = np.zeros([len(self.get_channels()), self._count_length])
-            self.countdata_smoothed = np.zeros([len(self.get_channels()), self._count_length])
-            self._sampling_data = np.empty([len(self.get_channels()), self._counting_samples])
+            # initialising the data arrays, the samples to save are kept when resuming to save
+            saved_data = self._data_to_save
+            self._init_data_buffers()
+            if saved_data.number_of_columns == self._data_to_save.number_of_columns:
+                self._data_to_save = saved_data
+            self.rawdata = np.zeros([self._number_of_channels, self._counting_samples])
 
             # the sample index for gated counting
             self._already_counted_samples = 0
@@ -553,39 +588,12 @@ class CounterLogic(GenericLogic):
         Processes the raw data from the counting device
         @return:
         """
-        for i, ch in enumerate(self.get_channels()):
-            # remember the new count data in circular array
-            self.countdata[i, 0] = np.average(self.rawdata[i])
-        # move the array to the left to make space for the new data
-        self.countdata = np.roll(self.countdata, -1, axis=1)
-        # also move the smoothing array
-        self.countdata_smoothed = np.roll(self.countdata_smoothed, -1, axis=1)
-        # calculate the median and save it
-        window = -int(self._smooth_window_length / 2) - 1
-        for i, ch in enumerate(self.get_channels()):
-            self.countdata_smoothed[i, window:] = np.median(self.countdata[i,
-                                                            -self._smooth_window_length:])
+        # add the averaged samples to the count trace, smoothed trace and statistics
+        self._count_statistics.add(self.rawdata.mean(axis=1))
 
         # save the data if necessary
         if self._saving:
-             # if oversampling is necessary
-            if self._counting_samples > 1:
-                chans = self.get_channels()
-                self._sampling_data = np.empty([len(chans) + 1, self._counting_samples])
-                self._sampling_data[0, :] = time.time() - self._saving_start_time
-                for i, ch in enumerate(chans):
-                    self._sampling_data[i+1, 0] = self.rawdata[i]
-
-                self._data_to_save.extend(list(self._sampling_data))
-            # if we don't want to use oversampling
-            else:
-                # append tuple to data stream (timestamp, average counts)
-                chans = self.get_channels()
-                newdata = np.empty((len(chans) + 1, ))
-                newdata[0] = time.time() - self._saving_start_time
-                for i, ch in enumerate(chans):
-                    newdata[i+1] = self.countdata[i, -1]
-                self._data_to_save.append(newdata)
+            self._save_samples()
         return
 
     def _process_data_gated(self):
@@ -593,29 +601,27 @@ class CounterLogic(GenericLogic):
         Processes the raw data from the counting device
         @return:
         """
-        # remember the new count data in circular array
-        self.countdata[0] = np.average(self.rawdata[0])
-        # move the array to the left to make space for the new data
-        self.countdata = np.roll(self.countdata, -1)
-        # also move the smoothing array
-        self.countdata_smoothed = np.roll(self.countdata_smoothed, -1)
-        # calculate the median and save it
-        self.countdata_smoothed[-int(self._smooth_window_length / 2) - 1:] = np.median(
-            self.countdata[-self._smooth_window_length:])
+        # gated counting handles each readout of the gated samples like a continuous sample
+        self._process_data_continous()
+        return
 
-        # save the data if necessary
-        if self._saving:
-            # if oversampling is necessary
-            if self._counting_samples > 1:
-                self._sampling_data = np.empty((self._counting_samples, 2))
-                self._sampling_data[:, 0] = time.time() - self._saving_start_time
-                self._sampling_data[:, 1] = self.rawdata[0]
-                self._data_to_save.extend(list(self._sampling_data))
-            # if we don't want to use oversampling
-            else:
-                # append tuple to data stream (timestamp, average counts)
-                self._data_to_save.append(np.array((time.time() - self._saving_start_time,
-                                                    self.countdata[-1])))
+    def _save_samples(self):
+        """ Append the timestamp and counts of the last readout to the samples to save.
+        """
+        timestamp = time.time() - self._saving_start_time
+        # if oversampling is necessary, all samples of the readout get the same timestamp
+        if self._counting_samples > 1:
+            rows = np.empty((self.rawdata.shape[1], self._number_of_channels + 1))
+            rows[:, 0] = timestamp
+            rows[:, 1:] = self.rawdata.transpose()
+            self._data_to_save.extend(rows)
+        # if we don't want to use oversampling
+        else:
+            # append tuple to data stream (timestamp, average counts)
+            row = np.empty(self._number_of_channels + 1)
+            row[0] = timestamp
+            row[1:] = self._count_statistics.trace.get_view()[:, -1]
+            self._data_to_save.append(row)
         return
 
     def _process_data_finite_gated(self):
@@ -623,19 +629,17 @@ class CounterLogic(GenericLogic):
         Processes the raw data from the counting device
         @return:
         """
-        if self._already_counted_samples+len(self.rawdata[0]) >= len(self.countdata):
-            needed_counts = len(self.countdata) - self._already_counted_samples
-            self.countdata[0:needed_counts] = self.rawdata[0][0:needed_counts]
-            self.countdata = np.roll(self.countdata, -needed_counts)
+        new_samples = self.rawdata.shape[1]
+        if self._already_counted_samples + new_samples >= self._count_statistics.trace.length:
+            needed_counts = self._count_statistics.trace.length - self._already_counted_samples
+            self._count_statistics.add_samples(self.rawdata[:, :needed_counts])
             self._already_counted_samples = 0
             self.stopRequested = True
         else:
-            # replace the first part of the array with the new data:
-            self.countdata[0:len(self.rawdata[0])] = self.rawdata[0]
-            # roll the array by the amount of data it had been inserted:
-            self.countdata = np.roll(self.countdata, -len(self.rawdata[0]))
+            # append the new samples at the end of the trace
+            self._count_statistics.add_samples(self.rawdata)
             # increment the index counter:
-            self._already_counted_samples += len(self.rawdata[0])
+            self._already_counted_samples += new_samples
         return
 
     def _stopCount_wait(self, timeout=5.0):
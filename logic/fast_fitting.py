@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the fast least-squares fits with analytic jacobians for the Qudi FitLogic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+from scipy.optimize import least_squares
+
+
+############################################################################
+#                                                                          #
+#                     Model functions and jacobians                        #
+#                                                                          #
+############################################################################
+
+class FastModel:
+    """
+    Vectorized model function with its analytic jacobian. The parameter names are the names of
+    the corresponding lmfit model. The jacobian has the shape (len(x), len(param_names)).
+    """
+
+    def __init__(self, param_names, function, jacobian):
+        self.param_names = tuple(param_names)
+        self.function = function
+        self.jacobian = jacobian
+
+
+def _make_peaks_model(prefixes, peak):
+    """
+    Sum of peaks with amplitude, center and sigma (and a common offset).
+
+    @param list prefixes: parameter prefix of each peak
+    @param function peak: function(x, center, sigma) returning the peak shape with unit height and
+                          its derivatives with respect to center and sigma
+
+    @return FastModel: model of the sum of peaks
+    """
+    param_names = [prefix + name for prefix in prefixes for name in ('amplitude', 'center', 'sigma')]
+    param_names.append('offset')
+
+    def function(x, p):
+        y = np.full(x.shape, p[-1])
+        for index in range(0, len(p) - 1, 3):
+            y += p[index] * peak(x, p[index + 1], p[index + 2])[0]
+        return y
+
+    def jacobian(x, p):
+        jac = np.empty((x.size, len(p)))
+        for index in range(0, len(p) - 1, 3):
+            shape, d_center, d_sigma = peak(x, p[index + 1], p[index + 2])
+            jac[:, index] = shape
+            jac[:, index + 1] = p[index] * d_center
+            jac[:, index + 2] = p[index] * d_sigma
+        jac[:, -1] = 1
+        return jac
+
+    return FastModel(param_names, function, jacobian)
+
+
+def _lorentzian_peak(x, center, sigma):
+    """ Lorentzian with unit height, see physical_lorentzian, and its derivatives. """
+    diff = center - x
+    denominator = diff ** 2 + sigma ** 2
+    shape = sigma ** 2 / denominator
+    return (shape,
+            -2 * sigma ** 2 * diff / denominator ** 2,
+            2 * sigma * diff ** 2 / denominator ** 2)
+
+
+def _gaussian_peak(x, center, sigma):
+    """ Gaussian with unit height, see physical_gauss, and its derivatives. """
+    diff = center - x
+    shape = np.exp(-diff ** 2 / (2 * sigma ** 2))
+    return shape, -shape * diff / sigma ** 2, shape * diff ** 2 / sigma ** 3
+
+
+def _stretched_decay(x, beta, lifetime):
+    """
+    Stretched exponential decay exp(-(x/lifetime)^beta) and its derivatives with respect to beta
+    and lifetime.
+    """
+    scaled = x / lifetime
+    power = np.power(scaled, beta)
+    decay = np.exp(-power)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_scaled = np.where(scaled > 0, np.log(np.abs(scaled)), 0)
+    return decay, -decay * power * log_scaled, decay * power * beta / lifetime
+
+
+def _make_decay_model():
+    """ amplitude * exp(-(x/lifetime)^beta) + offset """
+    param_names = ('amplitude', 'beta', 'lifetime', 'offset')
+
+    def function(x, p):
+        return p[0] * _stretched_decay(x, p[1], p[2])[0] + p[3]
+
+    def jacobian(x, p):
+        decay, d_beta, d_lifetime = _stretched_decay(x, p[1], p[2])
+        return np.column_stack((decay, p[0] * d_beta, p[0] * d_lifetime, np.ones(x.size)))
+
+    return FastModel(param_names, function, jacobian)
+
+
+def _make_sine_model(with_decay):
+    """
+    amplitude * sin(2*pi*frequency*x + phase) + offset, optionally multiplied with a (stretched)
+    exponential decay exp(-(x/lifetime)^beta)
+    """
+    param_names = ['amplitude', 'frequency', 'phase', 'offset']
+    if with_decay:
+        param_names[3:3] = ['beta', 'lifetime']
+
+    def function(x, p):
+        y = p[0] * np.sin(2 * np.pi * p[1] * x + p[2])
+        if with_decay:
+            y *= _stretched_decay(x, p[3], p[4])[0]
+        return y + p[-1]
+
+    def jacobian(x, p):
+        argument = 2 * np.pi * p[1] * x + p[2]
+        sine = np.sin(argument)
+        cosine = np.cos(argument)
+        jac = np.empty((x.size, len(p)))
+        if with_decay:
+            decay, d_beta, d_lifetime = _stretched_decay(x, p[3], p[4])
+            jac[:, 3] = p[0] * sine * d_beta
+            jac[:, 4] = p[0] * sine * d_lifetime
+        else:
+            decay = 1
+        jac[:, 0] = sine * decay
+        jac[:, 1] = p[0] * cosine * 2 * np.pi * x * decay
+        jac[:, 2] = p[0] * cosine * decay
+        jac[:, -1] = 1
+        return jac
+
+    return FastModel(param_names, function, jacobian)
+
+
+# Fits with a fast least-squares implementation, by fit name
+FAST_MODELS = {
+    'lorentzian': _make_peaks_model([''], _lorentzian_peak),
+    'lorentziandouble': _make_peaks_model(['l0_', 'l1_'], _lorentzian_peak),
+    'lorentziantriple': _make_peaks_model(['l0_', 'l1_', 'l2_'], _lorentzian_peak),
+    'gaussian': _make_peaks_model([''], _gaussian_peak),
+    'gaussiandouble': _make_peaks_model(['g0_', 'g1_'], _gaussian_peak),
+    'decayexponential': _make_decay_model(),
+    'decayexponentialstretched': _make_decay_model(),
+    'sine': _make_sine_model(with_decay=False),
+    'sineexponentialdecay': _make_sine_model(with_decay=True),
+    'sinestretchedexponentialdecay': _make_sine_model(with_decay=True),
+}
+
+
+############################################################################
+#                                                                          #
+#                          Fast least-squares fit                          #
+#                                                                          #
+############################################################################
+
+class FastFitResult:
+    """
+    Result of a fast fit. It provides the commonly used attributes of lmfit.model.ModelResult:
+    params (lmfit Parameters with fitted values and stderr), success, message, nfev, ndata, nvarys,
+    chisqr, redchi, residual, best_fit, covar and var_names, as well as eval(x=...).
+    """
+
+    def __init__(self, fast_model, params, x_axis, data):
+        self.fast_model = fast_model
+        self.params = params
+        self.x_axis = x_axis
+        self.data = data
+        self.success = False
+        self.message = ''
+        self.nfev = 0
+        self.ndata = data.size
+        self.nvarys = 0
+        self.chisqr = np.nan
+        self.redchi = np.nan
+        self.residual = None
+        self.best_fit = None
+        self.covar = None
+        self.var_names = list()
+
+    @property
+    def values(self):
+        """ Parameter values of the fast model (in the order of fast_model.param_names). """
+        return np.array([self.params[name].value for name in self.fast_model.param_names])
+
+    def eval(self, x=None):
+        """
+        Evaluate the fitted model.
+
+        @param numpy.ndarray x: optional, x values (default: x values of the fit)
+
+        @return numpy.ndarray: model values
+        """
+        x = self.x_axis if x is None else np.asarray(x, dtype=float)
+        return self.fast_model.function(x, self.values)
+
+
+def fast_fit(fit_methods, fit_function, estimator, x_axis, data, add_params=None, **kwargs):
+    """
+    Fit data with the analytic model and jacobian of FAST_MODELS using scipy.optimize.least_squares
+    instead of lmfit.Model.fit. The initial parameters are estimated like in the make_*_fit method,
+    parameters with an expression (e.g. fwhm, contrast) are only evaluated on access.
+
+    @param object fit_methods: FitLogic or stand-in instance providing the fit methods
+    @param str fit_function: name of the fit, e.g. 'lorentzian'
+    @param method estimator: estimator method
+    @param numpy.ndarray x_axis: 1D axis values
+    @param numpy.ndarray data: 1D data
+    @param Parameters or dict add_params: optional parameters replacing the estimated values
+    @param kwargs: additional keyword arguments for scipy.optimize.least_squares
+
+    @return FastFitResult: the fit result or None if the fit has no fast model or if one of its
+                           fitted parameters is constrained by an expression
+    """
+    fast_model = FAST_MODELS.get(fit_function)
+    if fast_model is None:
+        return None
+    x_axis = np.asarray(x_axis, dtype=float)
+    data = np.asarray(data, dtype=float)
+
+    model, params = getattr(fit_methods, 'make_{0}_model'.format(fit_function))()
+    error, params = estimator(x_axis, data, params)
+    params = fit_methods._substitute_params(initial_params=params, update_params=add_params)
+    names = fast_model.param_names
+    if any(name not in params or params[name].expr is not None for name in names):
+        return None
+
+    values = np.array([params[name].value for name in names], dtype=float)
+    lower = np.array([-np.inf if params[name].min is None else params[name].min for name in names])
+    upper = np.array([np.inf if params[name].max is None else params[name].max for name in names])
+    free = np.array([bool(params[name].vary) for name in names])
+
+    result = FastFitResult(fast_model, params, x_axis, data)
+    result.var_names = [name for name, is_free in zip(names, free) if is_free]
+    result.nvarys = int(free.sum())
+
+    def full_values(free_values):
+        full = values.copy()
+        full[free] = free_values
+        return full
+
+    def residual(free_values):
+        return fast_model.function(x_axis, full_values(free_values)) - data
+
+    def jacobian(free_values):
+        return fast_model.jacobian(x_axis, full_values(free_values))[:, free]
+
+    if result.nvarys > 0:
+        bounded = np.isfinite(lower[free]).any() or np.isfinite(upper[free]).any()
+        if bounded or data.size < result.nvarys:
+            kwargs.setdefault('method', 'trf')
+            kwargs['bounds'] = (lower[free], upper[free])
+        else:
+            kwargs.setdefault('method', 'lm')
+        kwargs.setdefault('x_scale', 'jac')
+        try:
+            solution = least_squares(residual, values[free], jac=jacobian, **kwargs)
+        except (ValueError, np.linalg.LinAlgError) as e:
+            result.message = str(e)
+            return result
+        values[free] = solution.x
+        result.success = bool(solution.success)
+        result.message = solution.message
+        result.nfev = solution.nfev
+        jac = solution.jac
+    else:
+        result.success = True
+        result.message = 'No free parameters.'
+        jac = None
+
+    for name, value in zip(names, values):
+        params[name].value = value
+    result.best_fit = fast_model.function(x_axis, values)
+    result.residual = result.best_fit - data
+    result.chisqr = float(np.sum(result.residual ** 2))
+    result.redchi = result.chisqr / max(1, data.size - result.nvarys)
+
+    # covariance and errors like lmfit: scaled inverse of the curvature matrix
+    if jac is not None:
+        try:
+            result.covar = np.linalg.inv(np.dot(jac.T, jac)) * result.redchi
+        except np.linalg.LinAlgError:
+            result.covar = None
+        if result.covar is not None:
+            errors = np.sqrt(np.abs(np.diag(result.covar)))
+            for name, stderr in zip(result.var_names, errors):
+                params[name].stderr = stderr
+    return result
@@ -23,6 +23,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 import importlib
 import inspect
 import lmfit
+import multiprocessing as mp
 from qtpy import QtCore
 import numpy as np
 import os
@@ -35,6 +36,8 @@ from core.util.modules import get_main_dir
 from core.util.mutex import Mutex
 from core.config import load, save
 from core.configoption import ConfigOption
+from logic.batch_fitting import split_traces, fit_traces, fit_traces_in_worker, _init_worker
+from logic.fast_fitting import fast_fit
 
 
 class FitLogic(GenericLogic):
@@ -55,10 +58,14 @@ class FitLogic(GenericLogic):
                                                    default=None,
                                                    missing='nothing')
 
+    # Optional number of worker processes for batch fits (default: number of CPUs, 1: no workers)
+    _batch_fit_workers = ConfigOption(name='batch_fit_workers', default=None, missing='nothing')
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         # locking for thread safety
         self.lock = Mutex()
+        self._batch_fit_pool = None
 
         filenames = []
         # for path in directories:
@@ -88,6 +95,8 @@ class FitLogic(GenericLogic):
                     filenames.append(f[:-3])
                     if path not in sys.path:
                         sys.path.append(path)
+        # the worker processes of batch fits import the fit methods files from the same paths
+        self._fit_methods_paths = path_list
 
         # A dictionary containing all fit methods and their estimators.
         self.fit_list = OrderedDict()
@@ -177,7 +186,119 @@ class FitLogic(GenericLogic):
 
     def on_deactivate(self):
         """ """
-        pass
+        if self._batch_fit_pool is not None:
+            self._batch_fit_pool.terminate()
+            self._batch_fit_pool.join()
+            self._batch_fit_pool = None
+
+    @property
+    def batch_fit_workers(self):
+        """ Number of worker processes used for batch fits. """
+        if self._batch_fit_workers is None:
+            return mp.cpu_count()
+        return max(1, int(self._batch_fit_workers))
+
+    def do_fast_fit(self, x_data, y_data, fit_function, estimator='generic', add_params=None,
+                    **kwargs):
+        """ Fit a 1D trace with an analytic model and jacobian instead of lmfit.Model.fit.
+
+        Available for the lorentzian, gaussian, (stretched) exponential decay and sine fits (see
+        logic.fast_fitting.FAST_MODELS). Other fits and fits with fitted parameters constrained by
+        an expression are done with the make_*_fit method, so no units or result_str_dict are
+        available for the fast fits.
+
+        @param numpy.ndarray x_data: 1D axis values
+        @param numpy.ndarray y_data: 1D data
+        @param str fit_function: name of the fit function, e.g. 'lorentzian'
+        @param str estimator: name of the estimator, e.g. 'dip' or 'generic'
+        @param Parameters add_params: optional, parameters to use instead of the estimated values
+        @param kwargs: additional keyword arguments for scipy.optimize.least_squares
+
+        @return object result: FastFitResult (or lmfit.model.ModelResult for the fallback) with
+                               params, success, chisqr, best_fit and eval(x=...)
+        """
+        try:
+            fit = self.fit_list['1d'][fit_function]
+            estimator_method = fit[estimator]
+        except KeyError:
+            self.log.error('Unknown fit function "{0}" with estimator "{1}" for fast fit.'
+                           ''.format(fit_function, estimator))
+            return None
+        result = fast_fit(self, fit_function, estimator_method, x_data, y_data,
+                          add_params=add_params, **kwargs)
+        if result is None:
+            result = fit['make_fit'](x_axis=x_data, data=y_data, estimator=estimator_method,
+                                     add_params=add_params)
+        return result
+
+    def do_batch_fit(self, x_data, y_data, fit_function, estimator='generic', add_params=None,
+                     warm_start=True, fast=False):
+        """ Fit a stack of 1D traces with the same fit function, distributed to worker processes.
+
+        @param numpy.ndarray x_data: 1D x values shared by all traces or 2D array with the x values
+                                     of each trace
+        @param numpy.ndarray y_data: 2D array of traces, shape (number_of_traces, trace_length)
+        @param str fit_function: name of the fit function, e.g. 'lorentzian'
+        @param str estimator: name of the estimator, e.g. 'dip' or 'generic'
+        @param Parameters add_params: optional, parameters to use instead of the estimated values
+                                      (e.g. fixed parameters)
+        @param bool warm_start: start each fit from the result of the previous trace instead of
+                                the estimator (the traces are fitted in consecutive ranges)
+        @param bool fast: use the fast least-squares fits where available, see do_fast_fit
+
+        @return tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray):
+            values: structured array with one field for each fit parameter and one entry per trace
+            errors: structured array of the parameter errors (NaN if not available)
+            success: bool array indicating the successful fits
+        """
+        x_data = np.asarray(x_data, dtype=float)
+        y_data = np.asarray(y_data, dtype=float)
+        if y_data.ndim != 2:
+            self.log.error('Batch fit needs a 2D array of traces.')
+            return None, None, None
+        if (x_data.ndim == 1 and x_data.size != y_data.shape[1]) or (
+                x_data.ndim == 2 and x_data.shape != y_data.shape):
+            self.log.error('Shapes of x data {0} and traces {1} do not match for batch fit.'
+                           ''.format(x_data.shape, y_data.shape))
+            return None, None, None
+        try:
+            fit = self.fit_list['1d'][fit_function]
+            make_fit = fit['make_fit']
+            estimator_method = fit[estimator]
+        except KeyError:
+            self.log.error('Unknown fit function "{0}" with estimator "{1}" for batch fit.'
+                           ''.format(fit_function, estimator))
+            return None, None, None
+
+        model, params = fit['make_model']()
+        param_names = list(params.keys())
+        args = (make_fit.__name__, estimator_method.__name__, param_names)
+
+        workers = self.batch_fit_workers
+        if workers < 2 or len(y_data) < 2:
+            values, errors, success = fit_traces(self, *args, x_data, y_data, add_params,
+                                                 warm_start, fast)
+        else:
+            if self._batch_fit_pool is None:
+                # spawn the workers instead of forking the Qt application with its threads
+                self._batch_fit_pool = mp.get_context('spawn').Pool(
+                    processes=workers,
+                    initializer=_init_worker,
+                    initargs=(self._fit_methods_paths,))
+            # more tasks than workers to balance fits of different duration
+            tasks = list()
+            for start, stop in split_traces(len(y_data), 4 * workers):
+                task_x = x_data if x_data.ndim == 1 else x_data[start:stop]
+                tasks.append(args + (task_x, y_data[start:stop], add_params, warm_start, fast))
+            results = self._batch_fit_pool.starmap(fit_traces_in_worker, tasks)
+            values = np.concatenate([result[0] for result in results])
+            errors = np.concatenate([result[1] for result in results])
+            success = np.concatenate([result[2] for result in results])
+
+        dtype = np.dtype([(name, np.float64) for name in param_names])
+        values = np.ascontiguousarray(values).view(dtype).reshape(-1)
+        errors = np.ascontiguousarray(errors).view(dtype).reshape(-1)
+        return values, errors, success
 
     def validate_load_fits(self, fits):
         """ Take fit names and estimators from a dict and check if they are valid.
@@ -462,3 +583,25 @@ class FitContainer(QtCore.QObject):
         self.sigFitUpdated.emit()
 
         return fit_x, fit_y, result
+
+    def do_batch_fit(self, x_data, y_data, warm_start=True, fast=False):
+        """ Performs the chosen fit on a stack of traces, see FitLogic.do_batch_fit.
+
+        @param array x_data: 1D x values shared by all traces or 2D x values of each trace
+        @param array y_data: 2D array of traces, shape (number_of_traces, trace_length)
+        @param bool warm_start: start each fit from the result of the previous trace
+        @param bool fast: use the fast least-squares fits where available
+
+        @return tuple (values, errors, success): structured arrays of the fitted parameter values
+                                                 and errors of each trace and bool array of the
+                                                 successful fits. All None if no fit is chosen.
+        """
+        if self.current_fit not in self.fit_list:
+            if self.current_fit != 'No Fit':
+                self.fit_logic.log.warning('The Fit Function "{0}" is not available for a batch '
+                                           'fit.'.format(self.current_fit))
+            return None, None, None
+        fit = self.fit_list[self.current_fit]
+        return self.fit_logic.do_batch_fit(x_data, y_data, fit['fit_name'], fit['est_name'],
+                                           add_params=self.use_settings, warm_start=warm_start,
+                                           fast=fast)
@@ -31,6 +31,7 @@ import matplotlib.pyplot as plt
 
 from logic.generic_logic import GenericLogic
 from core.util.mutex import Mutex
+from core.util.ring_buffer import SweepRingBuffer
 from core.connector import Connector
 from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
@@ -52,6 +53,11 @@ class ODMRLogic(GenericLogic):
         'LIST',
         missing='warn',
         converter=lambda x: MicrowaveMode[x.upper()])
+    # Optional directory to store raw data lines not held in memory any more. If not given, all
+    # raw data lines are kept in memory: the raw data buffer stores each line twice (for
+    # contiguous views) and doubles its capacity when full, so it can take up to four times the
+    # memory of the acquired raw data. Set this for long measurements with many frequencies.
+    raw_data_spill_dir = ConfigOption('raw_data_spill_dir', None, missing='nothing')
 
     clock_frequency = StatusVar('clock_frequency', 200)
     cw_mw_frequency = StatusVar('cw_mw_frequency', 2870e6)
@@ -128,12 +134,9 @@ class ODMRLogic(GenericLogic):
 
         # Initalize the ODMR data arrays (mean signal and sweep matrix)
         self._initialize_odmr_plots()
-        # Raw data array
-        self.odmr_raw_data = np.zeros(
-            [self.number_of_lines,
-             len(self._odmr_counter.get_odmr_channels()),
-             self.odmr_plot_x.size]
-        )
+        # Raw data ring buffer
+        self._raw_data_buffer = None
+        self._create_raw_data_buffer(self.number_of_lines)
 
         # Switch off microwave and set CW frequency and power
         self.mw_off()
@@ -162,6 +165,7 @@ class ODMRLogic(GenericLogic):
         self._mw_device.off()
         # Disconnect signals
         self.sigNextLine.disconnect()
+        self._raw_data_buffer.close()
 
     @fc.constructor
     def sv_set_fits(self, val):
@@ -205,6 +209,32 @@ class ODMRLogic(GenericLogic):
         else:
             return None
 
+    @property
+    def odmr_raw_data(self):
+        """ All raw data lines of the current measurement (newest first).
+        Lines spilled to disk are read back, so this can be expensive for long measurements.
+        """
+        return self._raw_data_buffer.get_lines()
+
+    def _create_raw_data_buffer(self, estimated_number_of_lines):
+        """ (Re-)Create the raw data ring buffer for the current frequency list.
+
+        @param int estimated_number_of_lines: number of lines to preallocate if all raw data is
+                                              kept in memory
+        """
+        if self._raw_data_buffer is not None:
+            self._raw_data_buffer.close()
+        if self.raw_data_spill_dir is None:
+            capacity = max(estimated_number_of_lines, self.number_of_lines)
+        else:
+            capacity = max(self.number_of_lines, self.lines_to_average)
+        self._raw_data_buffer = SweepRingBuffer(
+            line_shape=(len(self._odmr_counter.get_odmr_channels()), self.odmr_plot_x.size),
+            capacity=capacity,
+            window=max(0, self.lines_to_average),
+            spill_dir=self.raw_data_spill_dir)
+        return
+
     def _initialize_odmr_plots(self):
         """ Initializing the ODMR plots (line and matrix). """
 
@@ -268,18 +298,9 @@ class ODMRLogic(GenericLogic):
         """
         self.lines_to_average = int(lines_to_average)
 
-        if self.lines_to_average <= 0:
-            self.odmr_plot_y = np.mean(
-                self.odmr_raw_data[:max(1, self.elapsed_sweeps), :, :],
-                axis=0,
-                dtype=np.float64
-            )
-        else:
-            self.odmr_plot_y = np.mean(
-                self.odmr_raw_data[:max(1, min(self.lines_to_average, self.elapsed_sweeps)), :, :],
-                axis=0,
-                dtype=np.float64
-            )
+        with self.threadlock:
+            self._raw_data_buffer.set_window(max(0, self.lines_to_average))
+            self.odmr_plot_y = self._raw_data_buffer.get_mean()
 
         self.sigOdmrPlotsUpdated.emit(self.odmr_plot_x, self.odmr_plot_y, self.odmr_plot_xy)
         self.sigParameterUpdated.emit({'average_length': self.lines_to_average})
@@ -670,11 +691,7 @@ class ODMRLogic(GenericLogic):
                 estimated_number_of_lines = self.number_of_lines
             self.log.debug('Estimated number of raw data lines: {0:d}'
                            ''.format(estimated_number_of_lines))
-            self.odmr_raw_data = np.zeros(
-                [estimated_number_of_lines,
-                 len(self._odmr_counter.get_odmr_channels()),
-                 self.odmr_plot_x.size]
-            )
+            self._create_raw_data_buffer(estimated_number_of_lines)
             self.sigNextLine.emit()
             return 0
 
@@ -767,45 +784,29 @@ class ODMRLogic(GenericLogic):
                 self.sigNextLine.emit()
                 return
 
-            # Add new count data to raw_data array and append if array is too small
+            # Add new count data to the raw data ring buffer and expand it if it is too small
+            raw_data = self._raw_data_buffer
             if self._clearOdmrData:
-                self.odmr_raw_data[:, :, :] = 0
+                raw_data.clear()
                 self._clearOdmrData = False
-            if self.elapsed_sweeps == (self.odmr_raw_data.shape[0] - 1):
-                expanded_array = np.zeros(self.odmr_raw_data.shape)
-                self.odmr_raw_data = np.concatenate((self.odmr_raw_data, expanded_array), axis=0)
+            raw_data.ensure_capacity(max(self.number_of_lines, self.lines_to_average))
+            if self.raw_data_spill_dir is None and len(raw_data) == raw_data.capacity:
                 self.log.warning('raw data array in ODMRLogic was not big enough for the entire '
                                  'measurement. Array will be expanded.\nOld array shape was '
-                                 '({0:d}, {1:d}), new shape is ({2:d}, {3:d}).'
-                                 ''.format(self.odmr_raw_data.shape[0] - self.number_of_lines,
-                                           self.odmr_raw_data.shape[1],
-                                           self.odmr_raw_data.shape[0],
-                                           self.odmr_raw_data.shape[1]))
-
-            # shift data in the array "up" and add new data at the "bottom"
-            self.odmr_raw_data = np.roll(self.odmr_raw_data, 1, axis=0)
+                                 '({0:d}, {1:d}), new shape is ({2:d}, {3:d}).\nSet the config '
+                                 'option "raw_data_spill_dir" to keep the memory usage constant.'
+                                 ''.format(raw_data.capacity,
+                                           raw_data.line_shape[0],
+                                           2 * raw_data.capacity,
+                                           raw_data.line_shape[0]))
+            raw_data.add_line(new_counts)
 
-            self.odmr_raw_data[0] = new_counts
-
-            # Add new count data to mean signal
-            if self._clearOdmrData:
-                self.odmr_plot_y[:, :] = 0
-
-            if self.lines_to_average <= 0:
-                self.odmr_plot_y = np.mean(
-                    self.odmr_raw_data[:max(1, self.elapsed_sweeps), :, :],
-                    axis=0,
-                    dtype=np.float64
-                )
-            else:
-                self.odmr_plot_y = np.mean(
-                    self.odmr_raw_data[:max(1, min(self.lines_to_average, self.elapsed_sweeps)), :, :],
-                    axis=0,
-                    dtype=np.float64
-                )
+            # Mean signal from the running sums (all lines or sliding window)
+            self.odmr_plot_y = raw_data.get_mean()
 
-            # Set plot slice of matrix
-            self.odmr_plot_xy = self.odmr_raw_data[:self.number_of_lines, :, :]
+            # Set plot slice of matrix (newest line first). This is a copy, the view into the ring
+            # buffer is overwritten by the next lines while the GUI may still draw it.
+            self.odmr_plot_xy = raw_data.get_view(self.number_of_lines).copy()
 
             # Update elapsed time/sweeps
             self.elapsed_sweeps += 1
@@ -879,6 +880,7 @@ class ODMRLogic(GenericLogic):
         if tag is None:
             tag = ''
 
+        raw_data = self._raw_data_buffer.get_lines(self.elapsed_sweeps)
         for nch, channel in enumerate(self.get_odmr_channels()):
             # first save raw data for each channel
             if len(tag) > 0:
@@ -887,7 +889,7 @@ class ODMRLogic(GenericLogic):
                 filelabel_raw = 'ODMR_data_ch{0}_raw'.format(nch)
 
             data_raw = OrderedDict()
-            data_raw['count data (counts/s)'] = self.odmr_raw_data[:self.elapsed_sweeps, nch, :]
+            data_raw['count data (counts/s)'] = raw_data[:, nch, :]
             parameters = OrderedDict()
             parameters['Microwave CW Power (dBm)'] = self.cw_mw_power
             parameters['Microwave Sweep Power (dBm)'] = self.sweep_mw_power
@@ -26,7 +26,9 @@ import numpy as np
 import time
 
 from collections import OrderedDict
+from scipy.ndimage import maximum_filter
 from core.connector import Connector
+from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
 from datetime import datetime
 from logic.generic_logic import GenericLogic
@@ -360,6 +362,11 @@ class PoiManagerLogic(GenericLogic):
     scannerlogic = Connector(interface='ConfocalLogic')
     savelogic = Connector(interface='SaveLogic')
 
+    # config options
+    # Refine the positions of automatically detected POIs to the intensity weighted centroid of
+    # the spot instead of the brightest pixel
+    _subpixel_poi_refinement = ConfigOption('subpixel_poi_refinement', False, missing='nothing')
+
     # status vars
     _roi = StatusVar(default=dict())  # Notice constructor and representer further below
     _refocus_period = StatusVar(default=120)
@@ -1188,71 +1195,118 @@ class PoiManagerLogic(GenericLogic):
         arr_size = int(spot_size / pixel_size)
         return arr_size
 
-    def _is_spot_shape(self, local_arr):
-        unspot_e = 0
-        ensem_e = 0
-        len_arr = len(local_arr)
-        mid_f = int(0.5 * len_arr)
-        hm_local_arr = local_arr[mid_f].mean()
-        vm_local_arr = local_arr[:, mid_f].mean()
-        for i in range(0, len_arr):
-            if local_arr[i].mean() > hm_local_arr:
-                ensem_e += 1
-            if local_arr[:, i].mean() > vm_local_arr:
-                ensem_e += 1
-            if hm_local_arr > vm_local_arr * 1.2:
-                unspot_e += 1
-            if vm_local_arr > hm_local_arr * 1.2:
-                unspot_e += 1
-        if ensem_e > 4:
-            return False
-        elif unspot_e > 1:
-            return False
-        else:
-            return True
+    def _find_spots(self, scan):
+        """
+        Find the centers of bright spots in a 2D scan image.
+
+        A pixel is accepted as spot center if it is the maximum of the filter window (spot diameter
+        in pixels, see _spot_filter) around it, the mean of the window exceeds half the detection
+        threshold (scan mean * poi_threshold) and the window has a spot shape, i.e. at most 4 rows
+        and columns are brighter than the center row and column and the center row and column
+        means differ by less than 20%.
+        All windows are evaluated at once with a maximum filter and summed-area tables.
 
-    def _local_max(self, scan):
-        scan = np.asarray(scan, order="C")  # scan has to be a 2-D array
+        @param numpy.ndarray scan: 2D scan image
+
+        @return (numpy.ndarray, numpy.ndarray): row and column indices of the spot centers
+        """
+        scan = np.asarray(scan, dtype=float)
         filter_size = self._spot_filter(scan)
-        scan_m = scan.mean()
-        mid_f = int(filter_size / 2)
-        xc = []
-        yc = []
-        for i in range(0, len(scan) - filter_size):
-            for j in range(0, len(scan[i]) - filter_size):
-                local_arr = scan[i:i + filter_size, j:j + filter_size]
-                local_arr = np.asarray(local_arr)
-                arr_threshold = scan_m * self._poi_threshold * 0.5
-                if scan[i + mid_f][j + mid_f] == local_arr.max() and self._is_spot_shape(local_arr) and local_arr.mean() > arr_threshold:
-                    xc.append(i + mid_f)
-                    yc.append(j + mid_f)
-        return xc, yc
+        rows, columns = scan.shape
+        # Window positions (upper left corner) to check
+        window_rows, window_columns = rows - filter_size, columns - filter_size
+        if filter_size < 1 or window_rows < 1 or window_columns < 1:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int)
+        mid_f = filter_size // 2
+
+        # Sums over filter_size pixels along each row (row_sums) and column (column_sums).
+        # row_sums[i, j] is the sum of scan[i, j:j + filter_size].
+        cumulative = np.zeros((rows, columns + 1))
+        np.cumsum(scan, axis=1, out=cumulative[:, 1:])
+        row_sums = cumulative[:, filter_size:] - cumulative[:, :-filter_size]
+        cumulative = np.zeros((rows + 1, columns))
+        np.cumsum(scan, axis=0, out=cumulative[1:])
+        column_sums = cumulative[filter_size:] - cumulative[:-filter_size]
+        cumulative = np.zeros((rows + 1, row_sums.shape[1]))
+        np.cumsum(row_sums, axis=0, out=cumulative[1:])
+        window_means = (cumulative[filter_size:] - cumulative[:-filter_size]) / filter_size ** 2
+
+        # Candidates: window maximum at the center pixel and bright enough window
+        centers = scan[mid_f:mid_f + window_rows, mid_f:mid_f + window_columns]
+        window_max = maximum_filter(scan, size=filter_size)[mid_f:mid_f + window_rows,
+                                                            mid_f:mid_f + window_columns]
+        mean_threshold = scan.mean() * self._poi_threshold * 0.5
+        is_candidate = (centers == window_max) & (
+                window_means[:window_rows, :window_columns] > mean_threshold)
+        i, j = np.nonzero(is_candidate)
+
+        # Spot shape of the candidate windows. Comparing sums of equal length is equivalent to
+        # comparing the row and column means.
+        offsets = np.arange(filter_size)
+        window_row_sums = row_sums[i[:, np.newaxis] + offsets, j[:, np.newaxis]]
+        window_column_sums = column_sums[i[:, np.newaxis], j[:, np.newaxis] + offsets]
+        center_row_sum = window_row_sums[:, mid_f]
+        center_column_sum = window_column_sums[:, mid_f]
+        brighter_lines = np.count_nonzero(window_row_sums > center_row_sum[:, np.newaxis], axis=1)
+        brighter_lines += np.count_nonzero(
+            window_column_sums > center_column_sum[:, np.newaxis], axis=1)
+        is_spot = brighter_lines <= 4
+        if filter_size > 1:
+            is_spot &= center_row_sum <= center_column_sum * 1.2
+            is_spot &= center_column_sum <= center_row_sum * 1.2
+        return i[is_spot] + mid_f, j[is_spot] + mid_f
+
+    def _refine_spot_centers(self, scan, row_indices, column_indices):
+        """
+        Sub-pixel positions of spots as intensity weighted centroid of the filter window around
+        the given pixels. The window minimum is subtracted as background.
+
+        @param numpy.ndarray scan: 2D scan image
+        @param numpy.ndarray row_indices: row indices of the spot centers
+        @param numpy.ndarray column_indices: column indices of the spot centers
+
+        @return (numpy.ndarray, numpy.ndarray): refined (float) row and column positions
+        """
+        row_indices = np.asarray(row_indices, dtype=int)
+        column_indices = np.asarray(column_indices, dtype=int)
+        filter_size = max(1, self._spot_filter(scan))
+        offsets = np.arange(filter_size) - filter_size // 2
+        window_rows = np.clip(row_indices[:, np.newaxis] + offsets, 0, scan.shape[0] - 1)
+        window_columns = np.clip(column_indices[:, np.newaxis] + offsets, 0, scan.shape[1] - 1)
+        windows = scan[window_rows[:, :, np.newaxis], window_columns[:, np.newaxis, :]]
+        weights = windows - windows.min(axis=(1, 2), keepdims=True)
+        total = weights.sum(axis=(1, 2))
+        valid = total > 0
+        total[~valid] = 1
+        row_shift = np.where(valid, (weights.sum(axis=2) * offsets).sum(axis=1) / total, 0)
+        column_shift = np.where(valid, (weights.sum(axis=1) * offsets).sum(axis=1) / total, 0)
+        return row_indices + row_shift, column_indices + column_shift
 
     def auto_catch_poi(self):
-        scan_image = self.roi_scan_image.T
+        """
+        Add a POI for each bright spot found in the ROI scan image (see _find_spots) with a
+        center pixel brighter than the scan mean * poi_threshold.
+        """
+        if self.roi_scan_image is None:
+            self.log.error('No ROI scan image available to find POIs in.')
+            return
+        # Pixel values are truncated to integers
+        scan_image = np.trunc(np.array(self.roi_scan_image, dtype=float).T)
         x_range = self.roi_scan_image_extent[0]
         y_range = self.roi_scan_image_extent[1]
-        x_axis = np.arange(x_range[0], x_range[1], (x_range[1] - x_range[0]) / len(scan_image))
-        y_axis = np.arange(y_range[0], y_range[1], (y_range[1] - y_range[0]) / len(scan_image[0]))
-
-        for i in range(0, len(scan_image)):
-            for j in range(0, len(scan_image[i])):
-                scan_image[i][j] = int(scan_image[i][j])  # data here somehow needs to be reset, otherwise shit happens.
+        x_step = (x_range[1] - x_range[0]) / scan_image.shape[0]
+        y_step = (y_range[1] - y_range[0]) / scan_image.shape[1]
 
         threshold = scan_image.mean() * self._poi_threshold
+        x_indices, y_indices = self._find_spots(scan_image)
+        is_bright = scan_image[x_indices, y_indices] > threshold
+        x_indices, y_indices = x_indices[is_bright], y_indices[is_bright]
+        if self._subpixel_poi_refinement:
+            x_indices, y_indices = self._refine_spot_centers(scan_image, x_indices, y_indices)
 
-        xc1, yc1 = self._local_max(scan_image)
-        xc2 = []
-        yc2 = []
-        for i in range(0, len(xc1)):
-            if scan_image[xc1[i], yc1[i]] > threshold:
-                xc2.append(xc1[i])
-                yc2.append(yc1[i])
-
-        pois = np.zeros((len(xc2), 3))
         z = self.scanner_position[2]
-        for i in range(0, len(pois)):
-            pois[i] = [x_axis[xc2[i]], y_axis[yc2[i]], z]
-            self.add_poi(pois[i])
+        for x_index, y_index in zip(x_indices, y_indices):
+            self.add_poi(
+                np.array([x_range[0] + x_index * x_step, y_range[0] + y_index * y_step, z]))
             if self.poi_nametag is None:
-                time.sleep(0.1)
\ No newline at end of file
+                time.sleep(0.1)
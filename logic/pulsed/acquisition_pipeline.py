@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the asynchronous acquisition/analysis pipeline of the Qudi
+PulsedMeasurementLogic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import logging
+import queue
+import threading
+import time
+
+
+class StageMetrics:
+    """
+    Latency and throughput of one stage of the AcquisitionPipeline.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """ Reset all metrics and the start time of the throughput. """
+        with self._lock:
+            self._start = time.monotonic()
+            self._count = 0
+            self._dropped = 0
+            self._total_latency = 0.0
+            self._last_latency = float('nan')
+            self._max_latency = 0.0
+            self._last_age = float('nan')
+
+    def add(self, latency, age=None):
+        """
+        Record one processed item.
+
+        @param float latency: processing time of the item in s
+        @param float age: optional, time since the item was acquired in s
+        """
+        with self._lock:
+            self._count += 1
+            self._total_latency += latency
+            self._last_latency = latency
+            self._max_latency = max(self._max_latency, latency)
+            if age is not None:
+                self._last_age = age
+
+    def add_dropped(self, number=1):
+        """ Record items that were dropped without processing. """
+        with self._lock:
+            self._dropped += number
+
+    def as_dict(self):
+        """
+        @return dict: 'count', 'dropped', 'last_latency', 'mean_latency', 'max_latency' (in s),
+                      'throughput' (items/s) and 'last_age' (in s, time from acquisition to the
+                      end of processing of the last item)
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self._start
+            mean_latency = self._total_latency / self._count if self._count else float('nan')
+            return {'count': self._count,
+                    'dropped': self._dropped,
+                    'last_latency': self._last_latency,
+                    'mean_latency': mean_latency,
+                    'max_latency': self._max_latency,
+                    'throughput': self._count / elapsed if elapsed > 0 else 0.0,
+                    'last_age': self._last_age}
+
+
+class AcquisitionPipeline:
+    """
+    Two threads decoupling the readout of the hardware from the analysis of the data.
+
+    The acquisition thread calls <acquire> every <interval> seconds (or as fast as the hardware
+    returns if it is slower) and puts the result in a bounded queue. If the queue is full, the
+    oldest item is dropped. The analysis thread always takes the newest item from the queue, drops
+    all older ones and calls <analyze> with it. So a slow analysis never blocks the readout and
+    a slow readout never blocks the thread calling start/stop.
+
+    This is meant for accumulating data (like fast counter traces), where the newest item contains
+    everything of the older ones.
+    """
+
+    def __init__(self, acquire, analyze, interval=1.0, queue_size=2, name='pipeline', log=None):
+        """
+        @param callable acquire: function without arguments returning the acquired item
+        @param callable analyze: function called with an acquired item
+        @param float interval: minimum time between two calls of acquire in s
+        @param int queue_size: maximum number of acquired items waiting for analysis
+        @param str name: name of the threads
+        @param logging.Logger log: optional, logger for errors
+        """
+        self.log = logging.getLogger(__name__) if log is None else log
+        self._acquire = acquire
+        self._analyze = analyze
+        self.interval = interval
+        self._name = name
+        self._queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._stop_event = threading.Event()
+        self._acquisition_thread = None
+        self._analysis_thread = None
+        self.acquisition_metrics = StageMetrics()
+        self.analysis_metrics = StageMetrics()
+
+    @property
+    def is_running(self):
+        return self._acquisition_thread is not None and self._acquisition_thread.is_alive()
+
+    @property
+    def metrics(self):
+        """
+        @return dict: metrics of the stages 'acquisition' and 'analysis' (see StageMetrics) and
+                      the number of items waiting in the queue ('queued')
+        """
+        return {'acquisition': self.acquisition_metrics.as_dict(),
+                'analysis': self.analysis_metrics.as_dict(),
+                'queued': self._queue.qsize()}
+
+    def start(self):
+        """ Start the acquisition and analysis threads (and reset the metrics). """
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._clear_queue()
+        self.acquisition_metrics.reset()
+        self.analysis_metrics.reset()
+        self._acquisition_thread = threading.Thread(target=self._acquisition_worker,
+                                                    name='{0} acquisition'.format(self._name),
+                                                    daemon=True)
+        self._analysis_thread = threading.Thread(target=self._analysis_worker,
+                                                 name='{0} analysis'.format(self._name),
+                                                 daemon=True)
+        self._acquisition_thread.start()
+        self._analysis_thread.start()
+        return
+
+    def stop(self, timeout=None):
+        """
+        Stop both threads. Acquired items not analyzed yet are dropped.
+        Must not be called while holding a lock used by acquire or analyze.
+
+        @param float timeout: optional, maximum time to wait for each thread in s
+        """
+        self._stop_event.set()
+        for thread in (self._acquisition_thread, self._analysis_thread):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout)
+                if thread.is_alive():
+                    self.log.warning('Thread "{0}" did not stop within {1} s.'
+                                     ''.format(thread.name, timeout))
+        self.analysis_metrics.add_dropped(self._clear_queue())
+        self._acquisition_thread = None
+        self._analysis_thread = None
+        return
+
+    def _clear_queue(self):
+        """ Remove all items from the queue. @return int: number of removed items """
+        removed = 0
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return removed
+            removed += 1
+
+    def _acquisition_worker(self):
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            try:
+                item = self._acquire()
+            except Exception:
+                self.log.exception('Acquisition of the {0} failed:'.format(self._name))
+                self._stop_event.wait(self.interval)
+                continue
+            stop = time.monotonic()
+            self.acquisition_metrics.add(stop - start)
+            entry = (item, stop)
+            while True:
+                try:
+                    self._queue.put_nowait(entry)
+                    break
+                except queue.Full:
+                    # drop the oldest item, the newest one supersedes it
+                    try:
+                        self._queue.get_nowait()
+                        self.analysis_metrics.add_dropped()
+                    except queue.Empty:
+                        pass
+            self._stop_event.wait(max(0.0, self.interval - (time.monotonic() - start)))
+        return
+
+    def _analysis_worker(self):
+        while not self._stop_event.is_set():
+            try:
+                item, acquired = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            # only analyze the newest item, drop the older ones
+            while True:
+                try:
+                    item, acquired = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.analysis_metrics.add_dropped()
+            start = time.monotonic()
+            try:
+                self._analyze(item)
+            except Exception:
+                self.log.exception('Analysis of the {0} failed:'.format(self._name))
+                continue
+            stop = time.monotonic()
+            self.analysis_metrics.add(stop - start, age=stop - acquired)
+        return
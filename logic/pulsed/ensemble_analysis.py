@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the vectorized timing analysis of PulseBlockEnsembles for the Qudi
+SequenceGeneratorLogic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+
+
+def analyze_ensemble_timing(block_list, sample_rate, laser_channel):
+    """
+    Calculates the length in bins of each element (incl. repetitions) of a PulseBlockEnsemble and
+    the bins of all digital channel and laser transitions with array operations instead of
+    iterating over each repetition.
+
+    The ideal end times of the elements are the cumulative sum of
+    init_length_s + rep_no * increment_s in chronological order (numpy.cumsum adds sequentially,
+    so the float results are the same as adding them up one by one). Transitions are detected
+    once per block for the first repetition (compared to the state before the block) and once for
+    all further repetitions (compared to the last element of the block); the positions in all
+    repetitions follow from the number of elements of the block.
+
+    @param list block_list: list of tuples (PulseBlock instance, repetitions)
+    @param float sample_rate: sample rate in samples/s
+    @param str laser_channel: laser (or gate) channel descriptor. Laser transitions are taken from
+                              the laser_on flags of the elements if it is not a digital channel.
+
+    @return dict: keys 'elements_length_bins', 'digital_rising_bins', 'digital_falling_bins',
+                  'laser_rising_bins', 'laser_falling_bins', 'analog_channels',
+                  'digital_channels' and 'ideal_length' (see
+                  SequenceGeneratorLogic.analyze_block_ensemble)
+    """
+    digital_channels = set()
+    analog_channels = set()
+    # digital channel and laser_on state of the very last element in the ensemble
+    initial_digital_high = dict()
+    initial_laser_on = False
+    if len(block_list) > 0:
+        digital_channels = block_list[0][0].digital_channels
+        analog_channels = block_list[0][0].analog_channels
+        last_block = block_list[-1][0]
+        if len(last_block) > 0:
+            initial_digital_high = last_block[-1].digital_high
+            initial_laser_on = last_block[-1].laser_on
+    channels = list(digital_channels)
+    use_laser_on = not laser_channel.startswith('d')
+
+    # element lengths, channel states and laser_on flags of each block (once per block instance)
+    block_arrays = dict()
+    for block, reps in block_list:
+        if id(block) not in block_arrays:
+            block_arrays[id(block)] = (
+                np.array([element.init_length_s for element in block], dtype='float64'),
+                np.array([element.increment_s for element in block], dtype='float64'),
+                np.array([[bool(element.digital_high[chnl]) for chnl in channels]
+                          for element in block], dtype=bool).reshape((len(block), len(channels))),
+                np.array([[bool(element.laser_on)] for element in block],
+                         dtype=bool).reshape((len(block), 1)))
+
+    element_lengths_s = list()
+    # element indices (and channel index) of the transitions
+    digital_transitions = ([], [], [], [])
+    laser_transitions = ([], [], [], [])
+    digital_state = np.array([bool(initial_digital_high.get(chnl, False)) for chnl in channels],
+                             dtype=bool)
+    laser_state = np.array([bool(initial_laser_on)], dtype=bool)
+    element_offset = 0
+    for block, reps in block_list:
+        init_length_s, increment_s, digital_high, laser_on = block_arrays[id(block)]
+        number_of_elements = len(init_length_s)
+        if number_of_elements == 0:
+            continue
+        repetitions = np.arange(reps + 1, dtype='float64')
+        element_lengths_s.append(
+            (init_length_s[np.newaxis, :] + repetitions[:, np.newaxis] * increment_s).ravel())
+
+        _add_transitions(digital_transitions, digital_state, digital_high, reps, element_offset)
+        digital_state = digital_high[-1]
+        if use_laser_on:
+            _add_transitions(laser_transitions, laser_state, laser_on, reps, element_offset)
+            laser_state = laser_on[-1]
+        element_offset += number_of_elements * (reps + 1)
+
+    if element_lengths_s:
+        end_times = np.cumsum(np.concatenate(element_lengths_s))
+        end_bins = np.rint(end_times * sample_rate).astype('int64')
+        ideal_length = float(end_times[-1])
+    else:
+        end_bins = np.zeros(0, dtype='int64')
+        ideal_length = 0.0
+    start_bins = np.empty(end_bins.size, dtype='int64')
+    start_bins[:1] = 0
+    start_bins[1:] = end_bins[:-1]
+    elements_length_bins = end_bins - start_bins
+
+    digital_rising_bins = dict()
+    digital_falling_bins = dict()
+    for index, chnl in enumerate(channels):
+        digital_rising_bins[chnl] = _transition_bins(digital_transitions[0],
+                                                     digital_transitions[1], index, start_bins)
+        digital_falling_bins[chnl] = _transition_bins(digital_transitions[2],
+                                                      digital_transitions[3], index, start_bins)
+    if use_laser_on:
+        laser_rising_bins = _transition_bins(laser_transitions[0], laser_transitions[1], 0,
+                                             start_bins)
+        laser_falling_bins = _transition_bins(laser_transitions[2], laser_transitions[3], 0,
+                                              start_bins)
+    else:
+        laser_rising_bins = digital_rising_bins[laser_channel]
+        laser_falling_bins = digital_falling_bins[laser_channel]
+
+    return {'elements_length_bins': elements_length_bins,
+            'digital_rising_bins': digital_rising_bins,
+            'digital_falling_bins': digital_falling_bins,
+            'laser_rising_bins': laser_rising_bins,
+            'laser_falling_bins': laser_falling_bins,
+            'analog_channels': analog_channels,
+            'digital_channels': digital_channels,
+            'ideal_length': ideal_length}
+
+
+def _add_transitions(transitions, previous_state, states, reps, element_offset):
+    """
+    Append the element indices of the rising and falling transitions of a repeated block.
+
+    @param tuple transitions: lists of rising element indices, rising channel indices, falling
+                              element indices and falling channel indices to append to
+    @param numpy.ndarray previous_state: bool array of the channel states before the block
+    @param numpy.ndarray states: bool array (elements, channels) of the channel states of the
+                                 block elements
+    @param int reps: number of repetitions of the block
+    @param int element_offset: index of the first element of the block in the ensemble
+    """
+    number_of_elements = states.shape[0]
+    # first repetition: first element compared to the state before the block
+    previous = np.concatenate((previous_state[np.newaxis, :], states[:-1]))
+    for list_index, changed in ((0, ~previous & states), (2, previous & ~states)):
+        elements, chnls = np.nonzero(changed)
+        transitions[list_index].append(elements + element_offset)
+        transitions[list_index + 1].append(chnls)
+    if reps < 1:
+        return
+    # further repetitions: first element compared to the last element of the block
+    previous[0] = states[-1]
+    rep_offsets = np.arange(1, reps + 1, dtype='int64') * number_of_elements + element_offset
+    for list_index, changed in ((0, ~previous & states), (2, previous & ~states)):
+        elements, chnls = np.nonzero(changed)
+        transitions[list_index].append((rep_offsets[:, np.newaxis] + elements).ravel())
+        transitions[list_index + 1].append(np.tile(chnls, reps))
+    return
+
+
+def _transition_bins(element_indices, channel_indices, channel_index, start_bins):
+    """
+    Sorted unique start bins of the elements with a transition in one channel.
+
+    @param list element_indices: arrays of element indices of the transitions
+    @param list channel_indices: arrays of the channel indices of the transitions
+    @param int channel_index: index of the channel
+    @param numpy.ndarray start_bins: start bin of each element
+
+    @return numpy.ndarray: bins of the transitions (int64)
+    """
+    if not element_indices:
+        return np.zeros(0, dtype='int64')
+    elements = np.concatenate(element_indices)
+    channels = np.concatenate(channel_indices)
+    bins = start_bins[elements[channels == channel_index]]
+    # The element indices are in chronological order, so the bins are already sorted unless
+    # there are elements with negative length.
+    if np.any(bins[1:] < bins[:-1]):
+        return np.unique(bins)
+    keep = np.empty(bins.size, dtype=bool)
+    keep[:1] = True
+    np.not_equal(bins[1:], bins[:-1], out=keep[1:])
+    return bins[keep]
+
+
+def ensemble_digital_runs(block_list, elements_length_bins, digital_channels):
+    """
+    Converts the elements of a digital-only PulseBlockEnsemble into runs of constant digital
+    channel states (run-length encoding) without creating sample arrays. Elements of zero length
+    are skipped and consecutive elements with identical states are merged, so the result scales
+    with the number of state changes instead of the number of samples.
+
+    @param list block_list: list of tuples (PulseBlock instance, repetitions)
+    @param numpy.ndarray elements_length_bins: length in bins of each element incl. repetitions
+                                               (see analyze_ensemble_timing)
+    @param iterable digital_channels: digital channel descriptors to encode
+
+    @return (numpy.ndarray, dict): length in bins of each run (int64) and dict with the digital
+                                   channel descriptors as keys and bool arrays with the state of
+                                   the channel in each run as values
+    """
+    channels = sorted(digital_channels)
+    block_states = dict()
+    states = list()
+    for block, reps in block_list:
+        if len(block) == 0:
+            continue
+        if id(block) not in block_states:
+            block_states[id(block)] = np.array(
+                [[bool(element.digital_high[chnl]) for chnl in channels] for element in block],
+                dtype=bool).reshape((len(block), len(channels)))
+        states.append(np.tile(block_states[id(block)], (reps + 1, 1)))
+    if not states:
+        return np.zeros(0, dtype='int64'), {chnl: np.zeros(0, dtype=bool) for chnl in channels}
+    states = np.concatenate(states)
+    lengths = np.asarray(elements_length_bins, dtype='int64')
+    if len(lengths) != len(states):
+        raise ValueError('Number of element lengths ({0:d}) does not match the number of '
+                         'elements ({1:d}) in the ensemble.'.format(len(lengths), len(states)))
+
+    non_empty = lengths > 0
+    lengths = lengths[non_empty]
+    states = states[non_empty]
+    if lengths.size == 0:
+        return lengths, {chnl: np.zeros(0, dtype=bool) for chnl in channels}
+    # start of a new run wherever any channel changes its state
+    run_starts = np.empty(lengths.size, dtype=bool)
+    run_starts[0] = True
+    np.any(states[1:] != states[:-1], axis=1, out=run_starts[1:])
+    run_starts = np.flatnonzero(run_starts)
+    run_lengths = np.add.reduceat(lengths, run_starts)
+    return run_lengths, {chnl: states[run_starts, index] for index, chnl in enumerate(channels)}
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains helper functions for the parallel sampling of PulseBlockEnsembles in the Qudi
+SequenceGeneratorLogic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import tempfile
+import numpy as np
+import multiprocessing as mp
+
+from core.util.network import get_shared_memory_dir
+
+# Shared float32 sample buffer of the worker process and the path of its file
+_worker_buffer = None
+_worker_buffer_file = None
+
+
+def iterate_sampling_pieces(block_list, elements_length_bins, chunk_length, offset_bin=0,
+                            rotating_frame=True):
+    """
+    Generator splitting the element timeline of a PulseBlockEnsemble into write chunks of
+    <chunk_length> samples. Each chunk is described by a list of pieces, i.e. elements or parts
+    of elements that fall into the chunk.
+
+    The pieces and their time offsets are exactly the same as produced by the serial sampling loop
+    in SequenceGeneratorLogic.sample_pulse_block_ensemble. Since sampling functions are evaluated
+    on the time array of an entire piece (e.g. chirps depend on the start and end time of the
+    piece), pieces are never split any further. This guarantees identical samples no matter how
+    the pieces are distributed among worker processes.
+
+    @param list block_list: list of (PulseBlock, repetitions) tuples of the ensemble
+    @param numpy.ndarray elements_length_bins: length in bins of each element incl. repetitions
+    @param int chunk_length: number of samples per write chunk (last chunk may be shorter)
+    @param int offset_bin: the time offset bin to start with (rotating frame)
+    @param bool rotating_frame: flag indicating if the rotating frame is preserved
+
+    @return: generator yielding (chunk_length, pieces, offset_bin) tuples for each chunk.
+             pieces is a list of (write_index, length, time_offset_bin, element) tuples.
+             offset_bin is the rotating frame offset after this chunk.
+    """
+    total_samples = int(np.sum(elements_length_bins))
+    processed_samples = 0
+    write_index = 0
+    pieces = list()
+    element_count = 0
+    for block, reps in block_list:
+        for rep_no in range(reps + 1):
+            for element in block.element_list:
+                element_length = elements_length_bins[element_count]
+                element_samples_written = 0
+                while element_samples_written != element_length:
+                    samples_to_add = min(chunk_length - write_index,
+                                         element_length - element_samples_written)
+                    pieces.append((write_index, samples_to_add, offset_bin, element))
+                    element_samples_written += samples_to_add
+                    write_index += samples_to_add
+                    processed_samples += samples_to_add
+                    if rotating_frame:
+                        offset_bin += samples_to_add
+                    if write_index == chunk_length:
+                        yield chunk_length, pieces, offset_bin
+                        pieces = list()
+                        write_index = 0
+                        chunk_length = min(chunk_length, total_samples - processed_samples)
+                element_count += 1
+    return
+
+
+def split_pieces(pieces, number_of_tasks):
+    """
+    Distribute consecutive pieces into at most <number_of_tasks> groups of similar sample count.
+
+    @param list pieces: list of (write_index, length, time_offset_bin, element) tuples
+    @param int number_of_tasks: maximum number of groups to create
+
+    @return list: list of piece lists
+    """
+    total_length = sum(piece[1] for piece in pieces)
+    target_length = max(1, total_length // max(1, number_of_tasks))
+    tasks = list()
+    current_task = list()
+    current_length = 0
+    for piece in pieces:
+        current_task.append(piece)
+        current_length += piece[1]
+        if current_length >= target_length:
+            tasks.append(current_task)
+            current_task = list()
+            current_length = 0
+    if current_task:
+        tasks.append(current_task)
+    return tasks
+
+
+def _get_worker_buffer(buffer_file, buffer_shape):
+    """
+    Map the shared sample buffer file in the worker process. The mapping is kept for the
+    following tasks until the sampler switches to another buffer file.
+
+    @param str buffer_file: path of the shared float32 buffer file
+    @param tuple buffer_shape: (number of analog channels, chunk length)
+
+    @return numpy.ndarray: float32 array of shape buffer_shape
+    """
+    global _worker_buffer, _worker_buffer_file
+    if buffer_file != _worker_buffer_file:
+        _worker_buffer = None
+        _worker_buffer = np.memmap(buffer_file, dtype='float32', mode='r+')
+        _worker_buffer_file = buffer_file
+    return _worker_buffer[:buffer_shape[0] * buffer_shape[1]].reshape(buffer_shape)
+
+
+def _sample_analog_pieces(buffer_file, buffer_shape, pieces, channel_indices, normalization,
+                          sample_rate):
+    """
+    Worker function calculating the analog samples of a list of pieces and writing them into the
+    shared sample buffer.
+
+    @param str buffer_file: path of the shared float32 buffer file
+    @param tuple buffer_shape: (number of analog channels, chunk length)
+    @param list pieces: list of (write_index, length, time_offset_bin, pulse_function) tuples
+    @param dict channel_indices: analog channel descriptors as keys and buffer row as values
+    @param dict normalization: analog channel descriptors as keys and half the pp-amplitude as
+                               values
+    @param float sample_rate: the sample rate in samples/s
+    """
+    buffer = _get_worker_buffer(buffer_file, buffer_shape)
+    for write_index, length, time_offset, pulse_function in pieces:
+        time_arr = (time_offset + np.arange(length, dtype='float64')) / sample_rate
+        for chnl, function in pulse_function.items():
+            samples = function.get_samples(time_arr) / normalization[chnl]
+            buffer[channel_indices[chnl], write_index:write_index + length] = samples
+    return
+
+
+class ParallelAnalogSampler:
+    """
+    Samples the analog channels of PulseBlockEnsemble write chunks with a pool of worker
+    processes into a shared float32 buffer.
+
+    The pool is started with the "spawn" method on first use and kept until close() is called, so
+    it is shared by all sampled ensembles. The buffer is a file in the shared memory directory
+    mapped by all processes. It is reused for all ensembles and only replaced if a larger one is
+    needed.
+    """
+
+    def __init__(self, workers):
+        """
+        @param int workers: number of worker processes
+        """
+        self.workers = int(workers)
+        self.channel_indices = dict()
+        self._pool = None
+        self._buffer_file = None
+        self._buffer = None
+        self._shape = (0, 0)
+
+    def prepare(self, analog_channels, chunk_length):
+        """
+        Set up the buffer (and the pool on first use) to sample the write chunks of an ensemble.
+
+        @param iterable analog_channels: analog channel descriptors of the ensemble
+        @param int chunk_length: maximum number of samples per write chunk
+        """
+        channels = sorted(analog_channels)
+        self.channel_indices = {chnl: ii for ii, chnl in enumerate(channels)}
+        self._shape = (len(channels), int(chunk_length))
+        size = self._shape[0] * self._shape[1]
+        if self._buffer is None or self._buffer.size < size:
+            self._release_buffer()
+            fd, path = tempfile.mkstemp(prefix='qudi_samples_', dir=get_shared_memory_dir())
+            os.close(fd)
+            self._buffer_file = path
+            self._buffer = np.memmap(path, dtype='float32', mode='w+', shape=(size,)).view(
+                np.ndarray)
+        if self._pool is None:
+            self._pool = mp.get_context('spawn').Pool(processes=self.workers)
+        return
+
+    def close(self):
+        """
+        Terminate the pool and remove the buffer file.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        self._release_buffer()
+        return
+
+    def _release_buffer(self):
+        self._buffer = None
+        if self._buffer_file is not None:
+            try:
+                os.remove(self._buffer_file)
+            except OSError:
+                # still mapped by a worker process (Windows)
+                pass
+            self._buffer_file = None
+        return
+
+    def sample_async(self, pieces, normalization, sample_rate):
+        """
+        Start sampling the analog channels of a write chunk.
+
+        @param list pieces: list of (write_index, length, time_offset_bin, element) tuples
+        @param dict normalization: analog channel descriptors as keys and half the pp-amplitude as
+                                   values
+        @param float sample_rate: the sample rate in samples/s
+
+        @return multiprocessing.pool.AsyncResult: call get() to wait for completion
+        """
+        pieces = [(index, length, offset, element.pulse_function) for
+                  index, length, offset, element in pieces if element.pulse_function]
+        tasks = split_pieces(pieces, 4 * self.workers)
+        return self._pool.starmap_async(
+            _sample_analog_pieces,
+            [(self._buffer_file, self._shape, task, self.channel_indices, normalization,
+              sample_rate) for task in tasks])
+
+    def get_samples(self, chunk_length):
+        """
+        Get views of the sampled analog data of the last write chunk (no copy).
+
+        @param int chunk_length: length of the current write chunk
+
+        @return dict: analog channel descriptors as keys and float32 sample arrays as values
+        """
+        buffer = self._buffer[:self._shape[0] * self._shape[1]].reshape(self._shape)
+        return {chnl: buffer[ii, :chunk_length] for chnl, ii in self.channel_indices.items()}
@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the single-file database of saved PulseBlocks, PulseBlockEnsembles and
+PulseSequences for the Qudi SequenceGeneratorLogic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from core.util.helpers import natural_sort
+from logic.pulsed.pulse_objects import SequenceStep
+
+
+class PulseAssetStore:
+    """
+    SQLite database storing the dict representations (get_dict_representation) of pulse assets
+    as versioned json text instead of one pickle file per asset.
+
+    Each asset is a row indexed by kind ('block', 'ensemble' or 'sequence') and name, with the
+    format version, a hash of the data and the modification time. Listing the names only reads the
+    index, the data of an asset is only read and decoded on request. Saving an asset with unchanged
+    data does not write anything. Several saves can be combined into one transaction.
+    """
+    # version of the schema of the database file
+    schema_version = 1
+    # version of the json encoding of the asset data
+    format_version = 1
+
+    def __init__(self, path):
+        """
+        @param str path: path of the database file (created if it does not exist)
+        """
+        self.log = logging.getLogger(__name__)
+        self.path = path
+        # The logic is accessed from other threads (e.g. the GUI reading saved assets), so all
+        # access is serialized by a lock instead of tying the connection to one thread.
+        self._lock = threading.RLock()
+        self._transaction_depth = 0
+        self._connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        version = self._connection.execute('PRAGMA user_version').fetchone()[0]
+        if version > self.schema_version:
+            raise RuntimeError('Pulse asset database "{0}" has schema version {1:d}, newer than '
+                               'the supported version {2:d}.'.format(path, version,
+                                                                     self.schema_version))
+        self._connection.execute('CREATE TABLE IF NOT EXISTS assets ('
+                                 'kind TEXT NOT NULL, '
+                                 'name TEXT NOT NULL, '
+                                 'version INTEGER NOT NULL, '
+                                 'hash TEXT NOT NULL, '
+                                 'mtime REAL NOT NULL, '
+                                 'data TEXT NOT NULL, '
+                                 'PRIMARY KEY (kind, name))')
+        self._connection.execute('PRAGMA user_version={0:d}'.format(self.schema_version))
+
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager combining all saves and deletions inside into one transaction. Nested
+        transactions are committed with the outermost one. Everything is rolled back on an
+        exception.
+        """
+        with self._lock:
+            if self._transaction_depth == 0:
+                self._connection.execute('BEGIN')
+            self._transaction_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._transaction_depth -= 1
+                if self._transaction_depth == 0:
+                    self._connection.execute('ROLLBACK')
+                raise
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self._connection.execute('COMMIT')
+
+    def names(self, kind):
+        """
+        Names of all stored assets of a kind (without reading their data).
+
+        @param str kind: 'block', 'ensemble' or 'sequence'
+
+        @return list: naturally sorted asset names
+        """
+        with self._lock:
+            rows = self._connection.execute('SELECT name FROM assets WHERE kind=?', (kind,))
+            return natural_sort(row[0] for row in rows)
+
+    def index(self, kind):
+        """
+        @param str kind: 'block', 'ensemble' or 'sequence'
+
+        @return dict: asset names as keys and dicts with keys 'version', 'hash' and 'mtime'
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT name, version, hash, mtime FROM assets WHERE kind=?', (kind,))
+            return {name: {'version': version, 'hash': data_hash, 'mtime': mtime}
+                    for name, version, data_hash, mtime in rows}
+
+    def load(self, kind, name):
+        """
+        Read and decode the dict representation of an asset.
+
+        @param str kind: 'block', 'ensemble' or 'sequence'
+        @param str name: asset name
+
+        @return dict: dict representation of the asset, None if not found or not readable
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT version, data FROM assets WHERE kind=? AND name=?', (kind, name)).fetchone()
+        if row is None:
+            return None
+        version, data = row
+        if version > self.format_version:
+            self.log.error('Saved {0} "{1}" has format version {2:d} which is newer than the '
+                           'supported version {3:d}.'.format(kind, name, version,
+                                                             self.format_version))
+            return None
+        try:
+            return json.loads(data, object_hook=_decode_object)
+        except (ValueError, TypeError, KeyError) as e:
+            self.log.error('Failed to decode saved {0} "{1}": {2}'.format(kind, name, e))
+            return None
+
+    def save(self, kind, name, dict_repr):
+        """
+        Encode and store the dict representation of an asset. Nothing is written if the stored
+        data is identical.
+
+        @param str kind: 'block', 'ensemble' or 'sequence'
+        @param str name: asset name
+        @param dict dict_repr: dict representation of the asset (see get_dict_representation)
+
+        @return bool: True if the asset was written
+        """
+        data = json.dumps(_encode_object(dict_repr), separators=(',', ':'))
+        data_hash = hashlib.sha1(data.encode('utf-8')).hexdigest()
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT version, hash FROM assets WHERE kind=? AND name=?', (kind, name)).fetchone()
+            if row is not None and tuple(row) == (self.format_version, data_hash):
+                return False
+            with self.transaction():
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO assets (kind, name, version, hash, mtime, data) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (kind, name, self.format_version, data_hash, time.time(), data))
+        return True
+
+    def delete(self, kind, name):
+        """
+        @param str kind: 'block', 'ensemble' or 'sequence'
+        @param str name: asset name
+        """
+        with self._lock:
+            with self.transaction():
+                self._connection.execute('DELETE FROM assets WHERE kind=? AND name=?',
+                                         (kind, name))
+        return
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+        return
+
+
+class LazyAssetDict(OrderedDict):
+    """
+    OrderedDict of pulse assets by name. Names of stored assets can be added without their
+    objects, which are then loaded by the loader function on first access.
+    Listing the names (iteration, len, in) does not load anything.
+    """
+
+    _not_loaded = object()
+
+    def __init__(self, loader):
+        """
+        @param callable loader: function returning the asset object of a name (or None if it could
+                                not be loaded)
+        """
+        super().__init__()
+        self._loader = loader
+
+    def add_stored(self, names):
+        """
+        Add the names of stored assets, which are loaded on first access.
+
+        @param iterable names: asset names
+        """
+        for name in names:
+            super().__setitem__(name, self._not_loaded)
+        return
+
+    def is_loaded(self, name):
+        return super().__getitem__(name) is not self._not_loaded
+
+    def loaded_items(self):
+        """ (name, asset) tuples of all assets already loaded (without loading the others). """
+        return [(name, value) for name, value in super().items() if value is not self._not_loaded]
+
+    def __getitem__(self, name):
+        value = super().__getitem__(name)
+        if value is self._not_loaded:
+            value = self._loader(name)
+            if value is None:
+                super().__delitem__(name)
+                raise KeyError(name)
+            super().__setitem__(name, value)
+        return value
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def pop(self, name, *default):
+        try:
+            value = self[name]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        super().__delitem__(name)
+        return value
+
+    def values(self):
+        return [self[name] for name in list(self)]
+
+    def items(self):
+        return [(name, self[name]) for name in list(self)]
+
+    def copy(self):
+        return OrderedDict(self.items())
+
+    def __reduce__(self):
+        return OrderedDict, (self.items(),)
+
+
+_json_scalar_types = frozenset((str, int, float, bool, type(None)))
+
+
+def _encode_object(obj):
+    """
+    Convert an object into json serializable types. numpy arrays, tuples, sets and dicts with
+    non-string keys are converted into dicts tagged with the key "__type__".
+    """
+    # Fast path for the most frequent types
+    obj_type = type(obj)
+    if obj_type in _json_scalar_types:
+        return obj
+    if obj_type is dict:
+        for key in obj:
+            if type(key) is not str or key == '__type__':
+                break
+        else:
+            return {key: _encode_object(value) for key, value in obj.items()}
+    elif obj_type is list:
+        return [_encode_object(item) for item in obj]
+
+    if obj is None or isinstance(obj, (str, bool, int, float)):
+        return obj
+    if isinstance(obj, dict):
+        if all(isinstance(key, str) for key in obj) and '__type__' not in obj:
+            encoded = {key: _encode_object(value) for key, value in obj.items()}
+            if isinstance(obj, SequenceStep):
+                return {'__type__': 'SequenceStep', 'value': encoded}
+            return encoded
+        return {'__type__': 'dict',
+                'items': [[_encode_object(key), _encode_object(value)] for key, value in
+                          obj.items()]}
+    if isinstance(obj, list):
+        return [_encode_object(item) for item in obj]
+    if isinstance(obj, tuple):
+        return {'__type__': 'tuple', 'items': [_encode_object(item) for item in obj]}
+    if isinstance(obj, (set, frozenset)):
+        return {'__type__': 'set', 'items': [_encode_object(item) for item in obj]}
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            return {'__type__': 'ndarray', 'dtype': 'object',
+                    'items': _encode_object(obj.tolist())}
+        return {'__type__': 'ndarray',
+                'dtype': obj.dtype.str,
+                'shape': list(obj.shape),
+                'data': base64.b64encode(np.ascontiguousarray(obj).tobytes()).decode('ascii')}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError('Object of type {0} can not be saved.'.format(type(obj).__name__))
+
+
+def _decode_object(obj):
+    """ json object_hook reverting _encode_object. """
+    obj_type = obj.get('__type__')
+    if obj_type is None:
+        return obj
+    if obj_type == 'dict':
+        return {_freeze(key): value for key, value in obj['items']}
+    if obj_type == 'tuple':
+        return tuple(obj['items'])
+    if obj_type == 'set':
+        return set(_freeze(item) for item in obj['items'])
+    if obj_type == 'SequenceStep':
+        return SequenceStep(obj['value'])
+    if obj_type == 'ndarray':
+        if obj['dtype'] == 'object':
+            return np.array(obj['items'], dtype=object)
+        return np.frombuffer(base64.b64decode(obj['data']), dtype=np.dtype(obj['dtype'])).reshape(
+            obj['shape']).copy()
+    raise ValueError('Unknown encoded type "{0}".'.format(obj_type))
+
+
+def _freeze(obj):
+    """ Lists in set items or dict keys were tuples before encoding. """
+    if isinstance(obj, list):
+        return tuple(_freeze(item) for item in obj)
+    return obj
@@ -31,6 +31,11 @@ class BasicPulseExtractor(PulseExtractorBase):
     """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Cached laser edge indices used by "ungated_conv_deriv_cached" together with the settings
+        # they have been detected for and the number of calls since the settings last changed.
+        self._edge_cache = None
+        self._edge_cache_key = None
+        self._edge_cache_calls = 0
 
     def gated_conv_deriv(self, count_data, conv_std_dev=20.0, flank_width=0):
         """
@@ -133,6 +138,120 @@ class BasicPulseExtractor(PulseExtractorBase):
         if not isinstance(number_of_lasers, int):
             return return_dict
 
+        edges = self._detect_laser_edges_conv_deriv(count_data, conv_std_dev, number_of_lasers)
+        # if gaussian smoothing or derivative failed, return only zeros to indicate a failed pulse
+        # extraction.
+        if edges is None:
+            return_dict['laser_counts_arr'] = np.zeros((number_of_lasers, 10), dtype='int64')
+            return return_dict
+        rising_ind, falling_ind = edges
+
+        return_dict['laser_counts_arr'] = self._slice_laser_pulses(count_data,
+                                                                   rising_ind,
+                                                                   falling_ind)
+        return_dict['laser_indices_rising'] = rising_ind
+        return_dict['laser_indices_falling'] = falling_ind
+        return return_dict
+
+    def ungated_conv_deriv_cached(self, count_data, conv_std_dev=20.0, edge_check_interval=100):
+        """
+        Same extraction as "ungated_conv_deriv" but the detected laser edges are cached and reused
+        as long as the measurement and fast counter settings stay the same.
+        Since the laser pulse positions do not move for a fixed pulse sequence, the expensive edge
+        detection (gaussian filtering and iterative flank search over the whole timetrace) is only
+        performed upon settings change or periodically to check for drifts. All other calls only
+        slice the laser pulses from the timetrace using the cached edge indices, so the extraction
+        cost scales with the laser pulse size instead of the timetrace length.
+
+        Edges are re-detected on calls number 1, 2, 4, 8, ... (to quickly refine the initial
+        detection on a timetrace with low statistics) and after that every <edge_check_interval>
+        calls. An edge_check_interval <= 0 disables the periodic drift check.
+
+        @param numpy.ndarray count_data: The raw timetrace data (1D) from an ungated fast counter
+        @param float conv_std_dev: The standard deviation of the gaussian used for smoothing
+        @param int edge_check_interval: Number of calls after which the edges are re-detected
+
+        @return dict: The extracted laser pulses of the timetrace as well as the indices for rising
+                      and falling flanks.
+        """
+        number_of_lasers = self.measurement_settings.get('number_of_lasers')
+        if not isinstance(number_of_lasers, int):
+            return self.ungated_conv_deriv(count_data, conv_std_dev)
+
+        cache_key = self._get_edge_cache_key(count_data, conv_std_dev)
+        if self._edge_cache_key != cache_key:
+            self._edge_cache_key = cache_key
+            self._edge_cache = None
+            self._edge_cache_calls = 0
+        self._edge_cache_calls += 1
+
+        # Check if the edges need to be (re-)detected
+        calls = self._edge_cache_calls
+        detect_edges = self._edge_cache is None or calls & (calls - 1) == 0
+        if edge_check_interval > 0 and calls % edge_check_interval == 0:
+            detect_edges = True
+
+        if detect_edges:
+            return_dict = self.ungated_conv_deriv(count_data, conv_std_dev)
+            # Only cache successful edge detections
+            if return_dict['laser_indices_rising'].size == number_of_lasers:
+                if self._edge_cache is not None and not (
+                        np.array_equal(self._edge_cache[0], return_dict['laser_indices_rising'])
+                        and np.array_equal(self._edge_cache[1],
+                                           return_dict['laser_indices_falling'])):
+                    self.log.debug('Laser pulse edges changed upon re-detection. '
+                                   'Updating cached edges.')
+                self._edge_cache = (return_dict['laser_indices_rising'],
+                                    return_dict['laser_indices_falling'])
+            return return_dict
+
+        rising_ind, falling_ind = self._edge_cache
+        return_dict = dict()
+        return_dict['laser_counts_arr'] = self._slice_laser_pulses(count_data,
+                                                                   rising_ind,
+                                                                   falling_ind)
+        return_dict['laser_indices_rising'] = rising_ind.copy()
+        return_dict['laser_indices_falling'] = falling_ind.copy()
+        return return_dict
+
+    def _get_edge_cache_key(self, count_data, conv_std_dev):
+        """
+        Helper method to create a hashable key describing all settings the laser pulse positions
+        in an ungated timetrace depend on. If this key changes, cached edge positions are invalid.
+
+        @param numpy.ndarray count_data: The raw timetrace data (1D) from an ungated fast counter
+        @param float conv_std_dev: The standard deviation of the gaussian used for smoothing
+
+        @return tuple: hashable cache key
+        """
+        sampling_info = self.sampling_information
+        ensemble_key = (
+            sampling_info.get('number_of_samples'),
+            tuple(np.ravel(sampling_info.get('laser_rising_bins', ()))),
+            tuple(np.ravel(sampling_info.get('laser_falling_bins', ()))))
+        counter_settings = self.fast_counter_settings
+        counter_key = (counter_settings.get('bin_width'),
+                       counter_settings.get('record_length'),
+                       counter_settings.get('number_of_gates'))
+        return (self.measurement_settings.get('number_of_lasers'),
+                count_data.size,
+                conv_std_dev,
+                ensemble_key,
+                counter_key)
+
+    @staticmethod
+    def _detect_laser_edges_conv_deriv(count_data, conv_std_dev, number_of_lasers):
+        """
+        Helper method performing the edge detection for "ungated_conv_deriv".
+        See "ungated_conv_deriv" for a detailed description of the procedure.
+
+        @param numpy.ndarray count_data: The raw timetrace data (1D) from an ungated fast counter
+        @param float conv_std_dev: The standard deviation of the gaussian used for smoothing
+        @param int number_of_lasers: The number of laser pulses to find
+
+        @return (numpy.ndarray, numpy.ndarray): sorted rising and falling edge indices.
+                                                None if the edge detection failed.
+        """
         # apply gaussian filter to remove noise and compute the gradient of the timetrace sum
         try:
             conv = ndimage.filters.gaussian_filter1d(count_data.astype(float), conv_std_dev)
@@ -144,10 +263,8 @@ class BasicPulseExtractor(PulseExtractorBase):
             conv_deriv = np.zeros(conv.size)
 
         # if gaussian smoothing or derivative failed, the returned array only contains zeros.
-        # Check for that and return also only zeros to indicate a failed pulse extraction.
         if len(conv_deriv.nonzero()[0]) == 0:
-            return_dict['laser_counts_arr'] = np.zeros((number_of_lasers, 10), dtype='int64')
-            return return_dict
+            return None
 
         # use a reference for array, because the exact position of the peaks or dips
         # (i.e. maxima or minima, which are the inflection points in the pulse) are distorted by
@@ -235,24 +352,31 @@ class BasicPulseExtractor(PulseExtractorBase):
         rising_ind.sort()
         falling_ind.sort()
 
+        return rising_ind, falling_ind
+
+    @staticmethod
+    def _slice_laser_pulses(count_data, rising_ind, falling_ind):
+        """
+        Helper method to slice the laser pulses out of an ungated timetrace given the rising and
+        falling edge indices. The length of all laser pulses is the maximum detected laser length.
+        Laser pulses exceeding the timetrace are padded with zeros.
+
+        @param numpy.ndarray count_data: The raw timetrace data (1D) from an ungated fast counter
+        @param numpy.ndarray rising_ind: rising edge indices of all laser pulses
+        @param numpy.ndarray falling_ind: falling edge indices of all laser pulses
+
+        @return 2D numpy.ndarray: the extracted laser pulses (dim 0: laser number, 1: time bin)
+        """
         # find the maximum laser length to use as size for the laser array
         laser_length = np.max(falling_ind - rising_ind)
 
-        # initialize the empty output array
-        laser_arr = np.zeros((number_of_lasers, laser_length), dtype='int64')
-        # slice the detected laser pulses of the timetrace and save them in the
-        # output array according to the found rising edge
-        for i in range(number_of_lasers):
-            if rising_ind[i] + laser_length > count_data.size:
-                lenarr = count_data[rising_ind[i]:].size
-                laser_arr[i, 0:lenarr] = count_data[rising_ind[i]:]
-            else:
-                laser_arr[i] = count_data[rising_ind[i]:rising_ind[i] + laser_length]
-
-        return_dict['laser_counts_arr'] = laser_arr.astype('int64')
-        return_dict['laser_indices_rising'] = rising_ind
-        return_dict['laser_indices_falling'] = falling_ind
-        return return_dict
+        # slice the detected laser pulses of the timetrace according to the found rising edge
+        # and pad pulses exceeding the timetrace with zeros
+        bin_indices = rising_ind[:, np.newaxis] + np.arange(laser_length)
+        valid = bin_indices < count_data.size
+        laser_arr = np.zeros((len(rising_ind), laser_length), dtype='int64')
+        laser_arr[valid] = count_data[bin_indices[valid]]
+        return laser_arr
 
     def ungated_threshold(self, count_data, count_threshold=10, min_laser_length=200e-9,
                           threshold_tolerance=20e-9):
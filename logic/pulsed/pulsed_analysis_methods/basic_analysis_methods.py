@@ -56,34 +56,25 @@ class BasicPulseAnalyzer(PulseAnalyzerBase):
         norm_start_bin = round(norm_start / bin_width)
         norm_end_bin = round(norm_end / bin_width)
 
-        # initialize data arrays for signal and measurement error
-        signal_data = np.empty(num_of_lasers, dtype=float)
-        error_data = np.empty(num_of_lasers, dtype=float)
-
-        # loop over all laser pulses and analyze them
-        for ii, laser_arr in enumerate(laser_data):
-            # calculate the sum and mean of the data in the normalization window
-            tmp_data = laser_arr[norm_start_bin:norm_end_bin]
-            reference_sum = np.sum(tmp_data)
-            reference_mean = (reference_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
-
-            # calculate the sum and mean of the data in the signal window
-            tmp_data = laser_arr[signal_start_bin:signal_end_bin]
-            signal_sum = np.sum(tmp_data)
-            signal_mean = (signal_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
-
-            # Calculate normalized signal while avoiding division by zero
-            if reference_mean > 0 and signal_mean >= 0:
-                signal_data[ii] = signal_mean / reference_mean
-            else:
-                signal_data[ii] = 0.0
-
-            # Calculate measurement error while avoiding division by zero
-            if reference_sum > 0 and signal_sum > 0:
-                # calculate with respect to gaussian error 'evolution'
-                error_data[ii] = signal_data[ii] * np.sqrt(1 / signal_sum + 1 / reference_sum)
-            else:
-                error_data[ii] = 0.0
+        # calculate the sum and mean of the data in the normalization and signal window for all
+        # laser pulses at once
+        (reference_sum, signal_sum), (reference_len, signal_len) = self._get_window_sums(
+            laser_data, ((norm_start_bin, norm_end_bin), (signal_start_bin, signal_end_bin)))
+        reference_mean = reference_sum / reference_len if reference_len != 0 else np.zeros(
+            num_of_lasers)
+        signal_mean = signal_sum / signal_len if signal_len != 0 else np.zeros(num_of_lasers)
+
+        # Calculate normalized signal while avoiding division by zero
+        signal_data = np.zeros(num_of_lasers, dtype=float)
+        valid = (reference_mean > 0) & (signal_mean >= 0)
+        np.divide(signal_mean, reference_mean, out=signal_data, where=valid)
+
+        # Calculate measurement error while avoiding division by zero
+        error_data = np.zeros(num_of_lasers, dtype=float)
+        valid = (reference_sum > 0) & (signal_sum > 0)
+        # calculate with respect to gaussian error 'evolution'
+        error_data[valid] = signal_data[valid] * np.sqrt(
+            1 / signal_sum[valid] + 1 / reference_sum[valid])
 
         return signal_data, error_data
 
@@ -106,23 +97,15 @@ class BasicPulseAnalyzer(PulseAnalyzerBase):
         signal_start_bin = round(signal_start / bin_width)
         signal_end_bin = round(signal_end / bin_width)
 
-        # initialize data arrays for signal and measurement error
-        signal_data = np.empty(num_of_lasers, dtype=float)
-        error_data = np.empty(num_of_lasers, dtype=float)
+        # calculate the sum of the data in the signal window for all laser pulses at once
+        (signal,), _ = self._get_window_sums(laser_data, ((signal_start_bin, signal_end_bin),))
 
-        # loop over all laser pulses and analyze them
-        for ii, laser_arr in enumerate(laser_data):
-            # calculate the sum of the data in the signal window
-            signal = laser_arr[signal_start_bin:signal_end_bin].sum()
-            signal_error = np.sqrt(signal)
-
-            # Avoid numpy C type variables overflow and NaN values
-            if signal < 0 or signal != signal:
-                signal_data[ii] = 0.0
-                error_data[ii] = 0.0
-            else:
-                signal_data[ii] = signal
-                error_data[ii] = signal_error
+        # Avoid numpy C type variables overflow and NaN values
+        signal_data = np.zeros(num_of_lasers, dtype=float)
+        error_data = np.zeros(num_of_lasers, dtype=float)
+        valid = signal >= 0
+        signal_data[valid] = signal[valid]
+        error_data[valid] = np.sqrt(signal[valid])
 
         return signal_data, error_data
 
@@ -146,24 +129,19 @@ class BasicPulseAnalyzer(PulseAnalyzerBase):
         signal_start_bin = round(signal_start / bin_width)
         signal_end_bin = round(signal_end / bin_width)
 
-        # initialize data arrays for signal and measurement error
-        signal_data = np.empty(num_of_lasers, dtype=float)
-        error_data = np.empty(num_of_lasers, dtype=float)
-
-        # loop over all laser pulses and analyze them
-        for ii, laser_arr in enumerate(laser_data):
-            # calculate the mean of the data in the signal window
-            signal = laser_arr[signal_start_bin:signal_end_bin].mean()
-            signal_sum = laser_arr[signal_start_bin:signal_end_bin].sum()
-            signal_error = np.sqrt(signal_sum) / (signal_end_bin - signal_start_bin)
-
-            # Avoid numpy C type variables overflow and NaN values
-            if signal < 0 or signal != signal:
-                signal_data[ii] = 0.0
-                error_data[ii] = 0.0
-            else:
-                signal_data[ii] = signal
-                error_data[ii] = signal_error
+        # calculate the sum and mean of the data in the signal window for all laser pulses at once
+        (signal_sum,), (signal_len,) = self._get_window_sums(
+            laser_data, ((signal_start_bin, signal_end_bin),))
+
+        # Avoid numpy C type variables overflow and NaN values (empty signal window)
+        signal_data = np.zeros(num_of_lasers, dtype=float)
+        error_data = np.zeros(num_of_lasers, dtype=float)
+        if signal_len == 0:
+            return signal_data, error_data
+        signal = signal_sum / signal_len
+        valid = signal >= 0
+        signal_data[valid] = signal[valid]
+        error_data[valid] = np.sqrt(signal_sum[valid]) / (signal_end_bin - signal_start_bin)
 
         return signal_data, error_data
 
@@ -214,25 +192,64 @@ class BasicPulseAnalyzer(PulseAnalyzerBase):
         norm_start_bin = round(norm_start / bin_width)
         norm_end_bin = round(norm_end / bin_width)
 
-        # initialize data arrays for signal and measurement error
-        signal_data = np.empty(num_of_lasers, dtype=float)
-        error_data = np.empty(num_of_lasers, dtype=float)
+        # calculate the sum and mean of the data in the normalization and signal window for all
+        # laser pulses at once
+        (reference_sum, signal_sum), (reference_len, signal_len) = self._get_window_sums(
+            laser_data, ((norm_start_bin, norm_end_bin), (signal_start_bin, signal_end_bin)))
+        reference_mean = reference_sum / reference_len if reference_len != 0 else np.zeros(
+            num_of_lasers)
+        signal_mean = signal_sum / signal_len if signal_len != 0 else np.zeros(num_of_lasers)
+
+        signal_data = signal_mean - reference_mean
+
+        # calculate with respect to gaussian error 'evolution'
+        with np.errstate(divide='ignore', invalid='ignore'):
+            error_data = signal_data * np.sqrt(
+                1 / np.abs(signal_sum) + 1 / np.abs(reference_sum))
 
-        # loop over all laser pulses and analyze them
-        for ii, laser_arr in enumerate(laser_data):
-            # calculate the sum and mean of the data in the normalization window
-            tmp_data = laser_arr[norm_start_bin:norm_end_bin]
-            reference_sum = np.sum(tmp_data)
-            reference_mean = (reference_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
+        return signal_data, error_data
 
-            # calculate the sum and mean of the data in the signal window
-            tmp_data = laser_arr[signal_start_bin:signal_end_bin]
-            signal_sum = np.sum(tmp_data)
-            signal_mean = (signal_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
+    @staticmethod
+    def _get_window_sums(laser_data, windows):
+        """
+        Helper method to calculate the sum over several time bin windows for all laser pulses at
+        once. For integer data a single cumulative sum along the time axis is computed over the
+        region spanned by all windows and each window sum is then obtained by a simple difference,
+        which is exact. Floating point data is summed per window, since differences of a
+        cumulative sum are not bit-identical to the sums of the windows.
 
-            signal_data[ii] = signal_mean - reference_mean
+        Window boundaries follow the usual python slicing rules, i.e. each window sum is equal to
+        laser_data[:, start:stop].sum(axis=1).
 
-            # calculate with respect to gaussian error 'evolution'
-            error_data[ii] = signal_data[ii] * np.sqrt(1 / abs(signal_sum) + 1 / abs(reference_sum))
+        @param 2D numpy.ndarray laser_data: the timetraces of all laser pulses
+                                            dim 0: laser pulse number; dim 1: time bin
+        @param iterable windows: iterable of (start_bin, stop_bin) tuples
 
-        return signal_data, error_data
+        @return (list, list): list of 1D numpy arrays containing the sums per laser pulse for each
+                              window, list of the number of bins within each window
+        """
+        num_of_bins = laser_data.shape[1]
+        bounds = list()
+        for start, stop in windows:
+            start, stop, _ = slice(start, stop).indices(num_of_bins)
+            bounds.append((start, max(start, stop)))
+
+        first_bin = min(start for start, stop in bounds)
+        last_bin = max(stop for start, stop in bounds)
+        if last_bin <= first_bin:
+            empty_sum = np.zeros(laser_data.shape[0], dtype=laser_data.sum(axis=1).dtype)
+            return [empty_sum] * len(bounds), [0] * len(bounds)
+
+        window_lengths = [stop - start for start, stop in bounds]
+        if laser_data.dtype.kind not in 'biu':
+            window_sums = [laser_data[:, start:stop].sum(axis=1) for start, stop in bounds]
+            return window_sums, window_lengths
+
+        # cumulative sum with a leading zero column so that window sums are simple differences
+        cumulated = np.cumsum(laser_data[:, first_bin:last_bin], axis=1)
+        cumulated = np.hstack(
+            (np.zeros((laser_data.shape[0], 1), dtype=cumulated.dtype), cumulated))
+
+        window_sums = [cumulated[:, stop - first_bin] - cumulated[:, start - first_bin] for
+                       start, stop in bounds]
+        return window_sums, window_lengths
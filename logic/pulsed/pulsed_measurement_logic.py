@@ -37,6 +37,8 @@ from core.util.math import compute_ft
 from logic.generic_logic import GenericLogic
 from logic.pulsed.pulse_extractor import PulseExtractor
 from logic.pulsed.pulse_analyzer import PulseAnalyzer
+from logic.pulsed.raw_data_stash import RawDataStash
+from logic.pulsed.acquisition_pipeline import AcquisitionPipeline
 
 
 class PulsedMeasurementLogic(GenericLogic):
@@ -57,6 +59,19 @@ class PulsedMeasurementLogic(GenericLogic):
     analysis_import_path = ConfigOption(name='additional_analysis_path', default=None)
     # Optional file type descriptor for saving raw data to file
     _raw_data_save_type = ConfigOption(name='raw_data_save_type', default='text')
+    # Optional directory for the memory-mapped stashed raw data (kept between sessions). A temporary
+    # directory is used if not given.
+    _raw_data_stash_dir = ConfigOption(name='raw_data_stash_dir', default=None, missing='nothing')
+    # Optional interval (in sweeps) of the raw data snapshots of the running measurement (0: off)
+    _raw_data_snapshot_interval = ConfigOption(name='raw_data_snapshot_interval', default=0,
+                                               missing='nothing')
+    # Read the fast counter in a separate thread and analyze the newest trace in another one
+    # instead of both in the analysis timer of the logic thread
+    _asynchronous_acquisition = ConfigOption(name='asynchronous_acquisition', default=False,
+                                             missing='nothing')
+    # Maximum number of fast counter traces waiting for analysis (older ones are dropped)
+    _acquisition_queue_size = ConfigOption(name='acquisition_queue_size', default=2,
+                                           missing='nothing')
 
     # status variables
     # ext. microwave settings
@@ -137,8 +152,15 @@ class PulsedMeasurementLogic(GenericLogic):
         self.laser_data = np.zeros((10, 20), dtype='int64')
         self.raw_data = np.zeros((10, 20), dtype='int64')
 
-        self._saved_raw_data = OrderedDict()  # temporary saved raw data
-        self._recalled_raw_data_tag = None  # the currently recalled raw data dict key
+        self._raw_data_stash = None  # memory-mapped stashed raw data
+        self._recalled_raw_data_tag = None  # the currently recalled raw data stash tag
+        # two buffers for the accumulated raw data including the recalled raw data. The one not
+        # published as raw_data is written (double buffering).
+        self._raw_data_buffers = [None, None]
+        self._next_snapshot_sweeps = 0
+
+        # acquisition/analysis threads (only with asynchronous_acquisition)
+        self._acquisition_pipeline = None
 
         # Paused measurement flag
         self.__is_paused = False
@@ -204,9 +226,22 @@ class PulsedMeasurementLogic(GenericLogic):
         # initialize arrays for the measurement data
         self._initialize_data_arrays()
 
-        # recalled saved raw data dict key
+        # recalled saved raw data stash tag
+        self._raw_data_stash = RawDataStash(self._raw_data_stash_dir)
         self._recalled_raw_data_tag = None
 
+        # acquisition and analysis threads replacing the analysis timer
+        if self._asynchronous_acquisition:
+            self._acquisition_pipeline = AcquisitionPipeline(
+                acquire=self._read_fast_counter,
+                analyze=self._pulsed_analysis_loop,
+                interval=self.__timer_interval,
+                queue_size=self._acquisition_queue_size,
+                name='pulsed measurement',
+                log=self.log)
+        else:
+            self._acquisition_pipeline = None
+
         # Connect internal signals
         self.sigStartTimer.connect(self.__analysis_timer.start, QtCore.Qt.QueuedConnection)
         self.sigStopTimer.connect(self.__analysis_timer.stop, QtCore.Qt.QueuedConnection)
@@ -228,6 +263,9 @@ class PulsedMeasurementLogic(GenericLogic):
         self.__analysis_timer.timeout.disconnect()
         self.sigStartTimer.disconnect()
         self.sigStopTimer.disconnect()
+
+        self._raw_data_buffers = [None, None]
+        self._raw_data_stash.close()
         return
 
     ############################################################################
@@ -779,7 +817,10 @@ class PulsedMeasurementLogic(GenericLogic):
                 self._initialize_data_arrays()
 
                 # recall stashed raw data
-                if stashed_raw_data_tag in self._saved_raw_data:
+                self._raw_data_buffers = [None, None]
+                self._raw_data_stash.clear_snapshots()
+                self._next_snapshot_sweeps = self._raw_data_snapshot_interval
+                if stashed_raw_data_tag in self._raw_data_stash:
                     self._recalled_raw_data_tag = stashed_raw_data_tag
                     self.log.info('Starting pulsed measurement with stashed raw data "{0}".'
                                   ''.format(stashed_raw_data_tag))
@@ -803,7 +844,7 @@ class PulsedMeasurementLogic(GenericLogic):
 
                 # Set starting time and start timer (if present)
                 self.__start_time = time.time()
-                self.sigStartTimer.emit()
+                self._start_analysis()
 
                 # Set measurement paused flag
                 self.__is_paused = False
@@ -816,6 +857,11 @@ class PulsedMeasurementLogic(GenericLogic):
         """
         Stop the measurement
         """
+        # Stop the acquisition and analysis threads (if present). This must not be done while
+        # holding the threadlock since the analysis thread needs it to finish.
+        if self._acquisition_pipeline is not None:
+            self._acquisition_pipeline.stop()
+
         # Get raw data and analyze it a last time just before stopping the measurement.
         try:
             self._pulsed_analysis_loop()
@@ -836,9 +882,10 @@ class PulsedMeasurementLogic(GenericLogic):
 
                 # stash raw data if requested
                 if stash_raw_data_tag:
-                    self._saved_raw_data[stash_raw_data_tag] = (self.raw_data.copy(),
-                                                                {'elapsed_sweeps': self.__elapsed_sweeps,
-                                                                 'elapsed_time': self.__elapsed_time})
+                    self._raw_data_stash.stash(stash_raw_data_tag,
+                                               self.raw_data,
+                                               elapsed_sweeps=self.__elapsed_sweeps,
+                                               elapsed_time=self.__elapsed_time)
                 self._recalled_raw_data_tag = None
 
                 # Set measurement paused flag
@@ -848,6 +895,55 @@ class PulsedMeasurementLogic(GenericLogic):
                 self.sigMeasurementStatusUpdated.emit(False, False)
         return
 
+    @property
+    def stashed_raw_data_tags(self):
+        return self._raw_data_stash.tags
+
+    def merge_stashed_raw_data(self, target_tag, source_tags, remove_sources=False):
+        """
+        Add the stashed raw data of several tags to the stash of target_tag (without loading them
+        into memory).
+
+        @param str target_tag: tag of the stash to add the raw data to (created if necessary)
+        @param list source_tags: tags of the stashes to add
+        @param bool remove_sources: remove the merged stashes afterwards
+
+        @return list: tags of the merged stashes
+        """
+        with self._threadlock:
+            if target_tag == self._recalled_raw_data_tag:
+                self.log.error('Unable to merge into stashed raw data "{0}" while it is recalled '
+                               'by the running measurement.'.format(target_tag))
+                return list()
+            return self._raw_data_stash.merge(target_tag, source_tags,
+                                              remove_sources=remove_sources)
+
+    def remove_stashed_raw_data(self, tag):
+        """
+        Remove stashed raw data.
+
+        @param str tag: tag of the stash
+        """
+        with self._threadlock:
+            if tag == self._recalled_raw_data_tag:
+                self.log.error('Unable to remove stashed raw data "{0}" while it is recalled by '
+                               'the running measurement.'.format(tag))
+                return
+            self._raw_data_stash.remove(tag)
+        return
+
+    def get_raw_data_snapshots(self):
+        """
+        Get the raw data snapshots of the running (or last) measurement taken every
+        <raw_data_snapshot_interval> sweeps. The difference of two snapshots is the raw data
+        acquired in between.
+
+        @return tuple(numpy.ndarray, list): memory-mapped array of the snapshots with shape
+                                            (snapshots,) + raw data shape and info dict of each
+                                            snapshot with keys 'elapsed_sweeps' and 'elapsed_time'
+        """
+        return self._raw_data_stash.get_snapshots()
+
     @QtCore.Slot(bool)
     def toggle_measurement_pause(self, pause):
         """
@@ -866,6 +962,9 @@ class PulsedMeasurementLogic(GenericLogic):
         """
         Pauses the measurement
         """
+        if self._acquisition_pipeline is not None:
+            self._acquisition_pipeline.stop()
+
         with self._threadlock:
             if self.module_state() == 'locked':
                 # pausing the timer
@@ -901,8 +1000,7 @@ class PulsedMeasurementLogic(GenericLogic):
                 self.pulse_generator_on()
 
                 # un-pausing the timer
-                if not self.__analysis_timer.isActive():
-                    self.sigStartTimer.emit()
+                self._start_analysis()
 
                 # Set measurement paused flag
                 self.__is_paused = False
@@ -922,12 +1020,15 @@ class PulsedMeasurementLogic(GenericLogic):
 
         @param int|float interval: Interval of the timer in s
         """
+        if self._acquisition_pipeline is not None and interval <= 0:
+            self._acquisition_pipeline.stop()
+
         with self._threadlock:
             self.__timer_interval = interval
             if self.__timer_interval > 0:
                 self.__analysis_timer.setInterval(int(1000. * self.__timer_interval))
                 if self.module_state() == 'locked' and not self.__is_paused:
-                    self.sigStartTimer.emit()
+                    self._start_analysis()
             else:
                 self.sigStopTimer.emit()
 
@@ -935,6 +1036,34 @@ class PulsedMeasurementLogic(GenericLogic):
                                       self.__timer_interval)
         return
 
+    def _start_analysis(self):
+        """
+        Start the analysis timer or, with asynchronous acquisition, the acquisition and analysis
+        threads (if not running yet).
+        """
+        if self._acquisition_pipeline is None:
+            if not self.__analysis_timer.isActive():
+                self.sigStartTimer.emit()
+        elif self.__timer_interval > 0:
+            self._acquisition_pipeline.interval = self.__timer_interval
+            self._acquisition_pipeline.start()
+        return
+
+    @property
+    def acquisition_metrics(self):
+        """
+        Latency and throughput of the acquisition and analysis threads (only with
+        asynchronous_acquisition, empty dict otherwise).
+
+        @return dict: dicts 'acquisition' and 'analysis' with keys 'count', 'dropped',
+                      'last_latency', 'mean_latency', 'max_latency' (in s), 'throughput'
+                      (traces/s) and 'last_age' (in s, age of the last analyzed trace) and the number
+                      of traces waiting for analysis 'queued'
+        """
+        if self._acquisition_pipeline is None:
+            return dict()
+        return self._acquisition_pipeline.metrics
+
     @QtCore.Slot(str)
     def set_alternative_data_type(self, alt_data_type):
         """
@@ -1097,15 +1226,19 @@ class PulsedMeasurementLogic(GenericLogic):
                                                                         self.__fast_counter_gates))
         return
 
-    def _pulsed_analysis_loop(self):
+    def _pulsed_analysis_loop(self, fast_counter_data=None):
         """ Acquires laser pulses from fast counter,
             calculates fluorescence signal and creates plots.
+
+        @param tuple fast_counter_data: optional, fast counter trace and info dict already read by
+                                        _read_fast_counter (in the acquisition thread). The fast
+                                        counter is read if not given.
         """
         with self._threadlock:
             if self.module_state() == 'locked':
                 # Update elapsed time
 
-                self._extract_laser_pulses()
+                self._extract_laser_pulses(fast_counter_data)
 
                 tmp_signal, tmp_error = self._analyze_laser_pulses()
 
@@ -1147,13 +1280,20 @@ class PulsedMeasurementLogic(GenericLogic):
             self.sigMeasurementDataUpdated.emit()
             return
 
-    def _extract_laser_pulses(self):
+    def _extract_laser_pulses(self, fast_counter_data=None):
         # Get counter raw data (including recalled raw data from previous measurement)
-        fc_data, info_dict = self._get_raw_data()
+        fc_data, info_dict = self._get_raw_data(fast_counter_data)
         self.raw_data = fc_data
         self.__elapsed_sweeps = info_dict['elapsed_sweeps']
         self.__elapsed_time = info_dict['elapsed_time']
 
+        # snapshot of the accumulated raw data every <raw_data_snapshot_interval> sweeps
+        if 0 < self._next_snapshot_sweeps <= self.__elapsed_sweeps:
+            self._raw_data_stash.add_snapshot(self.raw_data, self.__elapsed_sweeps,
+                                              self.__elapsed_time)
+            while self._next_snapshot_sweeps <= self.__elapsed_sweeps:
+                self._next_snapshot_sweeps += self._raw_data_snapshot_interval
+
         # extract laser pulses from raw data
         return_dict = self._pulseextractor.extract_laser_pulses(self.raw_data)
         self.laser_data = return_dict['laser_counts_arr']
@@ -1170,10 +1310,11 @@ class PulsedMeasurementLogic(GenericLogic):
             tmp_error = np.zeros(self.laser_data.shape[0])
         return tmp_signal, tmp_error
 
-    def _get_raw_data(self):
+    def _read_fast_counter(self):
         """
-        Get the raw count data from the fast counting hardware and perform sanity checks.
-        Also add recalled raw data to the newly received data.
+        Get the raw count data from the fast counting hardware.
+        Only reads the hardware, so it can be called from the acquisition thread without the
+        threadlock.
         @return tuple(numpy.ndarray, info_dict): The count data (1D for ungated, 2D for gated counter) and
                                                  info_dict with keys 'elapsed_sweeps' and 'elapsed_time'
         """
@@ -1194,20 +1335,44 @@ class PulsedMeasurementLogic(GenericLogic):
             elapsed_time = info_dict['elapsed_time']
         else:
             elapsed_time = time.time() - self.__start_time
+        return fc_data, {'elapsed_sweeps': elapsed_sweeps, 'elapsed_time': elapsed_time}
 
-        # add old raw data from previous measurements if necessary
-        if self._saved_raw_data.get(self._recalled_raw_data_tag) is not None:
-            # self.log.info('Found old saved raw data with tag "{0}".'
-            #               ''.format(self._recalled_raw_data_tag))
-            elapsed_sweeps += self._saved_raw_data[self._recalled_raw_data_tag][1]['elapsed_sweeps']
-            elapsed_time += self._saved_raw_data[self._recalled_raw_data_tag][1]['elapsed_time']
+    def _get_raw_data(self, fast_counter_data=None):
+        """
+        Get the raw count data from the fast counting hardware and perform sanity checks.
+        Also add recalled raw data to the newly received data.
+        @param tuple fast_counter_data: optional, return value of _read_fast_counter. The fast
+                                        counter is read if not given.
+        @return tuple(numpy.ndarray, info_dict): The count data (1D for ungated, 2D for gated counter) and
+                                                 info_dict with keys 'elapsed_sweeps' and 'elapsed_time'
+        """
+        if fast_counter_data is None:
+            fast_counter_data = self._read_fast_counter()
+        fc_data, info_dict = fast_counter_data
+        elapsed_sweeps = info_dict['elapsed_sweeps']
+        elapsed_time = info_dict['elapsed_time']
+
+        # add old raw data from previous measurements if necessary. The sum is written into one of
+        # two persistent buffers instead of allocating a new array each time. The buffer currently
+        # published as raw_data (read by the GUI) is never written.
+        if self._recalled_raw_data_tag in self._raw_data_stash:
+            stashed_data, stashed_info = self._raw_data_stash.get(self._recalled_raw_data_tag)
+            elapsed_sweeps += stashed_info['elapsed_sweeps']
+            elapsed_time += stashed_info['elapsed_time']
+            index = 1 if self._raw_data_buffers[0] is self.raw_data else 0
+            buffer = self._raw_data_buffers[index]
+            if buffer is None or buffer.shape != stashed_data.shape:
+                buffer = np.empty(stashed_data.shape, dtype='int64')
+                self._raw_data_buffers[index] = buffer
             if not fc_data.any():
                 self.log.warning('Only zeros received from fast counter!\n'
                                  'Using recalled raw data only.')
-                fc_data = self._saved_raw_data[self._recalled_raw_data_tag][0]
-            elif self._saved_raw_data[self._recalled_raw_data_tag][0].shape == fc_data.shape:
+                buffer[...] = stashed_data
+                fc_data = buffer
+            elif stashed_data.shape == fc_data.shape:
                 self.log.debug('Recalled raw data has the same shape as current data.')
-                fc_data = self._saved_raw_data[self._recalled_raw_data_tag][0] + fc_data
+                np.add(stashed_data, fc_data, out=buffer, casting='unsafe')
+                fc_data = buffer
             else:
                 self.log.warning('Recalled raw data has not the same shape as current data.'
                                  '\nDid NOT add recalled raw data to current time trace.')
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the memory-mapped store of stashed raw data and raw data snapshots for the Qudi
+PulsedMeasurementLogic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import numpy as np
+from collections import OrderedDict
+
+
+class RawDataStash:
+    """
+    Store of stashed fast counter raw data (int64) by tag. Each stash is a .npy file in the stash
+    directory which is memory-mapped, so stashed data does not occupy RAM (apart from the page
+    cache of the OS). Stashes can be merged in place.
+
+    Additionally, snapshots of the accumulated raw data of the running measurement can be appended
+    to a binary file, e.g. every n sweeps, to recall the data of any part of a long measurement.
+
+    Without a directory, a temporary directory is used and removed on close. With a directory, the
+    stashes are kept and loaded again on the next start.
+    """
+    index_filename = 'stash_index.json'
+
+    def __init__(self, directory=None):
+        """
+        @param str directory: optional, directory of the stash files
+        """
+        self.log = logging.getLogger(__name__)
+        self._temporary = directory is None
+        if self._temporary:
+            self._directory = tempfile.mkdtemp(prefix='qudi_pulsed_stash_')
+        else:
+            self._directory = directory
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+        # tag -> dict with keys 'filename', 'elapsed_sweeps' and 'elapsed_time'
+        self._entries = OrderedDict()
+        # tag -> memory-mapped array
+        self._arrays = dict()
+
+        self._snapshot_file = None
+        self._snapshot_shape = None
+        self._snapshot_info = list()
+        self._load_index()
+
+    def __contains__(self, tag):
+        return tag in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def tags(self):
+        return list(self._entries)
+
+    def _load_index(self):
+        """ Load the stash index of a persistent stash directory. """
+        index_path = os.path.join(self._directory, self.index_filename)
+        if self._temporary or not os.path.isfile(index_path):
+            return
+        try:
+            with open(index_path, 'r') as file:
+                entries = json.load(file, object_pairs_hook=OrderedDict)
+        except (OSError, ValueError) as e:
+            self.log.error('Raw data stash index "{0}" could not be read: {1}'.format(index_path, e))
+            return
+        for tag, entry in entries.items():
+            if os.path.isfile(os.path.join(self._directory, entry['filename'])):
+                self._entries[tag] = entry
+        return
+
+    def _write_index(self):
+        """ Write the stash index (only for a persistent stash directory). """
+        if self._temporary:
+            return
+        index_path = os.path.join(self._directory, self.index_filename)
+        with open(index_path + '.tmp', 'w') as file:
+            json.dump(self._entries, file)
+        os.replace(index_path + '.tmp', index_path)
+        return
+
+    def _get_array(self, tag):
+        """ Memory-mapped array of a stash, opened on first access. """
+        if tag not in self._arrays:
+            path = os.path.join(self._directory, self._entries[tag]['filename'])
+            self._arrays[tag] = np.load(path, mmap_mode='r+')
+        return self._arrays[tag]
+
+    def stash(self, tag, data, elapsed_sweeps, elapsed_time, merge=False):
+        """
+        Stash raw data under a tag, replacing an existing stash with the same tag.
+
+        @param str tag: name of the stash
+        @param numpy.ndarray data: raw data (1D for ungated, 2D for gated counters)
+        @param int elapsed_sweeps: number of sweeps of the data
+        @param float elapsed_time: measurement time of the data
+        @param bool merge: add the data to an existing stash with the same tag and shape instead
+                           of replacing it
+        """
+        data = np.asarray(data)
+        if merge and tag in self._entries and self._get_array(tag).shape == data.shape:
+            array = self._get_array(tag)
+            np.add(array, data, out=array, casting='unsafe')
+            self._entries[tag]['elapsed_sweeps'] += int(elapsed_sweeps)
+            self._entries[tag]['elapsed_time'] += float(elapsed_time)
+        else:
+            self.remove(tag)
+            filename = 'stash_{0}.npy'.format(hashlib.sha1(tag.encode('utf-8')).hexdigest())
+            array = np.lib.format.open_memmap(os.path.join(self._directory, filename), mode='w+',
+                                              dtype=np.int64, shape=data.shape)
+            array[...] = data
+            self._arrays[tag] = array
+            self._entries[tag] = {'filename': filename,
+                                  'elapsed_sweeps': int(elapsed_sweeps),
+                                  'elapsed_time': float(elapsed_time)}
+        array.flush()
+        self._write_index()
+        return
+
+    def get(self, tag):
+        """
+        Get the stashed raw data of a tag.
+
+        @param str tag: name of the stash
+
+        @return tuple(numpy.memmap, dict): read-only view of the raw data and info dict with keys
+                                           'elapsed_sweeps' and 'elapsed_time'
+        """
+        view = self._get_array(tag).view(np.ndarray)
+        view.flags.writeable = False
+        entry = self._entries[tag]
+        return view, {'elapsed_sweeps': entry['elapsed_sweeps'],
+                      'elapsed_time': entry['elapsed_time']}
+
+    def merge(self, target_tag, source_tags, remove_sources=False):
+        """
+        Add the raw data of several stashes to the target stash in place. The target stash is
+        created from the first source if it does not exist. Sources with a different shape are
+        skipped.
+
+        @param str target_tag: name of the stash to add the data to
+        @param list source_tags: names of the stashes to add
+        @param bool remove_sources: remove the source stashes after merging
+
+        @return list: names of the merged source stashes
+        """
+        merged = list()
+        for tag in source_tags:
+            if tag == target_tag or tag not in self._entries:
+                continue
+            data, info = self.get(tag)
+            if target_tag in self._entries and self._get_array(target_tag).shape != data.shape:
+                self.log.warning('Stashed raw data "{0}" has not the same shape as "{1}". Did NOT '
+                                 'merge it.'.format(tag, target_tag))
+                continue
+            self.stash(target_tag, data, info['elapsed_sweeps'], info['elapsed_time'],
+                       merge=True)
+            merged.append(tag)
+        if remove_sources:
+            for tag in merged:
+                self.remove(tag)
+        return merged
+
+    def remove(self, tag):
+        """
+        Remove a stash and its file.
+
+        @param str tag: name of the stash
+        """
+        entry = self._entries.pop(tag, None)
+        array = self._arrays.pop(tag, None)
+        if entry is None:
+            return
+        if array is not None:
+            array.flush()
+            del array
+        try:
+            os.remove(os.path.join(self._directory, entry['filename']))
+        except OSError as e:
+            # still mapped by a view on some operating systems
+            self.log.warning('Stashed raw data file of "{0}" could not be removed: {1}'
+                             ''.format(tag, e))
+        self._write_index()
+        return
+
+    def add_snapshot(self, data, elapsed_sweeps, elapsed_time):
+        """
+        Append a snapshot of the accumulated raw data of the running measurement.
+
+        @param numpy.ndarray data: accumulated raw data
+        @param int elapsed_sweeps: number of sweeps of the data
+        @param float elapsed_time: measurement time of the data
+        """
+        data = np.asarray(data, dtype=np.int64)
+        if self._snapshot_shape is not None and data.shape != self._snapshot_shape:
+            self.clear_snapshots()
+        if self._snapshot_file is None:
+            self._snapshot_file = open(os.path.join(self._directory, 'snapshots.bin'), 'w+b')
+            self._snapshot_shape = data.shape
+        self._snapshot_file.seek(0, os.SEEK_END)
+        self._snapshot_file.write(np.ascontiguousarray(data).tobytes())
+        self._snapshot_file.flush()
+        self._snapshot_info.append({'elapsed_sweeps': int(elapsed_sweeps),
+                                    'elapsed_time': float(elapsed_time)})
+        return
+
+    def get_snapshots(self):
+        """
+        Get the snapshots of the running (or last) measurement.
+
+        @return tuple(numpy.memmap, list): read-only array with shape (snapshots,) + data shape and
+                                           info dict of each snapshot
+        """
+        if not self._snapshot_info:
+            return np.zeros((0,), dtype=np.int64), list()
+        shape = (len(self._snapshot_info),) + self._snapshot_shape
+        snapshots = np.memmap(self._snapshot_file.name, dtype=np.int64, mode='r', shape=shape)
+        return snapshots, list(self._snapshot_info)
+
+    def clear_snapshots(self):
+        """ Remove all snapshots. """
+        if self._snapshot_file is not None:
+            self._snapshot_file.close()
+            try:
+                os.remove(self._snapshot_file.name)
+            except OSError:
+                pass
+        self._snapshot_file = None
+        self._snapshot_shape = None
+        self._snapshot_info = list()
+        return
+
+    def close(self):
+        """ Close all files. A temporary stash directory is removed. """
+        self.clear_snapshots()
+        for array in self._arrays.values():
+            array.flush()
+        self._arrays.clear()
+        if self._temporary:
+            self._entries.clear()
+            shutil.rmtree(self._directory, ignore_errors=True)
+        return
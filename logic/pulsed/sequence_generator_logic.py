@@ -39,6 +39,10 @@ from logic.generic_logic import GenericLogic
 from logic.pulsed.pulse_objects import PulseBlock, PulseBlockEnsemble, PulseSequence
 from logic.pulsed.pulse_objects import PulseObjectGenerator, PulseBlockElement
 from logic.pulsed.sampling_functions import SamplingFunctions
+from logic.pulsed.parallel_sampling import ParallelAnalogSampler, iterate_sampling_pieces
+from logic.pulsed.waveform_cache import WaveformCache, get_ensemble_hash
+from logic.pulsed.ensemble_analysis import analyze_ensemble_timing, ensemble_digital_runs
+from logic.pulsed.pulse_asset_store import PulseAssetStore, LazyAssetDict
 from interface.pulser_interface import SequenceOption
 
 
@@ -64,7 +68,16 @@ class SequenceGeneratorLogic(GenericLogic):
     _assets_storage_dir = ConfigOption(name='assets_storage_path',
                                        default=os.path.join(get_home_dir(), 'saved_pulsed_assets'),
                                        missing='warn')
+    # Single-file database of the saved blocks, ensembles and sequences (in assets_storage_path)
+    _asset_store_filename = ConfigOption(name='assets_database_file',
+                                         default='pulsed_assets.db',
+                                         missing='nothing')
     _overhead_bytes = ConfigOption(name='overhead_bytes', default=0, missing='nothing')
+    # Number of worker processes used to sample analog waveforms. Serial sampling if <= 1.
+    _sampling_workers = ConfigOption(name='sampling_workers', default=0, missing='nothing')
+    # On-disk cache for sampled waveforms. Disabled if the size (in bytes) is <= 0.
+    _waveform_cache_dir = ConfigOption(name='waveform_cache_path', default=None, missing='nothing')
+    _waveform_cache_size = ConfigOption(name='waveform_cache_size', default=0, missing='nothing')
     # Optional additional paths to import from
     _additional_methods_import_path = ConfigOption(name='additional_predefined_methods_path',
                                                    default=None,
@@ -130,9 +143,31 @@ class SequenceGeneratorLogic(GenericLogic):
         # A flag indicating if sampling of a sequence is in progress
         self.__sequence_generation_in_progress = False
 
+        # Timing information of the last sampling run for each PulseBlockEnsemble name
+        self._sampling_timing = dict()
+        # Ensemble hashes of the waveforms written to the device by this session. Keys are the
+        # waveform names (without channel suffix), values are dicts with keys "hash", "offset_bin"
+        # and "waveforms". Not saved as status variable since the device content may change while
+        # qudi is not running.
+        self._device_waveform_hashes = dict()
+        # On-disk cache for sampled waveforms (WaveformCache instance if enabled)
+        self._waveform_cache = None
+        # Worker pool of the parallel sampling (ParallelAnalogSampler, started on first use)
+        self._parallel_sampler = None
+        # Memoized results of analyze_block_ensemble by ensemble hash (least recently used last)
+        self._ensemble_info_cache = OrderedDict()
+        self._ensemble_info_cache_size = 32
+
         # Get instance of PulseObjectGenerator which takes care of collecting all predefined methods
         self._pog = None
 
+        # Database of the saved pulse objects (PulseAssetStore instance)
+        self._asset_store = None
+        # Pulser waveforms and sequences at activation. Sampling information of saved ensembles and
+        # sequences referring to others is outdated and discarded when loading them.
+        self._activation_waveforms = set()
+        self._activation_sequences = set()
+
         # The created pulse objects (PulseBlock, PulseBlockEnsemble, PulseSequence) are saved in
         # these dictionaries. The keys are the names.
         self._saved_pulse_blocks = OrderedDict()
@@ -187,13 +222,30 @@ class SequenceGeneratorLogic(GenericLogic):
         # Read back settings from device and update instance variables accordingly
         self._read_settings_from_device()
 
-        # Update saved blocks/ensembles/sequences from serialized files
-        self._saved_pulse_blocks = OrderedDict()
-        self._saved_pulse_block_ensembles = OrderedDict()
-        self._saved_pulse_sequences = OrderedDict()
-        self._update_blocks_from_file()
-        self._update_ensembles_from_file()
-        self._update_sequences_from_file()
+        # Waveforms on the device are only reused if written during this activation
+        self._device_waveform_hashes = dict()
+
+        # Set up the on-disk waveform cache if enabled
+        self._waveform_cache = None
+        if self._waveform_cache_size > 0:
+            if not self._waveform_cache_dir:
+                self._waveform_cache_dir = os.path.join(self._assets_storage_dir, 'waveform_cache')
+            self._waveform_cache = WaveformCache(self._waveform_cache_dir,
+                                                 self._waveform_cache_size)
+
+        # Open the asset database and import assets saved as pickle files by older qudi versions
+        self._asset_store = PulseAssetStore(
+            os.path.join(self._assets_storage_dir, self._asset_store_filename))
+        self._import_pickled_assets()
+
+        # Update saved blocks/ensembles/sequences from the asset database. The objects are only
+        # de-serialized on first access.
+        self._saved_pulse_blocks = LazyAssetDict(self._load_block_from_store)
+        self._saved_pulse_block_ensembles = LazyAssetDict(self._load_ensemble_from_store)
+        self._saved_pulse_sequences = LazyAssetDict(self._load_sequence_from_store)
+        self._update_blocks_from_store()
+        self._update_ensembles_from_store()
+        self._update_sequences_from_store()
 
         # Get instance of PulseObjectGenerator which takes care of collecting all predefined methods
         self._pog = PulseObjectGenerator(sequencegeneratorlogic=self)
@@ -204,6 +256,12 @@ class SequenceGeneratorLogic(GenericLogic):
     def on_deactivate(self):
         """ Deinitialisation performed during deactivation of the module.
         """
+        if self._asset_store is not None:
+            self._asset_store.close()
+            self._asset_store = None
+        if self._parallel_sampler is not None:
+            self._parallel_sampler.close()
+            self._parallel_sampler = None
         return
 
     # @_saved_pulse_blocks.constructor
@@ -299,6 +357,16 @@ class SequenceGeneratorLogic(GenericLogic):
     def sampled_sequences(self):
         return netobtain(self.pulsegenerator().get_sequence_names())
 
+    @property
+    def sampling_timing(self):
+        """
+        Timing information of the last sampling run for each sampled PulseBlockEnsemble.
+
+        @return dict: ensemble names as keys and dicts with keys 'workers', 'sampling', 'writing'
+                      and 'total' (times in seconds) as values
+        """
+        return self._sampling_timing.copy()
+
     @property
     def analog_channels(self):
         return {chnl for chnl in self.__activation_config[1] if chnl.startswith('a_ch')}
@@ -446,15 +514,21 @@ class SequenceGeneratorLogic(GenericLogic):
             self.log.error('Can´t clear the pulser as it is running. Switch off the pulser and try again.')
             return -1
         self.pulsegenerator().clear_all()
-        # Delete all sampling information from all PulseBlockEnsembles and PulseSequences
-        for seq_name in self.saved_pulse_sequences:
-            seq = self.saved_pulse_sequences[seq_name]
-            seq.sampling_information = dict()
-            self.save_sequence(seq)
-        for ens_name in self.saved_pulse_block_ensembles:
-            ens = self.saved_pulse_block_ensembles[ens_name]
-            ens.sampling_information = dict()
-            self.save_ensemble(ens)
+        self._device_waveform_hashes = dict()
+        # Delete all sampling information from all PulseBlockEnsembles and PulseSequences.
+        # Assets not loaded yet from the asset database get their sampling information deleted
+        # when loaded.
+        self._activation_waveforms = set()
+        self._activation_sequences = set()
+        with self._asset_store.transaction():
+            for seq_name, seq in self._saved_pulse_sequences.loaded_items():
+                seq.sampling_information = dict()
+                self._save_sequence_to_store(seq)
+            for ens_name, ens in self._saved_pulse_block_ensembles.loaded_items():
+                ens.sampling_information = dict()
+                self._save_ensemble_to_store(ens)
+        self.sigSequenceDictUpdated.emit(self.saved_pulse_sequences)
+        self.sigEnsembleDictUpdated.emit(self.saved_pulse_block_ensembles)
         self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
         self.sigAvailableSequencesUpdated.emit(self.sampled_sequences)
         self.sigLoadedAssetUpdated.emit('', '')
@@ -708,7 +782,7 @@ class SequenceGeneratorLogic(GenericLogic):
         @param PulseBlock block: PulseBlock instance to save
         """
         self._saved_pulse_blocks[block.name] = block
-        self._save_block_to_file(block)
+        self._save_block_to_store(block)
         self.sigBlockDictUpdated.emit(self._saved_pulse_blocks)
         return
 
@@ -733,16 +807,15 @@ class SequenceGeneratorLogic(GenericLogic):
             del (self._saved_pulse_blocks[name])
 
         # Delete from disk
-        filepath = os.path.join(self._assets_storage_dir, '{0}.block'.format(name))
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        self._asset_store.delete('block', name)
 
         self.sigBlockDictUpdated.emit(self.saved_pulse_blocks)
         return
 
     def _load_block_from_file(self, block_name):
         """
-        De-serializes a PulseBlock instance from file.
+        De-serializes a PulseBlock instance from a pickle file saved by older versions of this
+        logic (see _import_pickled_assets).
 
         @param str block_name: The name of the PulseBlock instance to de-serialize
         @return PulseBlock: The de-serialized PulseBlock instance
@@ -763,44 +836,51 @@ class SequenceGeneratorLogic(GenericLogic):
                 self.log.debug('{0!s}'.format(traceback.format_exc()))
         return block
 
-    def _update_blocks_from_file(self):
-        """
-        Update the saved_pulse_blocks dict by de-serializing stored file.
+    def _load_block_from_store(self, block_name):
         """
-        # Get all files in asset directory ending on ".block" and extract a sorted list of
-        # PulseBlock names
-        with os.scandir(self._assets_storage_dir) as scan:
-            names = natural_sort(f.name[:-6] for f in scan if f.is_file and f.name.endswith('.block'))
+        De-serializes a PulseBlock instance from the asset database.
 
-        # Load all blocks from file
-        for block_name in names:
-            block = self._load_block_from_file(block_name)
-            if block is not None:
-                self._saved_pulse_blocks[block_name] = block
+        @param str block_name: The name of the PulseBlock instance to de-serialize
+        @return PulseBlock: The de-serialized PulseBlock instance (None if not possible)
+        """
+        block_dict = self._asset_store.load('block', block_name)
+        if block_dict is None:
+            return None
+        try:
+            return PulseBlock.block_from_dict(block_dict)
+        except:
+            self.log.exception('Failed to de-serialize PulseBlock "{0}" from asset database.'
+                               ''.format(block_name))
+        return None
 
+    def _update_blocks_from_store(self):
+        """
+        Update the saved_pulse_blocks dict with the names of the PulseBlocks in the asset database.
+        """
+        self._saved_pulse_blocks.add_stored(self._asset_store.names('block'))
         self.sigBlockDictUpdated.emit(self._saved_pulse_blocks)
         return
 
-    def _save_block_to_file(self, block):
+    def _save_block_to_store(self, block):
         """
-        Saves a single PulseBlock instance to file by serialization using pickle.
+        Saves a single PulseBlock instance to the asset database.
 
         @param PulseBlock block: The PulseBlock instance to be saved
         """
-        filename = '{0}.block'.format(block.name)
         try:
-            with open(os.path.join(self._assets_storage_dir, filename), 'wb') as file:
-                pickle.dump(block, file)
+            self._asset_store.save('block', block.name, block.get_dict_representation())
         except:
-            self.log.error('Failed to serialize PulseBlock "{0}" to file.'.format(block.name))
+            self.log.exception('Failed to serialize PulseBlock "{0}" to asset database.'
+                               ''.format(block.name))
         return
 
-    def _save_blocks_to_file(self):
+    def _save_blocks_to_store(self):
         """
-        Saves the saved_pulse_blocks dict items to files.
+        Saves the saved_pulse_blocks dict items to the asset database in one transaction.
         """
-        for block in self._saved_pulse_blocks.values():
-            self._save_block_to_file(block)
+        with self._asset_store.transaction():
+            for block in self._saved_pulse_blocks.values():
+                self._save_block_to_store(block)
         return
 
     def save_ensemble(self, ensemble):
@@ -809,7 +889,7 @@ class SequenceGeneratorLogic(GenericLogic):
         @param PulseBlockEnsemble ensemble: PulseBlockEnsemble instance to save
         """
         self._saved_pulse_block_ensembles[ensemble.name] = ensemble
-        self._save_ensemble_to_file(ensemble)
+        self._save_ensemble_to_store(ensemble)
         self.sigEnsembleDictUpdated.emit(self.saved_pulse_block_ensembles)
         return
 
@@ -832,24 +912,23 @@ class SequenceGeneratorLogic(GenericLogic):
         # Delete from dict
         if name in self.saved_pulse_block_ensembles:
             # check if ensemble has already been sampled and delete associated waveforms
-            if self.saved_pulse_block_ensembles[name].sampling_information:
-                self._delete_waveform(
-                    self.saved_pulse_block_ensembles[name].sampling_information['waveforms'])
+            ensemble = self.saved_pulse_block_ensembles.get(name)
+            if ensemble is not None and ensemble.sampling_information:
+                self._delete_waveform(ensemble.sampling_information['waveforms'])
                 self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
             # delete PulseBlockEnsemble
-            del self._saved_pulse_block_ensembles[name]
+            self._saved_pulse_block_ensembles.pop(name, None)
 
         # Delete from disk
-        filepath = os.path.join(self._assets_storage_dir, '{0}.ensemble'.format(name))
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        self._asset_store.delete('ensemble', name)
 
         self.sigEnsembleDictUpdated.emit(self.saved_pulse_block_ensembles)
         return
 
     def _load_ensemble_from_file(self, ensemble_name):
         """
-        De-serializes a PulseBlockEnsemble instance from file.
+        De-serializes a PulseBlockEnsemble instance from a pickle file saved by older versions of
+        this logic (see _import_pickled_assets).
 
         @param str ensemble_name: The name of the PulseBlockEnsemble instance to de-serialize
         @return PulseBlockEnsemble: The de-serialized PulseBlockEnsemble instance
@@ -866,53 +945,63 @@ class SequenceGeneratorLogic(GenericLogic):
                 os.remove(filepath)
         return ensemble
 
-    def _update_ensembles_from_file(self):
+    def _load_ensemble_from_store(self, ensemble_name):
         """
-        Update the saved_pulse_block_ensembles dict from temporary file.
+        De-serializes a PulseBlockEnsemble instance from the asset database. Outdated
+        sampling_information (waveforms no longer present on the pulser at activation) is removed.
+
+        @param str ensemble_name: The name of the PulseBlockEnsemble instance to de-serialize
+        @return PulseBlockEnsemble: The de-serialized PulseBlockEnsemble instance (None if not
+                                    possible)
         """
-        # Get all files in asset directory ending on ".ensemble" and extract a sorted list of
-        # PulseBlockEnsemble names
-        with os.scandir(self._assets_storage_dir) as scan:
-            names = natural_sort(f.name[:-9] for f in scan if f.is_file and f.name.endswith('.ensemble'))
+        ensemble_dict = self._asset_store.load('ensemble', ensemble_name)
+        if ensemble_dict is None:
+            return None
+        try:
+            ensemble = PulseBlockEnsemble.ensemble_from_dict(ensemble_dict)
+        except:
+            self.log.exception('Failed to de-serialize PulseBlockEnsemble "{0}" from asset '
+                               'database.'.format(ensemble_name))
+            return None
+        if ensemble.sampling_information.get('waveforms'):
+            waveform_set = set(ensemble.sampling_information['waveforms'])
+            if not self._activation_waveforms.issuperset(waveform_set):
+                ensemble.sampling_information = dict()
+        return ensemble
 
+    def _update_ensembles_from_store(self):
+        """
+        Update the saved_pulse_block_ensembles dict with the names of the PulseBlockEnsembles in
+        the asset database.
+        """
         # Get all waveforms currently stored on pulser hardware in order to delete outdated
         # sampling_information dicts
-        sampled_waveforms = set(self.sampled_waveforms)
-
-        # Load all ensembles from file
-        for ensemble_name in names:
-            ensemble = self._load_ensemble_from_file(ensemble_name)
-            if ensemble is not None:
-                if ensemble.sampling_information.get('waveforms'):
-                    waveform_set = set(ensemble.sampling_information['waveforms'])
-                    if not sampled_waveforms.issuperset(waveform_set):
-                        ensemble.sampling_information = dict()
-                self._saved_pulse_block_ensembles[ensemble_name] = ensemble
+        self._activation_waveforms = set(self.sampled_waveforms)
 
+        self._saved_pulse_block_ensembles.add_stored(self._asset_store.names('ensemble'))
         self.sigEnsembleDictUpdated.emit(self.saved_pulse_block_ensembles)
         return
 
-    def _save_ensemble_to_file(self, ensemble):
+    def _save_ensemble_to_store(self, ensemble):
         """
-        Saves a single PulseBlockEnsemble instance to file by serialization using pickle.
+        Saves a single PulseBlockEnsemble instance to the asset database.
 
         @param PulseBlockEnsemble ensemble: The PulseBlockEnsemble instance to be saved
         """
-        filename = '{0}.ensemble'.format(ensemble.name)
         try:
-            with open(os.path.join(self._assets_storage_dir, filename), 'wb') as file:
-                pickle.dump(ensemble, file)
+            self._asset_store.save('ensemble', ensemble.name, ensemble.get_dict_representation())
         except:
-            self.log.error('Failed to serialize PulseBlockEnsemble "{0}" to file.'
-                           ''.format(ensemble.name))
+            self.log.exception('Failed to serialize PulseBlockEnsemble "{0}" to asset database.'
+                               ''.format(ensemble.name))
         return
 
-    def _save_ensembles_to_file(self):
+    def _save_ensembles_to_store(self):
         """
-        Saves the saved_pulse_block_ensembles dict items to files.
+        Saves the saved_pulse_block_ensembles dict items to the asset database in one transaction.
         """
-        for ensemble in self.saved_pulse_block_ensembles.values():
-            self._save_ensemble_to_file(ensemble)
+        with self._asset_store.transaction():
+            for ensemble in self.saved_pulse_block_ensembles.values():
+                self._save_ensemble_to_store(ensemble)
         return
 
     def save_sequence(self, sequence):
@@ -924,7 +1013,7 @@ class SequenceGeneratorLogic(GenericLogic):
         @return: str: name of the serialized object, if needed.
         """
         self._saved_pulse_sequences[sequence.name] = sequence
-        self._save_sequence_to_file(sequence)
+        self._save_sequence_to_store(sequence)
         self.sigSequenceDictUpdated.emit(self.saved_pulse_sequences)
         return
 
@@ -947,44 +1036,44 @@ class SequenceGeneratorLogic(GenericLogic):
         if name in self.saved_pulse_sequences:
             # check if sequence has already been sampled and delete associated sequence from pulser.
             # Also delete associated waveforms if sequence has been sampled within rotating frame.
-            if self.saved_pulse_sequences[name].sampling_information:
+            sequence = self.saved_pulse_sequences.get(name)
+            if sequence is not None and sequence.sampling_information:
                 self._delete_sequence(name)
-                if self.saved_pulse_sequences[name].rotating_frame:
-                    self._delete_waveform(
-                        self.saved_pulse_sequences[name].sampling_information['waveforms'])
+                if sequence.rotating_frame:
+                    self._delete_waveform(sequence.sampling_information['waveforms'])
                     self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
             # delete PulseSequence
-            del self._saved_pulse_sequences[name]
+            self._saved_pulse_sequences.pop(name, None)
 
         # Delete from disk
-        filepath = os.path.join(self._assets_storage_dir, '{0}.sequence'.format(name))
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        self._asset_store.delete('sequence', name)
 
         self.sigSequenceDictUpdated.emit(self.saved_pulse_sequences)
         return
 
     def _load_sequence_from_file(self, sequence_name):
         """
-        De-serializes a PulseSequence instance from file.
+        De-serializes a PulseSequence instance from a pickle file saved by older versions of this
+        logic (see _import_pickled_assets).
 
         @param str sequence_name: The name of the PulseSequence instance to de-serialize
         @return PulseSequence: The de-serialized PulseSequence instance
         """
         filepath = os.path.join(self._assets_storage_dir, '{0}.sequence'.format(sequence_name))
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, 'rb') as file:
-                    sequence = pickle.load(file)
-                # FIXME: Due to the pickling the dict namespace merging gets lost on the way.
-                # Restored it here but a better way needs to be found.
-                for step in range(len(sequence)):
-                    sequence[step].__dict__ = sequence[step]
-            except pickle.UnpicklingError:
-                self.log.error('Failed to de-serialize PulseSequence "{0}" from file.'
-                               ''.format(sequence_name))
-                os.remove(filepath)
-                return None
+        if not os.path.exists(filepath):
+            return None
+        try:
+            with open(filepath, 'rb') as file:
+                sequence = pickle.load(file)
+            # FIXME: Due to the pickling the dict namespace merging gets lost on the way.
+            # Restored it here but a better way needs to be found.
+            for step in range(len(sequence)):
+                sequence[step].__dict__ = sequence[step]
+        except pickle.UnpicklingError:
+            self.log.error('Failed to de-serialize PulseSequence "{0}" from file.'
+                           ''.format(sequence_name))
+            os.remove(filepath)
+            return None
 
         # Conversion for backwards compatibility
         if len(sequence) > 0 and not isinstance(sequence[0].flag_high, list):
@@ -1025,58 +1114,110 @@ class SequenceGeneratorLogic(GenericLogic):
                                    ''.format(sequence_name))
                     os.remove(filepath)
                     return None
-            self._save_sequence_to_file(sequence)
         return sequence
 
-    def _update_sequences_from_file(self):
+    def _load_sequence_from_store(self, sequence_name):
         """
-        Update the saved_pulse_sequences dict from files.
+        De-serializes a PulseSequence instance from the asset database. Outdated
+        sampling_information (sequence or waveforms no longer present on the pulser at activation)
+        is removed.
+
+        @param str sequence_name: The name of the PulseSequence instance to de-serialize
+        @return PulseSequence: The de-serialized PulseSequence instance (None if not possible)
         """
-        # Get all files in asset directory ending on ".sequence" and extract a sorted list of
-        # PulseSequence names
-        with os.scandir(self._assets_storage_dir) as scan:
-            names = natural_sort(f.name[:-9] for f in scan if f.is_file and f.name.endswith('.sequence'))
+        sequence_dict = self._asset_store.load('sequence', sequence_name)
+        if sequence_dict is None:
+            return None
+        try:
+            sequence = PulseSequence.sequence_from_dict(sequence_dict)
+        except:
+            self.log.exception('Failed to de-serialize PulseSequence "{0}" from asset database.'
+                               ''.format(sequence_name))
+            return None
+        if sequence.name not in self._activation_sequences:
+            sequence.sampling_information = dict()
+        elif sequence.sampling_information:
+            waveform_set = set(sequence.sampling_information['waveforms'])
+            if not self._activation_waveforms.issuperset(waveform_set):
+                sequence.sampling_information = dict()
+        return sequence
 
+    def _update_sequences_from_store(self):
+        """
+        Update the saved_pulse_sequences dict with the names of the PulseSequences in the asset
+        database.
+        """
         # Get all waveforms and sequences currently stored on pulser hardware in order to delete
         # outdated sampling_information dicts
-        sampled_waveforms = set(self.sampled_waveforms)
-        sampled_sequences = set(self.sampled_sequences)
-
-        # Load all sequences from file
-        for sequence_name in names:
-            sequence = self._load_sequence_from_file(sequence_name)
-            if sequence is not None:
-                if sequence.name not in sampled_sequences:
-                    sequence.sampling_information = dict()
-                elif sequence.sampling_information:
-                    waveform_set = set(sequence.sampling_information['waveforms'])
-                    if not sampled_waveforms.issuperset(waveform_set):
-                        sequence.sampling_information = dict()
-                self._saved_pulse_sequences[sequence_name] = sequence
+        self._activation_waveforms = set(self.sampled_waveforms)
+        self._activation_sequences = set(self.sampled_sequences)
 
+        self._saved_pulse_sequences.add_stored(self._asset_store.names('sequence'))
         self.sigSequenceDictUpdated.emit(self.saved_pulse_sequences)
         return
 
-    def _save_sequence_to_file(self, sequence):
+    def _save_sequence_to_store(self, sequence):
         """
-        Saves a single PulseSequence instance to file by serialization using pickle.
+        Saves a single PulseSequence instance to the asset database.
 
         @param PulseSequence sequence: The PulseSequence instance to be saved
         """
-        filename = '{0}.sequence'.format(sequence.name)
         try:
-            with open(os.path.join(self._assets_storage_dir, filename), 'wb') as file:
-                pickle.dump(sequence, file)
+            self._asset_store.save('sequence', sequence.name, sequence.get_dict_representation())
         except:
-            self.log.error('Failed to serialize PulseSequence "{0}" to file.'.format(sequence.name))
+            self.log.exception('Failed to serialize PulseSequence "{0}" to asset database.'
+                               ''.format(sequence.name))
         return
 
-    def _save_sequences_to_file(self):
+    def _save_sequences_to_store(self):
         """
-        Saves the saved_pulse_sequences dict items to files.
+        Saves the saved_pulse_sequences dict items to the asset database in one transaction.
         """
-        for sequence in self.saved_pulse_sequences.values():
-            self._save_sequence_to_file(sequence)
+        with self._asset_store.transaction():
+            for sequence in self.saved_pulse_sequences.values():
+                self._save_sequence_to_store(sequence)
+        return
+
+    def _import_pickled_assets(self):
+        """
+        Imports PulseBlocks, PulseBlockEnsembles and PulseSequences saved as pickle files
+        (<name>.block, <name>.ensemble, <name>.sequence) by older versions of this logic into the
+        asset database in one transaction. Imported files are moved into the sub-directory
+        "imported_pickle_files" of the assets storage directory.
+        """
+        loaders = {'block': self._load_block_from_file,
+                   'ensemble': self._load_ensemble_from_file,
+                   'sequence': self._load_sequence_from_file}
+        with os.scandir(self._assets_storage_dir) as scan:
+            filenames = natural_sort(f.name for f in scan if
+                                     f.is_file() and f.name.rsplit('.', 1)[-1] in loaders)
+        if not filenames:
+            return
+
+        imported = list()
+        with self._asset_store.transaction():
+            for filename in filenames:
+                name, kind = filename.rsplit('.', 1)
+                asset = loaders[kind](name)
+                if asset is None:
+                    continue
+                try:
+                    self._asset_store.save(kind, name, asset.get_dict_representation())
+                except:
+                    self.log.exception('Failed to import pulse asset file "{0}" into asset '
+                                       'database.'.format(filename))
+                    continue
+                imported.append(filename)
+
+        # Only move the files after the import has been committed
+        imported_dir = os.path.join(self._assets_storage_dir, 'imported_pickle_files')
+        if imported and not os.path.exists(imported_dir):
+            os.makedirs(imported_dir)
+        for filename in imported:
+            os.replace(os.path.join(self._assets_storage_dir, filename),
+                       os.path.join(imported_dir, filename))
+        self.log.info('Imported {0:d} pulse asset files into asset database "{1}".'
+                      ''.format(len(imported), self._asset_store.path))
         return
 
     def generate_predefined_sequence(self, predefined_sequence_name, kwargs_dict):
@@ -1110,13 +1251,6 @@ class SequenceGeneratorLogic(GenericLogic):
             self.sigPredefinedSequenceGenerated.emit(None, False)
             return
 
-        # Save objects
-        for block in blocks:
-            self.save_block(block)
-        for ensemble in ensembles:
-            ensemble.sampling_information = dict()
-            self.save_ensemble(ensemble)
-
         if self.pulse_generator_constraints.sequence_option == SequenceOption.FORCED and len(sequences) < 1:
             self.log.info('Adding default sequence for: {0:s}'.format(predefined_sequence_name))
             self._add_default_sequence(ensembles, sequences)
@@ -1124,9 +1258,16 @@ class SequenceGeneratorLogic(GenericLogic):
                 self.log.debug('New default PulseSequence is: {0:s} length {1:d}'
                                ''.format(sequences[0].name, len(sequences)))
 
-        for sequence in sequences:
-            sequence.sampling_information = dict()
-            self.save_sequence(sequence)
+        # Save objects in one transaction of the asset database
+        with self._asset_store.transaction():
+            for block in blocks:
+                self.save_block(block)
+            for ensemble in ensembles:
+                ensemble.sampling_information = dict()
+                self.save_ensemble(ensemble)
+            for sequence in sequences:
+                sequence.sampling_information = dict()
+                self.save_sequence(sequence)
 
         created_name = gen_params.get('name') if 'name' not in kwargs_dict else kwargs_dict['name']
         self.sigPredefinedSequenceGenerated.emit(created_name, len(sequences) > 0)
@@ -1258,108 +1399,44 @@ class SequenceGeneratorLogic(GenericLogic):
         laser_channel = self.generation_parameters['gate_channel'] if self.generation_parameters[
             'gate_channel'] else self.generation_parameters['laser_channel']
 
-        # memorize the digital channel state of the previous element
-        tmp_digital_high = dict()
-        # memorize the laser_on flag of the previous element (in case of non-digital laser channel)
-        tmp_laser_on = False
-        # Set of used analog and digital channels
-        digital_channels = set()
-        analog_channels = set()
-        # check for active channels and initialize tmp_digital_high/tmp_laser_on with the state of
-        # the very last element in the ensemble
-        if len(ensemble) > 0:
-            block = self.get_block(ensemble[0][0])
-            digital_channels = block.digital_channels
-            analog_channels = block.analog_channels
-            block = self.get_block(ensemble[-1][0])
-            if len(block) > 0:
-                tmp_digital_high = block[-1].digital_high.copy()
-                tmp_laser_on = block[-1].laser_on
-            else:
-                tmp_digital_high = {chnl: False for chnl in digital_channels}
-                tmp_laser_on = False
-
-        # dicts containing the bins where the digital channels are rising/falling
-        digital_rising_bins = {chnl: list() for chnl in digital_channels}
-        digital_falling_bins = {chnl: list() for chnl in digital_channels}
-        laser_rising_bins = list()
-        laser_falling_bins = list()
-
-        # Array to store the length in bins for all elements including repetitions in the order
-        # they are occuring in the waveform later on.
-        elements_length_bins = list()
-
-        # variables to keep track of the current timeframe
-        current_end_time = 0.0
-        current_start_bin = 0
-
-        # Loop through all blocks in the ensemble
-        for block_name, reps in ensemble:
-            # Get the stored PulseBlock instance
-            block = self.get_block(block_name)
-
-            # Iterate over all repetitions of the current block
-            for rep_no in range(reps + 1):
-                # Iterate over the Block_Elements inside the current block
-                for element in block:
-                    # save bin position if a transition from low to high or vice versa has occurred
-                    # in a digital channel
-                    if tmp_digital_high != element.digital_high:
-                        for chnl, state in element.digital_high.items():
-                            if not tmp_digital_high[chnl] and state:
-                                digital_rising_bins[chnl].append(current_start_bin)
-                            elif tmp_digital_high[chnl] and not state:
-                                digital_falling_bins[chnl].append(current_start_bin)
-                        tmp_digital_high = element.digital_high.copy()
-
-                    if not laser_channel.startswith('d') and tmp_laser_on != element.laser_on:
-                        if not tmp_laser_on and element.laser_on:
-                            laser_rising_bins.append(current_start_bin)
-                        else:
-                            laser_falling_bins.append(current_start_bin)
-                        tmp_laser_on = element.laser_on
-
-                    # Calculate length of the current element with current repetition count in sec
-                    # and add this to the ideal end time for the sequence up until this point.
-                    current_end_time += element.init_length_s + rep_no * element.increment_s
-
-                    # Nearest possible match including the discretization in bins
-                    current_end_bin = int(np.rint(current_end_time * self.__sample_rate))
-
-                    # append current element length in discrete bins to temporary array
-                    elements_length_bins.append(current_end_bin - current_start_bin)
-
-                    # advance bin offset for next element
-                    current_start_bin = current_end_bin
-
-        elements_length_bins = np.array(elements_length_bins, dtype='int64')
-
-        # convert rising/falling indices to numpy.ndarrays. Remove duplicates.
-        for chnl in digital_channels:
-            digital_rising_bins[chnl] = sorted(set(digital_rising_bins[chnl]))
-            digital_falling_bins[chnl] = sorted(set(digital_falling_bins[chnl]))
-            digital_rising_bins[chnl] = np.array(digital_rising_bins[chnl], dtype='int64')
-            digital_falling_bins[chnl] = np.array(digital_falling_bins[chnl], dtype='int64')
-        if laser_channel.startswith('d'):
-            laser_rising_bins = digital_rising_bins[laser_channel]
-            laser_falling_bins = digital_falling_bins[laser_channel]
-        else:
-            laser_rising_bins = np.array(sorted(set(laser_rising_bins)), dtype='int64')
-            laser_falling_bins = np.array(sorted(set(laser_falling_bins)), dtype='int64')
+        # The result only depends on the timing of the blocks, the sample rate and the laser
+        # channel. Return the memoized result if these did not change.
+        blocks = {name: self.get_block(name) for name, reps in ensemble.block_list}
+        ensemble_hash = get_ensemble_hash(ensemble, blocks, {'sample_rate': self.__sample_rate,
+                                                             'laser_channel': laser_channel})
+        timing = self._ensemble_info_cache.pop(ensemble_hash, None)
+        if timing is None:
+            timing = analyze_ensemble_timing(
+                [(blocks[name], reps) for name, reps in ensemble.block_list],
+                sample_rate=self.__sample_rate,
+                laser_channel=laser_channel)
+            # protect the memoized arrays against modification by the caller
+            for array in [timing['elements_length_bins'], timing['laser_rising_bins'],
+                          timing['laser_falling_bins']] + list(
+                    timing['digital_rising_bins'].values()) + list(
+                    timing['digital_falling_bins'].values()):
+                array.flags.writeable = False
+            while len(self._ensemble_info_cache) >= self._ensemble_info_cache_size:
+                self._ensemble_info_cache.popitem(last=False)
+        self._ensemble_info_cache[ensemble_hash] = timing
+
+        elements_length_bins = timing['elements_length_bins']
+        analog_channels = set(timing['analog_channels'])
+        digital_channels = set(timing['digital_channels'])
 
         return_dict = dict()
         return_dict['number_of_samples'] = np.sum(elements_length_bins)
         return_dict['number_of_elements'] = len(elements_length_bins)
         return_dict['elements_length_bins'] = elements_length_bins
-        return_dict['digital_rising_bins'] = digital_rising_bins
-        return_dict['digital_falling_bins'] = digital_falling_bins
+        return_dict['digital_rising_bins'] = timing['digital_rising_bins'].copy()
+        return_dict['digital_falling_bins'] = timing['digital_falling_bins'].copy()
         return_dict['analog_channels'] = analog_channels
         return_dict['digital_channels'] = digital_channels
         return_dict['channel_set'] = analog_channels.union(digital_channels)
         return_dict['generation_parameters'] = self.generation_parameters.copy()
-        return_dict['ideal_length'] = current_end_time
-        return_dict['laser_rising_bins'] = laser_rising_bins
-        return_dict['laser_falling_bins'] = laser_falling_bins
+        return_dict['ideal_length'] = timing['ideal_length']
+        return_dict['laser_rising_bins'] = timing['laser_rising_bins']
+        return_dict['laser_falling_bins'] = timing['laser_falling_bins']
         return return_dict
 
     def analyze_sequence(self, sequence):
@@ -1690,9 +1767,6 @@ class SequenceGeneratorLogic(GenericLogic):
         # Set the waveform name (excluding the device specific channel naming suffix, i.e. '_ch1')
         waveform_name = name_tag if name_tag else ensemble.name
 
-        # check for old waveforms associated with the ensemble and delete them from pulse generator.
-        self._delete_waveform_by_nametag(waveform_name)
-
         # Take current time
         start_time = time.time()
 
@@ -1738,6 +1812,20 @@ class SequenceGeneratorLogic(GenericLogic):
                 self.log.warn('Extending waveform {0} by {2} bins. New length {1}.'.format(
                     ensemble.name, ensemble_info['number_of_samples'], extension_samples))
 
+        # Check if identical waveforms (by ensemble hash) are already present on the device.
+        # Otherwise delete old waveforms associated with the ensemble from pulse generator.
+        # The hash is taken after the granularity padding, which changes the ensemble the first
+        # time it is sampled.
+        ensemble_hash = self._get_ensemble_hash(ensemble, offset_bin)
+        device_record = self._device_waveform_hashes.get(waveform_name)
+        reuse_device_waveforms = False
+        if device_record is not None and device_record['hash'] == ensemble_hash:
+            ready_waveforms = self.sampled_waveforms
+            reuse_device_waveforms = all(wfm in ready_waveforms for wfm in
+                                         device_record['waveforms'])
+        if not reuse_device_waveforms:
+            self._delete_waveform_by_nametag(waveform_name)
+
         # Calculate the byte size per sample.
         # One analog sample per channel is 4 bytes (np.float32) and one digital sample per channel
         # is 1 byte (np.bool).
@@ -1753,6 +1841,107 @@ class SequenceGeneratorLogic(GenericLogic):
         else:
             array_length = self._overhead_bytes // bytes_per_sample
 
+        # Digital-only waveforms are written as runs of constant channel states if the device
+        # supports it, without creating sample arrays (and without the waveform cache).
+        write_runs = (not ensemble_info['analog_channels']
+                      and ensemble_info['number_of_samples'] > 0
+                      and getattr(self.pulse_generator_constraints, 'run_length_waveforms', False))
+
+        # Sample the ensemble and write the samples chunkwise to the device.
+        # Skip sampling if the waveforms are already on the device or cached on disk.
+        cache_entry = None
+        cache_writer = None
+        if not reuse_device_waveforms and not write_runs and self._waveform_cache is not None:
+            cache_entry = self._waveform_cache.get_entry(ensemble_hash)
+            if cache_entry is None:
+                cache_writer = self._waveform_cache.create_writer(
+                    ensemble_hash,
+                    ensemble_info['analog_channels'],
+                    ensemble_info['digital_channels'],
+                    ensemble_info['number_of_samples'])
+
+        if reuse_device_waveforms:
+            self.log.debug('Identical waveforms for PulseBlockEnsemble "{0}" found on device. '
+                           'Sampling skipped.'.format(ensemble.name))
+            result = (device_record['offset_bin'],
+                      set(device_record['waveforms']),
+                      {'workers': 0, 'sampling': 0.0, 'writing': 0.0})
+        elif write_runs:
+            result = self._write_ensemble_runs(ensemble, ensemble_info, waveform_name, offset_bin)
+        elif cache_entry is not None:
+            self.log.debug('Cached samples for PulseBlockEnsemble "{0}" found. Sampling skipped.'
+                           ''.format(ensemble.name))
+            result = self._write_ensemble_from_cache(
+                ensemble, ensemble_info, waveform_name, cache_entry, array_length)
+        elif (self._sampling_workers > 1 and ensemble_info['analog_channels']
+                and ensemble_info['number_of_samples'] > 0):
+            result = self._write_ensemble_parallel(
+                ensemble, ensemble_info, waveform_name, offset_bin, array_length, cache_writer)
+        else:
+            result = self._write_ensemble_serial(
+                ensemble, ensemble_info, waveform_name, offset_bin, array_length, cache_writer)
+
+        if cache_writer is not None:
+            if result is None:
+                cache_writer.discard()
+            else:
+                cache_writer.finalize(result[0])
+        if result is None:
+            self._device_waveform_hashes.pop(waveform_name, None)
+            if not self.__sequence_generation_in_progress:
+                self.module_state.unlock()
+            self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
+            self.sigSampleEnsembleComplete.emit(None)
+            return -1, list(), dict()
+        offset_bin, written_waveforms, timing = result
+        self._device_waveform_hashes[waveform_name] = {'hash': ensemble_hash,
+                                                       'offset_bin': int(offset_bin),
+                                                       'waveforms': natural_sort(written_waveforms)}
+
+        # Save sampling related parameters to the sampling_information container within the
+        # PulseBlockEnsemble.
+        # This step is only performed if the resulting waveforms are named by the PulseBlockEnsemble
+        # and not by a sequence nametag
+        if waveform_name == ensemble.name:
+            ensemble.sampling_information = dict()
+            ensemble.sampling_information.update(ensemble_info)
+            ensemble.sampling_information['pulse_generator_settings'] = self.pulse_generator_settings
+            ensemble.sampling_information['waveforms'] = natural_sort(written_waveforms)
+            self.save_ensemble(ensemble)
+
+        timing['total'] = time.time() - start_time
+        self._sampling_timing[ensemble.name] = timing
+        self.log.info('Time needed for sampling and writing PulseBlockEnsemble {0} to device: {1} sec'
+                      ''.format(ensemble.name, int(np.rint(timing['total']))))
+        self.log.info('Timing of PulseBlockEnsemble "{0}" ({1:d} worker processes): sampling {2:.3f} '
+                      'sec, writing {3:.3f} sec, {4:.3e} samples/sec'
+                      ''.format(ensemble.name, timing['workers'], timing['sampling'],
+                                 timing['writing'],
+                                 ensemble_info['number_of_samples'] / max(timing['total'], 1e-9)))
+        if ensemble_info['number_of_samples'] == 0:
+            self.log.warning('Empty waveform (0 samples) created from PulseBlockEnsemble "{0}".'
+                             ''.format(ensemble.name))
+        if not self.__sequence_generation_in_progress:
+            self.module_state.unlock()
+        self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
+        self.sigSampleEnsembleComplete.emit(ensemble)
+        return offset_bin, natural_sort(written_waveforms), ensemble_info
+
+    def _write_ensemble_serial(self, ensemble, ensemble_info, waveform_name, offset_bin,
+                               array_length, cache_writer=None):
+        """
+        Samples a PulseBlockEnsemble element by element in the calling thread and writes the
+        samples to the device in chunks of <array_length> samples.
+
+        @param PulseBlockEnsemble ensemble: the ensemble to sample
+        @param dict ensemble_info: information about the ensemble (see analyze_block_ensemble)
+        @param str waveform_name: the name of the waveform to create on the device
+        @param int offset_bin: the time offset bin to start with (rotating frame)
+        @param int array_length: the number of samples to write to the device at once
+        @param CachedWaveformWriter cache_writer: optional writer to store the samples on disk
+
+        @return tuple: (offset_bin, set of written waveform names, timing dict) or None if failed
+        """
         # Allocate the sample arrays that are used for a single write command
         analog_samples = dict()
         digital_samples = dict()
@@ -1766,10 +1955,7 @@ class SequenceGeneratorLogic(GenericLogic):
                            'The sample array needed is too large to allocate in memory.\n'
                            'Try using the overhead_bytes ConfigOption to limit memory usage.'
                            ''.format(ensemble.name))
-            if not self.__sequence_generation_in_progress:
-                self.module_state.unlock()
-            self.sigSampleEnsembleComplete.emit(None)
-            return -1, list(), dict()
+            return None
 
         # integer to keep track of the sampls already processed
         processed_samples = 0
@@ -1779,6 +1965,9 @@ class SequenceGeneratorLogic(GenericLogic):
         element_count = 0
         # set of written waveform names on the device
         written_waveforms = set()
+        # time spent sampling and writing to the device
+        start_time = time.time()
+        write_time = 0.0
         # Iterate over all blocks within the PulseBlockEnsemble object
         for block_name, reps in ensemble.block_list:
             block = self.get_block(block_name)
@@ -1828,6 +2017,7 @@ class SequenceGeneratorLogic(GenericLogic):
                             # Set first/last chunk flags
                             is_first_chunk = array_write_index == processed_samples
                             is_last_chunk = processed_samples == ensemble_info['number_of_samples']
+                            write_start = time.time()
                             written_samples, wfm_list = self.pulsegenerator().write_waveform(
                                 name=waveform_name,
                                 analog_samples=analog_samples,
@@ -1836,6 +2026,8 @@ class SequenceGeneratorLogic(GenericLogic):
                                 is_last_chunk=is_last_chunk,
                                 total_number_of_samples=ensemble_info['number_of_samples'])
 
+                            write_time += time.time() - write_start
+
                             # Update written waveforms set
                             written_waveforms.update(wfm_list)
 
@@ -1847,11 +2039,10 @@ class SequenceGeneratorLogic(GenericLogic):
                                                'the number of samples staged to write ({3:d}).'
                                                ''.format(block_name, ensemble.name, written_samples,
                                                          array_length))
-                                if not self.__sequence_generation_in_progress:
-                                    self.module_state.unlock()
-                                self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
-                                self.sigSampleEnsembleComplete.emit(None)
-                                return -1, list(), dict()
+                                return None
+
+                            if cache_writer is not None:
+                                cache_writer.append(analog_samples, digital_samples, array_length)
 
                             # Reset array write start pointer
                             array_write_index = 0
@@ -1871,27 +2062,208 @@ class SequenceGeneratorLogic(GenericLogic):
                     # Increment element index
                     element_count += 1
 
-        # Save sampling related parameters to the sampling_information container within the
-        # PulseBlockEnsemble.
-        # This step is only performed if the resulting waveforms are named by the PulseBlockEnsemble
-        # and not by a sequence nametag
-        if waveform_name == ensemble.name:
-            ensemble.sampling_information = dict()
-            ensemble.sampling_information.update(ensemble_info)
-            ensemble.sampling_information['pulse_generator_settings'] = self.pulse_generator_settings
-            ensemble.sampling_information['waveforms'] = natural_sort(written_waveforms)
-            self.save_ensemble(ensemble)
+        timing = {'workers': 1,
+                  'sampling': time.time() - start_time - write_time,
+                  'writing': write_time}
+        return offset_bin, written_waveforms, timing
 
-        self.log.info('Time needed for sampling and writing PulseBlockEnsemble {0} to device: {1} sec'
-                      ''.format(ensemble.name, int(np.rint(time.time() - start_time))))
-        if ensemble_info['number_of_samples'] == 0:
-            self.log.warning('Empty waveform (0 samples) created from PulseBlockEnsemble "{0}".'
-                             ''.format(ensemble.name))
-        if not self.__sequence_generation_in_progress:
-            self.module_state.unlock()
-        self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
-        self.sigSampleEnsembleComplete.emit(ensemble)
-        return offset_bin, natural_sort(written_waveforms), ensemble_info
+    def _write_ensemble_runs(self, ensemble, ensemble_info, waveform_name, offset_bin):
+        """
+        Writes a digital-only PulseBlockEnsemble to the device as runs of constant channel states
+        (see PulserInterface.write_run_length_waveform). The runs are calculated from the element
+        lengths in bins of analyze_block_ensemble, so no sample arrays are created.
+
+        @param PulseBlockEnsemble ensemble: the ensemble to write
+        @param dict ensemble_info: information about the ensemble (see analyze_block_ensemble)
+        @param str waveform_name: the name of the waveform to create on the device
+        @param int offset_bin: the time offset bin to start with (rotating frame)
+
+        @return tuple: (offset_bin, set of written waveform names, timing dict) or None if failed
+        """
+        start_time = time.time()
+        run_lengths, digital_states = ensemble_digital_runs(
+            [(self.get_block(name), reps) for name, reps in ensemble.block_list],
+            ensemble_info['elements_length_bins'],
+            ensemble_info['digital_channels'])
+        write_start = time.time()
+        written_samples, wfm_list = self.pulsegenerator().write_run_length_waveform(
+            name=waveform_name,
+            run_lengths=run_lengths,
+            digital_states=digital_states)
+        write_time = time.time() - write_start
+        if written_samples != ensemble_info['number_of_samples']:
+            self.log.error('Writing of ensemble "{0}" as {1:d} runs of constant channel states '
+                           'failed.\nThe number of actually written samples ({2:d}) does not '
+                           'match the number of samples of the ensemble ({3:d}).'
+                           ''.format(ensemble.name, len(run_lengths), written_samples,
+                                     ensemble_info['number_of_samples']))
+            return None
+        if ensemble.rotating_frame:
+            offset_bin += ensemble_info['number_of_samples']
+        timing = {'workers': 1,
+                  'sampling': write_start - start_time,
+                  'writing': write_time}
+        return offset_bin, set(wfm_list), timing
+
+    def _write_ensemble_parallel(self, ensemble, ensemble_info, waveform_name, offset_bin,
+                                 array_length, cache_writer=None):
+        """
+        Samples a PulseBlockEnsemble like _write_ensemble_serial but the analog samples of each
+        write chunk are calculated by a pool of <sampling_workers> processes into a shared float32
+        buffer. The pool is kept for the lifetime of the module. The resulting samples are
+        identical to the ones of the serial sampling.
+
+        @param PulseBlockEnsemble ensemble: the ensemble to sample
+        @param dict ensemble_info: information about the ensemble (see analyze_block_ensemble)
+        @param str waveform_name: the name of the waveform to create on the device
+        @param int offset_bin: the time offset bin to start with (rotating frame)
+        @param int array_length: the number of samples to write to the device at once
+        @param CachedWaveformWriter cache_writer: optional writer to store the samples on disk
+
+        @return tuple: (offset_bin, set of written waveform names, timing dict) or None if failed
+        """
+        start_time = time.time()
+        write_time = 0.0
+        written_waveforms = set()
+        processed_samples = 0
+        normalization = {chnl: self.__analog_levels[0][chnl] / 2 for chnl in
+                         ensemble_info['analog_channels']}
+        block_list = [(self.get_block(block_name), reps) for block_name, reps in
+                      ensemble.block_list]
+        try:
+            digital_samples = {chnl: np.empty(array_length, dtype=bool) for chnl in
+                               ensemble_info['digital_channels']}
+            if self._parallel_sampler is None:
+                self._parallel_sampler = ParallelAnalogSampler(self._sampling_workers)
+            sampler = self._parallel_sampler
+            sampler.prepare(ensemble_info['analog_channels'], array_length)
+        except MemoryError:
+            self.log.error('Sampling of PulseBlockEnsemble "{0}" failed due to a MemoryError.\n'
+                           'The sample array needed is too large to allocate in memory.\n'
+                           'Try using the overhead_bytes ConfigOption to limit memory usage.'
+                           ''.format(ensemble.name))
+            return None
+        except OSError:
+            self.log.exception('Unable to set up the parallel sampling of PulseBlockEnsemble '
+                               '"{0}":'.format(ensemble.name))
+            return None
+
+        for chunk_length, pieces, offset_bin in iterate_sampling_pieces(
+                block_list=block_list,
+                elements_length_bins=ensemble_info['elements_length_bins'],
+                chunk_length=array_length,
+                offset_bin=offset_bin,
+                rotating_frame=ensemble.rotating_frame):
+            # Start sampling of the analog channels in the worker processes and fill the
+            # digital samples in the meantime
+            async_result = sampler.sample_async(pieces, normalization, self.__sample_rate)
+            for write_index, length, time_offset, element in pieces:
+                for chnl, state in element.digital_high.items():
+                    digital_samples[chnl][write_index:write_index + length] = state
+            try:
+                async_result.get()
+            except Exception:
+                self.log.exception('Sampling of PulseBlockEnsemble "{0}" in worker processes '
+                                   'failed:'.format(ensemble.name))
+                # Stop remaining tasks writing into the buffer. A new pool is started on next use.
+                sampler.close()
+                return None
+
+            processed_samples += chunk_length
+            analog_chunk = sampler.get_samples(chunk_length)
+            digital_chunk = {chnl: samples[:chunk_length] for chnl, samples in
+                             digital_samples.items()}
+            write_start = time.time()
+            written_samples, wfm_list = self.pulsegenerator().write_waveform(
+                name=waveform_name,
+                analog_samples=analog_chunk,
+                digital_samples=digital_chunk,
+                is_first_chunk=processed_samples == chunk_length,
+                is_last_chunk=processed_samples == ensemble_info['number_of_samples'],
+                total_number_of_samples=ensemble_info['number_of_samples'])
+            write_time += time.time() - write_start
+            written_waveforms.update(wfm_list)
+
+            if written_samples != chunk_length:
+                self.log.error('Sampling of ensemble "{0}" failed. Write to device was '
+                               'unsuccessful.\nThe number of actually written samples ({1:d}) '
+                               'does not match the number of samples staged to write ({2:d}).'
+                               ''.format(ensemble.name, written_samples, chunk_length))
+                return None
+
+            if cache_writer is not None:
+                cache_writer.append(analog_chunk, digital_chunk, chunk_length)
+
+        timing = {'workers': self._sampling_workers,
+                  'sampling': time.time() - start_time - write_time,
+                  'writing': write_time}
+        return offset_bin, written_waveforms, timing
+
+    def _write_ensemble_from_cache(self, ensemble, ensemble_info, waveform_name, cache_entry,
+                                   array_length):
+        """
+        Streams the memory-mapped samples of a waveform cache entry to the device in chunks of
+        <array_length> samples without sampling the PulseBlockEnsemble.
+
+        @param PulseBlockEnsemble ensemble: the ensemble the cached samples belong to
+        @param dict ensemble_info: information about the ensemble (see analyze_block_ensemble)
+        @param str waveform_name: the name of the waveform to create on the device
+        @param dict cache_entry: the waveform cache entry (see WaveformCache.get_entry)
+        @param int array_length: the number of samples to write to the device at once
+
+        @return tuple: (offset_bin, set of written waveform names, timing dict) or None if failed
+        """
+        number_of_samples = ensemble_info['number_of_samples']
+        if cache_entry['number_of_samples'] != number_of_samples:
+            self.log.error('Number of cached samples ({0:d}) does not match PulseBlockEnsemble '
+                           '"{1}" ({2:d}).'.format(cache_entry['number_of_samples'], ensemble.name,
+                                                   number_of_samples))
+            return None
+
+        start_time = time.time()
+        written_waveforms = set()
+        for chunk_start in range(0, number_of_samples, max(array_length, 1)):
+            chunk_stop = min(chunk_start + array_length, number_of_samples)
+            written_samples, wfm_list = self.pulsegenerator().write_waveform(
+                name=waveform_name,
+                analog_samples={chnl: samples[chunk_start:chunk_stop] for chnl, samples in
+                                cache_entry['analog_samples'].items()},
+                digital_samples={chnl: samples[chunk_start:chunk_stop] for chnl, samples in
+                                 cache_entry['digital_samples'].items()},
+                is_first_chunk=chunk_start == 0,
+                is_last_chunk=chunk_stop == number_of_samples,
+                total_number_of_samples=number_of_samples)
+            written_waveforms.update(wfm_list)
+            if written_samples != chunk_stop - chunk_start:
+                self.log.error('Writing cached samples of ensemble "{0}" failed. The number of '
+                               'actually written samples ({1:d}) does not match the number of '
+                               'samples staged to write ({2:d}).'
+                               ''.format(ensemble.name, written_samples, chunk_stop - chunk_start))
+                return None
+
+        timing = {'workers': 0, 'sampling': 0.0, 'writing': time.time() - start_time}
+        return cache_entry['offset_bin'], written_waveforms, timing
+
+    def _get_ensemble_hash(self, ensemble, offset_bin=0):
+        """
+        Get a hash of the PulseBlockEnsemble and all pulse generator settings the sampled
+        waveforms depend on. Identical hashes result in identical waveforms.
+
+        @param PulseBlockEnsemble ensemble: the ensemble to hash
+        @param int offset_bin: the time offset bin to start sampling with
+
+        @return str: the ensemble hash
+        """
+        blocks = {name: self.get_block(name) for name, reps in ensemble.block_list}
+        analog_channels = [chnl for chnl in self.__activation_config[1] if chnl.startswith('a')]
+        settings = {'sample_rate': self.__sample_rate,
+                    'activation_config': self.__activation_config[1],
+                    'analog_amplitudes': {chnl: self.__analog_levels[0].get(chnl) for chnl in
+                                          analog_channels},
+                    'waveform_granularity': self.pulse_generator_constraints.waveform_length.step,
+                    'overhead_bytes': self._overhead_bytes,
+                    'offset_bin': int(offset_bin)}
+        return get_ensemble_hash(ensemble, blocks, settings)
 
     @QtCore.Slot(str)
     def sample_pulse_sequence(self, sequence):
@@ -2045,6 +2417,10 @@ class SequenceGeneratorLogic(GenericLogic):
         for wfm in names:
             if wfm in current_waveforms:
                 self.pulsegenerator().delete_waveform(wfm)
+        # Forget the ensemble hashes of deleted waveforms
+        for name_tag, record in list(self._device_waveform_hashes.items()):
+            if any(wfm in names for wfm in record['waveforms']):
+                del self._device_waveform_hashes[name_tag]
         self.sigAvailableWaveformsUpdated.emit(self.sampled_waveforms)
         return
 
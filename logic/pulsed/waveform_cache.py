@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a content-addressed on-disk cache for sampled waveforms used by the Qudi
+SequenceGeneratorLogic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import numpy as np
+
+
+def get_ensemble_hash(ensemble, blocks, settings):
+    """
+    Creates a stable hash of a PulseBlockEnsemble describing the samples it produces.
+    The names of the ensemble and blocks are not included since they do not affect the samples.
+    Changes in the code of sampling functions are not detected.
+
+    @param PulseBlockEnsemble ensemble: the ensemble to hash
+    @param dict blocks: block names as keys and the PulseBlock instances used in the ensemble as
+                        values
+    @param dict settings: additional settings the samples depend on (sample rate, analog levels,
+                          activation config, etc.). Values must have a stable repr.
+
+    @return str: hexadecimal hash string
+    """
+    block_reprs = dict()
+    for name, block in blocks.items():
+        block_reprs[name] = _stable_repr(
+            [element.get_dict_representation() for element in block.element_list])
+    content = [_stable_repr(settings),
+               repr(bool(ensemble.rotating_frame)),
+               repr([(block_reprs[name], int(reps)) for name, reps in ensemble.block_list])]
+    return hashlib.sha1('\n'.join(content).encode('utf-8')).hexdigest()
+
+
+def _stable_repr(obj):
+    """
+    Helper function creating a repr of (nested) dicts, sets, lists and tuples independent of the
+    order of dict keys and set items.
+
+    @param obj: the object to represent
+
+    @return str: stable representation of obj
+    """
+    if isinstance(obj, dict):
+        items = sorted((str(key), _stable_repr(value)) for key, value in obj.items())
+        return '{' + ', '.join('{0}: {1}'.format(key, value) for key, value in items) + '}'
+    if isinstance(obj, (set, frozenset)):
+        return '{' + ', '.join(sorted(_stable_repr(item) for item in obj)) + '}'
+    if isinstance(obj, (list, tuple)):
+        return '[' + ', '.join(_stable_repr(item) for item in obj) + ']'
+    if isinstance(obj, np.ndarray):
+        return _stable_repr(obj.tolist())
+    if isinstance(obj, np.generic):
+        return repr(obj.item())
+    return repr(obj)
+
+
+class WaveformCache:
+    """
+    Size-bounded on-disk cache of sampled waveforms addressed by the ensemble hash.
+
+    Each cache entry is a directory named by the hash containing one .npy file per channel and a
+    "meta.json" file. Cached samples are read back as memory-mapped arrays. If the total size of
+    the cache exceeds max_size (in bytes), the least recently used entries are removed.
+    Entries without "meta.json" which are not being written (left over by an interrupted write)
+    are removed on every eviction.
+    """
+    _meta_file = 'meta.json'
+
+    def __init__(self, directory, max_size):
+        self.log = logging.getLogger(__name__)
+        self.directory = directory
+        self.max_size = int(max_size)
+        # keys of the entries currently written by a CachedWaveformWriter
+        self._writing = set()
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self.evict()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def get_entry(self, key):
+        """
+        Get a cache entry and mark it as recently used.
+
+        @param str key: the ensemble hash
+
+        @return dict: meta information with additional keys "analog_samples" and
+                      "digital_samples" holding dicts of memory-mapped sample arrays.
+                      None if the key is not cached.
+        """
+        path = os.path.join(self.directory, key)
+        meta_path = os.path.join(path, self._meta_file)
+        if not os.path.isfile(meta_path):
+            return None
+        try:
+            with open(meta_path, 'r') as file:
+                entry = json.load(file)
+            entry['analog_samples'] = {
+                chnl: np.load(os.path.join(path, chnl + '.npy'), mmap_mode='r') for chnl in
+                entry['analog_channels']}
+            entry['digital_samples'] = {
+                chnl: np.load(os.path.join(path, chnl + '.npy'), mmap_mode='r') for chnl in
+                entry['digital_channels']}
+        except (OSError, ValueError, KeyError):
+            self.log.warning('Corrupted waveform cache entry "{0}" removed.'.format(key))
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        # Update access time for LRU eviction
+        os.utime(meta_path, None)
+        return entry
+
+    def create_writer(self, key, analog_channels, digital_channels, number_of_samples):
+        """
+        Create a writer to stream samples into a new cache entry.
+
+        @param str key: the ensemble hash
+        @param iterable analog_channels: analog channel descriptors
+        @param iterable digital_channels: digital channel descriptors
+        @param int number_of_samples: total number of samples per channel
+
+        @return CachedWaveformWriter: the writer instance or None if the waveform does not fit
+                                      into the cache.
+        """
+        size = number_of_samples * (4 * len(analog_channels) + len(digital_channels))
+        if not self.enabled or size > self.max_size:
+            return None
+        try:
+            return CachedWaveformWriter(self, key, analog_channels, digital_channels,
+                                        number_of_samples)
+        except OSError:
+            self.log.exception('Unable to create waveform cache entry:')
+            return None
+
+    def evict(self):
+        """
+        Remove incomplete cache entries which are not being written and the least recently used
+        cache entries until the cache size is below max_size.
+        """
+        entries = list()
+        total_size = 0
+        for key in os.listdir(self.directory):
+            path = os.path.join(self.directory, key)
+            meta_path = os.path.join(path, self._meta_file)
+            if not os.path.isfile(meta_path):
+                if key not in self._writing:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(meta_path), size, path))
+            total_size += size
+        for atime, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total_size -= size
+        return
+
+    def clear(self):
+        """
+        Remove all cache entries.
+        """
+        for key in os.listdir(self.directory):
+            shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+        return
+
+
+class CachedWaveformWriter:
+    """
+    Writes the chunks of a sampled waveform into preallocated memory-mapped .npy files of a new
+    cache entry. The entry only becomes visible to WaveformCache.get_entry after finalize.
+    """
+
+    def __init__(self, cache, key, analog_channels, digital_channels, number_of_samples):
+        self._cache = cache
+        self._key = key
+        self._path = os.path.join(cache.directory, key)
+        self._number_of_samples = int(number_of_samples)
+        self._write_index = 0
+        if os.path.exists(self._path):
+            shutil.rmtree(self._path, ignore_errors=True)
+        cache._writing.add(key)
+        try:
+            os.makedirs(self._path)
+            self._analog = {chnl: np.lib.format.open_memmap(
+                os.path.join(self._path, chnl + '.npy'), mode='w+', dtype='float32',
+                shape=(self._number_of_samples,)) for chnl in analog_channels}
+            self._digital = {chnl: np.lib.format.open_memmap(
+                os.path.join(self._path, chnl + '.npy'), mode='w+', dtype=bool,
+                shape=(self._number_of_samples,)) for chnl in digital_channels}
+        except OSError:
+            self.discard()
+            raise
+
+    def append(self, analog_samples, digital_samples, length):
+        """
+        Append the first <length> samples of a chunk to the cache entry.
+
+        @param dict analog_samples: analog channel descriptors as keys and sample arrays as values
+        @param dict digital_samples: digital channel descriptors as keys and sample arrays as values
+        @param int length: number of samples to append
+        """
+        start, stop = self._write_index, self._write_index + length
+        for chnl, samples in analog_samples.items():
+            self._analog[chnl][start:stop] = samples[:length]
+        for chnl, samples in digital_samples.items():
+            self._digital[chnl][start:stop] = samples[:length]
+        self._write_index = stop
+        return
+
+    def finalize(self, offset_bin):
+        """
+        Flush all samples to disk and write the meta information to complete the cache entry.
+
+        @param int offset_bin: the rotating frame offset bin after the last sample
+        """
+        if self._write_index != self._number_of_samples:
+            self.discard()
+            return
+        for samples in list(self._analog.values()) + list(self._digital.values()):
+            samples.flush()
+        meta = {'number_of_samples': self._number_of_samples,
+                'offset_bin': int(offset_bin),
+                'analog_channels': sorted(self._analog),
+                'digital_channels': sorted(self._digital)}
+        self._analog = dict()
+        self._digital = dict()
+        with open(os.path.join(self._path, WaveformCache._meta_file), 'w') as file:
+            json.dump(meta, file)
+        self._cache._writing.discard(self._key)
+        self._cache.evict()
+        return
+
+    def discard(self):
+        """
+        Remove the incomplete cache entry.
+        """
+        self._analog = dict()
+        self._digital = dict()
+        shutil.rmtree(self._path, ignore_errors=True)
+        self._cache._writing.discard(self._key)
+        return
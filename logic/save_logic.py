@@ -26,10 +26,13 @@ import logging
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+import queue
 import sys
+import threading
 import time
 
 from collections import OrderedDict
+from qtpy import QtCore
 from core.configoption import ConfigOption
 from core.util import units
 from core.util.mutex import Mutex
@@ -39,6 +42,11 @@ from matplotlib.backends.backend_pdf import PdfPages
 from PIL import Image
 from PIL import PngImagePlugin
 
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
 
 class DailyLogHandler(logging.FileHandler):
     """
@@ -129,6 +137,8 @@ class SaveLogic(GenericLogic):
         log_into_daily_directory: True
         save_pdf: True
         save_png: True
+        asynchronous_saving: False  # optional, write files and figures in a background thread
+        hdf5_compression_level: 4  # optional, gzip level (0-9) for filetype 'hdf5'
     """
 
     _win_data_dir = ConfigOption('win_data_directory', 'C:/Data/')
@@ -136,6 +146,12 @@ class SaveLogic(GenericLogic):
     log_into_daily_directory = ConfigOption('log_into_daily_directory', False, missing='warn')
     save_pdf = ConfigOption('save_pdf', False)
     save_png = ConfigOption('save_png', True)
+    asynchronous_saving = ConfigOption('asynchronous_saving', False)
+    hdf5_compression_level = ConfigOption('hdf5_compression_level', 4)
+
+    # Emitted after a file has been written by the background writer thread.
+    # Parameters are the full path of the data file and a success flag.
+    sigSaveFinished = QtCore.Signal(str, bool)
 
     # Matplotlib style definition for saving plots
     mpl_qd_style = {
@@ -202,6 +218,10 @@ class SaveLogic(GenericLogic):
 
         self._daily_loghandler = None
 
+        # background writer thread and its job queue
+        self._save_queue = None
+        self._save_thread = None
+
     def on_activate(self):
         """ Definition, configuration and initialisation of the SaveLogic.
         """
@@ -218,6 +238,12 @@ class SaveLogic(GenericLogic):
             self._daily_loghandler = None
 
     def on_deactivate(self):
+        # Wait for pending files to be written and stop the background writer thread
+        if self._save_thread is not None:
+            self._save_queue.put(None)
+            self._save_thread.join()
+            self._save_thread = None
+            self._save_queue = None
         if self._daily_loghandler is not None:
             # removes the log handler logging into the daily directory
             logging.getLogger().removeHandler(self._daily_loghandler)
@@ -238,7 +264,8 @@ class SaveLogic(GenericLogic):
         self._daily_loghandler.setLevel(level)
 
     def save_data(self, data, filepath=None, parameters=None, filename=None, filelabel=None,
-                  timestamp=None, filetype='text', fmt='%.15e', delimiter='\t', plotfig=None):
+                  timestamp=None, filetype='text', fmt='%.15e', delimiter='\t', plotfig=None,
+                  asynchronous=None):
         """
         General save routine for data.
 
@@ -284,7 +311,9 @@ class SaveLogic(GenericLogic):
                                    filename and a timestamp, because then the timestamp will be
                                    ignored.
         @param string filetype: optional, the file format the data should be saved in. Valid inputs
-                                are 'text', 'xml' and 'npz'. Default is 'text'.
+                                are 'text', 'npz' and 'hdf5'. Default is 'text'.
+                                'hdf5' stores each data array as chunked, compressed dataset and
+                                the parameters as attributes of the file (requires h5py).
         @param string or list of strings fmt: optional, format specifier for saved data. See python
                                               documentation for
                                               "Format Specification Mini-Language". If you want for
@@ -299,6 +328,11 @@ class SaveLogic(GenericLogic):
                                               behaviour or failure to save right away.
         @param string delimiter: optional, insert here the delimiter, like '\n' for new line, '\t'
                                  for tab, ',' for a comma ect.
+        @param matplotlib.figure.Figure plotfig: optional, figure to save as PDF/PNG thumbnail
+        @param bool asynchronous: optional, if True the data is copied and the files (incl. the
+                                  figure) are written by a background thread. The method returns
+                                  immediately and sigSaveFinished is emitted afterwards.
+                                  Default is given by the ConfigOption "asynchronous_saving".
 
         1D data
         =======
@@ -446,8 +480,89 @@ class SaveLogic(GenericLogic):
                 header += 'not specified parameters: {0}\n'.format(parameters)
         header += '\nData:\n=====\n'
 
-        # write data to file
-        # FIXME: Implement other file formats
+        if filetype == 'hdf5' and h5py is None:
+            self.log.error('Saving data as hdf5-file requires the package h5py. Saving as '
+                           'textfile.')
+            filetype = 'text'
+        elif filetype not in ('text', 'npz', 'hdf5'):
+            self.log.error('Only saving of data as textfile, npz-file and hdf5-file is implemented.'
+                           ' Filetype "{0}" is not supported yet. Saving as textfile.'
+                           ''.format(filetype))
+            filetype = 'text'
+
+        job = {'data': data,
+               'filepath': filepath,
+               'filename': filename,
+               'filetype': filetype,
+               'header': header,
+               'parameters': parameters if isinstance(parameters, dict) else dict(),
+               'fmt': fmt,
+               'delimiter': delimiter,
+               'plotfig': plotfig,
+               'module_name': module_name,
+               'timestamp': timestamp,
+               'multiple_dtypes': multiple_dtypes,
+               'arr_dtype': arr_dtype,
+               'max_line_num': max_line_num,
+               'max_row_num': max_row_num,
+               'found_2d': found_2d}
+
+        if asynchronous is None:
+            asynchronous = self.asynchronous_saving
+        if asynchronous:
+            # Copy the data since the caller may change the arrays after this method returned.
+            job['data'] = OrderedDict((key, np.array(arr, copy=True)) for key, arr in data.items())
+            if self._save_thread is None:
+                self._save_queue = queue.Queue()
+                self._save_thread = threading.Thread(target=self._save_worker,
+                                                     name='SaveLogic writer',
+                                                     daemon=True)
+                self._save_thread.start()
+            self._save_queue.put(job)
+            self.log.debug('Time needed to prepare data for saving: {0:.2f}s'
+                           ''.format(time.time() - start_time))
+            return
+
+        self._write_data_files(**job)
+        self.log.debug('Time needed to save data: {0:.2f}s'.format(time.time() - start_time))
+        return
+
+    def wait_for_pending_saves(self):
+        """
+        Block until all files queued for asynchronous saving have been written.
+        """
+        if self._save_queue is not None:
+            self._save_queue.join()
+        return
+
+    def _save_worker(self):
+        """
+        Target of the background writer thread. Writes the queued jobs until None is received.
+        """
+        while True:
+            job = self._save_queue.get()
+            try:
+                if job is None:
+                    return
+                try:
+                    data_file = self._write_data_files(**job)
+                except:
+                    self.log.exception('Error while saving data in background thread:')
+                    self.sigSaveFinished.emit(os.path.join(job['filepath'], job['filename']),
+                                              False)
+                else:
+                    self.sigSaveFinished.emit(data_file, True)
+            finally:
+                self._save_queue.task_done()
+
+    def _write_data_files(self, data, filepath, filename, filetype, header, parameters, fmt,
+                          delimiter, plotfig, module_name, timestamp, multiple_dtypes, arr_dtype,
+                          max_line_num, max_row_num, found_2d):
+        """
+        Writes the data prepared by save_data to file(s) and saves the figure.
+
+        @return str: full path of the data file written
+        """
         # write to textfile
         if filetype == 'text':
             # Reshape data if multiple 1D arrays have been passed to this method.
@@ -491,19 +606,20 @@ class SaveLogic(GenericLogic):
             self.save_array_as_text(data=data[identifier_str], filename=filename, filepath=filepath,
                                     fmt=fmt, header=header, delimiter=delimiter, comments='#',
                                     append=False)
+            data_file = os.path.join(filepath, filename)
         # write npz file and save parameters in textfile
         elif filetype == 'npz':
             header += str(list(data.keys()))[1:-1]
             np.savez_compressed(filepath + '/' + filename[:-4], **data)
+            data_file = os.path.join(filepath, filename[:-4] + '.npz')
             self.save_array_as_text(data=[], filename=filename[:-4]+'_params.dat', filepath=filepath,
                                     fmt=fmt, header=header, delimiter=delimiter, comments='#',
                                     append=False)
+        # write hdf5 file with the parameters as attributes
         else:
-            self.log.error('Only saving of data as textfile and npz-file is implemented. Filetype "{0}" is not '
-                           'supported yet. Saving as textfile.'.format(filetype))
-            self.save_array_as_text(data=data[identifier_str], filename=filename, filepath=filepath,
-                                    fmt=fmt, header=header, delimiter=delimiter, comments='#',
-                                    append=False)
+            data_file = os.path.join(filepath, filename[:-4] + '.h5')
+            self.save_dict_as_hdf5(data=data, filename=data_file, parameters=parameters,
+                                   module_name=module_name, timestamp=timestamp)
 
         #--------------------------------------------------------------------------------------------
         # Save thumbnail figure of plot
@@ -563,8 +679,8 @@ class SaveLogic(GenericLogic):
 
             # close matplotlib figure
             plt.close(plotfig)
-            self.log.debug('Time needed to save data: {0:.2f}s'.format(time.time()-start_time))
             #----------------------------------------------------------------------------------
+        return data_file
 
     def save_array_as_text(self, data, filename, filepath='', fmt='%.15e', header='',
                            delimiter='\t', comments='#', append=False):
@@ -583,6 +699,50 @@ class SaveLogic(GenericLogic):
                            comments=comments)
         return
 
+    def save_dict_as_hdf5(self, data, filename, parameters=None, module_name='', timestamp=None):
+        """
+        Saves a dictionary of arrays as datasets of a hdf5-file. Arrays with more than
+        1024 elements are stored chunked and gzip compressed. The parameters are stored as
+        attributes of the file.
+
+        @param dict data: dataset labels as keys and arrays as values
+        @param str filename: full path of the hdf5-file to create
+        @param dict parameters: optional, parameters to save as file attributes
+        @param str module_name: optional, name of the module the data is coming from
+        @param datetime timestamp: optional, time stamp to save as attribute
+        """
+        with h5py.File(filename, 'w') as file:
+            file.attrs['qudi module'] = module_name
+            if timestamp is not None:
+                file.attrs['timestamp'] = timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')
+            if self.active_poi_name != '':
+                file.attrs['Measured at POI'] = self.active_poi_name
+            if parameters is not None:
+                for key, value in parameters.items():
+                    try:
+                        file.attrs[str(key)] = value
+                    except (TypeError, ValueError):
+                        file.attrs[str(key)] = str(value)
+
+            for label, arr in data.items():
+                arr = np.asarray(arr)
+                if arr.dtype.kind == 'U':
+                    arr = np.char.encode(arr, 'utf-8')
+                elif arr.dtype.kind == 'O':
+                    arr = arr.astype(bytes)
+                # "/" would create sub-groups in hdf5, so it is replaced in the dataset name
+                if arr.size > 1024:
+                    dataset = file.create_dataset(label.replace('/', '_'),
+                                                  data=arr,
+                                                  chunks=True,
+                                                  compression='gzip',
+                                                  compression_opts=self.hdf5_compression_level,
+                                                  shuffle=True)
+                else:
+                    dataset = file.create_dataset(label.replace('/', '_'), data=arr)
+                dataset.attrs['label'] = label
+        return
+
     def get_daily_directory(self):
         """ Gets or creates daily save directory.
 
@@ -20,6 +20,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 from qtpy import QtCore
+import os
 import numpy as np
 import datetime as dt
 import time
@@ -30,6 +31,8 @@ from core.statusvariable import StatusVar
 from core.configoption import ConfigOption
 from logic.generic_logic import GenericLogic
 from core.util.mutex import Mutex
+from core.util.ring_buffer import TraceRingBuffer
+from core.util.stream_writer import NpyStreamWriter
 from core.util.units import ScaledFloat
 from interface.data_instream_interface import StreamChannelType, StreamingMode
 
@@ -44,12 +47,15 @@ class TimeSeriesReaderLogic(GenericLogic):
         module.Class: 'time_series_reader_logic.TimeSeriesReaderLogic'
         max_frame_rate: 10  # optional (10Hz by default)
         calc_digital_freq: True  # optional (True by default)
+        save_recorded_text_data: False  # optional, also export recordings as .dat text file
         connect:
             _streamer_con: <streamer_name>
             _savelogic_con: <save_logic_name>
     """
     # declare signals
     sigDataChanged = QtCore.Signal(object, object, object, object)
+    # new samples of the (averaged) trace of each data frame, see new_trace_samples
+    sigNewTraceSamples = QtCore.Signal(object, object)
     sigStatusChanged = QtCore.Signal(bool, bool)
     sigSettingsChanged = QtCore.Signal(dict)
     _sigNextDataFrame = QtCore.Signal()  # internal signal
@@ -61,6 +67,12 @@ class TimeSeriesReaderLogic(GenericLogic):
     # config options
     _max_frame_rate = ConfigOption('max_frame_rate', default=10, missing='warn')
     _calc_digital_freq = ConfigOption('calc_digital_freq', default=True, missing='warn')
+    # Write the recorded data columns into the .dat file in addition to the .npy file. The text
+    # file is written by the background writer of SaveLogic, which needs a copy of the recorded
+    # data in memory.
+    _save_recorded_text_data = ConfigOption('save_recorded_text_data',
+                                            default=False,
+                                            missing='nothing')
 
     # status vars
     _trace_window_size = StatusVar('trace_window_size', default=6)
@@ -83,16 +95,17 @@ class TimeSeriesReaderLogic(GenericLogic):
         self._samples_per_frame = None
         self._stop_requested = True
 
-        # Data arrays
+        # Data ring buffers
         self._trace_data = None
         self._trace_times = None
         self._trace_data_averaged = None
-        self.__moving_filter = None
+        self._averaged_channel_indices = None
 
-        # for data recording
-        self._recorded_data = None
+        # for data recording (streams recorded data blocks into a .npy file)
+        self._recorder = None
         self._data_recording_active = False
         self._record_start_time = None
+        self._last_recorder_flush = 0
         return
 
     def on_activate(self):
@@ -162,12 +175,14 @@ class TimeSeriesReaderLogic(GenericLogic):
 
     def _init_data_arrays(self):
         window_size = self.trace_window_size_samples
-        self._trace_data = np.zeros(
-            [self.number_of_active_channels, window_size + self._moving_average_width // 2])
-        self._trace_data_averaged = np.zeros(
-            [len(self._averaged_channels), window_size - self._moving_average_width // 2])
+        self._trace_data = TraceRingBuffer(self.number_of_active_channels,
+                                           window_size + self._moving_average_width // 2)
+        self._trace_data_averaged = TraceRingBuffer(
+            len(self._averaged_channels), window_size - self._moving_average_width // 2)
+        active_channels = self.active_channel_names
+        self._averaged_channel_indices = [active_channels.index(ch) for ch in
+                                          self._averaged_channels]
         self._trace_times = np.arange(window_size) / self.data_rate
-        self._recorded_data = list()
         return
 
     @property
@@ -279,18 +294,42 @@ class TimeSeriesReaderLogic(GenericLogic):
 
     @property
     def trace_data(self):
-        data_offset = self._trace_data.shape[1] - self._moving_average_width // 2
-        data = {ch: self._trace_data[i, :data_offset] for i, ch in
-                enumerate(self.active_channel_names)}
+        """ Copy of the current trace. The newest moving_average_width // 2 samples are omitted to
+        keep the trace aligned with the averaged trace.
+        A copy is needed since the data is sent to other threads while the buffer is written.
+        """
+        data_offset = self._trace_data.length - self._moving_average_width // 2
+        trace = self._trace_data.get_view()[:, :data_offset].copy()
+        data = {ch: trace[i] for i, ch in enumerate(self.active_channel_names)}
         return self._trace_times, data
 
     @property
     def averaged_trace_data(self):
+        """ Copy of the current averaged trace. """
         if not self.averaged_channel_names or self.moving_average_width <= 1:
             return None, None
-        data = {ch: self._trace_data_averaged[i] for i, ch in
-                enumerate(self.averaged_channel_names)}
-        return self._trace_times[-self._trace_data_averaged.shape[1]:], data
+        trace = self._trace_data_averaged.get_view().copy()
+        data = {ch: trace[i] for i, ch in enumerate(self.averaged_channel_names)}
+        return self._trace_times[-self._trace_data_averaged.length:], data
+
+    def new_trace_samples(self, number_of_samples):
+        """ Copies of the samples the last data frame added to the end of trace_data and
+        averaged_trace_data. Receivers of sigNewTraceSamples append them to their own traces, so
+        the whole traces do not have to be copied for every data frame.
+
+        @param int number_of_samples: number of (down-sampled) samples in the last data frame
+
+        @return dict, dict: new samples of each channel and of each averaged channel (None if no
+                            averaged trace is calculated)
+        """
+        data_offset = self._trace_data.length - self._moving_average_width // 2
+        number_of_samples = min(number_of_samples, data_offset)
+        trace = self._trace_data.get_view()[:, data_offset - number_of_samples:data_offset].copy()
+        data = {ch: trace[i] for i, ch in enumerate(self.active_channel_names)}
+        if not self.averaged_channel_names or self.moving_average_width <= 1:
+            return data, None
+        trace = self._trace_data_averaged.get_view(number_of_samples).copy()
+        return data, {ch: trace[i] for i, ch in enumerate(self.averaged_channel_names)}
 
     @property
     def all_settings(self):
@@ -373,8 +412,6 @@ class TimeSeriesReaderLogic(GenericLogic):
                 if new_val / data_rate > self.trace_window_size:
                     if 'data_rate' in settings_dict or 'trace_window_size' in settings_dict:
                         self._moving_average_width = new_val
-                        self.__moving_filter = np.full(shape=self.moving_average_width,
-                                                       fill_value=1.0 / self.moving_average_width)
                     else:
                         self.log.warning('Moving average width to set ({0:d}) is smaller than the '
                                          'trace window size. Will adjust trace window size to '
@@ -382,8 +419,6 @@ class TimeSeriesReaderLogic(GenericLogic):
                         self._trace_window_size = float(new_val / data_rate)
                 else:
                     self._moving_average_width = new_val
-                    self.__moving_filter = np.full(shape=self.moving_average_width,
-                                                   fill_value=1.0 / self.moving_average_width)
 
             if 'data_rate' in settings_dict:
                 new_val = float(settings_dict['data_rate'])
@@ -462,8 +497,8 @@ class TimeSeriesReaderLogic(GenericLogic):
             self._init_data_arrays()
             settings = self.all_settings
             self.sigSettingsChanged.emit(settings)
-            if not restart:
-                self.sigDataChanged.emit(*self.trace_data, *self.averaged_trace_data)
+            # The whole (new) traces, sigNewTraceSamples only sends the samples to append
+            self.sigDataChanged.emit(*self.trace_data, *self.averaged_trace_data)
         if restart:
             self.start_reading()
         return settings
@@ -505,8 +540,7 @@ class TimeSeriesReaderLogic(GenericLogic):
             # self.sigSettingsChanged.emit(settings)
 
             if self._data_recording_active:
-                self._record_start_time = dt.datetime.now()
-                self._recorded_data = list()
+                self._start_recorder()
 
             if self._streamer.start_stream() < 0:
                 self.log.error('Error while starting streaming device data acquisition.')
@@ -546,7 +580,6 @@ class TimeSeriesReaderLogic(GenericLogic):
                             'Error while trying to stop streaming device data acquisition.')
                     if self._data_recording_active:
                         self._save_recorded_data(to_file=True, save_figure=True)
-                        self._recorded_data = list()
                     self._data_recording_active = False
                     self.module_state.unlock()
                     self.sigStatusChanged.emit(False, False)
@@ -568,17 +601,18 @@ class TimeSeriesReaderLogic(GenericLogic):
                     self._sigNextDataFrame.emit()
                     return
 
-                # Process data
-                self._process_trace_data(data)
-
-                # Emit update signal
-                self.sigDataChanged.emit(*self.trace_data, *self.averaged_trace_data)
+                # Process data and emit only the new samples instead of copies of the whole traces
+                if self._process_trace_data(data) == 0:
+                    self.sigNewTraceSamples.emit(
+                        *self.new_trace_samples(data.shape[1] // self.oversampling_factor))
                 self._sigNextDataFrame.emit()
         return
 
     def _process_trace_data(self, data):
         """
         Processes raw data from the streaming device
+
+        @return int: error code (0: OK, -1: error)
         """
         # Down-sample and average according to oversampling factor
         if self.oversampling_factor > 1:
@@ -597,28 +631,31 @@ class TimeSeriesReaderLogic(GenericLogic):
         if self._calc_digital_freq and digital_channels:
             data[:len(digital_channels)] *= self.sampling_rate
 
-        # Append data to save if necessary
+        # Stream data to the recording file if necessary
         if self._data_recording_active:
-            self._recorded_data.append(data.copy())
-
-        data = data[:, -self._trace_data.shape[1]:]
+            self._recorder.append(data.transpose())
+            # Update the header (file readable with the data so far) at most once per second
+            now = time.monotonic()
+            if now - self._last_recorder_flush >= 1:
+                self._recorder.flush()
+                self._last_recorder_flush = now
+
+        data = data[:, -self._trace_data.length:]
         new_samples = data.shape[1]
 
-        # Roll data array to have a continuously running time trace
-        self._trace_data = np.roll(self._trace_data, -new_samples, axis=1)
-        # Insert new data
-        self._trace_data[:, -new_samples:] = data
-
-        # Calculate moving average by using numpy.convolve with a normalized uniform filter
-        if self.moving_average_width > 1 and self.averaged_channel_names:
-            # Only convolve the new data and roll the previously calculated moving average
-            self._trace_data_averaged = np.roll(self._trace_data_averaged, -new_samples, axis=1)
-            offset = new_samples + len(self.__moving_filter) - 1
-            for i, ch in enumerate(self.averaged_channel_names):
-                data_index = self.active_channel_names.index(ch)
-                self._trace_data_averaged[i, -new_samples:] = np.convolve(
-                    self._trace_data[data_index, -offset:], self.__moving_filter, mode='valid')
-        return
+        # Write new data at the head of the circular trace buffer
+        self._trace_data.append(data)
+
+        # Calculate the moving average of the new samples from the cumulative sum over the new
+        # data and the preceding (moving_average_width - 1) samples.
+        width = self.moving_average_width
+        if width > 1 and self._averaged_channel_indices:
+            trace = self._trace_data.get_view(new_samples + width - 1)
+            cumulative_sum = np.zeros((len(self._averaged_channel_indices), trace.shape[1] + 1))
+            np.cumsum(trace[self._averaged_channel_indices], axis=1, out=cumulative_sum[:, 1:])
+            self._trace_data_averaged.append(
+                (cumulative_sum[:, width:] - cumulative_sum[:, :-width]) / width)
+        return 0
 
     @QtCore.Slot()
     def start_recording(self):
@@ -635,8 +672,7 @@ class TimeSeriesReaderLogic(GenericLogic):
 
             self._data_recording_active = True
             if self.module_state() == 'locked':
-                self._recorded_data = list()
-                self._record_start_time = dt.datetime.now()
+                self._start_recorder()
                 self.sigStatusChanged.emit(True, True)
             else:
                 self.start_reading()
@@ -658,24 +694,49 @@ class TimeSeriesReaderLogic(GenericLogic):
             self._data_recording_active = False
             if self.module_state() == 'locked':
                 self._save_recorded_data(to_file=True, save_figure=True)
-                self._recorded_data = list()
                 self.sigStatusChanged.emit(True, False)
         return 0
 
+    def _start_recorder(self):
+        """ Create a new file in the module data directory to stream the recorded data into.
+        """
+        if self._recorder is not None:
+            self._recorder.finalize()
+        self._record_start_time = dt.datetime.now()
+        filepath = self._savelogic.get_path_for_module(module_name='TimeSeriesReader')
+        filename = self._record_start_time.strftime('%Y%m%d-%H%M-%S') + '_data_trace.npy'
+        self._recorder = NpyStreamWriter(os.path.join(filepath, filename),
+                                         number_of_columns=self.number_of_active_channels)
+        return
+
     def _save_recorded_data(self, to_file=True, name_tag='', save_figure=True):
-        """ Save the counter trace data and writes it to a file.
+        """ Finalize the file containing the recorded data and save it as text (and figure).
+
+        The recorded data has already been streamed to a .npy file with one column per channel
+        during the recording. This file is the saved data. The .dat file contains the parameters
+        and the name of the .npy file, or the data columns if the ConfigOption
+        "save_recorded_text_data" is set. The .dat file and the figure are written by the
+        background writer of SaveLogic.
 
-        @param bool to_file: indicate, whether data have to be saved to file
+        @param bool to_file: indicate, whether the .dat file and figure have to be saved
         @param str name_tag: an additional tag, which will be added to the filename upon save
         @param bool save_figure: select whether png and pdf should be saved
 
-        @return dict parameters: Dictionary which contains the saving parameters
+        @return numpy.ndarray, dict: memory-mapped recorded data (channels x samples) and the
+                                     dictionary which contains the saving parameters
         """
-        if not self._recorded_data:
+        if self._recorder is None:
             self.log.error('No data has been recorded. Save to file failed.')
             return np.empty(0), dict()
 
-        data_arr = np.concatenate(self._recorded_data, axis=1)
+        data_file = self._recorder.finalize()
+        self._recorder = None
+        if name_tag:
+            tagged_file = data_file[:-4] + '_{0}.npy'.format(name_tag)
+            os.replace(data_file, tagged_file)
+            data_file = tagged_file
+
+        data_arr = np.load(data_file, mmap_mode='r').transpose()
         if data_arr.size == 0:
             self.log.error('No data has been recorded. Save to file failed.')
             return np.empty(0), dict()
@@ -693,15 +754,7 @@ class TimeSeriesReaderLogic(GenericLogic):
         parameters['Sampling rate (Hz)'] = self.sampling_rate
 
         if to_file:
-            # If there is a postfix then add separating underscore
-            filelabel = 'data_trace_{0}'.format(name_tag) if name_tag else 'data_trace'
-
-            # prepare the data in a dict:
-            header = ', '.join(
-                '{0} ({1})'.format(ch, unit) for ch, unit in self.active_channel_units.items())
-
-            data = {header: data_arr.transpose()}
-            filepath = self._savelogic.get_path_for_module(module_name='TimeSeriesReader')
+            filepath, data_filename = os.path.split(data_file)
             set_of_units = set(self.active_channel_units.values())
             unit_list = tuple(self.active_channel_units)
             y_unit = 'arb.u.'
@@ -712,15 +765,36 @@ class TimeSeriesReaderLogic(GenericLogic):
                     occurrences = count
                     y_unit = unit
 
-            fig = self._draw_figure(data_arr, self.data_rate, y_unit) if save_figure else None
-
-            self._savelogic.save_data(data=data,
-                                      filepath=filepath,
-                                      parameters=parameters,
-                                      filelabel=filelabel,
-                                      plotfig=fig,
-                                      delimiter='\t',
-                                      timestamp=saving_stop_time)
+            if save_figure:
+                # Plot at most ~10000 samples per channel read from the memory-mapped file
+                step = max(1, data_arr.shape[1] // 10000)
+                fig = self._draw_figure(data_arr[:, ::step], self.data_rate / step, y_unit)
+            else:
+                fig = None
+
+            # Formatting the data as text and rendering the figure take much longer than the
+            # recording itself, so the files are written by the background writer of SaveLogic.
+            if self._save_recorded_text_data:
+                header = ', '.join(
+                    '{0} ({1})'.format(ch, unit) for ch, unit in self.active_channel_units.items())
+                self._savelogic.save_data(data={header: data_arr.transpose()},
+                                          filepath=filepath,
+                                          parameters=parameters,
+                                          filename=data_filename[:-4] + '.dat',
+                                          plotfig=fig,
+                                          delimiter='\t',
+                                          timestamp=saving_stop_time,
+                                          asynchronous=True)
+            else:
+                self._savelogic.save_data(data={'Recorded data file': np.array([data_filename])},
+                                          filepath=filepath,
+                                          parameters=parameters,
+                                          filename=data_filename[:-4] + '.dat',
+                                          fmt='%s',
+                                          plotfig=fig,
+                                          delimiter='\t',
+                                          timestamp=saving_stop_time,
+                                          asynchronous=True)
             self.log.info('Time series saved to: {0}'.format(filepath))
         return data_arr, parameters
 
@@ -774,8 +848,8 @@ class TimeSeriesReaderLogic(GenericLogic):
 
             header = ', '.join(
                 '{0} ({1})'.format(ch, unit) for ch, unit in self.active_channel_units.items())
-            data_offset = self._trace_data.shape[1] - self.moving_average_width // 2
-            data = {header: self._trace_data[:, :data_offset].transpose()}
+            data_offset = self._trace_data.length - self.moving_average_width // 2
+            data = {header: self._trace_data.get_view()[:, :data_offset].transpose()}
 
             if to_file:
                 filepath = self._savelogic.get_path_for_module(module_name='TimeSeriesReader')
@@ -807,7 +881,6 @@ class TimeSeriesReaderLogic(GenericLogic):
                     'Error while trying to stop streaming device data acquisition.')
             if self._data_recording_active:
                 self._save_recorded_data(to_file=True, save_figure=True)
-                self._recorded_data = list()
             self._data_recording_active = False
             self.module_state.unlock()
             self.sigStatusChanged.emit(False, False)
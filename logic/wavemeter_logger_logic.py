@@ -534,7 +534,7 @@ class WavemeterLoggerLogic(GenericLogic):
 
         # prepare the data in a dict or in an OrderedDict:
         data = OrderedDict()
-        data['Time (s),Signal (counts/s)'] = self._counter_logic._data_to_save
+        data['Time (s),Signal (counts/s)'] = self._counter_logic._data_to_save.get_view()
 
         # write the parameters:
         parameters = OrderedDict()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file contains a modified pyqtgraph PlotDataItem for Qudi to display large traces.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+from pyqtgraph import PlotDataItem
+from core.util.decimation import MinMaxDecimator
+
+__all__ = ['DecimatedPlotDataItem']
+
+
+class DecimatedPlotDataItem(PlotDataItem):
+    """
+    Extension of pg.PlotDataItem to display traces with many more samples than screen pixels.
+    Only the minimum and the maximum sample of each pixel column of the visible x range are drawn
+    (see core.util.decimation.MinMaxDecimator), which gives the same line as drawing all samples.
+    The decimation is redone when the visible x range or the width of the view changes, reusing
+    the block minima/maxima calculated for the data set.
+
+    Traces with symbols, in FFT mode or with logarithmic axes are drawn like with pg.PlotDataItem.
+    The data bounds used for auto range are the bounds of the whole trace.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._decimator = MinMaxDecimator()
+        self._decimated_data = None
+        self._decimated_view = None
+        super().__init__(*args, **kwargs)
+        return
+
+    @property
+    def decimating(self):
+        """ True if the trace is drawn decimated. """
+        return (self.xData is not None
+                and self.opts['symbol'] is None
+                and not self.opts['fftMode']
+                and not any(self.opts['logMode']))
+
+    def getData(self):
+        if not self.decimating:
+            self._decimated_view = None
+            return super().getData()
+        if self.xDisp is None:
+            if self._decimated_data is not self.xData:
+                self._decimator.set_data(self.xData, self.yData)
+                self._decimated_data = self.xData
+            self._decimated_view = self._get_view()
+            x_min, x_max, pixels = self._decimated_view
+            self.xDisp, self.yDisp = self._decimator.decimate(x_min, x_max, pixels)
+        return self.xDisp, self.yDisp
+
+    def dataBounds(self, ax, frac=1.0, orthoRange=None):
+        if not self.decimating or frac < 1.0:
+            return super().dataBounds(ax, frac, orthoRange)
+        # The curve only contains the visible part of the trace.
+        self.getData()
+        if ax == 0:
+            return list(self._decimator.data_bounds(0))
+        return list(self._decimator.data_bounds(1, orthoRange))
+
+    def clear(self):
+        super().clear()
+        self._decimator.clear()
+        self._decimated_data = None
+        self._decimated_view = None
+        return
+
+    def viewRangeChanged(self):
+        if not self.decimating:
+            return super().viewRangeChanged()
+        self._update_decimation()
+        return
+
+    def viewTransformChanged(self):
+        super().viewTransformChanged()
+        if self.decimating:
+            self._update_decimation()
+        return
+
+    def _update_decimation(self):
+        """ Decimate the trace again if the visible x range or the view width changed. """
+        if self._get_view() != self._decimated_view:
+            self.xDisp = self.yDisp = None
+            self.updateItems()
+        return
+
+    def _get_view(self):
+        """
+        @return tuple: visible x range (None for the whole trace if not in a view) and width of the
+                       view in pixels
+        """
+        view = self.getViewBox()
+        rect = self.viewRect()
+        if view is None or rect is None:
+            return None, None, self._decimator.size
+        return rect.left(), rect.right(), max(1, int(round(view.width())))
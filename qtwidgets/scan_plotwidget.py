@@ -20,7 +20,9 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import numpy as np
 from pyqtgraph import PlotWidget, ImageItem, ViewBox, InfiniteLine, ROI
+from pyqtgraph import functions as fn
 from qtpy import QtCore
 from core.util.filters import scan_blink_correction
 
@@ -42,6 +44,11 @@ class ScanImageItem(ImageItem):
         self.use_blink_correction = False
         self.blink_correction_axis = 0
         self.orig_image = None
+        # maximum change of the levels (relative to the level range of the last full render) for
+        # which update_image_rows only renders the changed rows
+        self.level_tolerance = 0.05
+        self._row_update_image = None
+        self._rendered_levels = None
         super().__init__(*args, **kwargs)
         return
 
@@ -82,11 +89,87 @@ class ScanImageItem(ImageItem):
         """
         pg.ImageItem method override to apply optional filter when setting image data.
         """
+        if image is not None:
+            self._row_update_image = None
         if self.use_blink_correction:
             self.orig_image = image
             image = scan_blink_correction(image=image, axis=self.blink_correction_axis)
         return super().setImage(image=image, autoLevels=autoLevels, **kwargs)
 
+    def update_image_rows(self, image, rows=None, shift=0, levels=None, level_tolerance=None):
+        """
+        Update the displayed image by rendering only the changed rows into the already rendered
+        image instead of the whole image.
+        The changed rows are rendered with the new levels. The whole image is only rendered again
+        if the levels moved away from the levels of the last full render by more than
+        level_tolerance times their range, so rows rendered before are off by at most this
+        fraction of the color scale. Without changed rows the whole image is rendered with any
+        new levels.
+        The image array must be the same array (updated in place) as in the previous call. The whole
+        image is rendered (as with setImage) if it is a different array, if rows is None or if blink
+        correction or auto downsampling is active.
+
+        @param numpy.ndarray image: 2D image (row-major), updated in place since the last call
+        @param iterable rows: indices of the changed rows (after shifting), None for all rows
+        @param int shift: number of rows the content of the previous image moved down
+        @param tuple levels: (min, max) levels of the color scale
+        @param float level_tolerance: optional maximum relative level change without rendering the
+                                      whole image (default: attribute level_tolerance)
+        """
+        if levels is None:
+            levels = self.levels
+        else:
+            levels = np.asarray(levels, dtype=float)
+        if level_tolerance is None:
+            level_tolerance = self.level_tolerance
+        if rows is not None:
+            rows = np.asarray(rows, dtype=int)
+            shift = int(shift)
+            if shift == 0 and rows.size == 0:
+                level_tolerance = 0
+        if (rows is None or image is not self._row_update_image or self.qimage is None
+                or self.use_blink_correction or self.autoDownsample or callable(self.lut)
+                or self.axisOrder != 'row-major' or image.ndim != 2 or image.dtype.kind != 'f'
+                or levels is None or self._rendered_levels is None
+                or not self._levels_within_tolerance(levels, level_tolerance)
+                or (self.qimage.height(), self.qimage.width()) != image.shape):
+            self.setImage(image=image, autoLevels=False, levels=levels)
+            self._row_update_image = image
+            self._rendered_levels = None if levels is None else np.array(levels, dtype=float)
+            return
+
+        if shift == 0 and rows.size == 0:
+            return
+        # The changed rows are rendered with the new levels, the others keep their colors
+        self.setLevels(levels, update=False)
+        # The ARGB array of the rendered QImage (no copy)
+        argb_image = fn.imageToArray(self.qimage, copy=False, transpose=False)
+        if shift > 0:
+            argb_image[shift:] = argb_image[:-shift]
+        if rows.size > 0:
+            argb, alpha = fn.makeARGB(image[rows], lut=self.lut, levels=self.levels)
+            argb_image[rows] = argb
+        self.update()
+        self.sigImageChanged.emit()
+
+    def _levels_within_tolerance(self, levels, level_tolerance):
+        """
+        Check if the levels differ from the levels of the last full render by at most
+        level_tolerance times the range of these levels.
+
+        @param numpy.ndarray levels: (min, max) levels
+        @param float level_tolerance: maximum relative change of the levels
+
+        @return bool: True if the change is within the tolerance
+        """
+        rendered = self._rendered_levels
+        if levels.shape != rendered.shape:
+            return False
+        if level_tolerance <= 0:
+            return np.array_equal(levels, rendered)
+        span = abs(rendered[1] - rendered[0])
+        return bool(np.max(np.abs(levels - rendered)) <= level_tolerance * span)
+
     def mouseClickEvent(self, ev):
         if not ev.double():
             pos = self.getViewBox().mapSceneToView(ev.scenePos())
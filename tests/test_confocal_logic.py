@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the pipelined scan of logic/confocal_logic.py.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+
+import os
+import sys
+import types
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from logic.confocal_logic import ConfocalLogic
+
+
+class _ScanDummy:
+    """ Attributes and methods of ConfocalLogic used by the pipelined scan slot. """
+
+    def __init__(self):
+        self._scan_thread = object()
+        self._scan_generation = 0
+        self.stopRequested = False
+        self.stored_lines = list()
+        self.signal_scan_lines_next = types.SimpleNamespace(emit=lambda: None)
+
+    def _store_line_counts(self, line_index, line_counts, reverse):
+        self.stored_lines.append(line_index)
+
+    def _next_scan_line(self):
+        pass
+
+    def _queue_next_scan_line(self):
+        pass
+
+
+def test_lines_of_stopped_scan_are_discarded():
+    logic = _ScanDummy()
+    counts = np.zeros((10, 1))
+    ConfocalLogic._pipelined_line_scanned(logic, 0, 3, False, counts)
+    assert logic.stored_lines == [3]
+
+    # scan stopped and a new one started before the queued line of the old scan arrives
+    logic._scan_generation += 1
+    ConfocalLogic._pipelined_line_scanned(logic, 0, 4, False, counts)
+    ConfocalLogic._pipelined_line_scanned(logic, 1, 0, False, counts)
+    assert logic.stored_lines == [3, 0]
+
+    # no scan running
+    logic._scan_thread = None
+    ConfocalLogic._pipelined_line_scanned(logic, 1, 1, False, counts)
+    assert logic.stored_lines == [3, 0]
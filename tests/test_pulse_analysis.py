@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the basic pulsed analysis methods.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from logic.pulsed.pulsed_analysis_methods.basic_analysis_methods import BasicPulseAnalyzer
+
+WINDOWS = ((0, 200), (150, 3000), (2500, 2500), (10, 5000), (-100, -1))
+
+
+def _former_window_sums(laser_data, windows):
+    """ Window sums of the former per-laser loop. """
+    return [np.array([laser_arr[start:stop].sum() for laser_arr in laser_data])
+            for start, stop in windows]
+
+
+def test_window_sums_identical_to_former_loop():
+    rng = np.random.default_rng(0)
+    for laser_data in (rng.poisson(20, size=(50, 3000)),
+                       rng.poisson(20, size=(50, 3000)).astype(np.uint32),
+                       rng.random((50, 3000)) * 1e3,
+                       rng.random((50, 3000)).astype(np.float32)):
+        sums, lengths = BasicPulseAnalyzer._get_window_sums(laser_data, WINDOWS)
+        for window_sum, former_sum, (start, stop) in zip(
+                sums, _former_window_sums(laser_data, WINDOWS), WINDOWS):
+            assert window_sum.dtype == former_sum.dtype
+            assert np.array_equal(window_sum, former_sum)
+        assert lengths == [len(range(3000)[start:stop]) for start, stop in WINDOWS]
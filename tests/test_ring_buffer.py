@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the ring buffers in core/util/ring_buffer.py.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.util.ring_buffer import SweepRingBuffer
+
+
+def test_grow_empty_spilling_buffer(tmp_path):
+    buffer = SweepRingBuffer((5,), capacity=2, spill_dir=str(tmp_path))
+    try:
+        # e.g. ODMRLogic.set_average_length before the first sweep
+        buffer.set_window(4)
+        assert buffer.capacity == 4
+        assert len(buffer) == 0
+        assert np.array_equal(buffer.get_mean(), np.zeros(5))
+
+        for i in range(6):
+            buffer.add_line(np.full(5, i))
+        assert buffer.get_lines().shape == (6, 5)
+        assert np.array_equal(buffer.get_mean(), np.full(5, 3.5))
+
+        # and again after a clear
+        buffer.clear()
+        buffer.set_window(8)
+        assert buffer.capacity == 8
+        assert len(buffer) == 0
+    finally:
+        buffer.close()
+
+
+def test_grow_spilling_buffer_restores_spilled_lines(tmp_path):
+    buffer = SweepRingBuffer((3,), capacity=2, spill_dir=str(tmp_path))
+    try:
+        for i in range(5):
+            buffer.add_line(np.full(3, i))
+        buffer.ensure_capacity(4)
+        lines = buffer.get_lines()
+        assert np.array_equal(lines[:, 0], [4, 3, 2, 1, 0])
+        assert buffer.lines_in_memory == 4
+    finally:
+        buffer.close()
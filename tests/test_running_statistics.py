@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the statistics in core/util/running_statistics.py.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.util.running_statistics import SlidingMedian
+
+
+@pytest.mark.parametrize('window', [1, 2, 7, 50])
+def test_sliding_median_random(window):
+    values = np.random.RandomState(0).randint(0, 20, 1000).astype(float)
+    median = SlidingMedian(window)
+    for index, value in enumerate(values):
+        expected = np.median(values[max(0, index + 1 - window):index + 1])
+        assert median.add(value) == expected
+
+
+@pytest.mark.parametrize('step', [1.0, -1.0])
+def test_sliding_median_heaps_bounded(step):
+    """ Removed values of drifting data never reach the top of the heaps. """
+    window = 50
+    values = step * np.arange(20 * window, dtype=float)
+    median = SlidingMedian(window)
+    for index, value in enumerate(values):
+        expected = np.median(values[max(0, index + 1 - window):index + 1])
+        assert median.add(value) == expected
+        assert len(median._low) + len(median._high) <= 2 * window
+        assert len(median._removed) <= window
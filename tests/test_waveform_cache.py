@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the on-disk waveform cache in logic/pulsed/waveform_cache.py.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from logic.pulsed.waveform_cache import WaveformCache
+
+
+def _write_entry(cache, key, number_of_samples=100):
+    writer = cache.create_writer(key, ['a_ch1'], ['d_ch1'], number_of_samples)
+    writer.append({'a_ch1': np.ones(number_of_samples)},
+                  {'d_ch1': np.ones(number_of_samples, dtype=bool)},
+                  number_of_samples)
+    return writer
+
+
+def test_evict_removes_interrupted_entries(tmp_path):
+    # entry left over by a write interrupted in a previous session
+    os.makedirs(os.path.join(str(tmp_path), 'interrupted'))
+    with open(os.path.join(str(tmp_path), 'interrupted', 'a_ch1.npy'), 'wb') as file:
+        file.write(b'\0' * 1000)
+
+    cache = WaveformCache(str(tmp_path), max_size=10000)
+    assert not os.path.exists(os.path.join(str(tmp_path), 'interrupted'))
+
+    # an entry being written is kept until finalized
+    writer = _write_entry(cache, 'writing')
+    cache.evict()
+    assert os.path.isdir(os.path.join(str(tmp_path), 'writing'))
+    writer.finalize(offset_bin=0)
+    assert cache.get_entry('writing')['number_of_samples'] == 100
+
+    # an entry whose writer was dropped without finalize or discard is removed
+    _write_entry(cache, 'dropped')
+    cache._writing.discard('dropped')
+    cache.evict()
+    assert sorted(os.listdir(str(tmp_path))) == ['writing']
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = WaveformCache(str(tmp_path), max_size=1200)
+    for key in ('first', 'second', 'third'):
+        _write_entry(cache, key).finalize(offset_bin=0)
+        os.utime(os.path.join(str(tmp_path), key, 'meta.json'),
+                 (len(os.listdir(str(tmp_path))),) * 2)
+    assert cache.get_entry('first') is None
+    assert cache.get_entry('third') is not None
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the preallocating waveform file writers of the AWG hardware modules and
+SamplesWriteMethods, which have to create the same files as the appending writers.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import logging
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from hardware.awg.tektronix_awg7k import AWG7k
+from hardware.awg.tektronix_awg70k import AWG70K
+from tools.samples_write_methods import SamplesWriteMethods
+
+
+class _AWG7kFiles:
+    """ The wfm file writing of AWG7k without a device. """
+    _write_wfm = AWG7k._write_wfm
+    _write_wfm_preallocated = AWG7k._write_wfm_preallocated
+
+    def __init__(self, directory, preallocate):
+        self._tmp_work_dir = str(directory)
+        self._preallocate_waveform_files = preallocate
+        self._preallocated_wfm_files = dict()
+
+    def get_sample_rate(self):
+        return 12e9
+
+
+class _AWG70KFiles:
+    """ The wfmx file writing of AWG70K without a device. """
+    _write_wfmx = AWG70K._write_wfmx
+    _write_wfmx_preallocated = AWG70K._write_wfmx_preallocated
+    _create_xml_header = AWG70K._create_xml_header
+
+    def __init__(self, directory, preallocate):
+        self._tmp_work_dir = str(directory)
+        self._preallocate_waveform_files = preallocate
+        self._preallocated_wfmx_files = dict()
+
+    def get_sample_rate(self):
+        return 25e9
+
+
+def _get_chunks(chunk_lengths, seed=0):
+    rng = np.random.RandomState(seed)
+    chunks = list()
+    for length in chunk_lengths:
+        analog = rng.uniform(-1, 1, length).astype('float32')
+        markers = rng.randint(0, 4, length).astype('uint8')
+        chunks.append((analog, markers))
+    return chunks
+
+
+def _write_awg_file(awg, write_method, filename, chunks, with_markers):
+    total = sum(len(analog) for analog, _ in chunks)
+    for index, (analog, markers) in enumerate(chunks):
+        getattr(awg, write_method)(filename=filename,
+                                   analog_samples=analog,
+                                   marker_bytes=markers if with_markers else None,
+                                   is_first_chunk=index == 0,
+                                   is_last_chunk=index == len(chunks) - 1,
+                                   total_number_of_samples=total)
+
+
+def _read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('chunk_lengths', [(1000,), (1000, 1000, 500)])
+@pytest.mark.parametrize('with_markers', [True, False])
+def test_awg7k_preallocated_wfm_identical(tmp_path, chunk_lengths, with_markers):
+    chunks = _get_chunks(chunk_lengths)
+    for preallocate in (False, True):
+        awg = _AWG7kFiles(tmp_path / str(preallocate), preallocate)
+        os.makedirs(awg._tmp_work_dir)
+        _write_awg_file(awg, '_write_wfm', 'test_ch1', chunks, with_markers)
+        assert not awg._preallocated_wfm_files
+    assert _read(tmp_path / 'False' / 'test_ch1.wfm') == _read(tmp_path / 'True' / 'test_ch1.wfm')
+
+
+@pytest.mark.parametrize('chunk_lengths', [(1000,), (1000, 1000, 500)])
+@pytest.mark.parametrize('with_markers', [True, False])
+def test_awg70k_preallocated_wfmx_identical(tmp_path, chunk_lengths, with_markers):
+    chunks = _get_chunks(chunk_lengths)
+    for preallocate in (False, True):
+        awg = _AWG70KFiles(tmp_path / str(preallocate), preallocate)
+        os.makedirs(awg._tmp_work_dir)
+        _write_awg_file(awg, '_write_wfmx', 'test_ch1', chunks, with_markers)
+        assert not awg._preallocated_wfmx_files
+    assert not os.path.exists(tmp_path / 'True' / 'digital_tmp.bin')
+    assert (_read(tmp_path / 'False' / 'test_ch1.wfmx')
+            == _read(tmp_path / 'True' / 'test_ch1.wfmx'))
+
+
+class _Writer(SamplesWriteMethods):
+    """ SamplesWriteMethods with the attributes usually provided by the pulser hardware module. """
+    def __init__(self, directory, preallocate_files):
+        super().__init__(preallocate_files=preallocate_files)
+        self.waveform_dir = str(directory)
+        self.temp_dir = str(directory)
+        self.sample_rate = 25e9
+        self.log = logging.getLogger(__name__)
+
+
+def _get_digital_chunks(chunk_lengths, seed=0):
+    rng = np.random.RandomState(seed)
+    return [{'d_ch{0:d}'.format(ch): rng.randint(0, 2, length).astype(bool) for ch in range(1, 9)}
+            for length in chunk_lengths]
+
+
+def _write_fpga_file(writer, name, chunks):
+    total = sum(len(chunk['d_ch1']) for chunk in chunks)
+    for index, digital in enumerate(chunks):
+        writer._write_to_file['fpga'](name=name,
+                                      analog_samples=dict(),
+                                      digital_samples=digital,
+                                      total_number_of_samples=total,
+                                      is_first_chunk=index == 0,
+                                      is_last_chunk=index == len(chunks) - 1)
+
+
+@pytest.mark.parametrize('length', [1000, 1024])
+def test_preallocated_fpga_identical(tmp_path, length):
+    chunks = _get_digital_chunks((length,))
+    _write_fpga_file(_Writer(tmp_path, False), 'append', chunks)
+    _write_fpga_file(_Writer(tmp_path, True), 'prealloc', chunks)
+    assert _read(tmp_path / 'append.fpga') == _read(tmp_path / 'prealloc.fpga')
+
+
+def test_preallocated_fpga_chunks(tmp_path):
+    """ The chunks of a waveform end up in one file equal to the file written in one chunk. """
+    chunks = _get_digital_chunks((400, 400, 200))
+    whole = {ch: np.concatenate([chunk[ch] for chunk in chunks]) for ch in chunks[0]}
+    _write_fpga_file(_Writer(tmp_path, False), 'whole', [whole])
+    writer = _Writer(tmp_path, True)
+    _write_fpga_file(writer, 'chunked', chunks)
+    assert not writer._preallocated_files
+    assert _read(tmp_path / 'whole.fpga') == _read(tmp_path / 'chunked.fpga')
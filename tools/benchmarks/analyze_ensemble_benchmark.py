@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the timing analysis of heavily repeated PulseBlockEnsembles (as done by
+SequenceGeneratorLogic.analyze_block_ensemble before sampling): the former loop over each block,
+repetition and element versus the vectorized analyze_ensemble_timing. Also checks that both
+give identical results.
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/analyze_ensemble_benchmark.py [repetitions]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from logic.pulsed.pulse_objects import PulseBlock, PulseBlockElement
+from logic.pulsed.sampling_functions import SamplingFunctions
+from logic.pulsed.ensemble_analysis import analyze_ensemble_timing
+
+SamplingFunctions.import_sampling_functions(
+    [os.path.join(os.path.dirname(__file__), '..', '..', 'logic', 'pulsed',
+                  'sampling_function_defs')])
+
+
+def analyze_ensemble_loop(block_list, sample_rate, laser_channel):
+    """ Former implementation of SequenceGeneratorLogic.analyze_block_ensemble (timing part). """
+    tmp_digital_high = dict()
+    tmp_laser_on = False
+    digital_channels = set()
+    analog_channels = set()
+    if len(block_list) > 0:
+        block = block_list[0][0]
+        digital_channels = block.digital_channels
+        analog_channels = block.analog_channels
+        block = block_list[-1][0]
+        if len(block) > 0:
+            tmp_digital_high = block[-1].digital_high.copy()
+            tmp_laser_on = block[-1].laser_on
+        else:
+            tmp_digital_high = {chnl: False for chnl in digital_channels}
+            tmp_laser_on = False
+    digital_rising_bins = {chnl: list() for chnl in digital_channels}
+    digital_falling_bins = {chnl: list() for chnl in digital_channels}
+    laser_rising_bins = list()
+    laser_falling_bins = list()
+    elements_length_bins = list()
+    current_end_time = 0.0
+    current_start_bin = 0
+    for block, reps in block_list:
+        for rep_no in range(reps + 1):
+            for element in block:
+                if tmp_digital_high != element.digital_high:
+                    for chnl, state in element.digital_high.items():
+                        if not tmp_digital_high[chnl] and state:
+                            digital_rising_bins[chnl].append(current_start_bin)
+                        elif tmp_digital_high[chnl] and not state:
+                            digital_falling_bins[chnl].append(current_start_bin)
+                    tmp_digital_high = element.digital_high.copy()
+                if not laser_channel.startswith('d') and tmp_laser_on != element.laser_on:
+                    if not tmp_laser_on and element.laser_on:
+                        laser_rising_bins.append(current_start_bin)
+                    else:
+                        laser_falling_bins.append(current_start_bin)
+                    tmp_laser_on = element.laser_on
+                current_end_time += element.init_length_s + rep_no * element.increment_s
+                current_end_bin = int(np.rint(current_end_time * sample_rate))
+                elements_length_bins.append(current_end_bin - current_start_bin)
+                current_start_bin = current_end_bin
+    elements_length_bins = np.array(elements_length_bins, dtype='int64')
+    for chnl in digital_channels:
+        digital_rising_bins[chnl] = np.array(sorted(set(digital_rising_bins[chnl])), dtype='int64')
+        digital_falling_bins[chnl] = np.array(sorted(set(digital_falling_bins[chnl])),
+                                              dtype='int64')
+    if laser_channel.startswith('d'):
+        laser_rising_bins = digital_rising_bins[laser_channel]
+        laser_falling_bins = digital_falling_bins[laser_channel]
+    else:
+        laser_rising_bins = np.array(sorted(set(laser_rising_bins)), dtype='int64')
+        laser_falling_bins = np.array(sorted(set(laser_falling_bins)), dtype='int64')
+    return {'elements_length_bins': elements_length_bins,
+            'digital_rising_bins': digital_rising_bins,
+            'digital_falling_bins': digital_falling_bins,
+            'laser_rising_bins': laser_rising_bins,
+            'laser_falling_bins': laser_falling_bins,
+            'analog_channels': analog_channels,
+            'digital_channels': digital_channels,
+            'ideal_length': current_end_time}
+
+
+def make_element(length, increment=0, laser=False, gate=False, laser_on=False):
+    return PulseBlockElement(init_length_s=length,
+                             increment_s=increment,
+                             pulse_function={'a_ch1': SamplingFunctions.Idle()},
+                             digital_high={'d_ch1': laser, 'd_ch2': gate, 'd_ch3': False},
+                             laser_on=laser_on)
+
+
+def make_block_list(repetitions):
+    """ Laser initialization followed by a repeated XY8 block with incremented tau. """
+    init_block = PulseBlock('init', element_list=[
+        make_element(3e-6, laser=True, gate=True, laser_on=True),
+        make_element(1e-6)])
+    xy8_elements = list()
+    for pulse in range(8):
+        xy8_elements.append(make_element(12.5e-9, increment=1.3e-12))
+        xy8_elements.append(make_element(25.3e-9, laser=pulse % 2 == 0))
+    xy8_block = PulseBlock('xy8', element_list=xy8_elements)
+    readout_block = PulseBlock('readout', element_list=[
+        make_element(1e-6, laser=True, gate=True, laser_on=True),
+        make_element(0.7e-6, increment=3.1e-9)])
+    return [(init_block, 0), (xy8_block, repetitions), (readout_block, 10), (xy8_block, 3)]
+
+
+def compare(result, reference):
+    """ Check that both results are identical. """
+    for key in ('elements_length_bins', 'laser_rising_bins', 'laser_falling_bins'):
+        assert np.array_equal(result[key], reference[key]), key
+        assert result[key].dtype == reference[key].dtype, key
+    for key in ('digital_rising_bins', 'digital_falling_bins'):
+        assert set(result[key]) == set(reference[key]), key
+        for chnl in reference[key]:
+            assert np.array_equal(result[key][chnl], reference[key][chnl]), (key, chnl)
+    assert result['ideal_length'] == reference['ideal_length']
+    return
+
+
+def run_benchmark(repetitions=20000, sample_rate=25e9):
+    block_list = make_block_list(repetitions)
+    elements = sum(len(block) * (reps + 1) for block, reps in block_list)
+    print('{0:d} elements at {1:.3g} samples/s'.format(elements, sample_rate))
+    print('{0:>14} {1:>12} {2:>12} {3:>10}'.format('laser channel', 'loop [ms]',
+                                                   'vector [ms]', 'speedup'))
+    for laser_channel in ('d_ch1', 'a_ch1'):
+        start = time.perf_counter()
+        reference = analyze_ensemble_loop(block_list, sample_rate, laser_channel)
+        loop_time = time.perf_counter() - start
+        start = time.perf_counter()
+        result = analyze_ensemble_timing(block_list, sample_rate, laser_channel)
+        vector_time = time.perf_counter() - start
+        compare(result, reference)
+        print('{0:>14} {1:>12.1f} {2:>12.1f} {3:>10.1f}'.format(
+            laser_channel, 1e3 * loop_time, 1e3 * vector_time, loop_time / vector_time))
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run_benchmark(repetitions=int(sys.argv[1]))
+    else:
+        run_benchmark()
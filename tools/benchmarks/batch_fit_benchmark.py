@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of FitLogic.do_batch_fit against sequential FitContainer.do_fit calls on synthetic
+ODMR matrix rows (lorentzian dip with drifting center) and pulsed Rabi sweeps (damped sine).
+The batch fit is run in the calling process (1 worker) and with a process pool, each with and
+without warm start.
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/batch_fit_benchmark.py [number_of_traces [number_of_workers]]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import multiprocessing as mp
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from logic.fit_logic import FitLogic
+
+
+def generate_odmr_rows(number_of_traces, seed=0):
+    """ Lorentzian dips with a slowly drifting center and poissonian noise. """
+    rng = np.random.RandomState(seed)
+    x = np.linspace(2.80e9, 2.94e9, 101)
+    centers = 2.87e9 + np.cumsum(rng.normal(0, 2e5, number_of_traces))
+    half_width = 5e6 / 2
+    y = 1e4 * (1 - 0.2 * half_width ** 2 / (
+            (x[np.newaxis] - centers[:, np.newaxis]) ** 2 + half_width ** 2))
+    return x, rng.poisson(y).astype(float)
+
+
+def generate_rabi_sweeps(number_of_traces, seed=0):
+    """ Damped Rabi oscillations with slowly changing frequency and gaussian noise. """
+    rng = np.random.RandomState(seed)
+    x = np.linspace(0, 2e-6, 100)
+    frequencies = 4e6 + np.cumsum(rng.normal(0, 1e4, number_of_traces))
+    y = 0.5 + 0.15 * np.cos(2 * np.pi * frequencies[:, np.newaxis] * x[np.newaxis]) * np.exp(
+        -x[np.newaxis] / 1.5e-6)
+    return x, y + rng.normal(0, 0.01, y.shape)
+
+
+def sequential_fits(fit_logic, fit_function, estimator, x, y):
+    """ Fit each trace with a FitContainer like a measurement logic does. """
+    container = fit_logic.make_fit_container('benchmark', '1d')
+    fits = fit_logic.validate_load_fits(
+        {'1d': {'fit': {'fit_function': fit_function, 'estimator': estimator}}})['1d']
+    fits['fit']['use_settings'] = dict()
+    container.set_fit_functions(fits)
+    container.set_current_fit('fit')
+    return [container.do_fit(x, trace)[2] for trace in y]
+
+
+def run_benchmark(number_of_traces=200, number_of_workers=None):
+    if number_of_workers is None:
+        number_of_workers = mp.cpu_count()
+    serial_logic = FitLogic(manager=None, name='fitlogic', config={'batch_fit_workers': 1})
+    parallel_logic = FitLogic(manager=None, name='fitlogic',
+                              config={'batch_fit_workers': number_of_workers})
+    print('{0:d} traces per case, {1:d} worker processes ({2:d} CPUs)'.format(
+        number_of_traces, number_of_workers, mp.cpu_count()))
+    print('{0:>22} {1:>10} {2:>10} {3:>10} {4:>14}'.format(
+        'case', 'time [s]', 'fits/s', 'speedup', 'max deviation'))
+    cases = (('ODMR rows (lorentzian)', 'lorentzian', 'dip', 'center', generate_odmr_rows),
+             ('Rabi sweeps (sine)', 'sineexponentialdecay', 'generic', 'frequency',
+              generate_rabi_sweeps))
+    try:
+        for label, fit_function, estimator, parameter, generate in cases:
+            x, y = generate(number_of_traces)
+            start = time.perf_counter()
+            results = sequential_fits(serial_logic, fit_function, estimator, x, y)
+            reference_time = time.perf_counter() - start
+            reference = np.array([result.params[parameter].value for result in results])
+            print('{0:>22} {1:>10.3f} {2:>10.1f} {3:>10.1f} {4:>14}'.format(
+                label, reference_time, number_of_traces / reference_time, 1, '-'))
+            for name, logic, warm_start in (('batch', serial_logic, False),
+                                            ('batch warm start', serial_logic, True),
+                                            ('pool', parallel_logic, False),
+                                            ('pool warm start', parallel_logic, True)):
+                if logic is parallel_logic:
+                    # start the worker processes before timing
+                    logic.do_batch_fit(x, y[:2 * number_of_workers], fit_function, estimator)
+                start = time.perf_counter()
+                values, errors, success = logic.do_batch_fit(x, y, fit_function, estimator,
+                                                             warm_start=warm_start)
+                elapsed = time.perf_counter() - start
+                # relative deviation of the fitted parameter from the sequential fit
+                deviation = np.max(np.abs(values[parameter] - reference) / np.abs(reference))
+                print('{0:>22} {1:>10.3f} {2:>10.1f} {3:>10.1f} {4:>14.2e}'.format(
+                    name, elapsed, number_of_traces / elapsed, reference_time / elapsed,
+                    deviation))
+    finally:
+        parallel_logic.on_deactivate()
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        run_benchmark(number_of_traces=int(sys.argv[1]), number_of_workers=int(sys.argv[2]))
+    elif len(sys.argv) > 1:
+        run_benchmark(number_of_traces=int(sys.argv[1]))
+    else:
+        run_benchmark()
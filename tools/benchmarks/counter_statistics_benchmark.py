@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the data processing of CounterLogic per counter readout for several channels, trace
+lengths and smoothing windows. The streaming statistics (ring buffer trace, sliding median,
+growable sample buffer) are compared against the former processing with np.roll, np.median over
+the smoothing window and a list of saved samples. The time budget per readout at a count frequency
+of 1 kHz is 1 ms.
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/counter_statistics_benchmark.py [number_of_readouts]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from logic.counter_logic import CounterLogic
+
+COUNT_FREQUENCY = 1000
+
+
+class _LogicDummy:
+    """ Minimal stand-in for CounterLogic providing what the data processing reads. """
+    _init_data_buffers = CounterLogic._init_data_buffers
+    _process_data_continous = CounterLogic._process_data_continous
+    _save_samples = CounterLogic._save_samples
+    countdata = CounterLogic.countdata
+    countdata_smoothed = CounterLogic.countdata_smoothed
+
+    def __init__(self, number_of_channels, count_length, smooth_window_length):
+        self._channels = ['ch{0:d}'.format(i) for i in range(number_of_channels)]
+        self._count_length = count_length
+        self._smooth_window_length = smooth_window_length
+        self._counting_samples = 1
+        self._saving = True
+        self._saving_start_time = time.time()
+        self._init_data_buffers()
+
+    def get_channels(self):
+        return self._channels
+
+
+class _LegacyLogicDummy(_LogicDummy):
+    """ Former data processing of CounterLogic in continuous mode. """
+    countdata = None
+    countdata_smoothed = None
+
+    def _init_data_buffers(self):
+        self.countdata = np.zeros([len(self.get_channels()), self._count_length])
+        self.countdata_smoothed = np.zeros([len(self.get_channels()), self._count_length])
+        self._data_to_save = []
+
+    def _process_data_continous(self):
+        for i, ch in enumerate(self.get_channels()):
+            self.countdata[i, 0] = np.average(self.rawdata[i])
+        self.countdata = np.roll(self.countdata, -1, axis=1)
+        self.countdata_smoothed = np.roll(self.countdata_smoothed, -1, axis=1)
+        window = -int(self._smooth_window_length / 2) - 1
+        for i, ch in enumerate(self.get_channels()):
+            self.countdata_smoothed[i, window:] = np.median(self.countdata[i,
+                                                            -self._smooth_window_length:])
+        if self._saving:
+            chans = self.get_channels()
+            newdata = np.empty((len(chans) + 1, ))
+            newdata[0] = time.time() - self._saving_start_time
+            for i, ch in enumerate(chans):
+                newdata[i + 1] = self.countdata[i, -1]
+            self._data_to_save.append(newdata)
+        return
+
+
+def _process(logic, readouts):
+    start = time.perf_counter()
+    for readout in readouts:
+        logic.rawdata = readout
+        logic._process_data_continous()
+    return (time.perf_counter() - start) / len(readouts)
+
+
+def run_benchmark(number_of_readouts=20000, channels=(1, 2, 4, 8),
+                  count_lengths=(300, 10000), smooth_windows=(10, 100)):
+    rng = np.random.RandomState(0)
+    print('time per readout in us (budget at {0:d} Hz: {1:.0f} us), {2:d} readouts'.format(
+        COUNT_FREQUENCY, 1e6 / COUNT_FREQUENCY, number_of_readouts))
+    print('{0:>8} {1:>8} {2:>8} {3:>10} {4:>10} {5:>8} {6:>6}'.format(
+        'channels', 'length', 'window', 'streaming', 'legacy', 'speedup', 'equal'))
+    for number_of_channels in channels:
+        readouts = rng.poisson(1e4, (number_of_readouts, number_of_channels, 1)).astype(float)
+        for count_length in count_lengths:
+            for smooth_window in smooth_windows:
+                logic = _LogicDummy(number_of_channels, count_length, smooth_window)
+                legacy = _LegacyLogicDummy(number_of_channels, count_length, smooth_window)
+                streaming_time = _process(logic, readouts)
+                legacy_time = _process(legacy, readouts)
+                equal = (np.array_equal(logic.countdata, legacy.countdata)
+                         and np.array_equal(logic.countdata_smoothed, legacy.countdata_smoothed)
+                         and np.array_equal(logic._data_to_save.get_view()[:, 1:],
+                                            np.array(legacy._data_to_save)[:, 1:]))
+                print('{0:>8d} {1:>8d} {2:>8d} {3:>10.1f} {4:>10.1f} {5:>8.1f} {6:>6}'.format(
+                    number_of_channels, count_length, smooth_window, streaming_time * 1e6,
+                    legacy_time * 1e6, legacy_time / streaming_time, str(equal)))
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run_benchmark(number_of_readouts=int(float(sys.argv[1])))
+    else:
+        run_benchmark()
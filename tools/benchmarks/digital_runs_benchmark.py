@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of writing a digital-only PulseBlockEnsemble to a digital pulse generator (e.g.
+PulseStreamer, PulseBlaster): sampling bool arrays at full sample rate (as in
+SequenceGeneratorLogic._write_ensemble_serial) and converting them back into pulse durations in
+the hardware module versus calculating the runs of constant channel states directly from the
+element lengths of analyze_block_ensemble (ensemble_digital_runs). Also checks that both give the
+same pulse patterns.
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/digital_runs_benchmark.py [ensemble_length_ms]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from logic.pulsed.pulse_objects import PulseBlock, PulseBlockElement
+from logic.pulsed.ensemble_analysis import analyze_ensemble_timing, ensemble_digital_runs
+
+CHANNELS = ('d_ch1', 'd_ch2', 'd_ch3', 'd_ch4')
+
+
+def make_element(length, increment=0, laser=False, gate=False, mw=False):
+    return PulseBlockElement(init_length_s=length,
+                             increment_s=increment,
+                             pulse_function=dict(),
+                             digital_high={'d_ch1': laser, 'd_ch2': gate, 'd_ch3': mw,
+                                           'd_ch4': False},
+                             laser_on=laser)
+
+
+def make_block_list(ensemble_length):
+    """ Digital Rabi: switched microwave pulse with increasing length, laser readout. """
+    rabi_block = PulseBlock('rabi', element_list=[
+        make_element(10e-9, increment=1e-9, mw=True),
+        make_element(3e-6, laser=True, gate=True),
+        make_element(1e-6)])
+    repetitions = max(int(ensemble_length / 5e-6), 1)
+    return [(rabi_block, repetitions - 1)]
+
+
+def sample_digital(block_list, elements_length_bins):
+    """ Digital samples of the ensemble element by element (as in _write_ensemble_serial). """
+    number_of_samples = int(np.sum(elements_length_bins))
+    digital_samples = {chnl: np.empty(number_of_samples, dtype=bool) for chnl in CHANNELS}
+    write_index = 0
+    element_count = 0
+    for block, reps in block_list:
+        for rep_no in range(reps + 1):
+            for element in block:
+                length = elements_length_bins[element_count]
+                for chnl, state in element.digital_high.items():
+                    digital_samples[chnl][write_index:write_index + length] = state
+                write_index += length
+                element_count += 1
+    return digital_samples
+
+
+def samples_to_pattern(samples):
+    """ Pulse pattern (durations and levels) of one channel from its samples. """
+    pulse_starts = np.insert(np.flatnonzero(samples[1:] != samples[:-1]) + 1, 0, 0)
+    return np.diff(np.append(pulse_starts, samples.size)), samples[pulse_starts]
+
+
+def runs_to_pattern(run_lengths, states):
+    """ Pulse pattern (durations and levels) of one channel from runs of channel states. """
+    pulse_starts = np.insert(np.flatnonzero(states[1:] != states[:-1]) + 1, 0, 0)
+    return np.add.reduceat(run_lengths, pulse_starts), states[pulse_starts]
+
+
+def run_benchmark(ensemble_length=10e-3, sample_rate=1e9):
+    block_list = make_block_list(ensemble_length)
+    timing = analyze_ensemble_timing(block_list, sample_rate, 'd_ch1')
+    elements_length_bins = timing['elements_length_bins']
+    number_of_samples = int(np.sum(elements_length_bins))
+    print('{0:.1f} ms, {1:d} elements, {2:d} samples per channel at {3:.3g} samples/s'.format(
+        1e3 * timing['ideal_length'], len(elements_length_bins), number_of_samples, sample_rate))
+    print('{0:>8} {1:>10} {2:>14} {3:>12}'.format('path', 'time [ms]', 'memory [MB]', 'entries'))
+
+    start = time.perf_counter()
+    digital_samples = sample_digital(block_list, elements_length_bins)
+    sample_patterns = {chnl: samples_to_pattern(samples) for chnl, samples in
+                       digital_samples.items()}
+    sample_time = time.perf_counter() - start
+    sample_bytes = sum(samples.nbytes for samples in digital_samples.values())
+    print('{0:>8} {1:>10.1f} {2:>14.1f} {3:>12d}'.format(
+        'samples', 1e3 * sample_time, sample_bytes / 2**20, number_of_samples))
+    del digital_samples
+
+    start = time.perf_counter()
+    run_lengths, digital_states = ensemble_digital_runs(block_list, elements_length_bins,
+                                                        CHANNELS)
+    run_patterns = {chnl: runs_to_pattern(run_lengths, states) for chnl, states in
+                    digital_states.items()}
+    run_time = time.perf_counter() - start
+    run_bytes = run_lengths.nbytes + sum(states.nbytes for states in digital_states.values())
+    print('{0:>8} {1:>10.1f} {2:>14.1f} {3:>12d}'.format(
+        'runs', 1e3 * run_time, run_bytes / 2**20, len(run_lengths)))
+
+    for chnl in CHANNELS:
+        assert np.array_equal(sample_patterns[chnl][0], run_patterns[chnl][0]), chnl
+        assert np.array_equal(sample_patterns[chnl][1], run_patterns[chnl][1]), chnl
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run_benchmark(ensemble_length=float(sys.argv[1]) / 1e3)
+    else:
+        run_benchmark()
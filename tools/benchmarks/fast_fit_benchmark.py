@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of FitLogic fits of small live-fit datasets: the lmfit fit of the make_*_fit methods
+versus the fast least-squares fit with analytic jacobians (do_fast_fit).
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/fast_fit_benchmark.py [number_of_points [repetitions]]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from logic.fit_logic import FitLogic
+
+
+def generate_odmr(number_of_points, rng):
+    """ Lorentzian dip with poissonian noise. """
+    x = np.linspace(2.80e9, 2.94e9, number_of_points)
+    half_width = 5e6 / 2
+    y = 1e4 * (1 - 0.2 * half_width ** 2 / ((x - 2.87e9) ** 2 + half_width ** 2))
+    return x, rng.poisson(y).astype(float)
+
+
+def generate_odmr_double(number_of_points, rng):
+    """ Two lorentzian dips with poissonian noise. """
+    x = np.linspace(2.80e9, 2.94e9, number_of_points)
+    half_width = 5e6 / 2
+    y = 1e4
+    for center in (2.85e9, 2.89e9):
+        y = y - 2e3 * half_width ** 2 / ((x - center) ** 2 + half_width ** 2)
+    return x, rng.poisson(y).astype(float)
+
+
+def generate_rabi(number_of_points, rng):
+    """ Damped Rabi oscillation with gaussian noise. """
+    x = np.linspace(0, 2e-6, number_of_points)
+    y = 0.5 + 0.15 * np.cos(2 * np.pi * 4e6 * x) * np.exp(-x / 1.5e-6)
+    return x, y + rng.normal(0, 0.01, x.size)
+
+
+def generate_decay(number_of_points, rng):
+    """ Exponential decay (e.g. T1) with gaussian noise. """
+    x = np.linspace(0, 5e-3, number_of_points)
+    y = 0.3 + 0.2 * np.exp(-x / 1e-3)
+    return x, y + rng.normal(0, 0.005, x.size)
+
+
+def time_fits(fit, x, y, repetitions):
+    """ Mean time per fit and the last result. """
+    result = fit(x, y)
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        result = fit(x, y)
+    return (time.perf_counter() - start) / repetitions, result
+
+
+def run_benchmark(number_of_points=50, repetitions=50):
+    logic = FitLogic(manager=None, name='fitlogic')
+    rng = np.random.RandomState(0)
+    print('{0:d} points per trace, {1:d} fits per case'.format(number_of_points, repetitions))
+    print('{0:>22} {1:>12} {2:>12} {3:>10} {4:>14}'.format(
+        'fit', 'lmfit [ms]', 'fast [ms]', 'speedup', 'deviation'))
+    cases = (('lorentzian', 'dip', 'center', generate_odmr),
+             ('lorentziandouble', 'dip', 'l1_center', generate_odmr_double),
+             ('sineexponentialdecay', 'generic', 'frequency', generate_rabi),
+             ('decayexponential', 'generic', 'lifetime', generate_decay))
+    for fit_function, estimator, parameter, generate in cases:
+        x, y = generate(number_of_points, rng)
+        fit = logic.fit_list['1d'][fit_function]
+        lmfit_time, lmfit_result = time_fits(
+            lambda x_axis, data: fit['make_fit'](x_axis=x_axis, data=data,
+                                                 estimator=fit[estimator]),
+            x, y, repetitions)
+        fast_time, fast_result = time_fits(
+            lambda x_axis, data: logic.do_fast_fit(x_axis, data, fit_function, estimator),
+            x, y, repetitions)
+        reference = lmfit_result.params[parameter].value
+        # relative deviation of the fitted parameter from the lmfit fit
+        deviation = abs(fast_result.params[parameter].value - reference) / abs(reference)
+        print('{0:>22} {1:>12.3f} {2:>12.3f} {3:>10.1f} {4:>14.2e}'.format(
+            fit_function, 1e3 * lmfit_time, 1e3 * fast_time, lmfit_time / fast_time,
+            deviation))
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        run_benchmark(number_of_points=int(sys.argv[1]), repetitions=int(sys.argv[2]))
+    elif len(sys.argv) > 1:
+        run_benchmark(number_of_points=int(sys.argv[1]))
+    else:
+        run_benchmark()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the GUI thread time needed to display a confocal scan image while it is scanned line
+by line: setting and rendering the whole image and calculating the percentile color range of all
+non-zero pixels at every scanned line (as formerly done by ConfocalGui.refresh_xy_image) versus
+the same full refresh coalesced to a maximum frame rate (RefreshScheduler) and coalesced
+refreshes which only render the changed rows (ScanImageItem.update_image_rows) and take the
+percentiles from the sorted pixel values of an ImageRowBuffer, with the default level tolerance and
+with exact levels (every level change renders the whole image). Runs on a noise image and on an
+image with structure (bright spots on a background gradient), where the percentiles move with
+almost every line. Counts the renders of the whole image and checks that the final rendered images
+are identical after a last refresh with exact levels.
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/image_refresh_benchmark.py [image_size] [line_rate_Hz]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from qtpy import QtWidgets
+from pyqtgraph import functions as fn
+from qtwidgets.scan_plotwidget import ScanImageItem
+from gui.guiutils import ImageRowBuffer
+from gui.colordefs import ColorScaleInferno
+
+LOW_CENTILE = 1
+HIGH_CENTILE = 99
+MAX_FRAME_RATE = 20
+
+
+def refresh_full(item, image):
+    """ Former refresh at every line: percentiles of all non-zero pixels, whole image rendered. """
+    image_nonzero = image[np.nonzero(image)]
+    levels = (np.percentile(image_nonzero, LOW_CENTILE), np.percentile(image_nonzero, HIGH_CENTILE))
+    item.setImage(image=image, levels=levels)
+    item.render()
+
+
+def refresh_rows(item, buffer, image, level_tolerance=None):
+    """ Coalesced refresh: only changed rows rendered, percentiles from the sorted pixel values. """
+    rows, shift = buffer.update(image)
+    levels = (buffer.percentile(LOW_CENTILE), buffer.percentile(HIGH_CENTILE))
+    item.update_image_rows(buffer.image, rows, shift, levels=levels,
+                           level_tolerance=level_tolerance)
+    if item.qimage is None:
+        item.render()
+
+
+class CountingImageItem(ScanImageItem):
+    """ ScanImageItem counting the renders of the whole image. """
+
+    def __init__(self, *args, **kwargs):
+        self.full_renders = 0
+        super().__init__(*args, **kwargs)
+
+    def render(self, *args, **kwargs):
+        self.full_renders += 1
+        return super().render(*args, **kwargs)
+
+
+def structured_image(image_size, rng):
+    """ Counts of bright gaussian spots on a background gradient. """
+    y, x = np.mgrid[0:image_size, 0:image_size] / image_size
+    rate = 200 + 1800 * x * y
+    width = 0.005
+    for spot_x, spot_y in rng.random((image_size // 20, 2)):
+        rate += 20000 * np.exp(-((x - spot_x) ** 2 + (y - spot_y) ** 2) / (2 * width ** 2))
+    return rng.poisson(rate).astype(float)
+
+
+def run_benchmark(image_size=1000, line_rate=200):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    lut = ColorScaleInferno().lut
+    rng = np.random.default_rng(0)
+    images = (('noise', rng.poisson(1000, (image_size, image_size)).astype(float)),
+              ('structured', structured_image(image_size, rng)))
+    lines_per_frame = max(1, int(np.ceil(line_rate / MAX_FRAME_RATE)))
+    print('{0:d}x{0:d} pixel scan at {1:d} lines/s, max. {2:d} frames/s ({3:d} lines per frame)'
+          ''.format(image_size, line_rate, MAX_FRAME_RATE, lines_per_frame))
+    print('{0:>10} {1:>12} {2:>8} {3:>13} {4:>10} {5:>15} {6:>9}'.format(
+        'image', 'refresh', 'frames', 'full renders', 'total [s]', 'per frame [ms]', 'GUI load'))
+
+    for image_name, counts in images:
+        results = dict()
+        for name in ('line', 'frame', 'rows exact', 'rows'):
+            item = CountingImageItem(axisOrder='row-major')
+            item.setLookupTable(lut)
+            buffer = ImageRowBuffer()
+            image = np.zeros((image_size, image_size))
+            step = 1 if name == 'line' else lines_per_frame
+            level_tolerance = 0 if name == 'rows exact' else None
+            frames = 0
+            start = time.perf_counter()
+            for line in range(0, image_size, step):
+                image[line:line + step] = counts[line:line + step]
+                if name in ('line', 'frame'):
+                    refresh_full(item, image)
+                else:
+                    refresh_rows(item, buffer, image, level_tolerance)
+                frames += 1
+            total = time.perf_counter() - start
+            # fraction of the GUI thread time spent for refreshes while scanning
+            load = total / (image_size / line_rate)
+            print('{0:>10} {1:>12} {2:>8d} {3:>13d} {4:>10.2f} {5:>15.1f} {6:>8.0f}%'.format(
+                image_name, name, frames, item.full_renders, total, 1e3 * total / frames,
+                100 * load))
+            if name == 'rows':
+                # last refresh after the scan with exact levels
+                refresh_rows(item, buffer, image, level_tolerance=0)
+            results[name] = fn.imageToArray(item.qimage, copy=True, transpose=False)
+        for name in ('line', 'frame', 'rows exact'):
+            assert np.array_equal(results[name], results['rows'])
+    del app
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        run_benchmark(image_size=int(sys.argv[1]), line_rate=int(sys.argv[2]))
+    elif len(sys.argv) > 1:
+        run_benchmark(image_size=int(sys.argv[1]))
+    else:
+        run_benchmark()
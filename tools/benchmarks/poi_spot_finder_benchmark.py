@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark comparing the vectorized spot finder of PoiManagerLogic (auto_catch_poi) against the
+former per-pixel window loop on synthetic confocal images with gaussian spots.
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/poi_spot_finder_benchmark.py [image_size ...]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from logic.poi_manager_logic import PoiManagerLogic
+
+PIXEL_SIZE = 100e-9
+SPOT_DIAMETER = 500e-9
+
+
+class _LogicDummy:
+    """ Minimal stand-in for PoiManagerLogic providing what the spot finder reads. """
+    _spot_filter = PoiManagerLogic._spot_filter
+    _find_spots = PoiManagerLogic._find_spots
+    _refine_spot_centers = PoiManagerLogic._refine_spot_centers
+
+    def __init__(self, image_size):
+        self.roi_scan_image_extent = ((0, image_size * PIXEL_SIZE), (0, image_size * PIXEL_SIZE))
+        self._poi_diameter = SPOT_DIAMETER
+        self._poi_threshold = 5
+
+
+def legacy_is_spot_shape(local_arr):
+    unspot_e = 0
+    ensem_e = 0
+    len_arr = len(local_arr)
+    mid_f = int(0.5 * len_arr)
+    hm_local_arr = local_arr[mid_f].mean()
+    vm_local_arr = local_arr[:, mid_f].mean()
+    for i in range(0, len_arr):
+        if local_arr[i].mean() > hm_local_arr:
+            ensem_e += 1
+        if local_arr[:, i].mean() > vm_local_arr:
+            ensem_e += 1
+        if hm_local_arr > vm_local_arr * 1.2:
+            unspot_e += 1
+        if vm_local_arr > hm_local_arr * 1.2:
+            unspot_e += 1
+    if ensem_e > 4:
+        return False
+    elif unspot_e > 1:
+        return False
+    else:
+        return True
+
+
+def legacy_find_spots(logic, scan):
+    """ Former PoiManagerLogic._local_max followed by the threshold of auto_catch_poi. """
+    filter_size = logic._spot_filter(scan)
+    scan_m = scan.mean()
+    mid_f = int(filter_size / 2)
+    xc = []
+    yc = []
+    for i in range(0, len(scan) - filter_size):
+        for j in range(0, len(scan[i]) - filter_size):
+            local_arr = scan[i:i + filter_size, j:j + filter_size]
+            arr_threshold = scan_m * logic._poi_threshold * 0.5
+            if scan[i + mid_f][j + mid_f] == local_arr.max() and legacy_is_spot_shape(
+                    local_arr) and local_arr.mean() > arr_threshold:
+                xc.append(i + mid_f)
+                yc.append(j + mid_f)
+    threshold = scan_m * logic._poi_threshold
+    spots = [(x, y) for x, y in zip(xc, yc) if scan[x, y] > threshold]
+    return np.array(spots, dtype=int).reshape(-1, 2)
+
+
+def vectorized_find_spots(logic, scan, refine=False):
+    """ Spot detection as done by PoiManagerLogic.auto_catch_poi. """
+    x_indices, y_indices = logic._find_spots(scan)
+    is_bright = scan[x_indices, y_indices] > scan.mean() * logic._poi_threshold
+    x_indices, y_indices = x_indices[is_bright], y_indices[is_bright]
+    if refine:
+        return np.column_stack(logic._refine_spot_centers(scan, x_indices, y_indices))
+    return np.column_stack((x_indices, y_indices))
+
+
+def generate_image(image_size, spot_density=2e-3, seed=0):
+    """ Poissonian background with gaussian spots of SPOT_DIAMETER FWHM at sub-pixel positions.
+    Pixel values are integer counts like the truncated image in auto_catch_poi. """
+    rng = np.random.RandomState(seed)
+    number_of_spots = max(1, int(spot_density * image_size ** 2))
+    positions = rng.uniform(5, image_size - 5, (number_of_spots, 2))
+    sigma = SPOT_DIAMETER / PIXEL_SIZE / 2.355
+    image = np.zeros((image_size, image_size))
+    radius = int(np.ceil(4 * sigma))
+    offsets = np.arange(-radius, radius + 1)
+    for x, y in positions:
+        rows = np.clip(int(x) + offsets, 0, image_size - 1)
+        columns = np.clip(int(y) + offsets, 0, image_size - 1)
+        image[np.ix_(rows, columns)] += 2000 * np.exp(
+            -((rows[:, np.newaxis] - x) ** 2 + (columns[np.newaxis, :] - y) ** 2) / (
+                    2 * sigma ** 2))
+    return rng.poisson(image + 20).astype(float), positions
+
+
+def run_benchmark(image_sizes=(100, 200, 500, 1000, 2000), max_legacy_size=500):
+    print('spot diameter: {0:.0f} pixels'.format(SPOT_DIAMETER / PIXEL_SIZE))
+    print('{0:>6} {1:>7} {2:>12} {3:>12} {4:>10} {5:>7} {6:>14}'.format(
+        'size', 'spots', 'vectorized', 'legacy', 'speedup', 'equal', 'mean error'))
+    legacy_time_per_pixel = None
+    for size in image_sizes:
+        logic = _LogicDummy(size)
+        image, positions = generate_image(size)
+        start = time.perf_counter()
+        spots = vectorized_find_spots(logic, image)
+        vectorized_time = time.perf_counter() - start
+        refined = vectorized_find_spots(logic, image, refine=True)
+
+        # Mean distance (in pixels) of the found spots to the closest true spot position
+        def mean_error(found):
+            if len(found) == 0:
+                return np.nan
+            distances = np.linalg.norm(found[:, np.newaxis, :] - positions[np.newaxis], axis=2)
+            return distances.min(axis=1).mean()
+
+        if size <= max_legacy_size:
+            start = time.perf_counter()
+            legacy_spots = legacy_find_spots(logic, image)
+            legacy_time = time.perf_counter() - start
+            legacy_time_per_pixel = legacy_time / size ** 2
+            equal = str(np.array_equal(spots, legacy_spots))
+            legacy_label = '{0:12.3f}'.format(legacy_time)
+        else:
+            # Extrapolated from the largest image processed with the legacy loop
+            legacy_time = legacy_time_per_pixel * size ** 2
+            equal = '-'
+            legacy_label = '{0:11.1f}*'.format(legacy_time)
+        print('{0:>6d} {1:>7d} {2:12.4f} {3} {4:10.0f} {5:>7} {6:6.3f} / {7:5.3f}'.format(
+            size, len(spots), vectorized_time, legacy_label, legacy_time / vectorized_time,
+            equal, mean_error(spots), mean_error(refined)))
+    print('* extrapolated. mean error: distance to the true spot position in pixels for the '
+          'pixel / sub-pixel refined positions')
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run_benchmark(image_sizes=[int(arg) for arg in sys.argv[1:]])
+    else:
+        run_benchmark()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark comparing the vectorized analysis methods of BasicPulseAnalyzer against the former
+per-laser loop implementation.
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/pulse_analysis_benchmark.py
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from logic.pulsed.pulsed_analysis_methods.basic_analysis_methods import BasicPulseAnalyzer
+
+
+class _MeasurementSettingsDummy:
+    """ Minimal stand-in for PulsedMeasurementLogic providing the settings read by analyzers. """
+    def __init__(self, bin_width):
+        self.fast_counter_settings = {'bin_width': bin_width, 'is_gated': False}
+        self.measurement_settings = dict()
+        self.sampling_information = dict()
+        self.log = None
+
+
+def loop_mean_norm(laser_data, signal_start_bin, signal_end_bin, norm_start_bin, norm_end_bin):
+    signal_data = np.empty(laser_data.shape[0], dtype=float)
+    error_data = np.empty(laser_data.shape[0], dtype=float)
+    for ii, laser_arr in enumerate(laser_data):
+        tmp_data = laser_arr[norm_start_bin:norm_end_bin]
+        reference_sum = np.sum(tmp_data)
+        reference_mean = (reference_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
+        tmp_data = laser_arr[signal_start_bin:signal_end_bin]
+        signal_sum = np.sum(tmp_data)
+        signal_mean = (signal_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
+        if reference_mean > 0 and signal_mean >= 0:
+            signal_data[ii] = signal_mean / reference_mean
+        else:
+            signal_data[ii] = 0.0
+        if reference_sum > 0 and signal_sum > 0:
+            error_data[ii] = signal_data[ii] * np.sqrt(1 / signal_sum + 1 / reference_sum)
+        else:
+            error_data[ii] = 0.0
+    return signal_data, error_data
+
+
+def loop_sum(laser_data, signal_start_bin, signal_end_bin):
+    signal_data = np.empty(laser_data.shape[0], dtype=float)
+    error_data = np.empty(laser_data.shape[0], dtype=float)
+    for ii, laser_arr in enumerate(laser_data):
+        signal = laser_arr[signal_start_bin:signal_end_bin].sum()
+        if signal < 0 or signal != signal:
+            signal_data[ii] = 0.0
+            error_data[ii] = 0.0
+        else:
+            signal_data[ii] = signal
+            error_data[ii] = np.sqrt(signal)
+    return signal_data, error_data
+
+
+def loop_mean(laser_data, signal_start_bin, signal_end_bin):
+    signal_data = np.empty(laser_data.shape[0], dtype=float)
+    error_data = np.empty(laser_data.shape[0], dtype=float)
+    for ii, laser_arr in enumerate(laser_data):
+        signal = laser_arr[signal_start_bin:signal_end_bin].mean()
+        signal_sum = laser_arr[signal_start_bin:signal_end_bin].sum()
+        signal_error = np.sqrt(signal_sum) / (signal_end_bin - signal_start_bin)
+        if signal < 0 or signal != signal:
+            signal_data[ii] = 0.0
+            error_data[ii] = 0.0
+        else:
+            signal_data[ii] = signal
+            error_data[ii] = signal_error
+    return signal_data, error_data
+
+
+def loop_mean_reference(laser_data, signal_start_bin, signal_end_bin, norm_start_bin,
+                        norm_end_bin):
+    signal_data = np.empty(laser_data.shape[0], dtype=float)
+    error_data = np.empty(laser_data.shape[0], dtype=float)
+    for ii, laser_arr in enumerate(laser_data):
+        tmp_data = laser_arr[norm_start_bin:norm_end_bin]
+        reference_sum = np.sum(tmp_data)
+        reference_mean = (reference_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
+        tmp_data = laser_arr[signal_start_bin:signal_end_bin]
+        signal_sum = np.sum(tmp_data)
+        signal_mean = (signal_sum / len(tmp_data)) if len(tmp_data) != 0 else 0.0
+        signal_data[ii] = signal_mean - reference_mean
+        error_data[ii] = signal_data[ii] * np.sqrt(1 / abs(signal_sum) + 1 / abs(reference_sum))
+    return signal_data, error_data
+
+
+def _time_call(func, *args, repetitions=5, **kwargs):
+    """ Return the result and the best wall time in seconds out of <repetitions> calls. """
+    best = np.inf
+    result = None
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def run_benchmark(laser_numbers=(100, 1000, 10000), bins_per_laser=3000, bin_width=1e-9):
+    analyzer = BasicPulseAnalyzer(_MeasurementSettingsDummy(bin_width))
+    window_kwargs = {'signal_start': 0.0, 'signal_end': 200e-9,
+                     'norm_start': 300e-9, 'norm_end': 500e-9}
+    window_bins = (0, 200, 300, 500)
+
+    cases = (('mean_norm', analyzer.analyse_mean_norm, loop_mean_norm, window_kwargs, window_bins),
+             ('sum', analyzer.analyse_sum, loop_sum,
+              {'signal_start': 0.0, 'signal_end': 200e-9}, window_bins[:2]),
+             ('mean', analyzer.analyse_mean, loop_mean,
+              {'signal_start': 0.0, 'signal_end': 200e-9}, window_bins[:2]),
+             ('mean_reference', analyzer.analyse_mean_reference, loop_mean_reference,
+              window_kwargs, window_bins))
+
+    print('{0:>16} {1:>8} {2:>12} {3:>12} {4:>9} {5:>7}'.format(
+        'method', 'lasers', 'loop [ms]', 'vector [ms]', 'speedup', 'equal'))
+    for num_of_lasers in laser_numbers:
+        laser_data = np.random.poisson(5, (num_of_lasers, bins_per_laser)).astype('int64')
+        for name, vector_method, loop_method, kwargs, bins in cases:
+            loop_result, loop_time = _time_call(loop_method, laser_data, *bins)
+            vector_result, vector_time = _time_call(vector_method, laser_data, **kwargs)
+            equal = all(np.array_equal(a, b, equal_nan=True) for a, b in
+                        zip(loop_result, vector_result))
+            print('{0:>16} {1:>8d} {2:>12.3f} {3:>12.3f} {4:>9.1f} {5:>7}'.format(
+                name, num_of_lasers, loop_time * 1e3, vector_time * 1e3,
+                loop_time / vector_time, str(equal)))
+    return
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the storage of saved PulseBlocks and PulseBlockEnsembles in SequenceGeneratorLogic:
+the former pickle file per asset (saving all, loading all at activation) versus the
+PulseAssetStore database (saving all in one transaction, reading only the names at activation
+and de-serializing an asset on first access).
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/pulse_asset_store_benchmark.py [number_of_ensembles]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import pickle
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from logic.pulsed.pulse_objects import PulseBlock, PulseBlockElement, PulseBlockEnsemble
+from logic.pulsed.sampling_functions import SamplingFunctions
+from logic.pulsed.pulse_asset_store import PulseAssetStore, LazyAssetDict
+
+SamplingFunctions.import_sampling_functions(
+    [os.path.join(os.path.dirname(__file__), '..', '..', 'logic', 'pulsed',
+                  'sampling_function_defs')])
+
+
+def make_assets(number_of_ensembles):
+    """ One block with 20 elements and one sampled ensemble per name. """
+    assets = list()
+    for index in range(number_of_ensembles):
+        name = 'rabi_{0:d}'.format(index)
+        elements = [PulseBlockElement(init_length_s=(ii + 1) * 1e-8,
+                                      pulse_function={'a_ch1': SamplingFunctions.Sin(
+                                          amplitude=0.25, frequency=2.87e9, phase=0.0)},
+                                      digital_high={'d_ch1': ii % 2 == 0, 'd_ch2': False},
+                                      laser_on=ii % 2 == 0) for ii in range(20)]
+        block = PulseBlock(name, element_list=elements)
+        ensemble = PulseBlockEnsemble(name, block_list=[(name, 10)])
+        ensemble.measurement_information = {'controlled_variable': np.linspace(0, 1e-6, 50),
+                                            'units': ('s', ''),
+                                            'number_of_lasers': 50}
+        ensemble.sampling_information = {'waveforms': [name + '_ch1'],
+                                         'laser_rising_bins': np.arange(0, 200000, 2000),
+                                         'number_of_samples': 400000,
+                                         'activation_config': ('config0', {'a_ch1', 'd_ch1'})}
+        assets.append(('block', block))
+        assets.append(('ensemble', ensemble))
+    return assets
+
+
+def run_benchmark(number_of_ensembles=2000):
+    assets = make_assets(number_of_ensembles)
+    print('{0:d} blocks and {0:d} ensembles'.format(number_of_ensembles))
+    print('{0:>8} {1:>12} {2:>16} {3:>18} {4:>12}'.format(
+        'storage', 'save [ms]', 'activation [ms]', 'first access [ms]', 'size [MB]'))
+    with tempfile.TemporaryDirectory() as directory:
+        # pickle files: one file per asset, all files loaded at activation
+        pickle_dir = os.path.join(directory, 'pickle')
+        os.makedirs(pickle_dir)
+        start = time.perf_counter()
+        for kind, asset in assets:
+            with open(os.path.join(pickle_dir, '{0}.{1}'.format(asset.name, kind)), 'wb') as file:
+                pickle.dump(asset, file)
+        save_time = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = dict()
+        with os.scandir(pickle_dir) as scan:
+            filenames = [f.name for f in scan if f.is_file()]
+        for filename in filenames:
+            with open(os.path.join(pickle_dir, filename), 'rb') as file:
+                loaded[filename] = pickle.load(file)
+        activation_time = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(pickle_dir, f)) for f in filenames)
+        print('{0:>8} {1:>12.1f} {2:>16.1f} {3:>18.3f} {4:>12.1f}'.format(
+            'pickle', 1e3 * save_time, 1e3 * activation_time, 0.0, size / 2**20))
+
+        # asset database: saved in one transaction, names read at activation, loaded on access
+        path = os.path.join(directory, 'pulsed_assets.db')
+        store = PulseAssetStore(path)
+        start = time.perf_counter()
+        with store.transaction():
+            for kind, asset in assets:
+                store.save(kind, asset.name, asset.get_dict_representation())
+        save_time = time.perf_counter() - start
+        store.close()
+        start = time.perf_counter()
+        store = PulseAssetStore(path)
+        ensembles = LazyAssetDict(
+            lambda name: PulseBlockEnsemble.ensemble_from_dict(store.load('ensemble', name)))
+        ensembles.add_stored(store.names('ensemble'))
+        blocks = LazyAssetDict(lambda name: PulseBlock.block_from_dict(store.load('block', name)))
+        blocks.add_stored(store.names('block'))
+        activation_time = time.perf_counter() - start
+        start = time.perf_counter()
+        ensemble = ensembles['rabi_0']
+        block = blocks[ensemble.block_list[0][0]]
+        access_time = time.perf_counter() - start
+        assert len(block) == 20 and ensemble.sampling_information['number_of_samples'] == 400000
+        store.close()
+        print('{0:>8} {1:>12.1f} {2:>16.1f} {3:>18.3f} {4:>12.1f}'.format(
+            'database', 1e3 * save_time, 1e3 * activation_time, 1e3 * access_time,
+            os.path.getsize(path) / 2**20))
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run_benchmark(number_of_ensembles=int(sys.argv[1]))
+    else:
+        run_benchmark()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the asynchronous acquisition of PulsedMeasurementLogic with simulated slow hardware
+and slow analysis: the former serial timer loop (readout and analysis in one call of the logic
+thread) versus the AcquisitionPipeline (readout and analysis in separate threads). Reports the
+readout and analysis rates, the dropped traces, the age of the analyzed data and how long the
+calling (logic) thread is blocked per call.
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/pulsed_acquisition_pipeline_benchmark.py [readout_ms [analysis_ms]]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from logic.pulsed.acquisition_pipeline import AcquisitionPipeline
+
+
+class SlowFastCounter:
+    """ Fast counter returning the number of the trace after <readout_time>. """
+
+    def __init__(self, readout_time):
+        self.readout_time = readout_time
+        self.traces = 0
+
+    def get_data_trace(self):
+        time.sleep(self.readout_time)
+        self.traces += 1
+        return self.traces, time.monotonic()
+
+
+def run_benchmark(readout_time=0.05, analysis_time=0.2, interval=0.0, duration=3.0):
+    print('readout {0:.0f} ms, analysis {1:.0f} ms, timer interval {2:.0f} ms, {3:.1f} s per '
+          'case'.format(1e3 * readout_time, 1e3 * analysis_time, 1e3 * interval, duration))
+    print('{0:>10} {1:>14} {2:>14} {3:>10} {4:>14} {5:>18}'.format(
+        'case', 'readouts [1/s]', 'analyses [1/s]', 'dropped', 'data age [ms]',
+        'thread blocked [ms]'))
+
+    # serial: each timer tick reads the counter and analyzes the trace in the logic thread
+    counter = SlowFastCounter(readout_time)
+    ages = list()
+    blocked = list()
+    start = time.monotonic()
+    while time.monotonic() - start < duration:
+        tick = time.monotonic()
+        trace, acquired = counter.get_data_trace()
+        time.sleep(analysis_time)
+        ages.append(time.monotonic() - acquired)
+        blocked.append(time.monotonic() - tick)
+        time.sleep(max(0.0, interval - (time.monotonic() - tick)))
+    elapsed = time.monotonic() - start
+    print('{0:>10} {1:>14.1f} {2:>14.1f} {3:>10d} {4:>14.1f} {5:>18.1f}'.format(
+        'serial', counter.traces / elapsed, len(ages) / elapsed, 0,
+        1e3 * sum(ages) / len(ages), 1e3 * max(blocked)))
+
+    # pipeline: the logic thread only starts and stops the threads
+    counter = SlowFastCounter(readout_time)
+    pipeline = AcquisitionPipeline(acquire=counter.get_data_trace,
+                                   analyze=lambda trace: time.sleep(analysis_time),
+                                   interval=interval)
+    tick = time.monotonic()
+    pipeline.start()
+    blocked = time.monotonic() - tick
+    time.sleep(duration)
+    tick = time.monotonic()
+    pipeline.stop()
+    blocked = max(blocked, time.monotonic() - tick)
+    metrics = pipeline.metrics
+    print('{0:>10} {1:>14.1f} {2:>14.1f} {3:>10d} {4:>14.1f} {5:>18.1f}'.format(
+        'pipeline', metrics['acquisition']['throughput'], metrics['analysis']['throughput'],
+        metrics['analysis']['dropped'], 1e3 * metrics['analysis']['last_age'], 1e3 * blocked))
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        run_benchmark(readout_time=float(sys.argv[1]) / 1e3,
+                      analysis_time=float(sys.argv[2]) / 1e3)
+    elif len(sys.argv) > 1:
+        run_benchmark(readout_time=float(sys.argv[1]) / 1e3)
+    else:
+        run_benchmark()
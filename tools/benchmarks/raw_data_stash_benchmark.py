@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the raw data accumulation of PulsedMeasurementLogic with recalled stashed raw data:
+adding the stash to each new fast counter trace into a new array (former implementation) versus
+adding it in place into a persistent buffer with the stash memory-mapped by RawDataStash.
+Also reports the anonymous resident memory (RAM not backed by a file, i.e. not reclaimable page
+cache) used by many stashes in a dict versus the memory-mapped stash (Linux only).
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/raw_data_stash_benchmark.py [number_of_lasers [number_of_bins]]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from logic.pulsed.raw_data_stash import RawDataStash
+
+
+def anonymous_rss_mb():
+    """ Resident memory of this process not backed by a file in MB (nan if not available). """
+    try:
+        with open('/proc/self/status', 'r') as file:
+            for line in file:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float('nan')
+
+
+def run_benchmark(number_of_lasers=100, number_of_bins=20000, ticks=200, stashes=20):
+    shape = (number_of_lasers, number_of_bins)
+    rng = np.random.RandomState(0)
+    fc_data = rng.poisson(5, shape).astype(np.int64)
+    saved = rng.poisson(500, shape).astype(np.int64)
+    print('raw data {0} int64 ({1:.1f} MB), {2:d} timer ticks'.format(
+        shape, saved.nbytes / 2 ** 20, ticks))
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        raw_data = saved + fc_data
+    old_time = (time.perf_counter() - start) / ticks
+
+    stash = RawDataStash()
+    stash.stash('recalled', saved, elapsed_sweeps=1000, elapsed_time=100)
+    buffer = np.empty(shape, dtype=np.int64)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        stashed_data, info = stash.get('recalled')
+        np.add(stashed_data, fc_data, out=buffer, casting='unsafe')
+    new_time = (time.perf_counter() - start) / ticks
+    assert np.array_equal(buffer, raw_data)
+    print('{0:>32} {1:>10.2f} ms'.format('new array per tick', 1e3 * old_time))
+    print('{0:>32} {1:>10.2f} ms'.format('in place into buffer', 1e3 * new_time))
+
+    rss_before = anonymous_rss_mb()
+    for index in range(stashes):
+        stash.stash('stash {0:d}'.format(index), saved, elapsed_sweeps=1000, elapsed_time=100)
+    start = time.perf_counter()
+    stash.merge('merged', ['stash {0:d}'.format(index) for index in range(stashes)])
+    merge_time = time.perf_counter() - start
+    print('{0:>32} {1:>10.1f} MB anonymous RSS increase'.format(
+        '{0:d} memory-mapped stashes'.format(stashes), anonymous_rss_mb() - rss_before))
+    print('{0:>32} {1:>10.2f} ms'.format('merge of all stashes', 1e3 * merge_time))
+    stash.close()
+
+    rss_before = anonymous_rss_mb()
+    saved_raw_data = dict()
+    for index in range(stashes):
+        saved_raw_data['stash {0:d}'.format(index)] = (saved.copy(), {'elapsed_sweeps': 1000})
+    print('{0:>32} {1:>10.1f} MB anonymous RSS increase'.format(
+        '{0:d} stashes in a dict'.format(stashes), anonymous_rss_mb() - rss_before))
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        run_benchmark(number_of_lasers=int(sys.argv[1]), number_of_bins=int(sys.argv[2]))
+    elif len(sys.argv) > 1:
+        run_benchmark(number_of_lasers=int(sys.argv[1]))
+    else:
+        run_benchmark()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Loopback benchmark comparing the transfer of numpy arrays from a remote rpyc service by pickling
+(rpyc.utils.classic.obtain) with the shared memory and raw buffer stream transports used by
+netobtain.
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/remote_array_benchmark.py [size_in_MB ...]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import threading
+import numpy as np
+import rpyc
+from rpyc.utils.server import ThreadedServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from core.util.network import ArrayExportServiceMixin, obtain_array, netobtain
+
+rpyc.core.protocol.DEFAULT_CONFIG['allow_pickle'] = True
+
+
+class _ArrayService(ArrayExportServiceMixin, rpyc.Service):
+    """ Service providing a float64 array of a given size (like a fast counter data trace). """
+    arrays = dict()
+
+    def exposed_get_array(self, megabytes):
+        if megabytes not in self.arrays:
+            self.arrays.clear()
+            self.arrays[megabytes] = np.random.RandomState(0).randint(
+                0, 2 ** 16, int(megabytes * 2 ** 20) // 8).astype(np.float64)
+        return self.arrays[megabytes]
+
+
+def _time_call(function, repetitions):
+    best = np.inf
+    result = None
+    for _ in range(repetitions):
+        result = None
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_benchmark(sizes_mb=(1, 10, 100, 500), port=18861):
+    server = ThreadedServer(_ArrayService, hostname='localhost', port=port,
+                            protocol_config={'allow_all_attrs': True, 'allow_pickle': True})
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    time.sleep(0.5)
+    conn = rpyc.connect('localhost', port, config={'allow_all_attrs': True,
+                                                   'allow_pickle': True,
+                                                   'sync_request_timeout': 600})
+    print('{0:>10} {1:>18} {2:>10} {3:>12} {4:>9} {5:>6}'.format(
+        'size [MB]', 'transport', 'time [s]', 'MB/s', 'speedup', 'equal'))
+    try:
+        for size in sizes_mb:
+            remote_array = conn.root.get_array(size)
+            repetitions = 3 if size <= 100 else 1
+            reference_time, reference = _time_call(
+                lambda a=remote_array: rpyc.utils.classic.obtain(a), repetitions)
+            results = [('pickle (obtain)', reference_time, True)]
+            for name, transport in (('shared memory', 'shm'),
+                                    ('socket stream', 'socket'),
+                                    ('rpyc chunks', 'rpyc')):
+                elapsed, array = _time_call(lambda a=remote_array, t=transport: obtain_array(a, t),
+                                            repetitions)
+                results.append((name, elapsed, np.array_equal(array, reference)))
+                del array
+            elapsed, array = _time_call(lambda a=remote_array: netobtain(a), repetitions)
+            results.append(('netobtain (auto)', elapsed, np.array_equal(array, reference)))
+            del array, reference
+            for name, elapsed, equal in results:
+                print('{0:>10} {1:>18} {2:>10.4f} {3:>12.1f} {4:>9.1f} {5:>6}'.format(
+                    size, name, elapsed, size / elapsed, reference_time / elapsed, str(equal)))
+            del remote_array
+    finally:
+        conn.close()
+        server.close()
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run_benchmark(sizes_mb=[float(arg) for arg in sys.argv[1:]])
+    else:
+        run_benchmark()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark comparing the chunkwise wfm and wfmx writers of SamplesWriteMethods appending to the
+files against the writers into preallocated files (SamplesWriteMethods(preallocate_files=True)).
+Throughput (MB/s) and peak resident memory of each writer run are measured in a separate process
+and the created files are compared. Peak memory measurement is only available on unix systems.
+
+Run from the qudi main directory (number of samples per waveform as optional arguments):
+
+    python tools/benchmarks/samples_write_benchmark.py 1e8 1e9
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import multiprocessing as mp
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from tools.samples_write_methods import SamplesWriteMethods
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class _BenchmarkWriter(SamplesWriteMethods):
+    """ SamplesWriteMethods with the attributes usually provided by the pulser hardware module. """
+    def __init__(self, directory, preallocate_files):
+        super().__init__(preallocate_files=preallocate_files)
+        self.waveform_dir = directory
+        self.temp_dir = directory
+        self.sample_rate = 25e9
+        self.log = logging.getLogger(__name__)
+
+
+def _get_chunk(start, length):
+    """ Deterministic pseudo-random samples for the analog and digital channels of a chunk. """
+    rng = np.random.RandomState(start % (2 ** 32))
+    analog = {'a_ch1': rng.uniform(-1, 1, length).astype('float32')}
+    digital = {'d_ch1': rng.randint(0, 2, length).astype(bool),
+               'd_ch2': rng.randint(0, 2, length).astype(bool)}
+    return analog, digital
+
+
+def _run_writer(file_format, preallocate, total_samples, chunk_samples, directory, queue):
+    writer = _BenchmarkWriter(directory, preallocate)
+    write_method = writer._write_to_file[file_format]
+    write_time = 0.0
+    files = list()
+    try:
+        for start in range(0, total_samples, chunk_samples):
+            length = min(chunk_samples, total_samples - start)
+            analog, digital = _get_chunk(start, length)
+            start_time = time.perf_counter()
+            created_files = write_method(name='bench_prealloc' if preallocate else 'bench',
+                                         analog_samples=analog,
+                                         digital_samples=digital,
+                                         total_number_of_samples=total_samples,
+                                         is_first_chunk=start == 0,
+                                         is_last_chunk=start + length == total_samples)
+            write_time += time.perf_counter() - start_time
+            if isinstance(created_files, list):
+                files.extend(f for f in created_files if f not in files)
+    except Exception as err:
+        queue.put(err)
+        return
+    size = sum(os.path.getsize(os.path.join(directory, f)) for f in files)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else np.nan
+    queue.put((write_time, size, peak_rss, files))
+    return
+
+
+def _files_equal(directory, files_a, files_b):
+    for file_a, file_b in zip(files_a, files_b):
+        with open(os.path.join(directory, file_a), 'rb') as a:
+            with open(os.path.join(directory, file_b), 'rb') as b:
+                while True:
+                    block_a, block_b = a.read(1 << 24), b.read(1 << 24)
+                    if block_a != block_b:
+                        return False
+                    if not block_a:
+                        break
+    return True
+
+
+def run_benchmark(sample_numbers=(int(1e8), int(1e9)), chunk_samples=int(1e7),
+                  formats=('wfm', 'wfmx')):
+    print('{0:>6} {1:>12} {2:>8} {3:>10} {4:>12} {5:>15} {6:>7}'.format(
+        'format', 'samples', 'prealloc', 'time [s]', 'MB/s', 'peak RSS [MB]', 'equal'))
+    for total_samples in sample_numbers:
+        for file_format in formats:
+            directory = tempfile.mkdtemp()
+            results = dict()
+            try:
+                for preallocate in (False, True):
+                    queue = mp.Queue()
+                    process = mp.Process(target=_run_writer,
+                                         args=(file_format, preallocate, total_samples,
+                                               chunk_samples, directory, queue))
+                    process.start()
+                    results[preallocate] = queue.get()
+                    process.join()
+                if any(isinstance(result, Exception) for result in results.values()):
+                    equal = 'n/a'
+                else:
+                    equal = _files_equal(directory, results[False][3], results[True][3])
+                for preallocate, result in results.items():
+                    if isinstance(result, Exception):
+                        print('{0:>6} {1:>12.3e} {2:>8} failed: {3}'.format(
+                            file_format, total_samples, str(preallocate), repr(result)))
+                        continue
+                    write_time, size, peak_rss, files = result
+                    print('{0:>6} {1:>12.3e} {2:>8} {3:>10.2f} {4:>12.1f} {5:>15.1f} {6:>7}'.format(
+                        file_format, total_samples, str(preallocate), write_time,
+                        size / write_time / 2 ** 20, peak_rss, str(equal)))
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run_benchmark(sample_numbers=[int(float(arg)) for arg in sys.argv[1:]])
+    else:
+        run_benchmark()
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark comparing the circular buffer trace processing of TimeSeriesReaderLogic against the
+former implementation rolling the trace arrays and convolving each channel for every data frame.
+The circular buffer processing is measured emitting only the new samples of each data frame
+(appended to the traces of the GUI like in TimeSeriesGui.append_data) and emitting copies of the
+whole traces.
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/time_series_trace_benchmark.py [data_rate] [trace_window_size]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from logic.time_series_reader_logic import TimeSeriesReaderLogic
+from core.util.ring_buffer import TraceRingBuffer
+from interface.data_instream_interface import StreamChannelType
+
+
+class _LogicDummy:
+    """ Minimal stand-in for TimeSeriesReaderLogic providing what _process_trace_data and
+    new_trace_samples read. """
+    _process_trace_data = TimeSeriesReaderLogic._process_trace_data
+    new_trace_samples = TimeSeriesReaderLogic.new_trace_samples
+    trace_data = TimeSeriesReaderLogic.trace_data
+    averaged_trace_data = TimeSeriesReaderLogic.averaged_trace_data
+
+    def __init__(self, channels, window_size, moving_average_width):
+        self.oversampling_factor = 1
+        self.moving_average_width = moving_average_width
+        self._moving_average_width = moving_average_width
+        self.active_channel_names = list(channels)
+        self.averaged_channel_names = list(channels)
+        self.active_channel_types = {ch: StreamChannelType.ANALOG for ch in channels}
+        self._calc_digital_freq = False
+        self._data_recording_active = False
+        self._trace_data = TraceRingBuffer(len(channels),
+                                           window_size + moving_average_width // 2)
+        self._trace_data_averaged = TraceRingBuffer(len(channels),
+                                                    window_size - moving_average_width // 2)
+        self._averaged_channel_indices = list(range(len(channels)))
+        self._trace_times = np.arange(window_size, dtype=float)
+
+    def process(self, data):
+        """ Process a frame and copy the whole traces to emit them (as in trace_data). """
+        self._process_trace_data(data)
+        return self._trace_data.get_view().copy(), self._trace_data_averaged.get_view().copy()
+
+    def process_new_samples(self, data):
+        """ Process a frame and copy only its new samples to emit them (as in start_reading). """
+        self._process_trace_data(data)
+        return self.new_trace_samples(data.shape[1])
+
+
+class _DisplayDummy:
+    """ Displayed traces of TimeSeriesGui, the new samples of each data frame are appended. """
+
+    def __init__(self, logic):
+        self._logic = logic
+        _, data = logic.trace_data
+        _, smooth_data = logic.averaged_trace_data
+        self.trace = TraceRingBuffer(len(data), len(data[logic.active_channel_names[0]]))
+        self.averaged_trace = TraceRingBuffer(
+            len(smooth_data), len(smooth_data[logic.averaged_channel_names[0]]))
+
+    def process(self, data):
+        new_data, new_smooth_data = self._logic.process_new_samples(data)
+        self.trace.append(np.array(list(new_data.values())))
+        self.averaged_trace.append(np.array(list(new_smooth_data.values())))
+        return self.trace.get_view(), self.averaged_trace.get_view()
+
+
+class _LegacyProcessor:
+    """ Former trace processing using numpy.roll and numpy.convolve. """
+
+    def __init__(self, number_of_channels, window_size, moving_average_width):
+        self.trace_data = np.zeros(
+            [number_of_channels, window_size + moving_average_width // 2])
+        self.trace_data_averaged = np.zeros(
+            [number_of_channels, window_size - moving_average_width // 2])
+        self.moving_filter = np.full(shape=moving_average_width,
+                                     fill_value=1.0 / moving_average_width)
+
+    def process(self, data):
+        data = data[:, -self.trace_data.shape[1]:]
+        new_samples = data.shape[1]
+        self.trace_data = np.roll(self.trace_data, -new_samples, axis=1)
+        self.trace_data[:, -new_samples:] = data
+        self.trace_data_averaged = np.roll(self.trace_data_averaged, -new_samples, axis=1)
+        offset = new_samples + len(self.moving_filter) - 1
+        for i in range(self.trace_data_averaged.shape[0]):
+            self.trace_data_averaged[i, -new_samples:] = np.convolve(
+                self.trace_data[i, -offset:], self.moving_filter, mode='valid')
+
+
+def run_benchmark(data_rate=1e6, number_of_channels=8, max_frame_rate=10, trace_window_size=1,
+                  moving_average_width=9, duration=5):
+    window_size = int(round(trace_window_size * data_rate))
+    samples_per_frame = int(round(data_rate / max_frame_rate))
+    channels = ['ch{0:d}'.format(ii) for ii in range(number_of_channels)]
+    rng = np.random.RandomState(42)
+    frames = [rng.normal(size=(number_of_channels, samples_per_frame)) for _ in range(8)]
+
+    print('data rate: {0:.3e} Hz, channels: {1:d}, samples per frame: {2:d}, trace window: '
+          '{3:d} samples, moving average width: {4:d}'.format(
+              data_rate, number_of_channels, samples_per_frame, window_size, moving_average_width))
+
+    for name, create_processor in (
+            ('new samples', lambda: _DisplayDummy(
+                _LogicDummy(channels, window_size, moving_average_width))),
+            ('full trace copies', lambda: _LogicDummy(channels, window_size,
+                                                      moving_average_width)),
+            ('np.roll/convolve', lambda: _LegacyProcessor(number_of_channels, window_size,
+                                                          moving_average_width))):
+        processor = create_processor()
+        process = processor.process
+        processed = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            # The processing copies the data frame just like the streamer read would
+            process(frames[processed % len(frames)].copy())
+            processed += 1
+        elapsed = time.perf_counter() - start
+        print('{0:>18}: {1:8.1f} frames/s ({2:.3e} samples/s per channel, {3:s} real time)'
+              ''.format(name, processed / elapsed, processed * samples_per_frame / elapsed,
+                        'faster than' if processed / elapsed >= max_frame_rate else 'slower than'))
+
+    # Process identical data with both implementations and compare the results
+    new = _LogicDummy(channels, window_size, moving_average_width)
+    display = _DisplayDummy(new)
+    legacy = _LegacyProcessor(number_of_channels, window_size, moving_average_width)
+    for frame in frames * (1 + window_size // (len(frames) * samples_per_frame)):
+        display.process(frame.copy())
+        legacy.process(frame.copy())
+    print('trace equal: {0}, moving average max. deviation: {1:.3e}'.format(
+        np.array_equal(new._trace_data.get_view(), legacy.trace_data),
+        np.max(np.abs(new._trace_data_averaged.get_view() - legacy.trace_data_averaged))))
+    _, data = new.trace_data
+    _, smooth_data = new.averaged_trace_data
+    print('displayed traces equal to trace_data: {0}, averaged_trace_data: {1}'.format(
+        np.array_equal(display.trace.get_view(), np.array(list(data.values()))),
+        np.array_equal(display.averaged_trace.get_view(),
+                       np.array(list(smooth_data.values())))))
+    return
+
+
+if __name__ == '__main__':
+    kwargs = dict()
+    if len(sys.argv) > 1:
+        kwargs['data_rate'] = float(sys.argv[1])
+    if len(sys.argv) > 2:
+        kwargs['trace_window_size'] = float(sys.argv[2])
+    run_benchmark(**kwargs)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of displaying a long fast counter trace (e.g. the ungated laser trace of the pulsed
+GUI): setting and drawing all samples with pg.PlotDataItem versus DecimatedPlotDataItem, which
+only draws the first, last, minimum and maximum sample of each pixel column (M4 aggregation) and
+reuses the block minima/maxima of the trace while zooming in. Also compares the rendered images:
+pixels drawn by only one of both items must be next to a pixel drawn by both (line end
+rasterization), i.e. the shape of the trace is the same.
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/trace_decimation_benchmark.py [number_of_bins]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import pyqtgraph as pg
+from pyqtgraph import functions as fn
+from qtpy import QtWidgets
+from qtwidgets.decimated_plotitem import DecimatedPlotDataItem
+
+BIN_WIDTH = 1e-9
+LASER_PERIOD_BINS = 5000
+WIDTH = 1000
+HEIGHT = 400
+ZOOM_FACTORS = (1, 4, 16, 64, 256, 1024, 4096)
+
+
+def make_trace(number_of_bins):
+    """ Ungated fast counter histogram: laser pulses with fluorescence decay and Poisson noise. """
+    rng = np.random.default_rng(0)
+    bins = np.arange(number_of_bins)
+    phase = bins % LASER_PERIOD_BINS
+    rate = 20 + 200 * np.exp(-phase / 300) * (phase < 3000)
+    y = rng.poisson(rate).astype(float)
+    return bins * BIN_WIDTH, y
+
+
+def render(app, view):
+    app.processEvents()
+    return fn.imageToArray(view.grab().toImage(), copy=True)[..., :3].max(axis=-1) > 0
+
+
+def same_shape(lit_a, lit_b):
+    """ True if all pixels lit in only one image are next to a pixel lit in both. """
+    both = np.pad(lit_a & lit_b, 1)
+    near_both = np.zeros_like(lit_a)
+    for dx in (0, 1, 2):
+        for dy in (0, 1, 2):
+            near_both |= both[dy:dy + lit_a.shape[0], dx:dx + lit_a.shape[1]]
+    return not np.any((lit_a ^ lit_b) & ~near_both)
+
+
+def run_benchmark(number_of_bins=10000000):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    x, y = make_trace(number_of_bins)
+    y_range = (y.min(), y.max())
+    print('{0:d} bins, {1:d}x{2:d} pixel view'.format(number_of_bins, WIDTH, HEIGHT))
+    print('{0:>10} {1:>10} {2:>14} {3:>12} {4:>12} {5:>12}'.format(
+        'item', 'zoom', 'points drawn', 'time [ms]', 'diff pixels', 'lit pixels'))
+
+    results = dict()
+    for name, item_class in (('full', pg.PlotDataItem), ('decimated', DecimatedPlotDataItem)):
+        view = pg.GraphicsView()
+        viewbox = pg.ViewBox(enableMouse=False)
+        view.setCentralItem(viewbox)
+        view.resize(WIDTH, HEIGHT)
+        view.show()
+        viewbox.disableAutoRange()
+        viewbox.setRange(xRange=(x[0], x[-1]), yRange=y_range, padding=0)
+        item = item_class(pen=pg.mkPen('w'))
+        viewbox.addItem(item)
+        render(app, view)
+
+        results[name] = list()
+        start = time.perf_counter()
+        item.setData(x=x, y=y)
+        for zoom in ZOOM_FACTORS:
+            if zoom > 1:
+                start = time.perf_counter()
+            span = (x[-1] - x[0]) / zoom
+            center = x[number_of_bins // 3]
+            viewbox.setRange(xRange=(center - span / 2, center + span / 2), yRange=y_range,
+                             padding=0)
+            lit = render(app, view)
+            elapsed = time.perf_counter() - start
+            results[name].append((zoom, len(item.curve.xData), elapsed, lit))
+        view.close()
+
+    for name in results:
+        for (zoom, points, elapsed, lit), (_, _, _, lit_full) in zip(results[name],
+                                                                     results['full']):
+            print('{0:>10} {1:>10d} {2:>14d} {3:>12.1f} {4:>12d} {5:>12d}'.format(
+                name, zoom, points, 1e3 * elapsed, np.count_nonzero(lit ^ lit_full),
+                np.count_nonzero(lit)))
+            assert same_shape(lit, lit_full), zoom
+    del app
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run_benchmark(number_of_bins=int(float(sys.argv[1])))
+    else:
+        run_benchmark()
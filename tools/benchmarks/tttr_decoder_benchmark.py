@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the vectorized TTTR decoder and histogrammer used by the PicoHarp 300 fast counter
+with synthetic PicoHarp T3 records (photons, sequence markers and sync counter overflows).
+The result is compared against a per-record Python loop.
+
+Run from the qudi main directory:
+
+    python tools/benchmarks/tttr_decoder_benchmark.py [number_of_records]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from hardware.picoquant.tttr_decoder import TTTRDecoder, TTTRHistogrammer
+
+# Number of records per FIFO read of the PicoHarp 300 (TTREADMAX)
+FIFO_BLOCK_SIZE = 131072
+
+
+def generate_t3_records(number_of_records, number_of_gates, seed=0):
+    """ Synthetic PicoHarp T3 records with about one photon per sync pulse, a marker at the start
+    of each sequence of <number_of_gates> sync pulses and overflow records. """
+    rng = np.random.RandomState(seed)
+    nsync = np.cumsum(rng.poisson(1.0, number_of_records))
+    dtime = np.minimum(rng.exponential(400, number_of_records), 4095).astype(np.uint32)
+    channel = rng.randint(1, 3, number_of_records).astype(np.uint32)
+    records = (channel << 28) | (dtime << 16) | (nsync % 65536).astype(np.uint32)
+
+    # Sequence start markers before the first photon of each sequence
+    sequence = nsync // number_of_gates
+    marker_positions = np.flatnonzero(np.diff(np.concatenate(([-1], sequence))) > 0)
+    marker_nsync = sequence[marker_positions] * number_of_gates
+    markers = np.uint32(15 << 28) | np.uint32(1 << 16) | (marker_nsync % 65536).astype(np.uint32)
+    records = np.insert(records, marker_positions, markers)
+    nsync = np.insert(nsync, marker_positions, marker_nsync)
+
+    # Overflow records whenever the sync counter wraps around
+    overflow_positions = np.flatnonzero(np.diff(np.concatenate(([0], nsync // 65536))) > 0)
+    records = np.insert(records, overflow_positions, np.uint32(15 << 28))
+    return records
+
+
+def loop_histogram(records, number_of_bins, bin_factor, number_of_gates):
+    """ Per-record decoding and histogramming in pure Python. """
+    histogram = np.zeros((max(1, number_of_gates), number_of_bins), dtype=np.int64)
+    overflow_correction = 0
+    last_marker = 0
+    for record in records.tolist():
+        channel = record >> 28
+        dtime = (record >> 16) & 0xFFF
+        nsync = record & 0xFFFF
+        if channel == 15:
+            if dtime == 0:
+                overflow_correction += 65536
+            else:
+                last_marker = overflow_correction + nsync
+            continue
+        time_bin = dtime // bin_factor
+        if time_bin < number_of_bins:
+            gate = 0
+            if number_of_gates:
+                gate = (overflow_correction + nsync - last_marker) % number_of_gates
+            histogram[gate, time_bin] += 1
+    return histogram if number_of_gates else histogram[0]
+
+
+def vectorized_histogram(records, number_of_bins, bin_factor, number_of_gates):
+    """ Decoding and histogramming in FIFO sized blocks like the PicoHarp 300 module. """
+    decoder = TTTRDecoder('picoharp_t3')
+    histogrammer = TTTRHistogrammer(True, number_of_bins, bin_factor, number_of_gates)
+    for start in range(0, records.size, FIFO_BLOCK_SIZE):
+        histogrammer.add(decoder.decode(records[start:start + FIFO_BLOCK_SIZE]))
+    return histogrammer.get_data_trace()
+
+
+def run_benchmark(number_of_records=20000000, number_of_bins=1000, bin_factor=2,
+                  number_of_gates=100, loop_records=500000):
+    records = generate_t3_records(number_of_records, number_of_gates)
+    print('{0:d} records, {1:d} bins, bin factor {2:d}, {3:d} gates (gated histogram), '
+          'FIFO block size {4:d}'.format(records.size, number_of_bins, bin_factor,
+                                         number_of_gates, FIFO_BLOCK_SIZE))
+    for gates in (0, number_of_gates):
+        label = 'gated' if gates else 'ungated'
+        start = time.perf_counter()
+        vectorized_histogram(records, number_of_bins, bin_factor, gates)
+        elapsed = time.perf_counter() - start
+        print('{0:>8} vectorized: {1:8.3f} s, {2:.3e} records/s'.format(
+            label, elapsed, records.size / elapsed))
+
+        subset = records[:loop_records]
+        start = time.perf_counter()
+        reference = loop_histogram(subset, number_of_bins, bin_factor, gates)
+        loop_elapsed = time.perf_counter() - start
+        result = vectorized_histogram(subset, number_of_bins, bin_factor, gates)
+        print('{0:>8} python loop: {1:.3e} records/s ({2:d} records), speedup {3:.0f}x, '
+              'equal: {4}'.format(label, subset.size / loop_elapsed, subset.size,
+                                  (records.size / elapsed) / (subset.size / loop_elapsed),
+                                  np.array_equal(result, reference)))
+    return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run_benchmark(number_of_records=int(float(sys.argv[1])))
+    else:
+        run_benchmark()
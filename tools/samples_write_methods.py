@@ -32,16 +32,36 @@ class SamplesWriteMethods:
     Collection of write-to-file methods used to create hardware compatible files for the pulse
     generator out of sample arrays.
     """
-    def __init__(self):
+    def __init__(self, preallocate_files=False):
+        """
+        @param bool preallocate_files: optional, write wfm, wfmx and fpga files into files
+                                       preallocated to their final size with the first chunk
+                                       instead of appending (and using temporary marker files
+                                       for wfmx). The created files are identical.
+                                       pstream files are run-length encoded and pickled, so their
+                                       size is unknown before the last chunk and they are always
+                                       written by _write_pstream.
+        """
         # If you want to define a new file format, make a new method and add the
         # reference to this method to the _write_to_file dictionary:
         self._write_to_file = OrderedDict()
-        self._write_to_file['wfm'] = self._write_wfm
-        self._write_to_file['wfmx'] = self._write_wfmx
+        if preallocate_files:
+            self._write_to_file['wfm'] = self._write_wfm_preallocated
+            self._write_to_file['wfmx'] = self._write_wfmx_preallocated
+        else:
+            self._write_to_file['wfm'] = self._write_wfm
+            self._write_to_file['wfmx'] = self._write_wfmx
         self._write_to_file['seq'] = self._write_seq
         self._write_to_file['seqx'] = self._write_seqx
-        self._write_to_file['fpga'] = self._write_fpga
+        if preallocate_files:
+            self._write_to_file['fpga'] = self._write_fpga_preallocated
+        else:
+            self._write_to_file['fpga'] = self._write_fpga
         self._write_to_file['pstream'] = self._write_pstream
+
+        # Write position (in samples), header length and packing buffer of each file currently
+        # written by the preallocating methods
+        self._preallocated_files = dict()
         return
 
     def _write_wfmx(self, name, analog_samples, digital_samples, total_number_of_samples,
@@ -439,6 +459,200 @@ class SamplesWriteMethods:
 
         return created_files
 
+    def _write_wfmx_preallocated(self, name, analog_samples, digital_samples,
+                                 total_number_of_samples, is_first_chunk, is_last_chunk):
+        """
+        Version of _write_wfmx creating identical files without temporary marker files.
+        The wfmx-file of each analog channel is preallocated to its final size with the first
+        chunk. The analog samples and the marker bytes of each chunk are then written directly to
+        their positions in the file.
+
+        Parameters and return value are the same as for _write_wfmx.
+        """
+        created_files = list()
+        chunk_length = len(analog_samples[list(analog_samples)[0]])
+
+        if is_first_chunk:
+            # create header
+            self._create_xml_file(total_number_of_samples, self.temp_dir)
+            temp_file = os.path.join(self.temp_dir, 'header.xml')
+            with open(temp_file, 'r') as header:
+                header_bytes = bytes(header.read(), 'UTF-8')
+            os.remove(temp_file)
+            self._preallocated_files[name + '.wfmx'] = [0, len(header_bytes), None]
+
+            for channel in analog_samples:
+                markers = self.__get_marker_channels(channel)
+                has_markers = markers[0] in digital_samples or markers[1] in digital_samples
+                filename = name + channel[1:] + '.wfmx'
+                created_files.append(filename)
+                # preallocate file with header, analog samples and marker bytes
+                file_size = len(header_bytes) + total_number_of_samples * (
+                    5 if has_markers else 4)
+                with open(os.path.join(self.waveform_dir, filename), 'wb') as wfmxfile:
+                    wfmxfile.write(header_bytes)
+                    wfmxfile.truncate(file_size)
+
+        file_state = self._preallocated_files[name + '.wfmx']
+        write_index, header_length, marker_bytes = file_state
+        if marker_bytes is None or marker_bytes.size < chunk_length:
+            marker_bytes = np.empty(chunk_length, dtype='uint8')
+            file_state[2] = marker_bytes
+        marker_bytes = marker_bytes[:chunk_length]
+        for channel in analog_samples:
+            markers = self.__get_marker_channels(channel)
+            filepath = os.path.join(self.waveform_dir, name + channel[1:] + '.wfmx')
+            with open(filepath, 'r+b') as wfmxfile:
+                # analog samples behind the header
+                wfmxfile.seek(header_length + 4 * write_index)
+                wfmxfile.write(analog_samples[channel])
+                # marker bytes behind all analog samples
+                if markers[0] in digital_samples or markers[1] in digital_samples:
+                    self.__pack_markers(marker_bytes, digital_samples, markers)
+                    wfmxfile.seek(header_length + 4 * total_number_of_samples + write_index)
+                    wfmxfile.write(marker_bytes)
+
+        file_state[0] = write_index + chunk_length
+        if is_last_chunk:
+            del self._preallocated_files[name + '.wfmx']
+        return created_files
+
+    def _write_wfm_preallocated(self, name, analog_samples, digital_samples,
+                                total_number_of_samples, is_first_chunk, is_last_chunk):
+        """
+        Version of _write_wfm creating identical files.
+        The wfm-file of each analog channel is preallocated to its final size (incl. header and
+        footer) with the first chunk. The (float32, uint8) records of each chunk are packed into
+        buffers reused for all chunks and written directly to their position in the file.
+
+        Parameters and return value are the same as for _write_wfm.
+        """
+        created_files = list()
+        chunk_length = len(analog_samples[list(analog_samples)[0]])
+        record_type = np.dtype('float32, uint8')
+
+        if is_first_chunk:
+            num_bytes = str(int(total_number_of_samples * 5))
+            header = str.encode('MAGIC 1000\r\n#' + str(len(num_bytes)) + num_bytes)
+            footer = str.encode('CLOCK {0:16.10E}\r\n'.format(self.sample_rate))
+            for channel in analog_samples:
+                filename = name + channel[1:] + '.wfm'
+                with open(os.path.join(self.waveform_dir, filename), 'wb') as wfm_file:
+                    wfm_file.write(header)
+                    wfm_file.seek(len(header) + total_number_of_samples * record_type.itemsize)
+                    wfm_file.write(footer)
+            self._preallocated_files[name + '.wfm'] = [0, len(header), None]
+
+        file_state = self._preallocated_files[name + '.wfm']
+        write_index, header_length, buffers = file_state
+        if buffers is None or buffers[0].size < chunk_length:
+            buffers = (np.empty(chunk_length, dtype=record_type),
+                       np.empty(chunk_length, dtype='uint8'))
+            file_state[2] = buffers
+        records, marker_bytes = buffers[0][:chunk_length], buffers[1][:chunk_length]
+        for channel in analog_samples:
+            filename = name + channel[1:] + '.wfm'
+            created_files.append(filename)
+            records['f0'] = analog_samples[channel]
+            self.__pack_markers(marker_bytes, digital_samples, self.__get_marker_channels(channel))
+            records['f1'] = marker_bytes
+            with open(os.path.join(self.waveform_dir, filename), 'r+b') as wfm_file:
+                wfm_file.seek(header_length + record_type.itemsize * write_index)
+                wfm_file.write(records)
+
+        file_state[0] = write_index + chunk_length
+        if is_last_chunk:
+            del self._preallocated_files[name + '.wfm']
+        return created_files
+
+    def _write_fpga_preallocated(self, name, analog_samples, digital_samples,
+                                 total_number_of_samples, is_first_chunk, is_last_chunk):
+        """
+        Version of _write_fpga writing each chunk to its position in a fpga-file preallocated to
+        its final size (incl. the zero-samples padding to a multiple of 32 samples) with the first
+        chunk. The encoding buffer is reused for all chunks. In contrast to _write_fpga, which
+        recreates the file with every chunk, waveforms written in several chunks are complete.
+
+        Parameters and return value are the same as for _write_fpga.
+        """
+        if len(digital_samples) != 8:
+            self.log.warning('FPGA pulse generator needs 8 digital channels. ({0} given)\n'
+                             'All not specified channels will be set to logical low.'
+                             ''.format(len(digital_samples)))
+            return -1
+
+        filename = name + '.fpga'
+        filepath = os.path.join(self.waveform_dir, filename)
+        chunk_length = len(digital_samples[list(digital_samples)[0]])
+
+        if is_first_chunk:
+            file_size = total_number_of_samples
+            if total_number_of_samples % 32 != 0:
+                number_of_zeros = 32 - (total_number_of_samples % 32)
+                file_size += number_of_zeros
+                self.log.warning('FPGA pulse sequence length is no integer multiple of 32 '
+                                 'samples. Appending {0} zero-samples to the sequence.'
+                                 ''.format(number_of_zeros))
+            with open(filepath, 'wb') as fpgafile:
+                fpgafile.truncate(file_size)
+            self._preallocated_files[filename] = [0, 0, None]
+
+        file_state = self._preallocated_files[filename]
+        write_index, _, encoded_samples = file_state
+        if encoded_samples is None or encoded_samples.size < chunk_length:
+            encoded_samples = np.empty(chunk_length, dtype='uint8')
+            file_state[2] = encoded_samples
+        encoded_samples = encoded_samples[:chunk_length]
+
+        # encode channels into FPGA samples (bytes) the same way as _write_fpga
+        encoded_samples[:] = 0
+        for chnl_num in range(1, 9):
+            chnl_str = 'd_ch' + str(chnl_num)
+            if chnl_str in digital_samples:
+                encoded_samples += (2 ** chnl_num) * np.uint8(digital_samples[chnl_str])
+
+        with open(filepath, 'r+b') as fpgafile:
+            fpgafile.seek(write_index)
+            fpgafile.write(encoded_samples)
+
+        file_state[0] = write_index + chunk_length
+        if is_last_chunk:
+            del self._preallocated_files[filename]
+        return [filename]
+
+    @staticmethod
+    def __get_marker_channels(channel):
+        """
+        Get the digital channel descriptors of the two markers belonging to an analog channel.
+
+        @param str channel: analog channel descriptor (e.g. 'a_ch1')
+
+        @return list: the two marker channel descriptors (e.g. ['d_ch1', 'd_ch2'])
+        """
+        a_chnl_number = int(channel.strip('a_ch'))
+        return ['d_ch' + str((a_chnl_number * 2) - 1), 'd_ch' + str(a_chnl_number * 2)]
+
+    @staticmethod
+    def __pack_markers(out, digital_samples, markers):
+        """
+        Writes the marker byte values (1 for marker 1, 2 for marker 2, 3 for both) in place into
+        the contiguous uint8 array <out>.
+
+        @param numpy.ndarray out: uint8 array to write the marker bytes to
+        @param dict digital_samples: digital channel descriptors as keys and bool arrays as values
+        @param list markers: the two marker channel descriptors
+        """
+        if markers[0] in digital_samples:
+            out[:] = digital_samples[markers[0]]
+        else:
+            out[:] = 0
+        if markers[1] in digital_samples:
+            marker_2 = np.asarray(digital_samples[markers[1]], dtype=bool).view('uint8')
+            # adding the marker twice sets bit 1 without a temporary shifted array
+            out += marker_2
+            out += marker_2
+        return
+
     def _write_seq(self, sequence_obj):
         """
         Write a sequence to a seq-file.
@@ -589,7 +803,7 @@ class SamplesWriteMethods:
         # The header length is written into the file
         # The first line is not included since it is redundant
         # Also the last endline (\n) is excluded
-        text = open(filepath, "U").read()
+        text = open(filepath, "r").read()
         text = text.replace("xxxxxxxxx", length_of_header)
         text = bytes(text, 'UTF-8')
         f = open(filepath, "wb")